@@ -8,6 +8,7 @@
 
 import os
 import warnings
+from contextlib import contextmanager
 
 import pandas as pd
 
@@ -16,6 +17,8 @@ from chronix2grid import utils
 from chronix2grid.generation import generation_utils
 
 from chronix2grid.generation.dispatch import EconomicDispatch
+from chronix2grid.output_format import DEFAULT_OUTPUT_FORMAT
+from chronix2grid.telemetry import Telemetry, opf_solver_stats, timed_stage, TELEMETRY_FILE_NAME
 
 
 # MSG_PYPSA_DEPENDENCY = "Please install PypsaDispatchBackend dependency to launch chronix2grid with T mode. Chronix2grid stopped before dispatch computation. You should launch xithout letter T in mode"
@@ -54,6 +57,19 @@ class GeneratorBackend:
         A class that embeds a power loss generation backend such as :class:`chronix2grid.generation.loss.LossBackend`
     dispatch_backend_class
         A class that embeds a dispatch backend such as :class:`chronix2grid.generation.dispatch.DispatchBackend`
+    dispatch_cache: :class:`chronix2grid.generation.dispatch.dispatch_cache.DispatchCache` or ``None``
+        If not None, the results of the dispatch are read from (and stored in) this cache
+    output_format: ``str``
+        Format of the generated time series, see :mod:`chronix2grid.output_format` ("csv" by default)
+    by_n_weeks: ``int`` or ``None``
+        If not None, the generated time series are also written by chunks of `by_n_weeks` weeks (in the
+        folders "chunk_0", "chunk_1"... of each scenario), see :func:`chronix2grid.output_format.write_data`
+    async_write: ``bool``
+        Whether the generated time series are written in the background, see :mod:`chronix2grid.async_writer`
+        (False by default)
+    telemetry: ``bool``
+        Whether the duration, the peak memory and the solver statistics of each step (L, R, D and T) are written
+        in the file "telemetry.jsonl" of each scenario, see :mod:`chronix2grid.telemetry` (False by default)
     """
     def __init__(self):
         from chronix2grid import default_backend  # lazy import to avoid circular references
@@ -63,7 +79,8 @@ class GeneratorBackend:
         self.loss_config_manager = default_backend.LOSS_GENERATION_CONFIG
         self.dispatch_config_manager = default_backend.DISPATCH_GENERATION_CONFIG
 
-        self.dispatcher_class = default_backend.DISPATCHER
+        # default_backend.DISPATCHER is resolved on first use (see dispatcher_class), as pypsa is slow to import
+        self._dispatcher_class = None
 
         self.consumption_backend_class = default_backend.LOAD_GENERATION_BACKEND
         self.dispatch_backend_class = default_backend.DISPATCH_GENERATION_BACKEND
@@ -71,6 +88,24 @@ class GeneratorBackend:
         self.renewable_backend_class = default_backend.RENEWABLE_GENERATION_BACKEND
         self.loss_backend_class = default_backend.LOSS_GENERATION_BACKEND
 
+        self.dispatch_cache = None
+        self.output_format = DEFAULT_OUTPUT_FORMAT
+        self.async_write = False
+        self.by_n_weeks = None
+        self.telemetry = False
+        self._telemetry = None  # telemetry of the scenario being generated
+
+    @property
+    def dispatcher_class(self):
+        if self._dispatcher_class is None:
+            from chronix2grid import default_backend  # lazy import to avoid circular references
+            self._dispatcher_class = default_backend.DISPATCHER
+        return self._dispatcher_class
+
+    @dispatcher_class.setter
+    def dispatcher_class(self, dispatcher_class):
+        self._dispatcher_class = dispatcher_class
+
     # Call generation scripts n_scenario times with dedicated random seeds
     def run(self, case, n_scenarios, input_folder, output_folder, scen_names,
             time_params, mode='LRTK', scenario_id=None,
@@ -151,30 +186,49 @@ class GeneratorBackend:
             scenario_folder_path = os.path.join(output_folder, scenario_name)
 
             print("================ Generating " + scenario_name + " ================")
-            if 'L' in mode:
-                load, load_forecasted = self.do_l(scenario_folder_path, seed_load, params_dict['L'], loads_charac, config_manager_dict['L'])
-                #params.update(params_load)
-            if 'R' in mode:
-                prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted = self.do_r(scenario_folder_path, seed_res, params_dict['R'],
-                                                                                               prods_charac,
-                                                                                               config_manager_dict['R'])
-                #params.update(params_res)
-            if 'D' in mode:
-
-                self.do_d(input_folder, scenario_folder_path,
-                                     load, prod_solar, prod_wind,
-                                     params_dict['G'], config_manager_dict['D'])
-            if 'T' in mode:
-                if self.dispatch_backend_class is None:
-                    warnings.warn(MSG_NO_DISPATCH_BACKEND, UserWarning)
-                else:
-
-                    dispatch_results = self.do_t(input_folder, scenario_name, load, prod_solar, prod_wind,
-                                                 grid_folder, scenario_folder_path, seed_disp, params_dict['G'], params_dict['T'], loss)
+            with self._scenario_telemetry(scenario_name, scenario_folder_path):
+                if 'L' in mode:
+                    with timed_stage(self._telemetry, "L"):
+                        load, load_forecasted = self.do_l(scenario_folder_path, seed_load, params_dict['L'], loads_charac, config_manager_dict['L'])
+                    #params.update(params_load)
+                if 'R' in mode:
+                    with timed_stage(self._telemetry, "R"):
+                        prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted = self.do_r(scenario_folder_path, seed_res, params_dict['R'],
+                                                                                                       prods_charac,
+                                                                                                       config_manager_dict['R'])
+                    #params.update(params_res)
+                if 'D' in mode:
+                    with timed_stage(self._telemetry, "D"):
+                        self.do_d(input_folder, scenario_folder_path,
+                                             load, prod_solar, prod_wind,
+                                             params_dict['G'], config_manager_dict['D'])
+                if 'T' in mode:
+                    if self.dispatch_backend_class is None:
+                        warnings.warn(MSG_NO_DISPATCH_BACKEND, UserWarning)
+                    else:
+                        with timed_stage(self._telemetry, "T"):
+                            dispatch_results = self.do_t(input_folder, scenario_name, load, prod_solar, prod_wind,
+                                                         grid_folder, scenario_folder_path, seed_disp, params_dict['G'], params_dict['T'], loss)
 
             print('\n')
         return params_dict['G'], loads_charac, prods_charac
 
+    @contextmanager
+    def _scenario_telemetry(self, scenario_name, scenario_folder_path):
+        """
+        Times the generation of the scenario `scenario_name` (if :attr:`GeneratorBackend.telemetry`) and writes
+        its telemetry in `scenario_folder_path`, even if a step fails
+        """
+        self._telemetry = Telemetry(scenario_name) if self.telemetry else None
+        try:
+            with timed_stage(self._telemetry, "scenario"):
+                yield self._telemetry
+        finally:
+            if self._telemetry is not None:
+                os.makedirs(scenario_folder_path, exist_ok=True)
+                self._telemetry.write(os.path.join(scenario_folder_path, TELEMETRY_FILE_NAME))
+            self._telemetry = None
+
     def do_l(self, scenario_folder_path, seed_load, params, loads_charac, load_config_manager):
         """
         Generates load chronics thanks to the backend in ``self.consumption_backend_class``
@@ -287,13 +341,26 @@ class GeneratorBackend:
         res_names = dict(wind=prod_wind.columns, solar=prod_solar.columns)
         grid_path = os.path.join(grid_folder, constants.GRID_FILENAME)
         # grid_path = grid_folder
-        dispatcher = EconomicDispatch.init_dispatcher_from_config_dataframe(grid_path, input_folder,self.dispatcher_class, params_opf)
+        dispatcher_class = self.dispatcher_class
+        if "dispatcher" in params_opf:
+            from chronix2grid import default_backend  # lazy import to avoid circular references
+            dispatcher_class = default_backend.DISPATCHERS[params_opf["dispatcher"]]
+        dispatcher = EconomicDispatch.init_dispatcher_from_config_dataframe(grid_path, input_folder, dispatcher_class, params_opf)
         dispatcher.chronix_scenario = EconomicDispatch.ChroniXScenario(load, prods, res_names,
                                                                        scenario_name, loss)
+        dispatcher.cache = self.dispatch_cache
 
         generator_dispatch = self.dispatch_backend_class(dispatcher, scenario_folder_path,
                                                  grid_folder, seed_disp, params, params_opf)
         dispatch_results = generator_dispatch.run()
+        if self._telemetry is not None:
+            opf_timings = getattr(dispatcher, "opf_timings", None)
+            stats = opf_solver_stats(opf_timings,
+                                     dispatch_results.terminal_conditions if dispatch_results is not None else None)
+            if self.dispatch_cache is not None:
+                # read from the cache (nothing solved)
+                stats["cached"] = opf_timings is None
+            self._telemetry.add_solver_stats(**stats)
         return dispatch_results
 
     def get_params_charact(self,time_params,config_manager_dict):
@@ -317,6 +384,10 @@ class GeneratorBackend:
 
         params.update(time_params)
         params = generation_utils.updated_time_parameters_with_timestep(params, params['dt'])
+        # passed to all the steps with the general parameters
+        params["output_format"] = self.output_format
+        params["async_write"] = self.async_write
+        params["by_n_weeks"] = self.by_n_weeks
 
         #loads_charac=None
         #prods_charac=None
@@ -0,0 +1,147 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""Background writer: the generated time series are formatted and compressed by a pool of threads
+(bz2, zlib and zstd release the GIL) while the generation goes on."""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.output_format import data_file_path, remove_data, write_data, DEFAULT_OUTPUT_FORMAT
+
+DEFAULT_MAX_WORKERS = 4
+
+# one writer per process (see get_async_writer)
+_WRITERS = {}
+
+
+class AsyncWriter:
+    """
+    Writes data frames (or numpy arrays) with :func:`chronix2grid.output_format.write_data`
+    in background threads.
+
+    At most `max_pending` writes can be waiting at the same time: :func:`AsyncWriter.write` blocks
+    when the queue is full (so that the memory does not grow if the generation is faster than the
+    writing). The data are copied when they are submitted, they can be modified afterwards.
+
+    Call :func:`AsyncWriter.flush` (the barrier) before using the files written, typically at
+    the end of each scenario, before its metadata are saved. The errors raised while writing
+    are raised again by :func:`AsyncWriter.flush`.
+
+    Attributes
+    ----------
+    max_workers: ``int``
+        Number of threads writing the data
+    max_pending: ``int``
+        Maximum number of writes submitted but not finished
+    """
+    def __init__(self, max_workers=None, max_pending=None):
+        if max_workers is None:
+            max_workers = min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1)
+        if max_pending is None:
+            max_pending = 2 * max_workers
+        self.max_workers = int(max_workers)
+        self.max_pending = int(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="chronix2grid_writer")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._futures = []
+        self._written = []  # what was submitted to write_data (see discard)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` in the background (blocks if `max_pending` jobs are waiting)"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def write(self, data, path, columns=None, **kwargs):
+        """
+        Same as :func:`chronix2grid.output_format.write_data` but in the background
+
+        Parameters
+        ----------
+        data: :class:`pandas.DataFrame`, :class:`pandas.Series` or :class:`numpy.ndarray`
+            The data to write (they are copied)
+        path: ``str``
+        columns: ``list``
+            Names of the columns (only used if `data` is a numpy array)
+        kwargs:
+            passed to :func:`chronix2grid.output_format.write_data`
+        """
+        if isinstance(data, np.ndarray):
+            data = pd.DataFrame(np.array(data, copy=True), columns=columns)
+        else:
+            data = data.copy()
+        # recorded before the write starts, so that discard removes what was (partially) written even if it fails
+        with self._lock:
+            self._written.append((data_file_path(path, kwargs.get("output_format", DEFAULT_OUTPUT_FORMAT)),
+                                  data.shape[0],
+                                  kwargs.get("chunk_size")))
+        return self.submit(write_data, data, path, **kwargs)
+
+    def flush(self):
+        """Wait until all the writes submitted are done, raises the first error encountered (if any)"""
+        with self._lock:
+            futures, self._futures = self._futures, []
+            self._written = []
+        error_ = None
+        for future in futures:
+            exc_ = future.exception()
+            if exc_ is not None and error_ is None:
+                error_ = exc_
+        if error_ is not None:
+            raise error_
+
+    def discard(self):
+        """
+        Wait until all the writes submitted are done and remove the files they wrote, including their chunks
+        and the files of the writes that failed (the errors are ignored)
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+            written, self._written = self._written, []
+        for future in futures:
+            future.exception()
+        for path, n_rows, chunk_size in written:
+            remove_data(path, n_rows=n_rows, chunk_size=chunk_size)
+
+    def close(self):
+        """Flush and stop the threads"""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def get_async_writer():
+    """
+    Returns the writer of this process (it is created the first time). A new one is created
+    in the processes started by a multiprocessing pool, as threads are not copied by fork.
+    """
+    pid = os.getpid()
+    if pid not in _WRITERS:
+        _WRITERS[pid] = AsyncWriter()
+    return _WRITERS[pid]
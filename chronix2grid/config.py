@@ -344,6 +344,24 @@ class DispatchConfigManager(ConfigManager):
             * *solver_name* - name of solver, that you should have installed in your environment and added in your environment variables.
             * *hydro_ramp_reduction_factor* - optional factor which will divide max ramp up and down to all hydro generators
             * *losses_pct**- if D mode is deactivate, losses are estimated as a percentage of load.
+            * *dispatcher* - optional, "pypsa" or "highs" (see ``chronix2grid.default_backend.DISPATCHERS``). "highs" builds
+              the linear program directly and solves it with HiGHS (through scipy), without pypsa. *pyomo* and
+              *solver_name* are then ignored. If not provided ``chronix2grid.default_backend.DISPATCHER`` is used.
+            * *dispatch_horizon* - optional, how the periods given by *mode_opf* are chained. "independent" (default)
+              solves each period on its own (ramps are not enforced between two periods). "rolling" solves them one
+              after the other, starting from the last setpoint of the previous period and looking *rolling_overlap_min*
+              minutes ahead (default 0). "parallel" solves them independently on *dispatch_nb_process* processes (default 1)
+              and then re solves the first *reconciliation_min* minutes (default 60) of each period to respect the ramps
+              at the boundaries. *rolling_window_min* can be used to set the length of the periods (in minutes) instead
+              of *mode_opf*.
+            * *marginal_price* - optional, how the marginal prices are computed. "dual" (default) uses the dual of the
+              power balance of the linear program (the cost of one more MW of demand). "max_cost" uses the highest
+              marginal cost of the generators producing at each step (as in former versions).
+            * *prepare_net* - optional, if True (default) the network is copied and the error correction ratios are
+              applied once for all the periods, each period then only updates the time dependant tables (and, with the
+              "highs" dispatcher, reuses the constraint matrices). If False the network is copied for each period. The
+              time spent in each part of the optimization of each period is stored in the ``opf_timings`` attribute of
+              the dispatcher.
 
         Optional parameters can be set for grid2op simulation of loss as a final step.
         The production is updated on a slack generator and warnings or errors are returned if this update violates generator constraints
@@ -354,6 +372,11 @@ class DispatchConfigManager(ConfigManager):
         * *idxSlack*, *nameSlack* - identifies slack generator that will be updated
         * *early_stopping_mode* if True returns errors if generator constraints are violated after updates. If False, only returns warnings
         * *agent_type* - Grid2op agent type ti use for simulation. Can be "reco" for RecoPowerLines or "do-nothing"
+        * *loss_engine* - "step" (default) runs the simulation with a grid2op runner, "batch" computes all the powerflows
+          of the scenario in one call to lightsim2grid (much faster, no agent results written)
+        * *loss_in_memory* - if True, the simulation reads the productions and loads computed by the dispatch from memory
+          instead of copying the grid folder and the chronics of each scenario, the corrected productions are then
+          written only once (no agent results written). False by default
 
         .. warning::
             The dispatch optimization can rely on pypsa simulation. If it is the case you should ensure pypsa dependencies are installed
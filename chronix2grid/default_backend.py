@@ -36,10 +36,22 @@ LOSS_GENERATION_BACKEND = LossBackend
 DISPATCH_GENERATION_CONFIG = DispatchConfigManager
 HYDRO_GENERATION_BACKEND = None
 
-from chronix2grid.generation.dispatch.PypsaDispatchBackend import PypsaDispatcher
-DISPATCHER = PypsaDispatcher
+# DISPATCHER (PypsaDispatcher) and DISPATCHERS, the dispatchers that can be selected with the "dispatcher" key
+# of the opf parameters, are imported on first access (see __getattr__ below), as pypsa is slow to import
 DISPATCH_GENERATION_BACKEND = DispatchBackend
 
 #### KPI (K) ####
 RENEWABLE_NINJA_REFERENCE_FOLDER = 'renewable_ninja'
 GAN_TRAINING_SET_REFERENCE_FOLDER = 'GAN_training_data'
+
+
+def __getattr__(name):
+    if name == "DISPATCHER":
+        from chronix2grid.generation.dispatch.PypsaDispatchBackend import PypsaDispatcher
+        return PypsaDispatcher
+    if name == "DISPATCHERS":
+        from chronix2grid.generation.dispatch.PypsaDispatchBackend import PypsaDispatcher
+        from chronix2grid.generation.dispatch.HighsDispatchBackend import HighsDispatcher
+        return {"pypsa": PypsaDispatcher,
+                "highs": HighsDispatcher}
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
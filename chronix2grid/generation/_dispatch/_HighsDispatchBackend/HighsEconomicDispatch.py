@@ -0,0 +1,211 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""Economic dispatch that does not rely on pypsa: the (single bus) linear program is
+assembled directly as a sparse matrix and solved with HiGHS."""
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.generation._dispatch._PypsaDispatchBackend._EDispatch_L2RPN2020.run_economic_dispatch import main_run_disptach
+from chronix2grid.generation.dispatch.EconomicDispatch import Dispatcher
+from chronix2grid.generation.dispatch.utils import RampMode
+from .highs_opf import preprocess_net_highs, prepare_net_highs, run_opf_highs
+
+GENERATOR_COLUMNS = ['carrier', 'p_nom', 'marginal_cost', 'ramp_limit_up', 'ramp_limit_down']
+
+
+class HighsDispatcher(Dispatcher):
+    """
+    Inheriting from Dispatcher to implement abstract methods with a linear program
+    solved by HiGHS (through :func:`scipy.optimize.linprog`).
+
+    It solves the same problem, with the same parameters, as
+    :class:`chronix2grid.generation.dispatch.PypsaDispatchBackend.PypsaDispatcher` but
+    without building a pypsa network (nor a pyomo / linopy model) for each period.
+    The generators are stored in a :class:`pandas.DataFrame` with the same columns
+    as `pypsa.Network.generators`.
+    """
+
+    # PATCH
+    # to avoid problems for respecting pmax and ramps when rounding production values in chronics at the end, we apply a correcting factor
+    PmaxCorrectingFactor = 1
+    RampCorrectingFactor = 0.1
+
+    def __init__(self):
+        super().__init__()
+        self.generators = pd.DataFrame({col: pd.Series(dtype=float if col != 'carrier' else object)
+                                        for col in GENERATOR_COLUMNS},
+                                       index=pd.Index([], name='Generator', dtype=object))
+        self.loads = pd.DataFrame(index=pd.Index(['agg_load'], name='Load'))
+        self._env = None  # The grid2op environment when instanciated with from_gri2dop_env
+        self._df = None
+        self._chronix_scenario = None
+        self._simplified_chronix_scenario = None
+        self._has_results = False
+        self._has_simplified_results = False
+
+        self._pmax_solar = None
+        self._pmax_wind = None
+        self.opf_timings = None  # time spent in each part of the opf of each period (see `run`)
+        self.cache = None  # a DispatchCache used by `run_cached`
+
+    def add_generator(self, name, p_nom, carrier, marginal_cost,
+                      ramp_limit_up=np.nan, ramp_limit_down=np.nan):
+        """Add a generator to the dispatch problem (`nan` ramps mean no ramp constraint)"""
+        self.generators.loc[name, GENERATOR_COLUMNS] = [carrier, float(p_nom), float(marginal_cost),
+                                                        float(ramp_limit_up), float(ramp_limit_down)]
+
+    def _add_renewables(self, pmax_solar, pmax_wind):
+        # add total wind and solar (for curtailment)
+        self._pmax_solar = pmax_solar
+        self.add_generator('agg_solar', p_nom=pmax_solar, carrier="solar", marginal_cost=0.)
+        self._pmax_wind = pmax_wind
+        # we prefer to curtail the wind if we have the choice
+        # that's because solar should be distributed on the grid
+        self.add_generator('agg_wind', p_nom=pmax_wind, carrier="wind", marginal_cost=0.1)
+
+    @classmethod
+    def from_gri2op_env(cls, grid2op_env):
+        """
+        Implements the abstract method of *Dispatcher*
+
+        Parameters
+        ----------
+        grid2op_env
+
+        Returns
+        -------
+        net: :class:`HighsDispatcher`
+        """
+        net = cls()
+        net._env = grid2op_env
+
+        carrier_types_to_exclude = ['wind', 'solar']
+        for i, generator in enumerate(grid2op_env.name_gen):
+            gen_type = grid2op_env.gen_type[i]
+            if gen_type not in carrier_types_to_exclude:
+                p_max = grid2op_env.gen_pmax[i]
+                net.add_generator(
+                    generator,
+                    p_nom=p_max - cls.PmaxCorrectingFactor,
+                    carrier=gen_type,
+                    marginal_cost=grid2op_env.gen_cost_per_MW[i],
+                    ramp_limit_up=(grid2op_env.gen_max_ramp_up[i] - cls.RampCorrectingFactor) / p_max,
+                    ramp_limit_down=(grid2op_env.gen_max_ramp_down[i] - cls.RampCorrectingFactor) / p_max,
+                )
+        net._add_renewables(np.sum(grid2op_env.gen_pmax[grid2op_env.gen_type == "solar"]),
+                            np.sum(grid2op_env.gen_pmax[grid2op_env.gen_type == "wind"]))
+        return net
+
+    @classmethod
+    def from_dataframe(cls, env_df):
+        """
+        Implements the abstract method of *Dispatcher*
+
+        Parameters
+        ----------
+        env_df: :class:`pandas.DataFrame`
+
+        Returns
+        -------
+        net: :class:`HighsDispatcher`
+        """
+        net = cls()
+        net._df = env_df
+
+        carrier_types_to_exclude = ['wind', 'solar']
+        for generator, gen_type, p_max, ramp_up, ramp_down, gen_cost_per_MW in zip(env_df['name'],
+                                                                                   env_df['type'],
+                                                                                   env_df['pmax'],
+                                                                                   env_df['max_ramp_up'],
+                                                                                   env_df['max_ramp_down'],
+                                                                                   env_df['cost_per_mw']):
+            if gen_type not in carrier_types_to_exclude:
+                net.add_generator(
+                    generator,
+                    p_nom=p_max - cls.PmaxCorrectingFactor,
+                    carrier=gen_type,
+                    marginal_cost=gen_cost_per_MW,
+                    ramp_limit_up=(ramp_up - cls.RampCorrectingFactor) / p_max,
+                    ramp_limit_down=(ramp_down - cls.RampCorrectingFactor) / p_max,
+                )
+        net._add_renewables(np.sum(env_df['pmax'][env_df['type'] == "solar"]),
+                            np.sum(env_df['pmax'][env_df['type'] == "wind"]))
+        return net
+
+    def run(self,
+            load,
+            total_solar,
+            total_wind,
+            params,
+            gen_constraints=None,
+            ramp_mode=RampMode.hard,
+            by_carrier=False,
+            gen_min_pu_t=None,
+            gen_max_pu_t=None,
+            **kwargs):
+        """
+        Implements the abstract method of *Dispatcher*
+
+        Extra keyword arguments are given to :func:`run_opf_highs` (for example `solver_options`),
+        those specific to pypsa (`pyomo`, `solver_name`) are ignored.
+        The time spent in each part of the optimization of each period is then
+        available in `opf_timings`.
+
+        Returns
+        -------
+        results: :class:`chronix2grid.generation.dispatch.EconomicDispatch.DispatchResults`
+        """
+        if total_solar is not None:
+            total_solar = total_solar / self._pmax_solar
+        if total_wind is not None:
+            total_wind = total_wind / self._pmax_wind
+        net = self if not by_carrier else self.simplify_net()
+        prods_dispatch, terminal_conditions, marginal_prices = \
+            main_run_disptach(
+                net,
+                load, total_solar, total_wind,
+                params, gen_constraints, ramp_mode,
+                preprocess_net_fun=preprocess_net_highs,
+                run_opf_fun=run_opf_highs,
+                prepare_net_fun=prepare_net_highs,
+                gen_min_pu_t=gen_min_pu_t, gen_max_pu_t=gen_max_pu_t,
+                **kwargs)
+        self.opf_timings = net.opf_timings
+        if prods_dispatch is None or marginal_prices is None:
+            return None
+        return self._store_results(prods_dispatch, marginal_prices, terminal_conditions, by_carrier=by_carrier)
+
+    def simplify_net(self):
+        """
+        Implements the abstract method of *Dispatcher*
+        """
+        carriers = self.generators.carrier.unique()
+        simplified_net = HighsDispatcher()
+        for carrier in carriers:
+            gens = self.generators.loc[self.generators.carrier == carrier,
+                                       ['p_nom', 'ramp_limit_up', 'ramp_limit_down', 'marginal_cost']]
+            p_nom = gens['p_nom'].sum()
+            simplified_net.add_generator(
+                carrier, p_nom=p_nom, carrier=carrier,
+                marginal_cost=gens['marginal_cost'].mean(),
+                ramp_limit_up=(gens['p_nom'] * gens['ramp_limit_up']).sum() / p_nom,
+                ramp_limit_down=(gens['p_nom'] * gens['ramp_limit_down']).sum() / p_nom,
+            )
+        simplified_net._hydro_file_path = self._hydro_file_path
+        simplified_net._min_hydro_pu = self._min_hydro_pu.iloc[:, 0]
+        simplified_net._max_hydro_pu = self._max_hydro_pu.iloc[:, 0]
+
+        print('simplified dispatch by carrier')
+        full_ramp = simplified_net.generators['p_nom'] * simplified_net.generators['ramp_limit_up']
+        print(pd.concat([simplified_net.generators[['p_nom', 'ramp_limit_up',
+                                                    'ramp_limit_down', 'marginal_cost']],
+                         pd.DataFrame({'full_ramp': full_ramp})],
+                        axis=1))
+        return simplified_net
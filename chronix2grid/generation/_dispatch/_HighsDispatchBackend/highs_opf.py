@@ -0,0 +1,328 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""Single bus economic dispatch written directly as a sparse linear program and solved
+with HiGHS (through scipy). This is the same problem as the one built by pypsa in
+:func:`chronix2grid.generation.dispatch.PypsaDispatchBackend.EDispatch_L2RPN2020.run_opf`."""
+
+import copy
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.optimize import linprog
+
+from chronix2grid.generation._dispatch._PypsaDispatchBackend._EDispatch_L2RPN2020.utils import add_boundary_constraints
+
+# scipy.optimize.linprog status -> (pyomo like) termination condition
+TERMINATION_CONDITIONS = {0: "optimal",
+                          1: "maxIterations",
+                          2: "infeasible",
+                          3: "unbounded",
+                          4: "other"}
+
+
+def preprocess_net_highs(net, every_min, input_data_resolution=5):
+    """Equivalent of `preprocess_net` for a :class:`HighsDispatcher`: adapts the ramps
+    up/down according to the configured time to run OPF (there are no loads nor
+    commitable variables to handle).
+
+    Parameters
+    ----------
+    net : HighsDispatcher
+    every_min : int
+        Time (in minutes) between two steps of the OPF
+    input_data_resolution : int, optional
+        Resolution (in minutes) of the input data, by default 5
+
+    Returns
+    -------
+    HighsDispatcher
+        The modified dispatcher
+    """
+    steps = every_min / input_data_resolution
+    net.generators.loc[:, ['ramp_limit_up', 'ramp_limit_down']] *= steps
+    return net
+
+
+def build_dispatch_matrices(p_nom, marginal_cost, ramp_up, ramp_down, n_step):
+    """Build the parts of the linear program of `build_dispatch_lp` that only depend on
+    the generators and on the number of steps (and not on the demand nor on the bounds),
+    so that they can be reused for all the periods with the same length.
+
+    Parameters
+    ----------
+    p_nom : np.ndarray
+        Nominal power of each generator (MW), shape (n_gen,)
+    marginal_cost : np.ndarray
+        Marginal cost of each generator, shape (n_gen,)
+    ramp_up : np.ndarray
+        Maximum ramp up (in pu of `p_nom`) between two steps, `nan` for no constraint, shape (n_gen,)
+    ramp_down : np.ndarray
+        Maximum ramp down (in pu of `p_nom`) between two steps, `nan` for no constraint, shape (n_gen,)
+    n_step : int
+        Number of steps
+
+    Returns
+    -------
+    c, A_ub, b_ub, A_eq
+        The corresponding arguments of :func:`scipy.optimize.linprog`
+    """
+    n_gen = p_nom.shape[0]
+    n_var = n_step * n_gen
+    c = np.tile(marginal_cost, n_step)
+
+    # supply = demand at each step
+    A_eq = sp.csr_matrix((np.ones(n_var), (np.repeat(np.arange(n_step), n_gen), np.arange(n_var))),
+                         shape=(n_step, n_var))
+
+    # ramps: p[t, g] - p[t-1, g] <= ramp_up * p_nom (and the opposite for ramp down)
+    # there is no constraint on the first step of the period
+    blocks, rhs = [], []
+    for sign, ramp in ((1., ramp_up), (-1., ramp_down)):
+        gen_ids = np.where(np.isfinite(ramp))[0]
+        if n_step <= 1 or gen_ids.shape[0] == 0:
+            continue
+        var_now = (np.arange(1, n_step).reshape(-1, 1) * n_gen + gen_ids.reshape(1, -1)).ravel()
+        var_prev = var_now - n_gen
+        n_row = var_now.shape[0]
+        rows = np.concatenate((np.arange(n_row), np.arange(n_row)))
+        cols = np.concatenate((var_now, var_prev))
+        vals = np.concatenate((np.full(n_row, sign), np.full(n_row, -sign)))
+        blocks.append(sp.csr_matrix((vals, (rows, cols)), shape=(n_row, n_var)))
+        rhs.append(np.tile(ramp[gen_ids] * p_nom[gen_ids], n_step - 1))
+    if blocks:
+        A_ub = sp.vstack(blocks, format="csr")
+        b_ub = np.concatenate(rhs)
+    else:
+        A_ub = None
+        b_ub = None
+    return c, A_ub, b_ub, A_eq
+
+
+def build_dispatch_lp(p_nom, marginal_cost, ramp_up, ramp_down, p_min_pu, p_max_pu, demand, matrices=None):
+    """Build the linear program of the dispatch of `n_gen` generators over `n_step` steps.
+
+    Variables are the productions, stored step by step: `x[t * n_gen + g]` is the
+    production of generator `g` at step `t`.
+
+    Parameters
+    ----------
+    p_nom : np.ndarray
+        Nominal power of each generator (MW), shape (n_gen,)
+    marginal_cost : np.ndarray
+        Marginal cost of each generator, shape (n_gen,)
+    ramp_up : np.ndarray
+        Maximum ramp up (in pu of `p_nom`) between two steps, `nan` for no constraint, shape (n_gen,)
+    ramp_down : np.ndarray
+        Maximum ramp down (in pu of `p_nom`) between two steps, `nan` for no constraint, shape (n_gen,)
+    p_min_pu : np.ndarray
+        Minimum production (in pu of `p_nom`), shape (n_step, n_gen)
+    p_max_pu : np.ndarray
+        Maximum production (in pu of `p_nom`), shape (n_step, n_gen)
+    demand : np.ndarray
+        Total demand to meet, shape (n_step,)
+    matrices : tuple, optional
+        Output of `build_dispatch_matrices` for these generators and this number of
+        steps (computed if not provided)
+
+    Returns
+    -------
+    c, A_ub, b_ub, A_eq, b_eq, bounds
+        The arguments of :func:`scipy.optimize.linprog`
+    """
+    n_step = p_min_pu.shape[0]
+    if matrices is None:
+        matrices = build_dispatch_matrices(p_nom, marginal_cost, ramp_up, ramp_down, n_step)
+    c, A_ub, b_ub, A_eq = matrices
+    bounds = np.stack([(p_min_pu * p_nom).ravel(), (p_max_pu * p_nom).ravel()], axis=1)
+    b_eq = np.asarray(demand, dtype=float)
+    return c, A_ub, b_ub, A_eq, b_eq, bounds
+
+
+def _apply_error_correction(gens, params, slack_name=None):
+    """same as `apply_error_correction` on the generators of a :class:`HighsDispatcher` (inplace)"""
+    is_renew = gens.index.isin(["agg_solar", "agg_wind"])
+    if "PmaxErrorCorrRatio" in params:
+        gens.loc[~is_renew, "p_nom"] *= float(params["PmaxErrorCorrRatio"])
+    if "RampErrorCorrRatio" in params:
+        gens.loc[~is_renew, ["ramp_limit_up", "ramp_limit_down"]] *= float(params["RampErrorCorrRatio"])
+    if slack_name is not None and "slack_ramp_limit_ratio" in params:
+        gens.loc[slack_name, ["ramp_limit_up", "ramp_limit_down"]] *= float(params["slack_ramp_limit_ratio"])
+    return gens
+
+
+def prepare_net_highs(net, params, slack_name=None):
+    """Equivalent of `prepare_net` for a :class:`HighsDispatcher`: returns a (shallow)
+    copy of `net` with the error correction ratios applied to its generators. When it
+    is given to `run_opf_highs` with `prepared=True`, the constraint matrices are also
+    kept (in `_lp_matrices`) and reused for all the periods with the same number of steps.
+
+    Parameters
+    ----------
+    net : HighsDispatcher
+    params : dict
+        OPF set up parameters
+    slack_name : str, optional
+        Name of the slack generator
+
+    Returns
+    -------
+    HighsDispatcher
+        The prepared copy
+    """
+    prepared_net = copy.copy(net)
+    prepared_net.generators = _apply_error_correction(net.generators.copy(), params, slack_name=slack_name)
+    prepared_net._lp_matrices = {}
+    return prepared_net
+
+
+def run_opf_highs(net,
+                  demand,
+                  gen_max,
+                  gen_min,
+                  params,
+                  total_solar=None,
+                  total_wind=None,
+                  slack_name=None,
+                  slack_pmin=None,
+                  slack_pmax=None,
+                  gen_min_pu_t=None,
+                  gen_max_pu_t=None,
+                  initial_p=None,
+                  final_p=None,
+                  return_duals=False,
+                  prepared=False,
+                  timings=None,
+                  solver_options=None,
+                  **kwargs):
+    """ Run the linear OPF problem (marginal costs and ramps only) of one period
+    with HiGHS.
+
+    It has the same signature and the same outputs as `run_opf` so that it can
+    be used by `main_run_disptach`. Arguments that only make sense for pypsa
+    (for example `pyomo` or `solver_name`) are ignored.
+
+    Parameters
+    ----------
+    net : HighsDispatcher
+    demand : dataframe
+        Load to be filled
+    gen_max : dataframe
+        Generator max constraints in pu
+    gen_min : dataframe
+        Generator min constraints in pu
+    params : dict
+        OPF set up parameters
+    initial_p : pd.Series, optional
+        Production of the generators at the step preceding the period (see `add_boundary_constraints`)
+    final_p : pd.Series, optional
+        Production of the generators at the step following the period
+    return_duals : bool, optional
+        If True, also returns the dual of the power balance at each step (the marginal price)
+    prepared : bool, optional
+        If True, `net` comes from `prepare_net_highs` (the error correction ratios are
+        already applied and the constraint matrices are cached)
+    timings : list, optional
+        If provided, the time spent (in seconds) to set up the bounds ("setup"), to build
+        the linear program ("build"), to solve it ("solve") and to read the results
+        ("extract") is appended to it (as a dict)
+    solver_options : dict, optional
+        Options passed to :func:`scipy.optimize.linprog`
+
+    Returns
+    -------
+    dataframe
+        Results of OPF dispatch
+    """
+    to_disp = {'day': demand.index.day.unique().values[0],
+               'week': demand.index.isocalendar().week.unique()[0],
+               'month': demand.index.month.unique().values[0],
+    }
+    mode = params['mode_opf']
+    if mode is None:
+        print(f'\n--> OPF formulation by => full chronix - Analyzing ')
+    else:
+        print(f'\n--> OPF formulation by => {mode} - Analyzing {mode} # {to_disp[mode]}')
+
+    beg_ = time.perf_counter()
+    if prepared:
+        gens = net.generators
+    else:
+        gens = _apply_error_correction(net.generators.copy(), params, slack_name=slack_name)
+
+    # time dependant bounds (in pu), pypsa default is 0 for p_min_pu and 1 for p_max_pu
+    p_max_pu = pd.DataFrame(1., index=demand.index, columns=gens.index)
+    p_min_pu = pd.DataFrame(0., index=demand.index, columns=gens.index)
+    for df_pu, constraints in ((p_max_pu, gen_max), (p_min_pu, gen_min)):
+        cols = [col for col in constraints.columns if col in df_pu.columns]
+        df_pu.loc[:, cols] = constraints.loc[demand.index, cols].values
+
+    # allow to curtail the solar and wind (to avoid infeasibility)
+    if "agg_solar" in p_max_pu:
+        p_max_pu["agg_solar"] = total_solar.values.ravel() if total_solar is not None else 0.
+    if "agg_wind" in p_max_pu:
+        p_max_pu["agg_wind"] = total_wind.values.ravel() if total_wind is not None else 0.
+    if slack_name is not None and slack_pmin is not None:
+        p_min_pu[slack_name] = slack_pmin
+    if slack_name is not None and slack_pmax is not None:
+        p_max_pu[slack_name] = slack_pmax
+
+    if gen_max_pu_t is not None:
+        # addition contraint on the max_pu, used for example when splitting the loss
+        for gen_nm, max_val in gen_max_pu_t.items():
+            if str(gen_nm) in p_max_pu:
+                p_max_pu[str(gen_nm)] = np.minimum(p_max_pu[str(gen_nm)], max_val)
+    if gen_min_pu_t is not None:
+        # addition contraint on the min_pu, used for example when splitting the loss
+        for gen_nm, min_val in gen_min_pu_t.items():
+            if str(gen_nm) in p_min_pu:
+                p_min_pu[str(gen_nm)] = np.maximum(p_min_pu[str(gen_nm)], min_val)
+
+    p_min_pu, p_max_pu = add_boundary_constraints(gens, p_min_pu, p_max_pu,
+                                                  initial_p=initial_p, final_p=final_p)
+
+    setup_ = time.perf_counter()
+    gen_charac = [gens[col].values.astype(float)
+                  for col in ["p_nom", "marginal_cost", "ramp_limit_up", "ramp_limit_down"]]
+    matrices = None
+    if prepared:
+        # the generators do not change between the periods
+        n_step = demand.shape[0]
+        if n_step not in net._lp_matrices:
+            net._lp_matrices[n_step] = build_dispatch_matrices(*gen_charac, n_step)
+        matrices = net._lp_matrices[n_step]
+    c, A_ub, b_ub, A_eq, b_eq, bounds = build_dispatch_lp(*gen_charac,
+                                                          p_min_pu.values.astype(float),
+                                                          p_max_pu.values.astype(float),
+                                                          demand.sum(axis=1).values,
+                                                          matrices=matrices)
+    build_ = time.perf_counter()
+    res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=bounds,
+                  method="highs", options=solver_options)
+    solve_ = time.perf_counter()
+    termination_condition = TERMINATION_CONDITIONS.get(res.status, "other")
+    dispatch, prices = None, None
+    if res.status != 0:
+        print('** OPF failed to find an optimal solution **')
+    else:
+        print('-- opf succeeded  >Objective value (should be greater than zero!')
+        dispatch = pd.DataFrame(res.x.reshape(demand.shape[0], gens.shape[0]),
+                                index=demand.index,
+                                columns=gens.index)
+        if return_duals:
+            # sensitivity of the cost to the demand at each step
+            prices = pd.Series(res.eqlin.marginals, index=demand.index)
+    if timings is not None:
+        timings.append({"period_start": demand.index[0], "nb_step": demand.shape[0],
+                        "setup": setup_ - beg_, "build": build_ - setup_, "solve": solve_ - build_,
+                        "extract": time.perf_counter() - solve_})
+    if return_duals:
+        return dispatch, termination_condition, prices
+    return dispatch, termination_condition
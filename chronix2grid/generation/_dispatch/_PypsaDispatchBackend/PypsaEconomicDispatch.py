@@ -54,6 +54,8 @@ class PypsaDispatcher(Dispatcher, pypsa.Network):
         
         self._pmax_solar = None
         self._pmax_wind = None
+        self.opf_timings = None  # time spent in each part of the opf of each period (see `run`)
+        self.cache = None  # a DispatchCache used by `run_cached`
 
     @classmethod
     def from_gri2op_env(cls, grid2op_env):
@@ -207,35 +209,18 @@ class PypsaDispatcher(Dispatcher, pypsa.Network):
             total_solar = total_solar / self._pmax_solar
         if total_wind is not None:
             total_wind = total_wind / self._pmax_wind
+        net = self if not by_carrier else self.simplify_net()
         prods_dispatch, terminal_conditions, marginal_prices = \
             main_run_disptach(
-                self if not by_carrier else self.simplify_net(),
+                net,
                 load, total_solar, total_wind, 
                 params, gen_constraints, ramp_mode,
                 gen_min_pu_t=gen_min_pu_t, gen_max_pu_t=gen_max_pu_t,
                 **kwargs)
+        self.opf_timings = net.opf_timings
         if prods_dispatch is None or marginal_prices is None:
             return None
-        
-        if by_carrier:
-            self._simplified_chronix_scenario = self._chronix_scenario.simplify_chronix()
-            self._simplified_chronix_scenario.prods_dispatch = prods_dispatch
-            self._simplified_chronix_scenario.marginal_prices = marginal_prices
-            results = self._simplified_chronix_scenario
-            self._has_simplified_results = True
-            self._has_results = False
-        else:
-            self._chronix_scenario.prods_dispatch = prods_dispatch
-            self._chronix_scenario.marginal_prices = marginal_prices
-            results = self._chronix_scenario
-            self._has_results = True
-            self._has_simplified_results = False
-        if self._env is None:
-            self.reset_ramps_from_dataframe()
-        else:
-            self.reset_ramps_from_grid2op_env()
-        
-        return DispatchResults(chronix=results, terminal_conditions=terminal_conditions)
+        return self._store_results(prods_dispatch, marginal_prices, terminal_conditions, by_carrier=by_carrier)
 
     def simplify_net(self):
         """
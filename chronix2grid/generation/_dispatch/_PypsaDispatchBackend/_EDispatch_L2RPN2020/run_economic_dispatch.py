@@ -7,23 +7,200 @@
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
 import argparse
+import multiprocessing
 import os
 import time
+import warnings
 
 import pandas as pd
-import pypsa
 
 from .utils import get_grouped_snapshots
 from .utils import interpolate_dispatch
 from .utils import preprocess_input_data
-from .utils import preprocess_net, filter_ramps
-from .utils import run_opf
+from .utils import preprocess_net, prepare_net, filter_ramps
+from .utils import run_opf, compute_marginal_prices
 from .utils import update_gen_constrains, update_params
 
 ## Dépendances Chronix2Grid !!
 from chronix2grid.generation.dispatch.utils import RampMode
 import chronix2grid.constants as cst
 
+POSSIBLE_DISPATCH_HORIZON = ['independent', 'rolling', 'parallel']
+POSSIBLE_MARGINAL_PRICE = ['dual', 'max_cost']
+
+
+def get_periods(tot_snap, params):
+    """Split the snapshots in consecutive periods for the rolling horizon (or parallel)
+    dispatch.
+
+    If "rolling_window_min" is in `params` the periods last this number of minutes,
+    otherwise they are given by `mode_opf` (day, week or month).
+
+    Parameters
+    ----------
+    tot_snap : DatetimeIndex
+        All the (resampled) snapshots
+    params : dict
+        OPF parameters
+
+    Returns
+    -------
+    list
+        The snapshots of each period, in chronological order
+    """
+    if "rolling_window_min" in params:
+        nb_step = max(int(params["rolling_window_min"]) // int(params["step_opf_min"]), 1)
+        return [tot_snap[beg_:beg_ + nb_step] for beg_ in range(0, len(tot_snap), nb_step)]
+    if params['mode_opf'] is None:
+        return [tot_snap]
+    periods = []
+    for month in tot_snap.month.unique():
+        snap_per_month = tot_snap[tot_snap.month == month]
+        periods += [pd.DatetimeIndex(snaps) for snaps in get_grouped_snapshots(snap_per_month, params['mode_opf'])]
+    return sorted(periods, key=lambda snaps: snaps[0])
+
+
+def _period_inputs(snaps, load_, solar_, wind_, gen_constraints_):
+    """slice all the inputs of the opf for the snapshots `snaps`"""
+    return {"demand": load_.loc[snaps],
+            "gen_max": gen_constraints_['p_max_pu'].loc[snaps],
+            "gen_min": gen_constraints_['p_min_pu'].loc[snaps],
+            "total_solar": solar_.loc[snaps] if solar_ is not None else None,
+            "total_wind": wind_.loc[snaps] if wind_ is not None else None}
+
+
+def _run_opf_period(run_opf_fun, net, inputs, params, opf_kwargs, initial_p=None, final_p=None, timings=None):
+    """run the opf of one period (can be called in another process)"""
+    return run_opf_fun(net,
+                       inputs["demand"],
+                       inputs["gen_max"],
+                       inputs["gen_min"],
+                       params,
+                       total_solar=inputs["total_solar"],
+                       total_wind=inputs["total_wind"],
+                       initial_p=initial_p,
+                       final_p=final_p,
+                       return_duals=True,
+                       timings=timings,
+                       **opf_kwargs)
+
+
+def _run_opf_period_timed(*args):
+    """same as `_run_opf_period` but also returns the timings (for the workers)"""
+    timings = []
+    return _run_opf_period(*args, timings=timings), timings
+
+
+def run_rolling_horizon(net, periods, tot_snap, load_, solar_, wind_, gen_constraints_,
+                        params, opf_kwargs, run_opf_fun=run_opf, timings=None):
+    """Solve the periods one after the other. Each optimization covers the period
+    and the "rolling_overlap_min" minutes that follow (only the period is kept) and
+    starts from the last setpoint of the previous period, so that ramps are respected
+    at the boundaries.
+
+    Returns
+    -------
+    list, list, list, bool
+        The dispatch of each period, the marginal prices (duals) of each period, the
+        termination conditions and whether an error occured
+    """
+    overlap = int(params.get("rolling_overlap_min", 0)) // int(params['step_opf_min'])
+    results, prices, termination_conditions = [], [], []
+    initial_p = None
+    for period_id, snaps in enumerate(periods):
+        beg_ = tot_snap.get_loc(snaps[0])
+        end_ = tot_snap.get_loc(snaps[-1]) + 1 + overlap
+        inputs = _period_inputs(tot_snap[beg_:end_], load_, solar_, wind_, gen_constraints_)
+        dispatch, termination_condition, price = _run_opf_period(run_opf_fun, net, inputs, params, opf_kwargs,
+                                                                 initial_p=initial_p, timings=timings)
+        termination_conditions.append(termination_condition)
+        if dispatch is None:
+            print(f"ERROR: dispatch failed for period {period_id} (starting {snaps[0]})")
+            return results, prices, termination_conditions, True
+        dispatch = dispatch.loc[snaps]
+        results.append(dispatch)
+        prices.append(price.loc[snaps] if price is not None else None)
+        initial_p = dispatch.iloc[-1]
+    return results, prices, termination_conditions, False
+
+
+def run_parallel_periods(net, periods, load_, solar_, wind_, gen_constraints_,
+                         params, opf_kwargs, run_opf_fun=run_opf, timings=None):
+    """Solve the (non overlapping) periods independently, with "dispatch_nb_process"
+    processes, then re solve the first "reconciliation_min" minutes of each period
+    starting from the last setpoint of the previous one (and ending close to the
+    setpoint computed for the rest of the period) so that ramps are respected at the
+    boundaries.
+
+    Returns
+    -------
+    list, list, list, bool
+        The dispatch of each period, the marginal prices (duals) of each period, the
+        termination conditions and whether an error occured
+    """
+    nb_process = int(params.get("dispatch_nb_process", 1))
+    tasks = [(run_opf_fun, net, _period_inputs(snaps, load_, solar_, wind_, gen_constraints_), params, opf_kwargs)
+             for snaps in periods]
+    if nb_process > 1 and len(tasks) > 1 and multiprocessing.current_process().daemon:
+        # already in a worker (eg with add_data), cannot start new processes
+        warnings.warn("run_parallel_periods: impossible to use multiple processes from a daemonic process. "
+                      "Periods are solved sequentially.")
+        nb_process = 1
+    if nb_process > 1 and len(tasks) > 1:
+        # the grid2op environment and the scenario are not needed by the workers (and not always picklable)
+        not_sent = {attr_nm: getattr(net, attr_nm)
+                    for attr_nm in ["_env", "_chronix_scenario", "_simplified_chronix_scenario"]
+                    if hasattr(net, attr_nm)}
+        try:
+            for attr_nm in not_sent:
+                setattr(net, attr_nm, None)
+            with multiprocessing.Pool(min(nb_process, len(tasks))) as pool_:
+                outputs_timed = pool_.starmap(_run_opf_period_timed, tasks)
+        finally:
+            for attr_nm, attr_val in not_sent.items():
+                setattr(net, attr_nm, attr_val)
+    else:
+        outputs_timed = [_run_opf_period_timed(*task) for task in tasks]
+    outputs = [output for output, _ in outputs_timed]
+    if timings is not None:
+        for _, period_timings in outputs_timed:
+            timings.extend(period_timings)
+
+    results, prices, termination_conditions = [], [], []
+    for period_id, (dispatch, termination_condition, price) in enumerate(outputs):
+        termination_conditions.append(termination_condition)
+        if dispatch is None:
+            print(f"ERROR: dispatch failed for period {period_id} (starting {periods[period_id][0]})")
+            return results, prices, termination_conditions, True
+        results.append(dispatch)
+        prices.append(price)
+
+    # boundary reconciliation (the window is doubled until the problem is feasible,
+    # the last attempt re solves the whole period without terminal constraint)
+    nb_reconciliation = max(int(params.get("reconciliation_min", 60)) // int(params['step_opf_min']), 1)
+    for period_id in range(1, len(periods)):
+        snaps = periods[period_id]
+        nb_step = min(nb_reconciliation, len(snaps))
+        while True:
+            final_p = results[period_id].iloc[nb_step] if nb_step < len(snaps) else None
+            inputs = _period_inputs(snaps[:nb_step], load_, solar_, wind_, gen_constraints_)
+            dispatch, _, price = _run_opf_period(run_opf_fun, net, inputs, params, opf_kwargs,
+                                                 initial_p=results[period_id - 1].iloc[-1],
+                                                 final_p=final_p, timings=timings)
+            if dispatch is not None or nb_step == len(snaps):
+                break
+            nb_step = min(2 * nb_step, len(snaps))
+        if dispatch is None:
+            print(f"WARNING: boundary reconciliation failed for period {period_id} (starting {snaps[0]}), "
+                  "ramps might not be respected at its beginning")
+            continue
+        results[period_id] = pd.concat([dispatch, results[period_id].iloc[nb_step:]], axis=0)
+        if price is not None and prices[period_id] is not None:
+            prices[period_id] = pd.concat([price, prices[period_id].iloc[nb_step:]], axis=0)
+        else:
+            prices[period_id] = None
+    return results, prices, termination_conditions, False
+
 
 def main_run_disptach(pypsa_net, 
                       load,
@@ -32,7 +209,14 @@ def main_run_disptach(pypsa_net,
                       params={},
                       gen_constraints=None,
                       ramp_mode=RampMode.hard,
+                      preprocess_net_fun=preprocess_net,
+                      run_opf_fun=run_opf,
+                      prepare_net_fun=prepare_net,
                       **kwargs):
+    # `preprocess_net_fun`, `run_opf_fun` and `prepare_net_fun` allow other dispatchers
+    # (eg HighsDispatcher) to reuse the whole pipeline (split by period, interpolation,
+    # marginal prices) with their own representation of the network and their own solver.
+
     # Update gen constrains dict with 
     # values passed by the users and params
     if gen_constraints is None:
@@ -67,7 +251,7 @@ def main_run_disptach(pypsa_net,
     #     values are normalizing for every 5 minutes)
     #   - It checks for all gen units if commitable variables is False
     #     (commitable as False helps to create a LP problem for PyPSA)
-    pypsa_net = preprocess_net(pypsa_net, params['step_opf_min'])
+    pypsa_net = preprocess_net_fun(pypsa_net, params['step_opf_min'])
 
     months = tot_snap.month.unique()
     slack_name = None
@@ -84,10 +268,40 @@ def main_run_disptach(pypsa_net,
             slack_name = str(params["slack_name"])
             slack_pmax = float(params["slack_pmax"]) / float(pypsa_net.generators.loc[slack_name].p_nom)
         
+    dispatch_horizon = params.get("dispatch_horizon", "independent")
+    if dispatch_horizon not in POSSIBLE_DISPATCH_HORIZON:
+        raise RuntimeError(f"\"dispatch_horizon\" should be one of {POSSIBLE_DISPATCH_HORIZON}, "
+                           f"found \"{dispatch_horizon}\"")
+    marginal_price_mode = params.get("marginal_price", "dual")
+    if marginal_price_mode not in POSSIBLE_MARGINAL_PRICE:
+        raise RuntimeError(f"\"marginal_price\" should be one of {POSSIBLE_MARGINAL_PRICE}, "
+                           f"found \"{marginal_price_mode}\"")
+
     error_ = False
     start = time.time()
-    results, termination_conditions = [], []
-    if (params['mode_opf'] is not None):
+    opf_net = pypsa_net
+    if params.get("prepare_net", True):
+        # copy the network and apply the error correction ratios once for all the periods
+        beg_ = time.perf_counter()
+        opf_net = prepare_net_fun(pypsa_net, params, slack_name=slack_name)
+        kwargs = dict(kwargs, prepared=True)
+        print(f'Network prepared in {time.perf_counter() - beg_:.2f}s')
+    timings = []
+    results, prices, termination_conditions = [], [], []
+    if dispatch_horizon != "independent":
+        print(f'dispatch_horizon: {dispatch_horizon}')
+        periods = get_periods(tot_snap, params)
+        opf_kwargs = dict(slack_name=slack_name, slack_pmin=slack_pmin, slack_pmax=slack_pmax, **kwargs)
+        if dispatch_horizon == "rolling":
+            results, prices, termination_conditions, error_ = run_rolling_horizon(
+                opf_net, periods, tot_snap, load_, solar_, wind_, gen_constraints_,
+                params, opf_kwargs, run_opf_fun=run_opf_fun, timings=timings)
+        else:
+            results, prices, termination_conditions, error_ = run_parallel_periods(
+                opf_net, periods, load_, solar_, wind_, gen_constraints_,
+                params, opf_kwargs, run_opf_fun=run_opf_fun, timings=timings)
+        termination_condition = termination_conditions[-1]
+    elif (params['mode_opf'] is not None):
         print(f'mode_opf is not None: {params["mode_opf"]}')
         for month in months:
             # Get snapshots per month
@@ -123,8 +337,8 @@ def main_run_disptach(pypsa_net,
                     gen_max_pu_per_mode = g_max_pu_per_month.loc[snaps]
                     gen_min_pu_per_mode = g_min_pu_per_month.loc[snaps]
                     # Run opf given in specified mode
-                    dispatch, termination_condition = run_opf(
-                        pypsa_net,
+                    dispatch, termination_condition, price = run_opf_fun(
+                        opf_net,
                         load_per_mode,
                         gen_max_pu_per_mode,
                         gen_min_pu_per_mode, params, 
@@ -133,31 +347,43 @@ def main_run_disptach(pypsa_net,
                         slack_name=slack_name,
                         slack_pmin=slack_pmin,
                         slack_pmax=slack_pmax,
+                        return_duals=True,
+                        timings=timings,
                         **kwargs)
                     if dispatch is None:
                         print(f"ERROR: dispatch failed for 'month' {month} (snap {snap_id})")
                         error_ = True
                         break
                     results.append(dispatch)
+                    prices.append(price)
                     termination_conditions.append(termination_condition)
     else:
         g_max_pu, g_min_pu = gen_constraints_['p_max_pu'], gen_constraints_['p_min_pu']
-        dispatch, termination_condition = run_opf(
-               pypsa_net, load_, g_max_pu,
+        dispatch, termination_condition, price = run_opf_fun(
+               opf_net, load_, g_max_pu,
                g_min_pu, params,
                total_solar=solar_,
                total_wind=wind_,
                slack_name=slack_name,
                slack_pmin=slack_pmin,
                slack_pmax=slack_pmax,
+               return_duals=True,
+               timings=timings,
                **kwargs)
 
         if dispatch is None:
             error_ = True
             print(f"ERROR: dispatch failed.")
         results.append(dispatch)
+        prices.append(price)
         termination_conditions.append(termination_condition)
 
+    # time spent in each part of the opf, for each period
+    pypsa_net.opf_timings = pd.DataFrame(timings)
+    if timings:
+        print('OPF timings (s) by period:')
+        print(pypsa_net.opf_timings.drop(columns=["period_start", "nb_step"]).agg(['sum', 'mean', 'max']))
+
     if error_:
         return None, termination_condition, None
     
@@ -175,11 +401,13 @@ def main_run_disptach(pypsa_net,
         print ('\n => Interpolating dispatch into 5 minutes resolution..')
         prod_p = interpolate_dispatch(prod_p)
 
-    # Get the prices of the marginal generator at each timestep
-    marginal_costs = pypsa_net.generators.marginal_cost
-    marginal_prices = prod_p.apply(
-        lambda row: marginal_costs[row[row > 0].index].max(),
-        axis=1)
+    if marginal_price_mode == "dual" and all(price is not None for price in prices):
+        # dual of the power balance given by the solver
+        marginal_prices = pd.concat(prices, axis=0).sort_index()
+        marginal_prices = marginal_prices.reindex(prod_p.index, method="ffill")
+    else:
+        # Get the prices of the marginal generator at each timestep
+        marginal_prices = compute_marginal_prices(prod_p, pypsa_net.generators.marginal_cost)
 
     # Add noise to results
     # gen_cap = pypsa_net.generators.p_nom
@@ -228,6 +456,7 @@ if __name__ == "__main__":
 
     # **  **  **  **  ** 
     # Load the PyPSA grid
+    import pypsa  # lazy import: this module is also used by the HiGHS dispatcher, that does not need pypsa
     net = pypsa.Network(import_name=args.grid_path)
 
     # Load consumption data without index
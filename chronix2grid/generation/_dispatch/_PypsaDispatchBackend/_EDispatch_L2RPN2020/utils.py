@@ -9,6 +9,7 @@
 import numpy as np
 import pandas as pd
 import copy 
+import time
 import warnings
 
 from chronix2grid.generation.dispatch.utils import RampMode
@@ -273,6 +274,148 @@ def get_grouped_snapshots(snapshot, mode):
     }
     return periods[mode]
 
+def add_boundary_constraints(generators, gen_min, gen_max, initial_p=None, final_p=None):
+    """Turn the setpoints of the generators just before (`initial_p`) and just
+    after (`final_p`) the optimized period into bounds on the first (resp. last)
+    step of this period, so that the ramps are respected at the boundaries.
+
+    This is what allows to chain periods (rolling horizon) or to reconcile
+    periods solved independently.
+
+    Parameters
+    ----------
+    generators : dataframe
+        The generators (with at least columns p_nom, ramp_limit_up and ramp_limit_down)
+        once all the corrections (ratio, slack etc.) have been applied
+    gen_min : dataframe
+        Generator min constraints in pu (one row per snapshot of the period)
+    gen_max : dataframe
+        Generator max constraints in pu (one row per snapshot of the period)
+    initial_p : pd.Series, optional
+        Production (MW) of the generators at the step preceding the period, by default None
+    final_p : pd.Series, optional
+        Production (MW) of the generators at the step following the period, by default None
+
+    Returns
+    -------
+    dataframe, dataframe
+        Updated gen_min and gen_max
+    """
+    if initial_p is None and final_p is None:
+        return gen_min, gen_max
+    gen_min = gen_min.copy()
+    gen_max = gen_max.copy()
+    for p_bound, row_id in ((initial_p, 0), (final_p, gen_min.shape[0] - 1)):
+        if p_bound is None:
+            continue
+        for gen_nm, p_val in p_bound.items():
+            if gen_nm not in generators.index:
+                continue
+            p_nom = float(generators.loc[gen_nm, "p_nom"])
+            ramp_up = float(generators.loc[gen_nm, "ramp_limit_up"]) * p_nom
+            ramp_down = float(generators.loc[gen_nm, "ramp_limit_down"]) * p_nom
+            if row_id == 0:
+                p_up, p_down = p_val + ramp_up, p_val - ramp_down
+            else:
+                # the step after the period must be reachable
+                p_up, p_down = p_val + ramp_down, p_val - ramp_up
+            if np.isfinite(p_up):
+                if gen_nm not in gen_max:
+                    gen_max[gen_nm] = 1.
+                col_id = gen_max.columns.get_loc(gen_nm)
+                gen_max.iloc[row_id, col_id] = min(gen_max.iloc[row_id, col_id], p_up / p_nom)
+            if np.isfinite(p_down):
+                if gen_nm not in gen_min:
+                    gen_min[gen_nm] = 0.
+                col_id = gen_min.columns.get_loc(gen_nm)
+                gen_min.iloc[row_id, col_id] = max(gen_min.iloc[row_id, col_id], p_down / p_nom)
+    return gen_min, gen_max
+
+
+def apply_error_correction(net, params, slack_name=None):
+    """Apply the error correction ratios of `params` ("PmaxErrorCorrRatio",
+    "RampErrorCorrRatio" and "slack_ramp_limit_ratio") to the generators of `net`
+    (the aggregated renewables are not affected).
+
+    Parameters
+    ----------
+    net : PyPSA instance
+        The network to modify (inplace)
+    params : dict
+        OPF set up parameters
+    slack_name : str, optional
+        Name of the slack generator
+
+    Returns
+    -------
+    PyPSA instance
+        The modified network
+    """
+    if "PmaxErrorCorrRatio" in params:
+        if "agg_solar" in net.generators.p_nom:
+            init_solar = net.generators.p_nom["agg_solar"]
+        if "agg_wind" in net.generators.p_nom:
+            init_wind = net.generators.p_nom["agg_wind"]
+            
+        net.generators.p_nom *= float(params["PmaxErrorCorrRatio"])
+        
+        if "agg_solar" in net.generators.p_nom:
+            net.generators.p_nom["agg_solar"] = init_solar
+        if "agg_wind" in net.generators.p_nom:
+            net.generators.p_nom["agg_wind"] = init_wind
+    
+    if "RampErrorCorrRatio" in params:
+        if "agg_solar" in net.generators.ramp_limit_up:
+            init_solar = net.generators.ramp_limit_up["agg_solar"]
+        if "agg_wind" in net.generators.ramp_limit_up:
+            init_wind = net.generators.ramp_limit_up["agg_wind"]
+            
+        net.generators.ramp_limit_up *= float(params["RampErrorCorrRatio"])
+        net.generators.ramp_limit_down *= float(params["RampErrorCorrRatio"])
+        
+        if "agg_solar" in net.generators.ramp_limit_up:
+            net.generators.ramp_limit_up["agg_solar"] = init_solar
+        if "agg_wind" in net.generators.ramp_limit_up:
+            net.generators.ramp_limit_up["agg_wind"] = init_wind
+
+    if slack_name is not None and "slack_ramp_limit_ratio" in params:
+        net.generators.ramp_limit_up[slack_name] *= float(params["slack_ramp_limit_ratio"])
+        net.generators.ramp_limit_down[slack_name] *= float(params["slack_ramp_limit_ratio"])
+    return net
+
+
+def prepare_net(net, params, slack_name=None):
+    """Copy the network once and apply the error correction ratios (see
+    `apply_error_correction`) so that it can be given to `run_opf` with
+    `prepared=True` for all the periods: each period then only replaces the time
+    dependant tables (snapshots, load and generator bounds) instead of copying
+    and setting up the whole network again.
+
+    The grid2op environment and the scenarios attached to a dispatcher are shared
+    with the copy (they are not used by the OPF).
+
+    Parameters
+    ----------
+    net : PyPSA instance
+    params : dict
+        OPF set up parameters
+    slack_name : str, optional
+        Name of the slack generator
+
+    Returns
+    -------
+    PyPSA instance
+        The prepared copy of the network
+    """
+    memo = {}
+    for attr_nm in ["_env", "_chronix_scenario", "_simplified_chronix_scenario"]:
+        attr_val = getattr(net, attr_nm, None)
+        if attr_val is not None:
+            memo[id(attr_val)] = attr_val
+    net = copy.deepcopy(net, memo)
+    return apply_error_correction(net, params, slack_name=slack_name)
+
+
 def run_opf(net,
             demand,
             gen_max,
@@ -285,6 +428,11 @@ def run_opf(net,
             slack_pmax=None,
             gen_min_pu_t=None,  # used when splitting the losses, to remember, for each generators / steps the setpoint
             gen_max_pu_t=None,  # used when splitting the losses, to remember, for each generators / steps the setpoint
+            initial_p=None,  # setpoint (MW) of the generators just before the period (rolling horizon)
+            final_p=None,  # setpoint (MW) of the generators just after the period
+            return_duals=False,
+            prepared=False,
+            timings=None,
             **kwargs):
     """ Run linear OPF problem in PyPSA considering
     only marginal costs and ramps as LP problem.
@@ -300,6 +448,21 @@ def run_opf(net,
         Generator min constraints in pu
     params : dict
         OPF set up parameters
+    initial_p : pd.Series, optional
+        Production of the generators at the step preceding the period, the ramps
+        between this step and the first step of the period are then enforced
+    final_p : pd.Series, optional
+        Production of the generators at the step following the period
+    return_duals : bool, optional
+        If True, also returns the dual of the power balance at each step (the
+        marginal price), or None if the solver does not provide it
+    prepared : bool, optional
+        If True, `net` comes from `prepare_net`: it is modified inplace (only its
+        time dependant tables) instead of being copied
+    timings : list, optional
+        If provided, the time spent (in seconds) to set up the network ("setup"), to
+        build and solve the problem ("solve") and to read the results ("extract") is
+        appended to it (as a dict)
     
     Returns
     -------
@@ -315,35 +478,11 @@ def run_opf(net,
         print(f'\n--> OPF formulation by => full chronix - Analyzing ')
     else:
         print(f'\n--> OPF formulation by => {mode} - Analyzing {mode} # {to_disp[mode]}')
-    net = copy.deepcopy(net)
-    
-    if "PmaxErrorCorrRatio" in params:
-        if "agg_solar" in net.generators.p_nom:
-            init_solar = net.generators.p_nom["agg_solar"]
-        if "agg_wind" in net.generators.p_nom:
-            init_wind = net.generators.p_nom["agg_wind"]
-            
-        net.generators.p_nom *= float(params["PmaxErrorCorrRatio"])
-        
-        if "agg_solar" in net.generators.p_nom:
-            net.generators.p_nom["agg_solar"] = init_solar
-        if "agg_wind" in net.generators.p_nom:
-            net.generators.p_nom["agg_wind"] = init_wind
+    beg_ = time.perf_counter()
+    if not prepared:
+        net = copy.deepcopy(net)
+        apply_error_correction(net, params, slack_name=slack_name)
     
-    if "RampErrorCorrRatio" in params:
-        if "agg_solar" in net.generators.ramp_limit_up:
-            init_solar = net.generators.ramp_limit_up["agg_solar"]
-        if "agg_wind" in net.generators.ramp_limit_up:
-            init_wind = net.generators.ramp_limit_up["agg_wind"]
-            
-        net.generators.ramp_limit_up *= float(params["RampErrorCorrRatio"])
-        net.generators.ramp_limit_down *= float(params["RampErrorCorrRatio"])
-        
-        if "agg_solar" in net.generators.ramp_limit_up:
-            net.generators.ramp_limit_up["agg_solar"] = init_solar
-        if "agg_wind" in net.generators.ramp_limit_up:
-            net.generators.ramp_limit_up["agg_wind"] = init_wind
-        
     # Reset information previously 
     # saved it in PyPSA instance
     net.loads_t.p_set = net.loads_t.p_set.iloc[0:0, 0:0]
@@ -388,10 +527,6 @@ def run_opf(net,
         gen_max = copy.deepcopy(gen_max)
         gen_max[slack_name] = slack_pmax
     
-    if slack_name is not None and "slack_ramp_limit_ratio" in params:
-        net.generators.ramp_limit_up[slack_name] *= float(params["slack_ramp_limit_ratio"])
-        net.generators.ramp_limit_down[slack_name] *= float(params["slack_ramp_limit_ratio"])
-    
     if gen_max_pu_t is not None:
         # addition contraint on the max_pu, used for example when splitting the loss
         for gen_nm, max_val in gen_max_pu_t.items():
@@ -408,19 +543,60 @@ def run_opf(net,
             else:
                 gen_min[str(gen_nm)] = min_val
     
+    gen_min, gen_max = add_boundary_constraints(net.generators, gen_min, gen_max,
+                                                initial_p=initial_p, final_p=final_p)
+    
     net.loads_t.p_set = pd.concat([demand])
     net.generators_t.p_max_pu = pd.concat([gen_max], axis=1)
     net.generators_t.p_min_pu = pd.concat([gen_min], axis=1)
     
     # ++  ++  ++  ++
     # Run Linear OPF
+    setup_ = time.perf_counter()
     status, termination_condition = net.lopf(net.snapshots, **kwargs)
+    solve_ = time.perf_counter()
     if status != 'ok':
         print('** OPF failed to find an optimal solution **')
-        return None, termination_condition
+        dispatch, prices = None, None
     else:
         print('-- opf succeeded  >Objective value (should be greater than zero!')
-        return net.generators_t.p.copy(), termination_condition
+        dispatch = net.generators_t.p.copy()
+        prices = None
+        if return_duals and net.buses_t.marginal_price.shape[1] > 0:
+            # shadow price of the power balance of the (single) bus
+            prices = net.buses_t.marginal_price.iloc[:, 0].reindex(demand.index).copy()
+            if prices.isna().any():
+                prices = None
+    if timings is not None:
+        timings.append({"period_start": demand.index[0], "nb_step": demand.shape[0],
+                        "setup": setup_ - beg_, "solve": solve_ - setup_,
+                        "extract": time.perf_counter() - solve_})
+    if return_duals:
+        return dispatch, termination_condition, prices
+    return dispatch, termination_condition
+
+
+def compute_marginal_prices(prod_p, marginal_costs):
+    """Price of the most expensive generator producing at each step (used when the
+    solver does not provide the duals of the power balance).
+
+    Parameters
+    ----------
+    prod_p : dataframe
+        Production of each generator (one column per generator)
+    marginal_costs : pd.Series
+        Marginal cost of each generator
+
+    Returns
+    -------
+    pd.Series
+        The marginal price at each step (nan if no generator produces)
+    """
+    costs = marginal_costs.reindex(prod_p.columns).values.astype(float)
+    masked_costs = np.where(prod_p.values > 0, costs.reshape(1, -1), -np.inf)
+    res = np.max(masked_costs, axis=1, initial=-np.inf)
+    res[~np.isfinite(res)] = np.nan
+    return pd.Series(res, index=prod_p.index)
 
 
 def interpolate_dispatch(dispatch, method='quadratic'):
@@ -13,6 +13,7 @@ from scipy.interpolate import interp1d
 
 from .. import generation_utils as utils
 import chronix2grid.constants as cst
+from chronix2grid.output_format import write_data, DEFAULT_OUTPUT_FORMAT
 
 def compute_loads(loads_charac, temperature_noise, params, load_weekly_pattern,
                   start_day, add_dim, day_lag=0,
@@ -20,6 +21,39 @@ def compute_loads(loads_charac, temperature_noise, params, load_weekly_pattern,
                   use_legacy=True):
     #6  # this is only TRUE if you simulate 2050 !!! formula does not really work
     
+    # start_day_of_week = start_day.weekday()
+    # first_dow_chronics = datetime.strptime(load_weekly_pattern["datetime"].iloc[1], "%Y-%m-%d %H:%M:%S").weekday()
+    # + (calendar.isleap(start_day.year) if start_day.month >= 3 else 0)
+    # day_lag = (first_dow_chronics - start_day_of_week) % 7
+    # day_lag = 0
+    res = compute_loads_array(loads_charac, temperature_noise, params, load_weekly_pattern,
+                              add_dim, day_lag=day_lag,
+                              return_ref_curve=return_ref_curve,
+                              use_legacy=use_legacy)
+    names, loads_array = res[:2]
+    loads_series = {name: loads_array[row_id] for row_id, name in enumerate(names)}
+    if not return_ref_curve:
+        return loads_series
+    return loads_series, res[2]
+
+
+def compute_loads_array(loads_charac, temperature_noise, params, load_weekly_pattern,
+                        add_dim, day_lag=0,
+                        return_ref_curve=False,
+                        use_legacy=True):
+    """
+    Same as :func:`compute_loads` but all the loads are generated at once.
+
+    Output:
+        (np.array) the names of the (residential) loads
+        (np.array) shape (n_load, Nt) the load series, one row per load
+        (np.array) shape (Nt, n_load_total) the reference curves (only if `return_ref_curve` is True)
+    """
+    types = loads_charac['type'].values
+    if np.any(types == 'industrial'):
+        raise NotImplementedError("Impossible to generate industrial loads for now.")
+    is_residential = types == 'residential'
+    
     # Compute active part of loads
     weekly_pattern = load_weekly_pattern['test'].values
     if use_legacy:
@@ -30,38 +64,29 @@ def compute_loads(loads_charac, temperature_noise, params, load_weekly_pattern,
         isoweekday = np.array([el.isoweekday() for el in datetime_lwp])
         hour_minutes = np.array([el.hour * 60 + el.minute for el in datetime_lwp])
     
-    # start_day_of_week = start_day.weekday()
-    # first_dow_chronics = datetime.strptime(load_weekly_pattern["datetime"].iloc[1], "%Y-%m-%d %H:%M:%S").weekday()
-    # + (calendar.isleap(start_day.year) if start_day.month >= 3 else 0)
-    # day_lag = (first_dow_chronics - start_day_of_week) % 7
-    # day_lag = 0
-    loads_series = {}
-    ref_curves = None
-    for i, name in enumerate(loads_charac['name']):
-        mask = (loads_charac['name'] == name)
-        if loads_charac[mask]['type'].values == 'residential':
-            locations = [loads_charac[mask]['x'].values[0], loads_charac[mask]['y'].values[0]]
-            Pmax = loads_charac[mask]['Pmax'].values[0]
-            tmp_ = compute_residential(locations, Pmax, temperature_noise,
-                                       params, weekly_pattern, index=i,
-                                       day_lag=day_lag, add_dim=add_dim,
-                                       return_ref_curve=return_ref_curve,
-                                       isoweekday_lwp=isoweekday,
-                                       hour_minutes_lwp=hour_minutes)
-            if return_ref_curve:
-                if ref_curves is None:
-                    ref_curves = np.zeros((tmp_[0].shape[0], loads_charac.shape[0]))
-                loads_series[name], ref_curves[:,i] = tmp_
-            else:
-                loads_series[name] = tmp_
-
-        if loads_charac[mask]['type'].values == 'industrial':
-            raise NotImplementedError("Impossible to generate industrial loads for now.")
-            Pmax = loads_charac[mask]['Pmax'].values[0]
-            loads_series[name] = compute_industrial(Pmax, params)
+    # interpolate the noise for all the loads at once
+    temperature_signals = utils.interpolate_noise_many(temperature_noise,
+                                                       params,
+                                                       loads_charac.loc[is_residential, ['x', 'y']].values,
+                                                       time_scale=params['temperature_corr'],
+                                                       add_dim=add_dim)
+    
+    tmp_ = compute_residential_many(loads_charac['Pmax'].values[is_residential],
+                                    temperature_signals,
+                                    params,
+                                    weekly_pattern,
+                                    np.where(is_residential)[0],
+                                    day_lag=day_lag,
+                                    return_ref_curve=return_ref_curve,
+                                    isoweekday_lwp=isoweekday,
+                                    hour_minutes_lwp=hour_minutes)
+    names = loads_charac['name'].values[is_residential]
     if not return_ref_curve:
-        return loads_series
-    return loads_series, ref_curves
+        return names, tmp_
+    loads_array, ref_residential = tmp_
+    ref_curves = np.zeros((loads_array.shape[1], loads_charac.shape[0]))
+    ref_curves[:, is_residential] = ref_residential.T
+    return names, loads_array, ref_curves
 
 
 def get_seasonal_pattern(params):
@@ -81,16 +106,18 @@ def compute_residential(locations, Pmax, temperature_noise, params,
                         weekly_pattern, index, day_lag=None, add_dim=0,
                         return_ref_curve=False,
                         isoweekday_lwp=None,
-                        hour_minutes_lwp=None):
+                        hour_minutes_lwp=None,
+                        temperature_signal=None):
 
 
-    # Compute refined signals
-    temperature_signal = utils.interpolate_noise(
-        temperature_noise,
-        params,
-        locations,
-        time_scale=params['temperature_corr'],
-        add_dim=add_dim)
+    # Compute refined signals (if not already computed for all the loads at once)
+    if temperature_signal is None:
+        temperature_signal = utils.interpolate_noise(
+            temperature_noise,
+            params,
+            locations,
+            time_scale=params['temperature_corr'],
+            add_dim=add_dim)
     temperature_signal = temperature_signal.astype(float)
     
     # Compute seasonal pattern
@@ -105,22 +132,59 @@ def compute_residential(locations, Pmax, temperature_noise, params,
         return residential_series, Pmax * weekly_pattern * seasonal_pattern
     return residential_series
 
-def compute_load_pattern(params, weekly_pattern, index, day_lag=None, isoweekday_lwp=None, hour_minutes_lwp=None):
+def compute_residential_many(Pmax, temperature_signals, params,
+                             weekly_pattern, indices, day_lag=None,
+                             return_ref_curve=False,
+                             isoweekday_lwp=None,
+                             hour_minutes_lwp=None):
     """
-    Loads a typical hourly pattern, and interpolates it to generate
-    a smooth solar generation pattern between 0 and 1
+    Same as :func:`compute_residential` for many loads at once: `Pmax` and `indices` have shape (n_load,)
+    and `temperature_signals` shape (n_load, Nt). It returns an array of shape (n_load, Nt)
+    """
+    # Compute seasonal pattern
+    seasonal_pattern = get_seasonal_pattern(params)
 
-    Input:
-        computation_params: (dict) Defines the mesh dimensions and
-            precision. Also define the correlation scales
-            interpolation_params: (dict) params of the interpolation
+    # Get weekly pattern
+    weekly_patterns = compute_load_patterns(params, weekly_pattern, indices, day_lag,
+                                            isoweekday_lwp=isoweekday_lwp,
+                                            hour_minutes_lwp=hour_minutes_lwp)
+    
+    std_temperature_noise = params['std_temperature_noise']
+    Pmax = np.asarray(Pmax, dtype=float).reshape(-1, 1)
+    residential_series = Pmax * weekly_patterns * (std_temperature_noise * temperature_signals + seasonal_pattern)
+    if return_ref_curve:
+        return residential_series, Pmax * weekly_patterns * seasonal_pattern
+    return residential_series
 
-    Output:
-        (np.array) A smooth solar pattern
+
+def compute_load_patterns(params, weekly_pattern, indices, day_lag=None, isoweekday_lwp=None, hour_minutes_lwp=None):
+    """
+    Calls :func:`compute_load_pattern` for all the `indices` and stack the results
+    in an array of shape (len(indices), Nt). The patterns starting at the same
+    week are computed only once.
+    """
+    patterns = {}
+    res = None
+    for row_id, index in enumerate(indices):
+        first_index = get_load_pattern_first_index(params, weekly_pattern, index, day_lag,
+                                                   isoweekday_lwp=isoweekday_lwp,
+                                                   hour_minutes_lwp=hour_minutes_lwp)
+        if first_index not in patterns:
+            patterns[first_index] = compute_load_pattern(params, weekly_pattern, index, day_lag,
+                                                         isoweekday_lwp=isoweekday_lwp,
+                                                         hour_minutes_lwp=hour_minutes_lwp)
+        if res is None:
+            res = np.zeros((len(indices), patterns[first_index].shape[0]))
+        res[row_id] = patterns[first_index]
+    if res is None:
+        res = np.zeros((0, int(params['T'] // params['dt'] + 1)))
+    return res
+
+
+def get_load_pattern_first_index(params, weekly_pattern, index, day_lag=None, isoweekday_lwp=None, hour_minutes_lwp=None):
+    """
+    Returns the index (in `weekly_pattern`) of the first step of the week used for the load `index`
     """
-    # solar_pattern resolution : 1H, 8761
-    
-    # Keep only one week of pattern
     index_weekly_perweek = 12 * 24 * 7
     if isoweekday_lwp is None or hour_minutes_lwp is None:
         # try to guess where to start from input data
@@ -137,6 +201,29 @@ def compute_load_pattern(params, weekly_pattern, index, day_lag=None, isoweekday
         possible_first_index = np.where((isoweekday_lwp == isoweekday_start) & (iso_hm_start == hour_minutes_lwp))[0]
         index_modulo = index % possible_first_index.shape[0]
         first_index = possible_first_index[index_modulo]
+    return int(first_index)
+
+
+def compute_load_pattern(params, weekly_pattern, index, day_lag=None, isoweekday_lwp=None, hour_minutes_lwp=None):
+    """
+    Loads a typical hourly pattern, and interpolates it to generate
+    a smooth solar generation pattern between 0 and 1
+
+    Input:
+        computation_params: (dict) Defines the mesh dimensions and
+            precision. Also define the correlation scales
+            interpolation_params: (dict) params of the interpolation
+
+    Output:
+        (np.array) A smooth solar pattern
+    """
+    # solar_pattern resolution : 1H, 8761
+    
+    # Keep only one week of pattern
+    index_weekly_perweek = 12 * 24 * 7
+    first_index = get_load_pattern_first_index(params, weekly_pattern, index, day_lag,
+                                               isoweekday_lwp=isoweekday_lwp,
+                                               hour_minutes_lwp=hour_minutes_lwp)
         
     # now extract right week of data
     last_index = first_index + index_weekly_perweek
@@ -175,8 +262,12 @@ def compute_load_pattern(params, weekly_pattern, index, day_lag=None, isoweekday
 
 
 def create_csv(prng, dict_, path, forecasted=False, reordering=True, noise=None,
-               shift=False, write_results=True, index=False):
-    df = pd.DataFrame.from_dict(dict_)
+               shift=False, write_results=True, index=False, output_format=DEFAULT_OUTPUT_FORMAT,
+               writer=None, chunk_size=None):
+    if type(dict_) is dict:
+        df = pd.DataFrame.from_dict(dict_)
+    else:
+        df = dict_.copy()
     df.set_index('datetime', inplace=True)
     df = df.sort_index(ascending=True)
     df = df.head(len(df)-1)  # Last value is lonely for another day
@@ -200,12 +291,12 @@ def create_csv(prng, dict_, path, forecasted=False, reordering=True, noise=None,
 
     if write_results:
         file_extension = '_forecasted' if forecasted else ''
-        df.to_csv(
-            os.path.join(path, f'load_p{file_extension}.csv.bz2'),
-            index=index, sep=';', float_format=cst.FLOATING_POINT_PRECISION_FORMAT)
-        df_reactive_power.to_csv(
-            os.path.join(path, f'load_q{file_extension}.csv.bz2'),
-            index=False, sep=';', float_format=cst.FLOATING_POINT_PRECISION_FORMAT)
+        # writer: chronix2grid.async_writer.AsyncWriter, to write in the background
+        write = write_data if writer is None else writer.write
+        write(df, os.path.join(path, f'load_p{file_extension}.csv.bz2'),
+              output_format=output_format, index=index, chunk_size=chunk_size)
+        write(df_reactive_power, os.path.join(path, f'load_q{file_extension}.csv.bz2'),
+              output_format=output_format, index=False, chunk_size=chunk_size)
 
     return df
 
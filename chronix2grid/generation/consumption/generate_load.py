@@ -17,6 +17,8 @@ import numpy as np
 # Libraries developed for this module
 from . import consumption_utils as conso
 from .. import generation_utils as utils
+from chronix2grid.output_format import DEFAULT_OUTPUT_FORMAT, chunk_size_from_params
+from chronix2grid.async_writer import get_async_writer
 
 
 def get_add_dim(params, loads_charac):
@@ -70,18 +72,19 @@ def main(scenario_destination_path, seed, params, loads_charac,
     temperature_noise = utils.generate_coarse_noise(prng, params, 'temperature', add_dim=add_dim)
 
     print('Computing loads ...')
-    start_day = datetime_index[0]
-    loads_series = conso.compute_loads(loads_charac,
-                                       temperature_noise,
-                                       params,
-                                       load_weekly_pattern,
-                                       start_day=start_day,
-                                       add_dim=add_dim,
-                                       day_lag=day_lag,
-                                       return_ref_curve=return_ref_curve,
-                                       use_legacy=use_legacy)
+    res = conso.compute_loads_array(loads_charac,
+                                    temperature_noise,
+                                    params,
+                                    load_weekly_pattern,
+                                    add_dim=add_dim,
+                                    day_lag=day_lag,
+                                    return_ref_curve=return_ref_curve,
+                                    use_legacy=use_legacy)
     if return_ref_curve:
-        loads_series, ref_curve = loads_series
+        load_names, loads_array, ref_curve = res
+    else:
+        load_names, loads_array = res
+    loads_series = pd.DataFrame(loads_array.T, columns=load_names)
     loads_series['datetime'] = datetime_index
 
     # Save files
@@ -90,17 +93,30 @@ def main(scenario_destination_path, seed, params, loads_charac,
         if not os.path.exists(scenario_destination_path):
             os.makedirs(scenario_destination_path)
             
+    output_format = params.get("output_format", DEFAULT_OUTPUT_FORMAT)
+    # the four files are written in parallel in the background
+    writer = get_async_writer() if params.get("async_write", False) and write_results else None
+    # the chunks (if any) are written with the files
+    chunk_size = chunk_size_from_params(params)
     load_p_forecasted = conso.create_csv(prng, loads_series, scenario_destination_path,
                                         forecasted=True, reordering=True,
-                                        shift=True, write_results=write_results, index=False)
+                                        shift=True, write_results=write_results, index=False,
+                                        output_format=output_format,
+                                        writer=writer,
+                                        chunk_size=chunk_size)
     load_p = conso.create_csv(
         prng,
         loads_series, scenario_destination_path,
         reordering=True,
         noise=params['planned_std'],
         write_results=write_results,
-        index=False
+        index=False,
+        output_format=output_format,
+        writer=writer,
+        chunk_size=chunk_size
     )
+    if writer is not None:
+        writer.flush()
     if not return_ref_curve:
         return load_p, load_p_forecasted
     else:
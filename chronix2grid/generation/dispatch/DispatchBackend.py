@@ -6,8 +6,6 @@
 # SPDX-License-Identifier: MPL-2.0
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
-from .generate_dispatch import main
-
 
 class DispatchBackend: # TODO - PypsaDispatchBackend - devra créer un PypsaDispatcher et l'utiliser. OU ALORS dans les constantes de Chronix2grid choisir la classe de Dispatcher
     """
@@ -54,8 +52,11 @@ class DispatchBackend: # TODO - PypsaDispatchBackend - devra créer un PypsaDisp
         .. note::
             As a final step, loss can be simulated thanks to grid2op. It is achieved if "loss_grid2op_simulation" is True in params_opf.
             You should then provide keys **"idxSlack","nameSlack","early_stopping_mode","pmin_margin","pmax_margin","rampup_margin",
-            "rampdown_margin","agent_type"**
+            "rampdown_margin","agent_type"**. With "loss_in_memory", the simulation reads the dispatch results from memory
+            (nothing is copied on the hard drive) and the productions are written once corrected
 
         """
+        # lazy import: the loss simulation relies on grid2op
+        from .generate_dispatch import main
         return main(self.dispatcher, self.scenario_folder_path, self.scenario_folder_path,
                     self.grid_folder, self.seed_disp, self.params, self.params_opf)
@@ -18,17 +18,38 @@ from collections import namedtuple
 import pathlib
 from numpy.random import default_rng
 
-import grid2op
-from grid2op.Chronics import ChangeNothing
 import pandas as pd
-import plotly.express as px
 
 from chronix2grid.generation.dispatch.utils import RampMode, add_noise_gen, modify_hydro_ramps, modify_slack_characs
 import chronix2grid.constants as cst
+from chronix2grid.output_format import write_data, chunk_size_from_params, DEFAULT_OUTPUT_FORMAT
+from chronix2grid.async_writer import get_async_writer
 
 DispatchResults = namedtuple('DispatchResults', ['chronix', 'terminal_conditions'])
 
+
+def load_hydro_guide_curves(hydro_file_path):
+    """
+    Reads the hydro guide curves in `hydro_file_path` (see :func:`Dispatcher.read_hydro_guide_curves`)
+
+    Returns
+    -------
+    :class:`pandas.DataFrame`
+        the columns "p_min_u" and "p_max_u" of the file, indexed by (month, day, hour, minute, second)
+    """
+    dateparse = lambda x: dt.datetime.strptime(x, '%Y-%m-%d %H:%M')
+    hydro_pattern = pd.read_csv(hydro_file_path, usecols=[0, 2, 3],
+                                parse_dates=[0], date_parser=dateparse)
+    hydro_pattern.set_index(hydro_pattern.columns[0], inplace=True)
+    hydro_pattern.index = hydro_pattern.index.map(
+        lambda x: (x.month, x.day, x.hour, x.minute, x.second))
+    return hydro_pattern
+
+
 def init_dispatcher_from_config(env_path, input_folder, dispatcher_class, params_opf):
+    import grid2op  # lazy import: only needed to read the grid from a grid2op environment
+    from grid2op.Chronics import ChangeNothing
+
     # Read grid and gens characs
     env118_withoutchron = grid2op.make(env_path,
                                        test=True,
@@ -97,6 +118,58 @@ class Dispatcher(ABC):
             ramp_mode=RampMode.hard, by_carrier=False, **kwargs):
         """Run the proper dispatch optimization. Have to be implemented in inheriting classes"""
 
+    def run_cached(self, load, total_solar, total_wind, params, gen_constraints=None,
+                   ramp_mode=RampMode.hard, by_carrier=False, **kwargs):
+        """
+        Same as :func:`Dispatcher.run` but the results are read from `self.cache`
+        (a :class:`chronix2grid.generation.dispatch.dispatch_cache.DispatchCache`) if the same
+        dispatch has already been computed, and stored in it otherwise.
+
+        If `self.cache` is None, this is exactly :func:`Dispatcher.run`. The terminal conditions
+        read from the cache are strings.
+
+        Returns
+        -------
+        results: :class:`chronix2grid.generation.dispatch.EconomicDispatch.DispatchResults`
+        """
+        if self.cache is None:
+            return self.run(load, total_solar, total_wind, params, gen_constraints=gen_constraints,
+                            ramp_mode=ramp_mode, by_carrier=by_carrier, **kwargs)
+        key = self.cache.make_key(self, load, total_solar, total_wind, params, gen_constraints=gen_constraints,
+                                  ramp_mode=ramp_mode, by_carrier=by_carrier, **kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            print(f'Dispatch read from the cache ({key})')
+            return self._store_results(*cached, by_carrier=by_carrier)
+        results = self.run(load, total_solar, total_wind, params, gen_constraints=gen_constraints,
+                           ramp_mode=ramp_mode, by_carrier=by_carrier, **kwargs)
+        if results is not None:
+            self.cache.put(key, results.chronix.prods_dispatch, results.chronix.marginal_prices,
+                           results.terminal_conditions)
+        return results
+
+    def _store_results(self, prods_dispatch, marginal_prices, terminal_conditions, by_carrier=False):
+        """keep the results of the dispatch in the (possibly simplified) chronix scenario and
+        reset the ramps (that are modified by the dispatch)"""
+        if by_carrier:
+            self._simplified_chronix_scenario = self._chronix_scenario.simplify_chronix()
+            self._simplified_chronix_scenario.prods_dispatch = prods_dispatch
+            self._simplified_chronix_scenario.marginal_prices = marginal_prices
+            results = self._simplified_chronix_scenario
+            self._has_simplified_results = True
+            self._has_results = False
+        else:
+            self._chronix_scenario.prods_dispatch = prods_dispatch
+            self._chronix_scenario.marginal_prices = marginal_prices
+            results = self._chronix_scenario
+            self._has_results = True
+            self._has_simplified_results = False
+        if self._env is None:
+            self.reset_ramps_from_dataframe()
+        else:
+            self.reset_ramps_from_grid2op_env()
+        return DispatchResults(chronix=results, terminal_conditions=terminal_conditions)
+
     @abstractmethod
     def simplify_net(self):
         pass
@@ -183,7 +256,7 @@ class Dispatcher(ABC):
                 self.generators.loc[generator, 'ramp_limit_down'] = \
                     rampdown / pmax
 
-    def read_hydro_guide_curves(self, hydro_file_path):
+    def read_hydro_guide_curves(self, hydro_file_path, hydro_pattern=None):
         """
         Reads realistic hydro pattern that provides seasonal boundaries to the hydro production.
         This constraint in the dispatch problem leads to more realistic hydro production
@@ -191,19 +264,18 @@ class Dispatcher(ABC):
         Parameters
         ----------
         hydro_file_path: ``str``
+        hydro_pattern: :class:`pandas.DataFrame`
+            the content of `hydro_file_path` if it was already read by :func:`load_hydro_guide_curves`
+            (it is read if None)
 
         """
-        dateparse = lambda x: dt.datetime.strptime(x, '%Y-%m-%d %H:%M')
-        hydro_pattern = pd.read_csv(hydro_file_path, usecols=[0, 2, 3],
-                                    parse_dates=[0], date_parser=dateparse)
-        hydro_pattern.set_index(hydro_pattern.columns[0], inplace=True)
+        if hydro_pattern is None:
+            hydro_pattern = load_hydro_guide_curves(hydro_file_path)
         hydro_names = self.generators[self.generators.carrier == 'hydro'].index
 
         for extremum in ['min', 'max']:
             hydro_pu = hydro_pattern[[f'p_{extremum}_u'] * len(hydro_names)]
             hydro_pu.columns = hydro_names
-            hydro_pu.index = hydro_pu.index.map(
-                lambda x: (x.month, x.day, x.hour, x.minute, x.second))
             setattr(self, f'_{extremum}_hydro_pu', hydro_pu)
 
         self._hydro_file_path = hydro_file_path
@@ -250,6 +322,7 @@ class Dispatcher(ABC):
                 raise
 
     def plot_ramps(self):
+        import plotly.express as px  # lazy import: only needed to plot
         caract_gen = self.generators[['p_nom', 'carrier', 'ramp_limit_up']]
         caract_gen = caract_gen.rename(columns={'index': 'name'})
         caract_gen = caract_gen.reset_index()
@@ -276,6 +349,32 @@ class Dispatcher(ABC):
         params: ``dict``
         output_folder: ``str``
 
+        """
+        # the files are written in parallel (in the background) if params["async_write"] is set
+        writer = get_async_writer() if params.get("async_write", False) else None
+        self.write_results(self.results_to_save(params, prng=prng), output_folder,
+                           output_format=params.get("output_format", DEFAULT_OUTPUT_FORMAT),
+                           writer=writer,
+                           chunk_size=chunk_size_from_params(params))
+        if writer is not None:
+            writer.flush()
+
+    def results_to_save(self, params, prng=None):
+        """
+        Computes (without writing them) the time series saved by :func:`Dispatcher.save_results`: the
+        productions (with the curtailed renewables) and their forecasts, the prices, the loads and the
+        original renewable productions
+
+        Parameters
+        ----------
+        params: ``dict``
+        prng: :class:`numpy.random.Generator`
+
+        Returns
+        -------
+        results: ``dict`` or ``None``
+            the :class:`pandas.DataFrame` to save, the keys being the names of the files (without
+            extension). None if the dispatch has failed
         """
         if prng is None:
             prng = default_rng()
@@ -289,18 +388,9 @@ class Dispatcher(ABC):
             print('Saving results for the grids with aggregated generators by carriers...')
             res_load_scenario = self._simplified_chronix_scenario
 
-        path_metadata_failed = os.path.join(output_folder, "DISPATCH_FAILED")
         if res_load_scenario is None:
-            # the backend failed to find a solution
-            print('ERROR: the backend failed to find a consistent state. Nothing is saved.')
-            with open(path_metadata_failed, "w", encoding="utf-8") as f:
-                f.write("The dispatch has failed. We cannot do anything.")
-            return
-        
-        # this did not failed, so I remove it
-        if os.path.exists(path_metadata_failed):
-            os.remove(path_metadata_failed)
-        
+            return None
+
         wind_curtail_coeff = 1.0
         solar_curtail_coeff = 1.0
         
@@ -357,34 +447,48 @@ class Dispatcher(ABC):
                                                      gen_cap,
                                                      noise_factor=params['planned_std'])
 
-        # prod_p_forecasted_with_noise.to_csv(
-        prod_p_forecasted_with_noise.to_csv(
-            os.path.join(output_folder, "prod_p_forecasted.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
-        # prod_p_with_noise.to_csv(
-        full_opf_dispatch.to_csv(
-            os.path.join(output_folder, "prod_p.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
-        res_load_scenario.marginal_prices.to_csv(
-            os.path.join(output_folder, "prices.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
-        res_load_scenario.loads.to_csv(
-            os.path.join(output_folder, "load_p.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
-        # save the origin time series        
-        pd.concat([res_load_scenario.wind_p, res_load_scenario.solar_p], axis=1).to_csv(
-            os.path.join(output_folder, "prod_p_renew_orig.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
+        return {"prod_p_forecasted": prod_p_forecasted_with_noise,
+                "prod_p": full_opf_dispatch,
+                "prices": res_load_scenario.marginal_prices,
+                "load_p": res_load_scenario.loads,
+                "prod_p_renew_orig": pd.concat([res_load_scenario.wind_p, res_load_scenario.solar_p], axis=1)}
+
+    @staticmethod
+    def write_results(results, output_folder, output_format=DEFAULT_OUTPUT_FORMAT, writer=None,
+                      chunk_size=None):
+        """
+        Writes the results computed by :func:`Dispatcher.results_to_save` in `output_folder`
+
+        Parameters
+        ----------
+        results: ``dict`` or ``None``
+        output_folder: ``str``
+        output_format: ``str``
+            see :mod:`chronix2grid.output_format`
+        writer: :class:`chronix2grid.async_writer.AsyncWriter`
+            if provided, the files are written in the background by this writer (call its `flush`
+            method to wait for them)
+        chunk_size: ``int``
+            if not None, the files are also written by chunks of `chunk_size` rows (see
+            :func:`chronix2grid.output_format.write_data`)
+
+        """
+        path_metadata_failed = os.path.join(output_folder, "DISPATCH_FAILED")
+        if results is None:
+            # the backend failed to find a solution
+            print('ERROR: the backend failed to find a consistent state. Nothing is saved.')
+            with open(path_metadata_failed, "w", encoding="utf-8") as f:
+                f.write("The dispatch has failed. We cannot do anything.")
+            return
+
+        # this did not failed, so I remove it
+        if os.path.exists(path_metadata_failed):
+            os.remove(path_metadata_failed)
+
+        write = write_data if writer is None else writer.write
+        for file_nm, df in results.items():
+            write(df, os.path.join(output_folder, f"{file_nm}.csv.bz2"), output_format=output_format,
+                  chunk_size=chunk_size)
 
 class ChroniXScenario:
     def __init__(self, loads, prods, res_names, scenario_name, loss=None):
@@ -0,0 +1,12 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+__all__ = ["HighsDispatcher", "run_opf_highs"]
+
+from chronix2grid.generation._dispatch._HighsDispatchBackend.HighsEconomicDispatch import HighsDispatcher
+from chronix2grid.generation._dispatch._HighsDispatchBackend.highs_opf import run_opf_highs
@@ -0,0 +1,198 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""On disk cache of the results of :func:`Dispatcher.run`, addressed by a hash of all the
+inputs of the dispatch (so that the same dispatch is never computed twice)."""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# change it when the content of the files (or the way the key is computed) changes
+CACHE_FORMAT_VERSION = 1
+# columns of the generator table that have an impact on the dispatch
+GENERATOR_COLUMNS = ['carrier', 'p_nom', 'marginal_cost', 'ramp_limit_up', 'ramp_limit_down']
+
+
+def _update_hash(hash_, obj):
+    """add `obj` (time series, dict of time series, parameters...) to the hash `hash_`"""
+    if obj is None:
+        hash_.update(b"none")
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        hash_.update(type(obj).__name__.encode())
+        if isinstance(obj, pd.DataFrame):
+            hash_.update(json.dumps([str(col) for col in obj.columns]).encode())
+        hash_.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, dict):
+        hash_.update(b"dict")
+        for key in sorted(obj, key=str):
+            hash_.update(str(key).encode())
+            _update_hash(hash_, obj[key])
+    else:
+        hash_.update(json.dumps(obj, sort_keys=True, default=str).encode())
+
+
+class DispatchCache:
+    """
+    Content addressed cache (on disk) for the results of a dispatch.
+
+    Each entry is stored in a compressed numpy file (`.npz`, no pickle) containing
+    `prods_dispatch`, `marginal_prices` and `terminal_conditions`. The key is a hash of
+    all the inputs of :func:`Dispatcher.run` (see :func:`DispatchCache.make_key`).
+    When the total size of the files is above `max_size_mb`, the least recently used
+    entries are removed.
+
+    It can be shared by different processes (files are written atomically).
+
+    Attributes
+    ----------
+    cache_dir: ``str``
+        Directory where the results are stored
+    max_size_mb: ``float``
+        Maximum size of the cache (in MB)
+    """
+    EXTENSION = ".npz"
+
+    def __init__(self, cache_dir, max_size_mb=1024.):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size_mb = float(max_size_mb)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(dispatcher, load, total_solar, total_wind, params, gen_constraints=None,
+                 ramp_mode=None, by_carrier=False, **kwargs):
+        """
+        Compute the key of a dispatch from all its inputs
+
+        Parameters
+        ----------
+        dispatcher: :class:`chronix2grid.generation.dispatch.EconomicDispatch.Dispatcher`
+            The dispatcher (its class and its generators are part of the key)
+        load, total_solar, total_wind, params, gen_constraints, ramp_mode, by_carrier, kwargs:
+            The arguments of :func:`Dispatcher.run`
+
+        Returns
+        -------
+        key: ``str``
+            The hexadecimal sha256 of the inputs
+        """
+        hash_ = hashlib.sha256()
+        _update_hash(hash_, CACHE_FORMAT_VERSION)
+        _update_hash(hash_, type(dispatcher).__name__)
+        _update_hash(hash_, dispatcher.generators[GENERATOR_COLUMNS])
+        _update_hash(hash_, load)
+        _update_hash(hash_, total_solar)
+        _update_hash(hash_, total_wind)
+        _update_hash(hash_, params)
+        _update_hash(hash_, gen_constraints)
+        _update_hash(hash_, str(ramp_mode))
+        _update_hash(hash_, bool(by_carrier))
+        _update_hash(hash_, kwargs)
+        return hash_.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.EXTENSION)
+
+    def get(self, key):
+        """
+        Read the results stored for `key`
+
+        Parameters
+        ----------
+        key: ``str``
+
+        Returns
+        -------
+        ``tuple`` or ``None``
+            `prods_dispatch` (:class:`pandas.DataFrame`), `marginal_prices` (:class:`pandas.Series`)
+            and `terminal_conditions` (``list`` of ``str``) or None if `key` is not in the cache
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                index_name, columns_name = [name if name else None for name in data["names"].tolist()]
+                index = pd.DatetimeIndex(data["index"], name=index_name)
+                prods_dispatch = pd.DataFrame(data["prods_dispatch"], index=index,
+                                              columns=pd.Index(data["columns"].tolist(), name=columns_name))
+                marginal_prices = pd.Series(data["marginal_prices"], index=index)
+                terminal_conditions = data["terminal_conditions"].tolist()
+        except (OSError, KeyError, ValueError):
+            # not in the cache (or being removed by another process, or corrupted)
+            return None
+        # mark it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return prods_dispatch, marginal_prices, terminal_conditions
+
+    def put(self, key, prods_dispatch, marginal_prices, terminal_conditions):
+        """
+        Store the results of a dispatch, and remove the least recently used entries if
+        the cache is too large
+
+        Parameters
+        ----------
+        key: ``str``
+        prods_dispatch: :class:`pandas.DataFrame`
+        marginal_prices: :class:`pandas.Series`
+        terminal_conditions: ``list``
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f,
+                                    index=prods_dispatch.index.values.astype("datetime64[ns]"),
+                                    columns=np.array([str(col) for col in prods_dispatch.columns]),
+                                    names=np.array([prods_dispatch.index.name or "",
+                                                    prods_dispatch.columns.name or ""]),
+                                    prods_dispatch=prods_dispatch.values.astype(float),
+                                    marginal_prices=marginal_prices.reindex(prods_dispatch.index).values.astype(float),
+                                    terminal_conditions=np.array([str(el) for el in terminal_conditions]))
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def entries(self):
+        """
+        Returns
+        -------
+        ``list``
+            (path, size in bytes, last use) of all the entries of the cache, the least recently used first
+        """
+        res = []
+        for file_nm in os.listdir(self.cache_dir):
+            if not file_nm.endswith(self.EXTENSION):
+                continue
+            path = os.path.join(self.cache_dir, file_nm)
+            try:
+                stat_ = os.stat(path)
+            except OSError:
+                continue
+            res.append((path, stat_.st_size, stat_.st_mtime))
+        return sorted(res, key=lambda el: el[2])
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is smaller than `max_size_mb`"""
+        entries = self.entries()
+        total_size = sum(size for _, size, _ in entries)
+        max_size = self.max_size_mb * 1024. * 1024.
+        for path, size, _ in entries:
+            if total_size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
@@ -9,17 +9,136 @@
 import os
 import warnings
 import shutil
+from collections import namedtuple
 import numpy as np
 import pandas as pd
 import pathlib
 
 import grid2op
-from grid2op.Chronics import Multifolder, GridStateFromFileWithForecasts
+from grid2op.Chronics import Multifolder, GridStateFromFileWithForecasts, FromNPY
 from grid2op.Parameters import Parameters
 from grid2op.Runner import Runner
+from grid2op.Action import DontAct
+from grid2op.Opponent import NeverAttackBudget, BaseOpponent
 from grid2op.Chronics import GridStateFromFile
 
 import chronix2grid.constants as cst
+from chronix2grid.output_format import write_data, DEFAULT_OUTPUT_FORMAT, CHUNK_FOLDER_BASE_NAME
+
+# what `run_grid2op_simulation_batch` returns in place of grid2op's EpisodeData
+BatchLossSimulation = namedtuple("BatchLossSimulation", ["prods_p", "first_obs"])
+
+
+class BatchLossEvaluator:
+    """Computes the losses of a whole scenario with a single call to lightsim2grid's
+    time series solver, instead of one `env.step` per time step.
+
+    The steps are solved one after the other in c++, each one initialized with the voltages
+    found at the previous one, and the base case (admittance matrix, symbolic factorization
+    of the jacobian) is built once and reused between two calls to :func:`compute`.
+
+    Parameters
+    ----------
+    env : grid2op.Environment.Environment
+        The environment describing the grid. It should use a LightSimBackend and
+        have been reset (not in a "game over" state).
+    """
+    def __init__(self, env):
+        from lightsim2grid import TimeSerie
+        self.n_gen = env.n_gen
+        self._time_serie = TimeSerie(env)
+        self._time_serie.computer.compute_gen_results = True
+
+    def compute(self, gen_p, load_p, load_q):
+        """Compute the losses and the deviation of each generator from its setpoint
+        (only the slack ones should move) for all the steps at once.
+
+        Parameters
+        ----------
+        gen_p : np.ndarray
+            Generator setpoints, shape (nb_step, n_gen)
+        load_p : np.ndarray
+            Active consumption, shape (nb_step, n_load)
+        load_q : np.ndarray
+            Reactive consumption, shape (nb_step, n_load)
+
+        Returns
+        -------
+        all_loss : np.ndarray
+            Losses (total generation - total consumption) at each step, shape (nb_step,)
+        diff_ : np.ndarray
+            Generator production computed by the powerflow minus its setpoint, shape (nb_step, n_gen).
+            Steps for which the powerflow diverged are filled with NaN.
+        """
+        gen_p = np.ascontiguousarray(gen_p, dtype=float)
+        load_p = np.ascontiguousarray(load_p, dtype=float)
+        load_q = np.ascontiguousarray(load_q, dtype=float)
+        with warnings.catch_warnings():
+            # a divergence is reported with NaN below
+            warnings.filterwarnings("ignore")
+            self._time_serie.compute_V_from_inj(gen_p, load_p, load_q, ignore_errors=True)
+        computer = self._time_serie.computer
+        res_gen_p = 1.0 * computer.get_gen_results()[..., 0]
+        converged = np.array(computer.converged_mask(), dtype=bool)
+        res_gen_p[~converged] = np.NaN
+        all_loss = np.sum(res_gen_p, axis=1) - np.sum(load_p, axis=1)
+        diff_ = res_gen_p - gen_p
+        return all_loss, diff_
+
+    def close(self):
+        self._time_serie.close()
+
+
+def estimate_losses_dc(env, gen_p, load_p, load_q):
+    """Cheap estimate of the losses at each step, based on DC powerflows.
+
+    A DC powerflow has no losses, they are approximated with the flows it computes
+    as the sum over the branches of `r * p ** 2` (in per unit), which neglects the
+    reactive power flows (so it tends to under estimate the losses).
+
+    Parameters
+    ----------
+    env : grid2op.Environment.Environment
+        Same requirements as for :class:`BatchLossEvaluator`
+    gen_p : np.ndarray
+        Generator setpoints, shape (nb_step, n_gen)
+    load_p : np.ndarray
+        Active consumption, shape (nb_step, n_load)
+    load_q : np.ndarray
+        Reactive consumption, shape (nb_step, n_load)
+
+    Returns
+    -------
+    np.ndarray
+        The estimated losses (in MW) at each step, shape (nb_step,)
+    """
+    from lightsim2grid import LightSimBackend, TimeSerie
+    from lightsim2grid.algorithm import AlgorithmType
+    if not isinstance(env.backend, LightSimBackend):
+        # the resistances are read from the grid of lightsim2grid
+        raise RuntimeError(f"The losses can only be estimated with DC powerflows (loss_warm_start=\"dc\") with a "
+                           f"LightSimBackend, not a {type(env.backend).__name__}")
+    time_serie = TimeSerie(env)
+    if AlgorithmType.DC_KLU in time_serie.available_default_algorithms:
+        time_serie.computer.change_algorithm(AlgorithmType.DC_KLU)
+    else:
+        time_serie.computer.change_algorithm(AlgorithmType.DC_SparseLU)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore")
+        time_serie.compute_V_from_inj(np.ascontiguousarray(gen_p, dtype=float),
+                                      np.ascontiguousarray(load_p, dtype=float),
+                                      np.ascontiguousarray(load_q, dtype=float),
+                                      ignore_errors=True)
+    flows_mw = time_serie.compute_P()
+    converged = np.array(time_serie.computer.converged_mask(), dtype=bool)
+    grid = env.backend._grid
+    r_pu = np.array([el.r_pu for el in grid.get_lines()] + [el.r_pu for el in grid.get_trafos()])
+    sn_mva = grid.get_sn_mva()
+    all_loss = np.sum(r_pu * (flows_mw / sn_mva) ** 2, axis=1) * sn_mva
+    all_loss[~converged] = np.NaN
+    time_serie.close()
+    return all_loss
+
 
 def move_env_temporarily(scenario_output_folder, grid_path):
 
@@ -46,7 +165,9 @@ def move_chronics_temporarily(scenario_output_folder, grid_path):
         warnings.warn("Had to delete a previous chronic temporary path in input data", UserWarning)
         shutil.rmtree(chronics_temporary_path)
     print("temporary copy of chronics in "+str(chronics_temporary_path))
-    shutil.copytree(scenario_output_folder, chronics_temporary_path)
+    # (the chunks are not read by grid2op)
+    shutil.copytree(scenario_output_folder, chronics_temporary_path,
+                    ignore=shutil.ignore_patterns(f"{CHUNK_FOLDER_BASE_NAME}_*"))
 
 def remove_temporary_chronics(grid_path):
     chronics_temporary_path = os.path.join(grid_path, 'chronics')
@@ -150,7 +271,148 @@ def run_grid2op_simulation_donothing(grid_path, agent_result_path,  nb_core = 1,
 
     return episode_data
 
-def correct_scenario_loss(scenario_folder_path, params_opf, grid_path, data_this_episode):
+def run_grid2op_simulation_batch(grid_path, agent_result_path):
+    """
+    Same as :func:`run_grid2op_simulation_donothing` but all the powerflows of the scenario are computed
+    at once with :class:`BatchLossEvaluator` (no grid2op runner, nothing is written on the hard drive).
+
+    :param grid_path (str): path to folder where grid.json and other information on grid are stored
+    :param agent_result_path (str): path of the scenario to simulate (its name is used to find the chronics)
+    :return: BatchLossSimulation with the generator productions (one row per step) and the first observation
+    """
+    print('Start grid2op simulation (batch) to compute realistic loss on grid')
+    from lightsim2grid import LightSimBackend
+    param = Parameters()
+    param.init_from_dict({"NO_OVERFLOW_DISCONNECTION": True})
+    env = grid2op.make(grid_path,
+                       param=param, backend=LightSimBackend(), test=True,
+                       data_feeding_kwargs={"gridvalueClass": GridStateFromFile})
+    scenario_name = pathlib.Path(agent_result_path).name
+    scen_id = search_chronic_num_from_name(scenario_name, env)
+    env.set_id(scen_id)
+    first_obs = env.reset()
+    data_loader = env.chronics_handler.real_data.data
+    evaluator = BatchLossEvaluator(env)
+    _, diff_ = evaluator.compute(data_loader.prod_p, data_loader.load_p, data_loader.load_q)
+    evaluator.close()
+    env.close()
+    if np.any(~np.isfinite(diff_)):
+        raise RuntimeError(f"The powerflow diverged for {np.sum(np.any(~np.isfinite(diff_), axis=1))} step(s) "
+                           f"of scenario {scenario_name}")
+    prods_p = data_loader.prod_p + diff_
+    print('---- end of simulation')
+    return BatchLossSimulation(prods_p=prods_p, first_obs=first_obs)
+
+def run_grid2op_simulation_in_memory(grid_path, prod_p, load_p, load_q, prod_v=None, loss_engine="step"):
+    """
+    Same as :func:`run_grid2op_simulation_donothing` (or :func:`run_grid2op_simulation_batch` if `loss_engine`
+    is "batch") but the environment reads the time series given here (grid2op's FromNPY): neither the grid folder
+    nor the chronics are copied, and nothing is written on the hard drive.
+
+    :param grid_path (str): path to folder where grid.json and other information on grid are stored (not modified)
+    :param prod_p (pd.DataFrame): production of each generator (one column per generator)
+    :param load_p (pd.DataFrame): active consumption of each load (one column per load)
+    :param load_q (pd.DataFrame): reactive consumption of each load
+    :param prod_v (pd.DataFrame): voltage setpoint of each generator (optional)
+    :param loss_engine (str): "step" (one env.step per time step) or "batch" (lightsim2grid's time series solver)
+    :return: BatchLossSimulation with the generator productions (one row per step) and the first observation
+    """
+    print('Start grid2op simulation (in memory) to compute realistic loss on grid')
+    if loss_engine == "batch":
+        from lightsim2grid import LightSimBackend
+        backend = LightSimBackend()
+    else:
+        try:
+            from lightsim2grid import LightSimBackend
+            backend = LightSimBackend()
+        except:
+            from grid2op.Backend import PandaPowerBackend
+            backend = PandaPowerBackend()
+            print("You might need to install the LightSimBackend) to gain massive speed up")
+    param = Parameters()
+    param.init_from_dict({"NO_OVERFLOW_DISCONNECTION": True})
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore")
+        env = grid2op.make(grid_path,
+                           param=param, backend=backend, test=True,
+                           chronics_class=FromNPY,
+                           data_feeding_kwargs={"load_p": load_p.values,
+                                                "load_q": load_q.values,
+                                                "prod_p": prod_p.values,
+                                                "prod_v": prod_v.values if prod_v is not None else None},
+                           # no attack on the powerlines, only the losses matter here
+                           opponent_budget_per_ts=0.,
+                           opponent_init_budget=0.,
+                           opponent_class=BaseOpponent,
+                           opponent_budget_class=NeverAttackBudget,
+                           opponent_action_class=DontAct)
+    # the columns are not necessarily in the order of the grid
+    gen_p = np.ascontiguousarray(prod_p[env.name_gen].values, dtype=float)
+    load_p = np.ascontiguousarray(load_p[env.name_load].values, dtype=float)
+    load_q = np.ascontiguousarray(load_q[env.name_load].values, dtype=float)
+    env.chronics_handler.real_data.change_chronics(new_load_p=load_p,
+                                                   new_load_q=load_q,
+                                                   new_prod_p=gen_p,
+                                                   new_prod_v=prod_v[env.name_gen].values if prod_v is not None else None)
+    first_obs = env.reset()
+    if loss_engine == "batch":
+        evaluator = BatchLossEvaluator(env)
+        _, diff_ = evaluator.compute(gen_p, load_p, load_q)
+        evaluator.close()
+        prods_p = gen_p + diff_
+    else:
+        prods_p = np.full(gen_p.shape, fill_value=np.NaN)
+        prods_p[0] = first_obs.gen_p
+        i = 0
+        done = False
+        while not done:
+            obs, reward, done, info = env.step(env.action_space())
+            i += 1
+            if done:
+                break
+            prods_p[i] = obs.gen_p
+    env.close()
+    if np.any(~np.isfinite(prods_p)):
+        raise RuntimeError(f"The powerflow diverged (or the episode stopped) for "
+                           f"{np.sum(np.any(~np.isfinite(prods_p), axis=1))} step(s)")
+    print('---- end of simulation')
+    return BatchLossSimulation(prods_p=prods_p, first_obs=first_obs)
+
+def correct_scenario_loss(scenario_folder_path, params_opf, grid_path, data_this_episode, chunk_size=None):
+    # Get dispatch prods before runner in chronix
+    OldProdsDf = pd.read_csv(os.path.join(scenario_folder_path, 'prod_p.csv.bz2'), sep=';')
+    OldProdsForecastDf = pd.read_csv(os.path.join(scenario_folder_path, 'prod_p_forecasted.csv.bz2'), sep=';')
+
+    newProdsDf, newProdsForecastDf = correct_loss(OldProdsDf, OldProdsForecastDf, scenario_folder_path, params_opf,
+                                                  data_this_episode, grid_path=grid_path)
+
+    # Serialization
+    write_data(newProdsDf, os.path.join(scenario_folder_path, "prod_p.csv.bz2"),
+               sep=';', index=False,
+               float_format=cst.FLOATING_POINT_PRECISION_FORMAT,
+               chunk_size=chunk_size)
+
+    write_data(newProdsForecastDf, os.path.join(scenario_folder_path, "prod_p_forecasted.csv.bz2"),
+               sep=';', index=False,
+               float_format=cst.FLOATING_POINT_PRECISION_FORMAT,
+               chunk_size=chunk_size)
+
+    print('---- end of loss correction ')
+    return newProdsDf, newProdsForecastDf
+
+def correct_loss(OldProdsDf, OldProdsForecastDf, scenario_folder_path, params_opf, data_this_episode, grid_path=None,
+                 output_format=DEFAULT_OUTPUT_FORMAT, chunk_size=None):
+    """
+    Puts the losses computed by the simulation on the slack generator of the productions `OldProdsDf` and of
+    their forecasts `OldProdsForecastDf` (both modified in place). The correction is logged in
+    adjusted_loss.csv.bz2 (in `scenario_folder_path`).
+
+    :param grid_path (str): folder of the grid whose temporary chronics are removed if the slack constraints
+        are violated with "early_stopping_mode" (None if there is nothing to remove)
+    :param output_format (str): format of adjusted_loss (see chronix2grid.output_format)
+    :param chunk_size (int): if not None, adjusted_loss is also written by chunks of chunk_size rows
+    :return: the corrected productions and forecasts
+    """
     print('Start realistic loss correction from simulation results')
 
     # Load simulation data
@@ -159,22 +421,26 @@ def correct_scenario_loss(scenario_folder_path, params_opf, grid_path, data_this
     id_slack = params_opf["idxSlack"]
 
     # Get gen constraints
-    observations = [obs for obs in data_this_episode.observations]
-    if observations[0] is None: # Quick hack because a None appears in observations with grid2op 1.5.0 - don't have time to handle it
-        observations[0] = observations[1]
-    first_obs = observations[0]
+    if isinstance(data_this_episode, BatchLossSimulation):
+        # results of run_grid2op_simulation_batch
+        observations = None
+        first_obs = data_this_episode.first_obs
+    else:
+        observations = [obs for obs in data_this_episode.observations]
+        if observations[0] is None: # Quick hack because a None appears in observations with grid2op 1.5.0 - don't have time to handle it
+            observations[0] = observations[1]
+        first_obs = observations[0]
     pmax = first_obs.gen_pmax[id_slack] #+ params_opf['pmax_margin']
     pmin = first_obs.gen_pmin[id_slack] #max(first_obs.gen_pmin[id_slack] - params_opf['pmin_margin'],0)
     ramp_up = first_obs.gen_max_ramp_up[id_slack] #+ params_opf['rampup_margin']
     ramp_down = first_obs.gen_max_ramp_down[id_slack] #+ params_opf['rampdown_margin']
 
     # Get corrected dispatch prod
-    prods_p = pd.DataFrame(np.array([obs.prod_p for obs in observations]))
-    prodSlack = prods_p[id_slack]
-
-    # Get dispatch prods before runner in chronix
-    OldProdsDf = pd.read_csv(os.path.join(scenario_folder_path, 'prod_p.csv.bz2'), sep=';')
-    OldProdsForecastDf = pd.read_csv(os.path.join(scenario_folder_path, 'prod_p_forecasted.csv.bz2'), sep=';')
+    if observations is None:
+        prods_p = pd.DataFrame(data_this_episode.prods_p)
+    else:
+        prods_p = pd.DataFrame(np.array([obs.prod_p for obs in observations]))
+    prodSlack = pd.Series(prods_p[id_slack].values, index=OldProdsDf.index)
 
     ##correction term
     newProdsDf = OldProdsDf
@@ -191,33 +457,20 @@ def correct_scenario_loss(scenario_folder_path, params_opf, grid_path, data_this
 
     # Log the correction
     CorrectionLosses_df = pd.DataFrame({'adjusted_loss_p':CorrectionLosses})
-    CorrectionLosses_df.to_csv(os.path.join(scenario_folder_path, 'adjusted_loss.csv.bz2'), sep=';', index = False)
+    write_data(CorrectionLosses_df, os.path.join(scenario_folder_path, 'adjusted_loss.csv.bz2'),
+               output_format=output_format, float_format=None, chunk_size=chunk_size)
 
     # Check constraints
     violations_message, bool = check_slack_constraints(newProdsDf[slack_name], pmax, pmin, ramp_up, ramp_down)
     if bool:
         if params_opf['early_stopping_mode']:
-            remove_temporary_chronics(grid_path)
+            if grid_path is not None:
+                remove_temporary_chronics(grid_path)
             raise ValueError(violations_message)
         else:
             warnings.warn(violations_message, UserWarning)
             print("Warning - "+violations_message)
 
-
-    # Serialization
-    newProdsDf.to_csv(
-            os.path.join(scenario_folder_path, "prod_p.csv.bz2"),
-            sep=';', index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
-
-    newProdsForecastDf.to_csv(
-        os.path.join(scenario_folder_path, "prod_p_forecasted.csv.bz2"),
-        sep=';', index=False,
-        float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-    )
-
-    print('---- end of loss correction ')
     return newProdsDf, newProdsForecastDf
 
 def check_slack_constraints(prod_p, pmax, pmin, ramp_up, ramp_down):
@@ -6,9 +6,12 @@
 # SPDX-License-Identifier: MPL-2.0
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
-from .PypsaDispatchBackend.EDispatch_L2RPN2020 import RampMode # TODO: Supprimer cette dépendance car pas utile (utiliser utils dans chronix2grid)
+from chronix2grid.generation.dispatch.utils import RampMode
 from .dispatch_loss_utils import run_grid2op_simulation_donothing, correct_scenario_loss, move_chronics_temporarily, \
-    remove_temporary_chronics, remove_simulation_data, move_env_temporarily
+    remove_temporary_chronics, remove_simulation_data, move_env_temporarily, run_grid2op_simulation_batch, \
+    run_grid2op_simulation_in_memory, correct_loss
+from chronix2grid.output_format import read_data, data_file_exists, chunk_size_from_params, DEFAULT_OUTPUT_FORMAT
+from chronix2grid.async_writer import get_async_writer
 import shutil
 import os
 import pathlib
@@ -50,7 +53,7 @@ def main(dispatcher, input_folder, output_folder, grid_folder, seed, params, par
                                                name=dispatcher.loads.index[0],include_renewable=False)
         ##########
         #Bypass solar and wind for now
-        dispatch_results = dispatcher.run(
+        dispatch_results = dispatcher.run_cached(
             load=load_with_losses,
             total_solar=dispatcher.solar_p.sum(axis=1),
             total_wind=dispatcher.wind_p.sum(axis=1),
@@ -67,7 +70,7 @@ def main(dispatcher, input_folder, output_folder, grid_folder, seed, params, par
                                                name=dispatcher.loads.index[0], include_renewable=True)
         ##########
         # Bypass solar and wind for now
-        dispatch_results = dispatcher.run(
+        dispatch_results = dispatcher.run_cached(
             load=load_with_losses,
             total_solar=None,
             total_wind=None,
@@ -84,20 +87,56 @@ def main(dispatcher, input_folder, output_folder, grid_folder, seed, params, par
             dispatch_results.chronix.prods_dispatch = dispatch_results.chronix.prods_dispatch.drop(
                 ["agg_wind", "agg_solar"], axis=1)
 
-    dispatcher.save_results(params, output_folder)
-
     is_dispatch_successful=(dispatcher.chronix_scenario.prods_dispatch is not None) and (len(dispatcher.chronix_scenario.prods_dispatch.columns)>=1)
-    if params_opf["loss_grid2op_simulation"] and is_dispatch_successful:
-        new_prod_p, new_prod_forecasted_p = simulate_loss(grid_folder, output_folder, params_opf, write_results = True)
+    output_format = params.get("output_format", DEFAULT_OUTPUT_FORMAT)
+    # the chunks (if any) are written with the files
+    chunk_size = chunk_size_from_params(params)
+    # grid2op can only read the chronics in csv
+    loss_in_memory = params_opf.get("loss_in_memory", False) or output_format != "csv"
+    if params_opf["loss_grid2op_simulation"] and is_dispatch_successful and loss_in_memory:
+        # the losses are simulated before anything is written, the productions are saved once corrected
+        results = dispatcher.results_to_save(params)
+        new_prod_p, new_prod_forecasted_p = simulate_loss_in_memory(grid_folder, output_folder, params_opf, results,
+                                                                    output_format=output_format,
+                                                                    chunk_size=chunk_size)
+        writer = get_async_writer() if params.get("async_write", False) else None
+        dispatcher.write_results(results, output_folder, output_format=output_format, writer=writer,
+                                 chunk_size=chunk_size)
         dispatch_results = update_results_loss(dispatch_results, new_prod_p, params_opf)
+        if writer is not None:
+            writer.flush()
+    else:
+        dispatcher.save_results(params, output_folder)
+
+        if params_opf["loss_grid2op_simulation"] and is_dispatch_successful:
+            new_prod_p, new_prod_forecasted_p = simulate_loss(grid_folder, output_folder, params_opf, write_results = True,
+                                                              chunk_size=chunk_size)
+            dispatch_results = update_results_loss(dispatch_results, new_prod_p, params_opf)
 
     return dispatch_results
 
 def update_results_loss(dispatch_results, new_prod_p, params_opf):
-    dispatch_results[0].prods_dispatch[params_opf['nameSlack']] = new_prod_p[params_opf['nameSlack']]
+    # new_prod_p does not necessarily have the (datetime) index of the dispatch
+    dispatch_results[0].prods_dispatch[params_opf['nameSlack']] = new_prod_p[params_opf['nameSlack']].values
     return dispatch_results
 
-def simulate_loss(input_folder, output_folder, params_opf, write_results = True):
+def simulate_loss(input_folder, output_folder, params_opf, write_results = True, loss_engine=None, chunk_size=None):
+    """
+    Simulate the scenario on the grid and put the losses on the slack generator.
+
+    loss_engine can be "step" (default: a grid2op runner, one env.step per time step) or "batch"
+    (all the powerflows computed in one call to lightsim2grid, nothing written for the agent results).
+    If not given, it is read from the "loss_engine" key of params_opf.
+
+    If chunk_size is not None, the corrected productions are also written by chunks of chunk_size rows.
+    """
+    if loss_engine is None:
+        if "loss_engine" in params_opf:
+            loss_engine = params_opf["loss_engine"]
+        else:
+            loss_engine = "step"
+    if loss_engine not in ("step", "batch"):
+        raise RuntimeError(f"Unknown loss_engine \"{loss_engine}\", it should be \"step\" or \"batch\"")
     scenario_folder_path = output_folder
     grid_folder_g2op = input_folder
 
@@ -109,11 +148,15 @@ def simulate_loss(input_folder, output_folder, params_opf, write_results = True)
     agent_results_path = str(pathlib.Path(scenario_folder_path).parent.parent)
     # try:
 
-    episode_data = run_grid2op_simulation_donothing(grid_temporary_path, scenario_folder_path,write_results=write_results,agent_results_path=agent_results_path)
+    if loss_engine == "batch":
+        episode_data = run_grid2op_simulation_batch(grid_temporary_path, scenario_folder_path)
+    else:
+        episode_data = run_grid2op_simulation_donothing(grid_temporary_path, scenario_folder_path,write_results=write_results,agent_results_path=agent_results_path)
     # except RuntimeError:
     #     remove_temporary_chronics(grid_folder_g2op)
     #     raise RuntimeError("Error in Grid2op simulation, temporary folder deleted")
-    dispatch_results_corrected = correct_scenario_loss(scenario_folder_path, params_opf, grid_folder_g2op, episode_data)
+    dispatch_results_corrected = correct_scenario_loss(scenario_folder_path, params_opf, grid_folder_g2op, episode_data,
+                                                       chunk_size=chunk_size)
 
     #remove temporary env folder
     shutil.rmtree(grid_temporary_path)
@@ -122,6 +165,39 @@ def simulate_loss(input_folder, output_folder, params_opf, write_results = True)
     return dispatch_results_corrected
 
 
+def simulate_loss_in_memory(input_folder, output_folder, params_opf, results, loss_engine=None,
+                            output_format=DEFAULT_OUTPUT_FORMAT, chunk_size=None):
+    """
+    Same as :func:`simulate_loss` without copying the grid folder and the chronics: the environment is fed
+    with the productions and the loads computed by the dispatch (`results`, see
+    :func:`chronix2grid.generation.dispatch.EconomicDispatch.Dispatcher.results_to_save`), whose
+    "prod_p" and "prod_p_forecasted" are corrected in place (they are not written here).
+
+    The reactive consumption and the voltage setpoints of the generators are read in `output_folder`
+    (written by the load and renewable generation).
+    """
+    if loss_engine is None:
+        loss_engine = params_opf.get("loss_engine", "step")
+    if loss_engine not in ("step", "batch"):
+        raise RuntimeError(f"Unknown loss_engine \"{loss_engine}\", it should be \"step\" or \"batch\"")
+    prod_p = results["prod_p"]
+    load_p = results["load_p"]
+    load_q = read_data(os.path.join(output_folder, "load_q.csv.bz2")).iloc[:load_p.shape[0]]
+    path_prod_v = os.path.join(output_folder, "prod_v.csv.bz2")
+    prod_v = None
+    if data_file_exists(path_prod_v):
+        prod_v = read_data(path_prod_v).iloc[:prod_p.shape[0]]
+
+    episode_data = run_grid2op_simulation_in_memory(input_folder, prod_p, load_p, load_q, prod_v=prod_v,
+                                                    loss_engine=loss_engine)
+    results["prod_p"], results["prod_p_forecasted"] = correct_loss(prod_p, results["prod_p_forecasted"],
+                                                                   output_folder, params_opf, episode_data,
+                                                                   output_format=output_format,
+                                                                   chunk_size=chunk_size)
+    print('---- end of loss correction ')
+    return results["prod_p"], results["prod_p_forecasted"]
+
+
 def parse_ramp_mode(mode):
     """
     Parse a string representing the difficulty of the ramps in the OPF into
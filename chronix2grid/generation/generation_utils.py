@@ -86,10 +86,28 @@ def interpolate_noise(computation_noise, params, locations, time_scale, add_dim)
     Output:
         (dict of np.array) returns one time series per location mentioned in dict locations
     """
+    x, y = locations
+    output = interpolate_noise_many(computation_noise, params, np.array([[x, y]], dtype=float),
+                                    time_scale, add_dim)
+    return output[0]
+
+
+def interpolate_noise_many(computation_noise, params, locations_array, time_scale, add_dim):
+    """
+    Batched version of :func:`interpolate_noise`: it interpolates the same
+    autocorrelated noise mesh at many locations at once.
+
+    Input:
+        computation_noise: (np.array) Autocorrelated signal computed on a coarse mesh
+        params: (dict) Defines the mesh dimensions and
+            precision. Also define the correlation scales
+        locations_array: (np.array) shape (n_sites, 2), the (x, y) coordinates of the points of interest
+
+    Output:
+        (np.array) shape (n_sites, Nt) one time series per location (one row per site)
+    """
 
     # Get computation domain size
-    Lx = params['Lx']
-    Ly = params['Ly']
     T = params['T']
 
     # Get the decay parameter for each dimension
@@ -97,9 +115,7 @@ def interpolate_noise(computation_noise, params, locations, time_scale, add_dim)
     dy_corr = params['dy_corr']
     dt_corr = time_scale
 
-    # Compute number of element in each dimension
-    Nx_comp = int(Lx // dx_corr + 1) + add_dim
-    Ny_comp = int(Ly // dy_corr + 1) + add_dim
+    # Compute number of element in the time dimension
     Nt_comp = int(T // dt_corr + 1) + add_dim
 
     # Get interpolation temporal mesh size
@@ -109,40 +125,43 @@ def interpolate_noise(computation_noise, params, locations, time_scale, add_dim)
     Nt_inter = T // dt + 1
 
     # Get coordinates
-    x, y = locations
+    locations_array = np.asarray(locations_array, dtype=float).reshape(-1, 2)
+    x = locations_array[:, 0]
+    y = locations_array[:, 1]
 
     # Get coordinates of closest points in the coarse mesh
-    x_minus = int(x // dx_corr)
-    x_plus = int(x // dx_corr + 1)
-    y_minus = int(y // dy_corr)
-    y_plus = int(y // dy_corr + 1)
+    x_minus = np.floor_divide(x, dx_corr).astype(int)
+    x_plus = x_minus + 1
+    y_minus = np.floor_divide(y, dy_corr).astype(int)
+    y_plus = y_minus + 1
 
     # 1st step : spatial interpolation
 
     # Initialize output
-    output = np.zeros(Nt_comp)
+    output = np.zeros((locations_array.shape[0], Nt_comp))
 
     # Initialize sum of distances
-    dist_tot = 0
+    dist_tot = np.zeros((locations_array.shape[0], 1))
 
     # For every close point, add the corresponding time series, weighted by the inverse
     # of the distance between them
     for x_neighbor in [x_minus, x_plus]:
         for y_neighbor in [y_minus, y_plus]:
             dist = 1 / (np.sqrt((x - dx_corr * x_neighbor) ** 2 + (y - dy_corr * y_neighbor) ** 2) + 1)
+            dist = dist.reshape(-1, 1)
             output += dist * computation_noise[x_neighbor, y_neighbor, :]
             dist_tot += dist
     output /= dist_tot
 
-    # 2nd step : temporal quadratic interpolation
+    # 2nd step : temporal quadratic interpolation (one spline for all the sites)
     t_comp = np.linspace(0, int(T), int(Nt_comp), endpoint=True)
     t_inter = np.linspace(0, int(T), int(Nt_inter), endpoint=True)
     if Nt_comp == 2:
-        f2 = interp1d(t_comp, output, kind='linear')
+        f2 = interp1d(t_comp, output, kind='linear', axis=1)
     elif Nt_comp == 3:
-        f2 = interp1d(t_comp, output, kind='quadratic')
+        f2 = interp1d(t_comp, output, kind='quadratic', axis=1)
     elif Nt_comp > 3:
-        f2 = interp1d(t_comp, output, kind='cubic')
+        f2 = interp1d(t_comp, output, kind='cubic', axis=1)
 
     if Nt_comp >= 2:
         output = f2(t_inter)
@@ -11,6 +11,8 @@ import datetime as dt
 import pandas as pd
 import copy
 
+from chronix2grid.output_format import write_data, chunk_size_from_params
+
 def main(input_folder, output_folder, load, prod_solar, prod_wind, params, params_loss, write_results = True):
     """
     :param input_folder (str): input folder in which pattern folder can be found
@@ -27,7 +29,8 @@ def main(input_folder, output_folder, load, prod_solar, prod_wind, params, param
     loss_pattern_path = os.path.join(input_folder, 'patterns', params_loss["loss_pattern"])
     loss = generate_valid_loss(loss_pattern_path, params)
     if write_results:
-        loss.to_csv(os.path.join(output_folder,'loss.csv.bz2'), sep = ';')
+        write_data(loss, os.path.join(output_folder,'loss.csv.bz2'), float_format=None, index=True,
+                   chunk_size=chunk_size_from_params(params))
     return loss
 
 def generate_valid_loss(loss_pattern_path, params):
@@ -18,6 +18,8 @@ from numpy.random import default_rng
 from . import solar_wind_utils as swutils
 from .. import generation_utils as utils
 import chronix2grid.constants as cst
+from chronix2grid.output_format import write_data, chunk_size_from_params, DEFAULT_OUTPUT_FORMAT
+from chronix2grid.async_writer import get_async_writer
 
 
 def get_add_dim(params, prods_charac):
@@ -100,67 +102,77 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern,
     medium_scale_wind_noise = utils.generate_coarse_noise(prng, params, 'medium_wind', add_dim=add_dim)
     short_scale_wind_noise = utils.generate_coarse_noise(prng, params, 'short_wind', add_dim=add_dim)
 
-    # Compute Wind and solar series of scenario
+    # Extract the characteristics of the productions once
+    names = prods_charac['name'].values
+    types = prods_charac['type'].values
+    is_solar = types == 'solar'
+    is_wind = types == 'wind'
+    
+    # Interpolate the noises for all the solar / wind farms at once
+    solar_locations = prods_charac.loc[is_solar, ['x', 'y']].values.astype(float)
+    if scale_solar_coord_for_correlation is not None:
+        solar_locations *= scale_solar_coord_for_correlation
+    solar_signals = utils.interpolate_noise_many(solar_noise, params, solar_locations,
+                                                 time_scale=params['solar_corr'], add_dim=add_dim)
+    wind_locations = prods_charac.loc[is_wind, ['x', 'y']].values
+    wind_signals = [utils.interpolate_noise_many(wind_noise, params, wind_locations,
+                                                 time_scale=params[f'{scale}_wind_corr'], add_dim=add_dim)
+                    for wind_noise, scale in zip([long_scale_wind_noise, medium_scale_wind_noise, short_scale_wind_noise],
+                                                 ['long', 'medium', 'short'])]
+    
+    # Compute Wind and solar series of scenario (one row per solar / wind farm)
     print('Generating solar and wind production chronics')
-    prods_series = {}
     solar_ref = None
     wind_ref = None
-    i_solar = 0
-    i_wind = 0
-    for name in prods_charac['name']:
-        mask = (prods_charac['name'] == name)
-        if prods_charac[mask]['type'].values == 'solar':
-            locations = [prods_charac[mask]['x'].values[0], prods_charac[mask]['y'].values[0]]
-            Pmax = prods_charac[mask]['Pmax'].values[0]
-            tmp_ = swutils.compute_solar_series(
-                prng,
-                locations,
-                Pmax,
-                solar_noise,
-                params, solar_pattern, smoothdist,
-                time_scale=params['solar_corr'],
-                add_dim=add_dim,
-                scale_solar_coord_for_correlation=scale_solar_coord_for_correlation,
-                return_ref_curve=return_ref_curve,
-                tol=tol_zero)
-            if return_ref_curve:
-                if solar_ref is None:
-                    solar_ref = np.zeros((tmp_[0].shape[0], (prods_charac['type'].values == 'solar').sum()))
-                prods_series[name], solar_ref[:,i_solar] = tmp_
-            else:
-                prods_series[name] = tmp_
-            i_solar += 1
-        elif prods_charac[mask]['type'].values == 'wind':
-            locations = [prods_charac[mask]['x'].values[0], prods_charac[mask]['y'].values[0]]
-            Pmax = prods_charac[mask]['Pmax'].values[0]
-            tmp_ = swutils.compute_wind_series(
-                prng,
-                locations,
-                Pmax,
-                long_scale_wind_noise,
-                medium_scale_wind_noise,
-                short_scale_wind_noise,
-                params, smoothdist,
-                add_dim=add_dim,
-                return_ref_curve=return_ref_curve,
-                tol=tol_zero)
-            if return_ref_curve:
-                if wind_ref is None:
-                    wind_ref = np.zeros((tmp_[0].shape[0], (prods_charac['type'].values == 'wind').sum()))
-                prods_series[name], wind_ref[:,i_wind] = tmp_
-            else:
-                prods_series[name] = tmp_
-            i_wind += 1
+    tmp_ = swutils.compute_solar_series(
+        prng,
+        solar_locations,
+        prods_charac['Pmax'].values[is_solar].reshape(-1, 1),
+        solar_noise,
+        params, solar_pattern, smoothdist,
+        time_scale=params['solar_corr'],
+        add_dim=add_dim,
+        return_ref_curve=return_ref_curve,
+        tol=tol_zero,
+        final_noise=solar_signals)
+    if return_ref_curve:
+        solar_array, solar_ref = tmp_
+        if is_solar.any():
+            solar_ref = np.tile(solar_ref.reshape(-1, 1), (1, is_solar.sum()))
+        else:
+            solar_ref = None
+    else:
+        solar_array = tmp_
+        
+    tmp_ = swutils.compute_wind_series(
+        prng,
+        wind_locations,
+        prods_charac['Pmax'].values[is_wind].reshape(-1, 1),
+        long_scale_wind_noise,
+        medium_scale_wind_noise,
+        short_scale_wind_noise,
+        params, smoothdist,
+        add_dim=add_dim,
+        return_ref_curve=return_ref_curve,
+        tol=tol_zero,
+        scale_signals=wind_signals)
+    if return_ref_curve:
+        wind_array, wind_ref = tmp_
+        if is_wind.any():
+            wind_ref = np.tile(wind_ref.reshape(-1, 1), (1, is_wind.sum()))
+        else:
+            wind_ref = None
+    else:
+        wind_array = tmp_
 
     # Séparation ds séries solaires et éoliennes
-    solar_series = {}
-    wind_series = {}
-    for name in prods_charac['name']:
-        mask = (prods_charac['name'] == name)
-        if prods_charac[mask]['type'].values == 'solar':
-            solar_series[name] = prods_series[name]
-        elif prods_charac[mask]['type'].values == 'wind':
-            wind_series[name] = prods_series[name]
+    solar_series = pd.DataFrame(solar_array.T, columns=names[is_solar])
+    wind_series = pd.DataFrame(wind_array.T, columns=names[is_wind])
+    is_renew = is_solar | is_wind
+    prods_array = np.zeros((datetime_index.shape[0], is_renew.sum()))
+    prods_array[:, is_solar[is_renew]] = solar_array.T
+    prods_array[:, is_wind[is_renew]] = wind_array.T
+    prods_series = pd.DataFrame(prods_array, columns=names[is_renew])
 
     # Time index
     prods_series['datetime'] = datetime_index
@@ -168,6 +180,11 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern,
     wind_series['datetime'] = datetime_index
 
     # Save files
+    output_format = params.get("output_format", DEFAULT_OUTPUT_FORMAT)
+    # the files are written in parallel in the background
+    writer = get_async_writer() if params.get("async_write", False) and write_results else None
+    # the chunks (if any) are written with the files
+    chunk_size = chunk_size_from_params(params)
     if scenario_destination_path is not None:
         print('Saving files in zipped csv')
         if not os.path.exists(scenario_destination_path):
@@ -180,7 +197,10 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern,
         reordering=True,
         shift=True,
         write_results=write_results,
-        index=False
+        index=False,
+        output_format=output_format,
+        writer=writer,
+        chunk_size=chunk_size
     )
 
     prod_solar = swutils.create_csv(
@@ -189,7 +209,10 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern,
         os.path.join(scenario_destination_path, 'solar_p.csv.bz2') if scenario_destination_path is not None else None,
         reordering=True,
         noise=params['planned_std'],
-        write_results=write_results
+        write_results=write_results,
+        output_format=output_format,
+        writer=writer,
+        chunk_size=chunk_size
     )
 
     prod_wind_forecasted = swutils.create_csv(
@@ -199,7 +222,10 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern,
         reordering=True,
         shift=True,
         write_results=write_results,
-        index=False
+        index=False,
+        output_format=output_format,
+        writer=writer,
+        chunk_size=chunk_size
     )
 
     prod_wind = swutils.create_csv(
@@ -207,7 +233,10 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern,
         wind_series, os.path.join(scenario_destination_path, 'wind_p.csv.bz2') if scenario_destination_path is not None else None,
         reordering=True,
         noise=params['planned_std'],
-        write_results=write_results
+        write_results=write_results,
+        output_format=output_format,
+        writer=writer,
+        chunk_size=chunk_size
     )
 
     prod_p = swutils.create_csv(
@@ -215,7 +244,10 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern,
         prods_series, os.path.join(scenario_destination_path, 'prod_p.csv.bz2') if scenario_destination_path is not None else None,
         reordering=True,
         noise=params['planned_std'],
-        write_results=write_results
+        write_results=write_results,
+        output_format=output_format,
+        writer=writer,
+        chunk_size=chunk_size
     )
 
     prod_v = prods_charac[['name', 'V']].set_index('name')
@@ -224,13 +256,15 @@ def main(scenario_destination_path, seed, params, prods_charac, solar_pattern,
     prod_v = prod_v.reindex(range(len(prod_p)))
     prod_v = prod_v.fillna(method='ffill') * 1.04
     
-    if write_results:
-        prod_v.to_csv(
-            os.path.join(scenario_destination_path, 'prod_v.csv.bz2') if scenario_destination_path is not None else None,
-            sep=';',
-            index=False,
-            float_format=cst.FLOATING_POINT_PRECISION_FORMAT
-        )
+    if write_results and scenario_destination_path is not None:
+        write = write_data if writer is None else writer.write
+        write(prod_v,
+              os.path.join(scenario_destination_path, 'prod_v.csv.bz2'),
+              output_format=output_format,
+              index=False,
+              chunk_size=chunk_size)
+    if writer is not None:
+        writer.flush()
     if not return_ref_curve and not return_prng:
         res = prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted
     elif not return_ref_curve and return_prng:
@@ -14,32 +14,40 @@ from scipy.interpolate import interp1d
 
 from .. import generation_utils as utils
 import chronix2grid.constants as cst
+from chronix2grid.output_format import write_data, DEFAULT_OUTPUT_FORMAT
 
 def compute_wind_series(prng, locations, Pmax, long_noise, medium_noise,
                         short_noise, params, smoothdist, add_dim,
                         return_ref_curve=False,
-                        tol=0.):
+                        tol=0.,
+                        scale_signals=None):
     # NB tol is set to 0.0 for legacy behaviour, otherwise tests do not pass, but this is a TERRIBLE idea.
+    # NB scale_signals can be the (long, medium, short) refined signals of this location, already
+    # computed with `interpolate_noise_many` for all the wind farms at once. In this case
+    # Pmax can be of shape (n_wind, 1) and the output will be of shape (n_wind, Nt)
     
     # Compute refined signals
-    long_scale_signal = utils.interpolate_noise(
-        long_noise,
-        params,
-        locations,
-        time_scale=params['long_wind_corr'],
-        add_dim=add_dim)
-    medium_scale_signal = utils.interpolate_noise(
-        medium_noise,
-        params,
-        locations,
-        time_scale=params['medium_wind_corr'],
-        add_dim=add_dim)
-    short_scale_signal = utils.interpolate_noise(
-        short_noise,
-        params,
-        locations,
-        time_scale=params['short_wind_corr'],
-        add_dim=add_dim)
+    if scale_signals is not None:
+        long_scale_signal, medium_scale_signal, short_scale_signal = scale_signals
+    else:
+        long_scale_signal = utils.interpolate_noise(
+            long_noise,
+            params,
+            locations,
+            time_scale=params['long_wind_corr'],
+            add_dim=add_dim)
+        medium_scale_signal = utils.interpolate_noise(
+            medium_noise,
+            params,
+            locations,
+            time_scale=params['medium_wind_corr'],
+            add_dim=add_dim)
+        short_scale_signal = utils.interpolate_noise(
+            short_noise,
+            params,
+            locations,
+            time_scale=params['short_wind_corr'],
+            add_dim=add_dim)
 
     # Compute seasonal pattern
     Nt_inter = int(params['T'] // params['dt'] + 1)
@@ -63,7 +71,7 @@ def compute_wind_series(prng, locations, Pmax, long_noise, medium_noise,
     signal[signal < tol] = 0.
     signal = smooth(signal)
     wind_series = Pmax * signal
-    wind_series[wind_series > 0.95 * Pmax] = 0.95 * Pmax
+    wind_series = np.minimum(wind_series, 0.95 * Pmax)
     if not return_ref_curve:
         return wind_series
     return wind_series, 1e-1 * np.exp(4 * (0.7 + 0.3 * seasonal_pattern) * 0.3)
@@ -73,13 +81,18 @@ def compute_solar_series(prng, locations, Pmax, solar_noise, params,
                          solar_pattern, smoothdist, time_scale,
                          add_dim, scale_solar_coord_for_correlation=None,
                          return_ref_curve=False,
-                         tol=0.):
+                         tol=0.,
+                         final_noise=None):
     # NB tol is set to 0.0 for legacy behaviour, otherwise tests do not pass, but this is a TERRIBLE idea.
+    # NB final_noise can be the refined noise of this location, already computed with
+    # `interpolate_noise_many` for all the solar farms at once. In this case
+    # Pmax can be of shape (n_solar, 1) and the output will be of shape (n_solar, Nt)
 
     # Compute noise at desired locations
-    if scale_solar_coord_for_correlation is not None:
-        locations = [float(scale_solar_coord_for_correlation) * float(locations[0]), float(scale_solar_coord_for_correlation) * float(locations[1])]
-    final_noise = utils.interpolate_noise(solar_noise, params, locations, time_scale, add_dim=add_dim)
+    if final_noise is None:
+        if scale_solar_coord_for_correlation is not None:
+            locations = [float(scale_solar_coord_for_correlation) * float(locations[0]), float(scale_solar_coord_for_correlation) * float(locations[1])]
+        final_noise = utils.interpolate_noise(solar_noise, params, locations, time_scale, add_dim=add_dim)
 
     # Compute solar pattern
     solar_pattern = compute_solar_pattern(params, solar_pattern, tol=tol)
@@ -100,7 +113,7 @@ def compute_solar_series(prng, locations, Pmax, solar_noise, params,
     signal = smooth(signal)
     solar_series = Pmax * signal
     # solar_series[np.isclose(solar_series, 0.)] = 0
-    solar_series[solar_series > 0.95 * Pmax] = 0.95 * Pmax
+    solar_series = np.minimum(solar_series, 0.95 * Pmax)
     if not return_ref_curve:
         return solar_series
     else:
@@ -232,7 +245,8 @@ def smooth(x, alpha=0.5, beta=None):
 
 
 def create_csv(prng, dict_, path, reordering=True, noise=None, shift=False,
-               write_results=True, index=False):
+               write_results=True, index=False, output_format=DEFAULT_OUTPUT_FORMAT, writer=None,
+               chunk_size=None):
     if type(dict_) is dict:
         df = pd.DataFrame.from_dict(dict_)
     else:
@@ -252,9 +266,10 @@ def create_csv(prng, dict_, path, reordering=True, noise=None, shift=False,
     if shift:
         df = df.shift(-1)
         df = df.fillna(0)
-    if write_results:
-        df.to_csv(path, index=index, sep=';',
-                  float_format=cst.FLOATING_POINT_PRECISION_FORMAT)
+    if write_results and path is not None:
+        # writer: chronix2grid.async_writer.AsyncWriter, to write in the background
+        write = write_data if writer is None else writer.write
+        write(df, path, output_format=output_format, index=index, chunk_size=chunk_size)
 
     return df
 
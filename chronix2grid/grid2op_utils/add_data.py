@@ -7,33 +7,71 @@
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 import os
 import json
-from multiprocessing import Pool
+import shutil
+import time
+import warnings
 
 import grid2op
-from chronix2grid.grid2op_utils.utils import generate_a_scenario, get_last_scenario_id
+from chronix2grid.grid2op_utils.utils import (generate_a_scenario, get_last_scenario_id, get_last_scenario_id_from_names,
+                                              check_dtype)
+from chronix2grid.grid2op_utils.env_context import get_env_context
+from chronix2grid.grid2op_utils.retry import RetryPolicy, run_with_retry
+from chronix2grid.grid2op_utils.scheduler import run_tasks, TaskDurations
+from chronix2grid.grid2op_utils.task_manifest import TaskManifest, MANIFEST_FILE_NAME, DONE, FAILED
+from chronix2grid.output_format import check_output_format, data_file_exists
+from chronix2grid.scenario_store import ScenarioStore
+from chronix2grid.telemetry import failed_telemetry_file_name
 from numpy.random import default_rng
 
+# mean duration of the tasks of the previous runs, per month, used to start the longest ones first
+DURATIONS_FILE_NAME = "add_data_durations.json"
+
 
 # wrapper function for generate_a_scenario
 def generate_a_scenario_wrapper(args):
+    res_gen, _ = _generate_with_retry(args)
+    return res_gen
+
+
+def _generate_with_retry(args):
+    """generate_a_scenario with the arguments `args`, attempted again with new seeds (according to the
+    retry policy of `args`) if it fails. Returns what it returned and the attempts"""
     (path_env, name_gen, gen_type, output_dir,
         start_date, dt, scen_id, load_seed, renew_seed,
         gen_p_forecast_seed, handle_loss, files_to_copy,
-        save_ref_curve, day_lag, tol_zero, debug) = args
-    res_gen = generate_a_scenario(path_env,
-                                name_gen, gen_type,
-                                output_dir,
-                                start_date, dt,
-                                scen_id,
-                                load_seed, renew_seed, 
-                                gen_p_forecast_seed,
-                                handle_loss,
-                                files_to_copy=files_to_copy,
-                                save_ref_curve=save_ref_curve,
-                                day_lag=day_lag,
-                                tol_zero=tol_zero,
-                                debug=debug)
-    return res_gen
+        save_ref_curve, day_lag, tol_zero, debug, output_format, async_write, dtype, telemetry, retry_policy) = args
+
+    def _generate(load_seed, renew_seed, gen_p_forecast_seed):
+        return generate_a_scenario(path_env,
+                                   name_gen, gen_type,
+                                   output_dir,
+                                   start_date, dt,
+                                   scen_id,
+                                   load_seed, renew_seed,
+                                   gen_p_forecast_seed,
+                                   handle_loss,
+                                   files_to_copy=files_to_copy,
+                                   save_ref_curve=save_ref_curve,
+                                   day_lag=day_lag,
+                                   tol_zero=tol_zero,
+                                   debug=debug,
+                                   output_format=output_format,
+                                   async_write=async_write,
+                                   dtype=dtype,
+                                   telemetry=telemetry)
+    return run_with_retry(_generate, (load_seed, renew_seed, gen_p_forecast_seed), retry_policy)
+
+
+def _run_task(args):
+    """runs :func:`generate_a_scenario_wrapper` and only returns the error message (if any), the duration and
+    the attempts, the generated time series are not sent back to the main process"""
+    beg_ = time.perf_counter()
+    attempts = None
+    try:
+        (error_, *_), attempts = _generate_with_retry(args)
+    except Exception as exc_:
+        error_ = exc_
+    return (f"{error_}" if error_ is not None else None), time.perf_counter() - beg_, attempts
 
 
 def add_data(env: grid2op.Environment.Environment,
@@ -47,7 +85,17 @@ def add_data(env: grid2op.Environment.Environment,
              save_ref_curve=False,
              day_lag=6,  # TODO 6 because it's 2050
              debug=False,
-             tol_zero=1e-3
+             tol_zero=1e-3,
+             output_format="csv",
+             async_write=False,
+             store_path=None,
+             dtype="float64",
+             telemetry=False,
+             resume=False,
+             task_timeout=None,
+             max_tasks_per_child=None,
+             max_attempts=1,
+             retry_backoff=0.
              ):
     """This function adds some data to already existing scenarios.
     
@@ -55,6 +103,10 @@ def add_data(env: grid2op.Environment.Environment,
         You should not start this function twice. Before starting a new run, make sure the previous one has terminated (otherwise you might
         erase some previously generated scenario)
 
+    The tasks of the run (one per scenario and month) and their status are recorded in the manifest
+    "add_data_manifest.jsonl" (see :mod:`chronix2grid.grid2op_utils.task_manifest`), in the "chronics" folder
+    (or in `store_path`). A run that was interrupted can then be resumed with `resume=True`.
+
     Parameters
     ----------
     env : _type_
@@ -68,20 +120,133 @@ def add_data(env: grid2op.Environment.Environment,
     with_loss: ``bool``
         Do you make sure that the generated data will not be modified too much when running with grid2op (default = True).
         Setting it to False will speed up (by quite a lot) the generation process, but will degrade the data quality.
+    output_format: ``str``
+        Format of the generated files, see :mod:`chronix2grid.output_format` (default "csv"). Only the
+        "csv" format can be read by grid2op.
+    async_write: ``bool``
+        Whether the files are written in the background while the scenario is generated (default False),
+        see :mod:`chronix2grid.async_writer`.
+    store_path: ``str``
+        If not None, the scenarios are appended to the :class:`chronix2grid.scenario_store.ScenarioStore` in
+        this folder instead of being written in the "chronics" folder of the environment (one folder per
+        scenario). Use :func:`chronix2grid.scenario_store.ScenarioStore.export` to get the grid2op layout back.
+    dtype: ``str``
+        Type of the time series during the generation, "float64" (default) or "float32". "float32" takes
+        about half the memory per worker (so more workers can run on the same node), see
+        :func:`chronix2grid.grid2op_utils.utils.generate_a_scenario`.
+    telemetry: ``bool``
+        Whether the duration, the peak memory and the solver statistics of each stage of the generation are
+        written in the file "telemetry.jsonl" of each scenario (default False), see :mod:`chronix2grid.telemetry`.
+    resume: ``bool``
+        Whether to resume the run recorded in the manifest (default False): the tasks that are done (and whose
+        scenario is complete) are skipped, the other ones (failed, not run or half-written) are generated again
+        with the same seeds. `seed` and `nb_scenario` are then not used. If there is no manifest, a new run starts.
+    task_timeout: ``float``
+        Maximum duration (in s) of the generation of a scenario for a month (default None: no limit). A task that
+        takes longer (for example because a solver hangs) is stopped and recorded as failed. The tasks are run
+        in other processes (even with `nb_core=1`) when it is set.
+    max_tasks_per_child: ``int``
+        Number of tasks after which a worker process is replaced by a new one (default None: never), to give back
+        the memory that might have leaked. See :mod:`chronix2grid.grid2op_utils.scheduler`.
+    max_attempts: ``int``
+        Maximum number of attempts to generate a scenario for a month (default 1: no retry). Each new attempt
+        uses new seeds, derived from the seeds of the task (see :mod:`chronix2grid.grid2op_utils.retry`), the
+        attempts are recorded in the manifest.
+    retry_backoff: ``float``
+        Time to wait (in s) before the second attempt, doubled after each attempt (default 0.)
         
     """
+    check_output_format(output_format)
+    check_dtype(dtype)
+    retry_policy = RetryPolicy(max_attempts=max_attempts, backoff=retry_backoff)
     # required parameters
     env_name = type(env).env_name
     output_dir = os.path.join(env.get_path_env(), "chronics")
+    store = None
+    if store_path is not None:
+        # each scenario is generated in a temporary folder, then moved into the store
+        store = ScenarioStore(store_path, dtype=dtype)
+        output_dir = os.path.join(store.path, "tmp_scenarios")
+        output_format = "npz"
     if not os.path.exists(output_dir):
         os.mkdir(output_dir)
         
-    last_scen = get_last_scenario_id(output_dir)
+    path_manifest = os.path.join(output_dir if store is None else store.path, MANIFEST_FILE_NAME)
+    if resume and os.path.exists(path_manifest):
+        manifest = TaskManifest(path_manifest)
+        to_run = _tasks_to_resume(manifest, output_dir, store)
+        print(f"Resuming {path_manifest}: {len(manifest.tasks) - len(to_run)} tasks done, {len(to_run)} to run")
+    else:
+        manifest = _new_manifest(path_manifest, output_dir, store, env.get_path_env(), seed, nb_scenario)
+        to_run = manifest.ids()
+
+    # generate the data
+    path_env = env.get_path_env()
+    name_gen = env.name_gen
+    gen_type = env.gen_type
+    with open(os.path.join(path_env, "scenario_params.json"), "r", encoding="utf-8") as f:
+        dt = json.load(f)["dt"]
+    # the input files are read (and checked) once, the worker processes inherit them
+    get_env_context(path_env).preload()
+    errors = {}
+    argss = []
+    for scenario_id in to_run:
+        task = manifest.tasks[scenario_id]
+        argss.append((path_env,
+                      name_gen,
+                      gen_type,
+                      output_dir,
+                      task["start_date"],
+                      dt,
+                      task["scen_id"],
+                      task["load_seed"],
+                      task["renew_seed"],
+                      task["gen_p_forecast_seed"],
+                      with_loss,
+                      files_to_copy,
+                      save_ref_curve,
+                      day_lag,
+                      tol_zero,
+                      debug,
+                      output_format,
+                      async_write,
+                      dtype,
+                      telemetry,
+                      retry_policy
+                      ))
+    durations = TaskDurations(os.path.join(os.path.dirname(path_manifest), DURATIONS_FILE_NAME))
+    if nb_core == 1 and task_timeout is None:
+        for args in argss:
+            error_, duration, attempts = _run_task(args)
+            _task_done(manifest, store, output_dir, args, error_, duration, errors, durations, attempts)
+    else:
+        def _callback(i, ok, res, duration):
+            # the manifest is updated (and the scenario moved into the store) as soon as a task is finished
+            error_, _, attempts = res if ok else (res, None, None)
+            _task_done(manifest, store, output_dir, argss[i], error_, duration, errors, durations, attempts)
+        run_tasks(_run_task, argss, _callback, nb_core,
+                  timeout=task_timeout,
+                  max_tasks_per_child=max_tasks_per_child,
+                  order=durations.longest_first([args[4] for args in argss]),
+                  task_names=to_run)
+    if store is not None:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def _new_manifest(path_manifest, output_dir, store, path_env, seed, nb_scenario):
+    """creates the manifest of a new run: `nb_scenario` new scenarios for all the months of the environment"""
+    if os.path.exists(path_manifest):
+        previous = TaskManifest(path_manifest)
+        if len(previous.ids(DONE)) < len(previous.tasks):
+            warnings.warn(f"The run recorded in \"{path_manifest}\" was not finished ({previous.summary()}), "
+                          f"it can no longer be resumed")
+    if store is None:
+        last_scen = get_last_scenario_id(output_dir)
+    else:
+        last_scen = get_last_scenario_id_from_names(store.scenarios)
     scen_ids = [f"{el}" for el in range(last_scen +1, last_scen + 1 + nb_scenario)]
-    with open(os.path.join(env.get_path_env(), "scenario_params.json"), "r", encoding="utf-8") as f:
+    with open(os.path.join(path_env, "scenario_params.json"), "r", encoding="utf-8") as f:
         dict_ref = json.load(f)
-        
-    dt = dict_ref["dt"]
     li_months = dict_ref["all_dates"]
 
     # generate the seeds
@@ -89,67 +254,88 @@ def add_data(env: grid2op.Environment.Environment,
         prng = default_rng(seed)
     else:
         prng = default_rng()
-        
-    load_seeds = []
-    renew_seeds = []
-    gen_p_forecast_seeds = []
+
+    tasks = []
     for scen_id in scen_ids:
         for start_date in li_months:
             load_seed, renew_seed, gen_p_forecast_seed = prng.integers(2**32 - 1, size=3)
-            load_seeds.append(load_seed)
-            renew_seeds.append(renew_seed)
-            gen_p_forecast_seeds.append(gen_p_forecast_seed)
-    
-    # generate the data
-    path_env = env.get_path_env()
-    name_gen = env.name_gen
-    gen_type = env.gen_type
-    errors = {}
-    argss = []
-    for j, scen_id in enumerate(scen_ids):
-        for i, start_date in enumerate(li_months):
-            # if start_date != "2035-03-12":
-            #     continue
-            seed_num = i + j * len(li_months)
-            argss.append((path_env,
-                          name_gen,
-                          gen_type,
-                          output_dir,
-                          start_date,
-                          dt,
-                          scen_id,
-                          load_seeds[seed_num],
-                          renew_seeds[seed_num],
-                          gen_p_forecast_seeds[seed_num],
-                          with_loss,
-                          files_to_copy,
-                          save_ref_curve,
-                          day_lag,
-                          tol_zero,
-                          debug
-                          ))
-    if nb_core == 1:
-        for args in argss:
-            res_gen = generate_a_scenario_wrapper(args)
-            error_, *_ = res_gen
-            if error_ is not None:
-                print("=============================")
-                print(f"     Error for {start_date} {scen_id}        ")
-                print(f"{error_}")
-                print("=============================")
-                errors[f'{start_date}_{scen_id}'] = f"{error_}"
-                
-                # load previous data
-                path_json_error = os.path.join(output_dir, "errors.json")
-                if os.path.exists(path_json_error):
-                    with open(path_json_error, "r", encoding="utf-8") as f:
-                        err_tmp = json.load(f)
-                    for k in err_tmp:
-                        errors[k] = err_tmp[k]
-                    
-                # write the log
-                with open(path_json_error, "w", encoding="utf-8") as f:
-                    json.dump(errors, fp=f)
-    else:
-        with Pool(nb_core) as p:
-            p.map(generate_a_scenario_wrapper, argss)
+            tasks.append({"start_date": start_date,
+                          "scen_id": scen_id,
+                          "load_seed": load_seed,
+                          "renew_seed": renew_seed,
+                          "gen_p_forecast_seed": gen_p_forecast_seed})
+    return TaskManifest.create(path_manifest, tasks)
+
+
+def _scenario_complete(scenario_path):
+    """whether all the files of the scenario in `scenario_path` were written (the metadata are written last)"""
+    return (os.path.isfile(os.path.join(scenario_path, "generation_quality.json")) and
+            all(data_file_exists(os.path.join(scenario_path, f"{nm}.csv.bz2"))
+                for nm in ["load_p", "load_q", "prod_p", "prod_p_forecasted"]))
+
+
+def _tasks_to_resume(manifest, output_dir, store):
+    """ids of the tasks of `manifest` that should be run again, the half-written scenarios are removed"""
+    res = []
+    for scenario_id, task in manifest.tasks.items():
+        scenario_path = os.path.join(output_dir, scenario_id)
+        if store is not None and scenario_id in store:
+            # (moved into the store just before the run was interrupted)
+            if task["status"] != DONE:
+                manifest.set_status(scenario_id, DONE)
+            continue
+        if store is None and task["status"] == DONE and _scenario_complete(scenario_path):
+            continue
+        if os.path.exists(scenario_path):
+            shutil.rmtree(scenario_path)
+        res.append(scenario_id)
+    return res
+
+
+def _task_done(manifest, store, output_dir, args, error_, duration, errors, durations, attempts=None):
+    """records the result of the task with the arguments `args` (and moves its scenario into `store`)"""
+    start_date, scen_id = args[4], args[6]
+    scenario_id = f"{start_date}_{scen_id}"
+    if store is not None:
+        _move_to_store(store, output_dir, args, error_)
+    elif error_ is not None and os.path.exists(os.path.join(output_dir, scenario_id)):
+        # (half-written by a task that was stopped)
+        shutil.rmtree(os.path.join(output_dir, scenario_id))
+    manifest.set_status(scenario_id, DONE if error_ is None else FAILED, duration=duration, error=error_,
+                        retries=attempts if attempts is not None and len(attempts) > 1 else None)
+    if error_ is None:
+        durations.add(start_date, duration)
+        return
+    print("=============================")
+    print(f"     Error for {start_date} {scen_id}        ")
+    print(f"{error_}")
+    print("=============================")
+    errors[scenario_id] = f"{error_}"
+
+    # load previous data
+    path_json_error = os.path.join(output_dir if store is None else store.path, "errors.json")
+    if os.path.exists(path_json_error):
+        with open(path_json_error, "r", encoding="utf-8") as f:
+            err_tmp = json.load(f)
+        for k in err_tmp:
+            errors[k] = err_tmp[k]
+
+    # write the log
+    with open(path_json_error, "w", encoding="utf-8") as f:
+        json.dump(errors, fp=f)
+
+
+def _move_to_store(store, output_dir, args, error_):
+    """appends the scenario generated with the arguments `args` in a temporary folder to `store`"""
+    start_date, scen_id = args[4], args[6]
+    scenario_id = f"{start_date}_{scen_id}"
+    scenario_path = os.path.join(output_dir, scenario_id)
+    failed_telemetry = os.path.join(output_dir, failed_telemetry_file_name(scenario_id))
+    if os.path.isfile(failed_telemetry):
+        # (the temporary folder is removed at the end of the run)
+        shutil.move(failed_telemetry, os.path.join(store.path, failed_telemetry_file_name(scenario_id)))
+    if not os.path.exists(scenario_path):
+        return
+    if error_ is None:
+        store.add_folder(scenario_path, scenario_id)
+    shutil.rmtree(scenario_path)
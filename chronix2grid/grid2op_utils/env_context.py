@@ -0,0 +1,148 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Input files of an environment (parameters, characteristics of the loads and generators) and reference patterns,
+read once per process instead of once per generated scenario.
+
+A file is read again only if it changed (its modification time or its size is not the same). What is returned
+is always a copy, that can be modified by the caller.
+"""
+
+import copy
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.generation.dispatch.EconomicDispatch import load_hydro_guide_curves
+from chronix2grid.getting_started.example.input.generation.patterns import ref_pattern_path
+
+# files that should be in the folder of an environment generated by chronix2grid, and the columns required in
+# the csv files
+REQUIRED_FILES = {"params.json": None,
+                  "params_load.json": None,
+                  "params_res.json": None,
+                  "params_opf.json": None,
+                  "loads_charac.csv": ["name"],
+                  "prods_charac.csv": ["name", "type", "Pmax", "Pmin"]}
+
+# one context per environment and per process
+_CONTEXTS = {}
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_csv(path):
+    return pd.read_csv(path, sep=",")
+
+
+def _copy(value):
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+class EnvContext:
+    """
+    Input files of the environment in `path_env` and reference patterns, read (and checked) once
+    (see :mod:`chronix2grid.grid2op_utils.env_context`)
+
+    Use :func:`get_env_context` to get the context of an environment for the current process.
+
+    Attributes
+    ----------
+    path_env: ``str``
+        folder of the environment
+    ref_pattern_path: ``str``
+        folder of the reference patterns ("load_weekly_pattern.csv", "solar_pattern.npy", "hydro_french.csv")
+    """
+    def __init__(self, path_env, ref_pattern_path=ref_pattern_path):
+        self.path_env = os.path.abspath(path_env)
+        self.ref_pattern_path = os.path.abspath(ref_pattern_path)
+        self._cache = {}
+        self.validate()
+
+    def validate(self):
+        """checks that the files required are in the environment (and that the csv files have the required columns)"""
+        for file_name, columns in REQUIRED_FILES.items():
+            path = os.path.join(self.path_env, file_name)
+            if not os.path.isfile(path):
+                raise RuntimeError(f"The file \"{file_name}\" is missing in the environment \"{self.path_env}\"")
+            if columns is None:
+                continue
+            missing = [col for col in columns if col not in self.read_csv(file_name).columns]
+            if missing:
+                raise RuntimeError(f"The columns {missing} are missing in \"{path}\"")
+
+    def preload(self):
+        """reads all the files (so that the processes forked afterwards do not read them again)"""
+        for file_name in REQUIRED_FILES:
+            if file_name.endswith(".json"):
+                self.read_json(file_name)
+        for file_name in ["params_forecasts.json", "wind_extra_params.json"]:
+            self.read_json(file_name, optional=True)
+        for file_name, method in [("load_weekly_pattern.csv", self.load_weekly_pattern),
+                                  ("solar_pattern.npy", self.solar_pattern),
+                                  ("hydro_french.csv", self.hydro_guide_curves)]:
+            if os.path.isfile(os.path.join(self.ref_pattern_path, file_name)):
+                method()
+        return self
+
+    def _get(self, path, loader):
+        """content of the file `path` read by `loader` (read again only if the file changed)"""
+        stat_ = os.stat(path)
+        key = (stat_.st_mtime_ns, stat_.st_size)
+        if path not in self._cache or self._cache[path][0] != key:
+            self._cache[path] = (key, loader(path))
+        return _copy(self._cache[path][1])
+
+    def read_json(self, file_name, optional=False):
+        """content of the json file `file_name` of the environment (None if it does not exist and is `optional`)"""
+        path = os.path.join(self.path_env, file_name)
+        if optional and not os.path.isfile(path):
+            return None
+        return self._get(path, _read_json)
+
+    def read_csv(self, file_name):
+        """the csv file `file_name` of the environment (separated by ",")"""
+        return self._get(os.path.join(self.path_env, file_name), _read_csv)
+
+    def load_weekly_pattern(self):
+        return self._get(os.path.join(self.ref_pattern_path, "load_weekly_pattern.csv"), _read_csv)
+
+    def solar_pattern(self):
+        return self._get(os.path.join(self.ref_pattern_path, "solar_pattern.npy"), np.load)
+
+    def hydro_guide_curves_path(self):
+        return os.path.join(self.ref_pattern_path, "hydro_french.csv")
+
+    def hydro_guide_curves(self):
+        """
+        the hydro guide curves, see
+        :func:`chronix2grid.generation.dispatch.EconomicDispatch.load_hydro_guide_curves`
+        """
+        return self._get(self.hydro_guide_curves_path(), load_hydro_guide_curves)
+
+
+def get_env_context(path_env):
+    """
+    The :class:`EnvContext` of the environment in `path_env` for the current process (created the first time)
+
+    Returns
+    -------
+    :class:`EnvContext`
+    """
+    path_env = os.path.abspath(path_env)
+    if path_env not in _CONTEXTS:
+        _CONTEXTS[path_env] = EnvContext(path_env)
+    return _CONTEXTS[path_env]
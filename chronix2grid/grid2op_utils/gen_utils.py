@@ -6,13 +6,15 @@
 # SPDX-License-Identifier: MPL-2.0
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
-import json
+import time
+import multiprocessing
+import warnings
 import pandas as pd
-import os
 import cvxpy as cp
 import numpy as np
 
 from chronix2grid.generation.renewable.generate_solar_wind import get_add_dim as get_add_dim_renew
+from chronix2grid.grid2op_utils.env_context import get_env_context
 from chronix2grid.grid2op_utils.noise_generation_utils import (get_forecast,
                                                                generate_noise)
 
@@ -52,103 +54,144 @@ def get_gen_ids_hydro(env):
     return ids_hyrdo
     
 
-def fix_forecast_ramps(nb_h,
-                       load_p,
-                       load_p_forecasted,
-                       res_gen_p_df,
-                       res_gen_p_forecasted_df,
-                       env_for_loss,
-                       hydro_constraints,
-                       params):
+def _make_forecast_ramps_problem(nb_h, total_gen, total_step,
+                                 scale_for_loads, p_min, ramp_min, ramp_max):
+    """build the (DPP compliant) problem used to fix the forecasts ramps.
     
-    #### cvxpy
-    total_step = 1 # for now
-    total_gen = np.sum(env_for_loss.gen_redispatchable)
-    load_f = load_p_forecasted.sum(axis=1)
-    scaling_factor = env_for_loss.gen_pmax[env_for_loss.gen_redispatchable]
-    scale_for_loads =  np.repeat(scaling_factor.reshape(1,-1), total_step, axis=0)
-    ids_hyrdo = get_gen_ids_hydro(env_for_loss)
+    Everything that changes from one step to another is a `cp.Parameter` so that
+    the problem is compiled only once.
+    """
+    cp_params = {"target_vector": cp.Parameter(shape=(total_step + nb_h, total_gen)),
+                 "turned_off_orig": cp.Parameter(shape=(total_step + nb_h, total_gen), nonneg=True),
+                 "p_max": cp.Parameter(shape=(total_step + nb_h, total_gen)),
+                 "init_setpoint": cp.Parameter(shape=(total_gen, )),
+                 "net_load": cp.Parameter(shape=(total_step + nb_h, )),
+                 "renew": cp.Parameter(shape=(total_step + nb_h, )),
+                 "inv_scale_curt": cp.Parameter(shape=(total_step + nb_h, ), nonneg=True),
+                 }
     
-    p_min = np.repeat(env_for_loss.gen_pmin[env_for_loss.gen_redispatchable].reshape(1,-1)  / scaling_factor,
-                      total_step + nb_h,
-                      axis=0)
-    p_max = np.repeat(env_for_loss.gen_pmax[env_for_loss.gen_redispatchable].reshape(1,-1) * params["PmaxErrorCorrRatio"] / scaling_factor,
-                      total_step + nb_h,
-                      axis=0)
+    # curtailment
+    curt_t = cp.Variable(shape=(total_step + nb_h, ), nonneg=True)
+    curt_t_scaled = cp.multiply(curt_t, cp_params["inv_scale_curt"])
     
-    ramp_min = np.repeat(-env_for_loss.gen_max_ramp_down[env_for_loss.gen_redispatchable].reshape(1,-1) * params["RampErrorCorrRatio"] / scaling_factor,
-                         total_step + (nb_h-1),
-                         axis=0)
-    ramp_max = np.repeat(env_for_loss.gen_max_ramp_up[env_for_loss.gen_redispatchable].reshape(1,-1) * params["RampErrorCorrRatio"] / scaling_factor,
-                         total_step + (nb_h-1),
-                         axis=0)
+    # generation
+    p_t = cp.Variable(shape=(total_step + nb_h, total_gen), pos=True)
+    real_p = cp.multiply(p_t, scale_for_loads)
     
-    if "hydro_ramp_reduction_factor" in params:
-        ramp_max[:, ids_hyrdo] /= float(params["hydro_ramp_reduction_factor"])
-        ramp_min[:, ids_hyrdo] /= float(params["hydro_ramp_reduction_factor"])
-        
-    res_gen_p = np.zeros((res_gen_p_forecasted_df.shape[0], total_gen))
-    amount_curtailed_for = np.zeros((res_gen_p_forecasted_df.shape[0], ))
-    has_error = np.zeros(res_gen_p_forecasted_df.shape[0], dtype=bool)
+    constraints = [real_p[0,:] == cp_params["init_setpoint"],
+                   p_t >= p_min,
+                   p_t <= cp_params["p_max"],
+                   p_t[1:,:] - p_t[:-1,:] >= ramp_min,
+                   p_t[1:,:] - p_t[:-1,:] <= ramp_max,
+                   cp.sum(real_p, axis=1) >= (cp_params["net_load"] + curt_t),
+                   cp.sum(real_p, axis=1) <= 1.01 * (cp_params["net_load"] + curt_t),
+                   curt_t <= cp_params["renew"],
+                   curt_t >= 0.,
+                   curt_t[0] == 0.
+                   ]
+    
+    cost = (cp.sum_squares(p_t - cp_params["target_vector"]) +
+            cp.norm1(cp.multiply(p_t, cp_params["turned_off_orig"])) +
+            10. * cp.sum_squares(curt_t_scaled))  # TODO normalize last stuff
+    prob = cp.Problem(cp.Minimize(cost), constraints)
+    return prob, (p_t, curt_t, real_p), cp_params
+    
+
+def _fix_forecast_ramps_batch(t0s, data):
+    """fix the forecasts ramps for all the steps in `t0s`.
+    
+    The problem is built (and compiled) only once per batch. `data` only contains
+    numpy arrays (see :func:`fix_forecast_ramps`).
+    """
+    nb_h = data["nb_h"]
+    total_gen = data["total_gen"]
+    scale_for_loads = data["scale_for_loads"]
+    p_max = data["p_max"]
+    ids_hyrdo = data["ids_hyrdo"]
+    hydro_p_max_pu = data["hydro_p_max_pu"]
+    res_gen_p_redisp = data["res_gen_p_redisp"]
+    res_gen_p_renew = data["res_gen_p_renew"]
+    res_gen_p_for_redisp = data["res_gen_p_for_redisp"]
+    res_gen_p_for_renew = data["res_gen_p_for_renew"]
+    loss_scales = data["loss_scales"]
+    load_f_vals = data["load_f"]
+    
+    res_gen_p = np.zeros((data["nb_for"], total_gen))
+    amount_curtailed_for = np.zeros((data["nb_for"], ))
+    has_error = np.zeros(data["nb_for"], dtype=bool)
     t0_errors = []
     errors = []
-    indx_forecasts_for_hydro_only = np.arange(0, nb_h + 1)
-    for t0 in range(res_gen_p_df.shape[0] - 1):
+    
+    # the problem is built (and compiled) only once, only the parameters
+    # change from one t0 to the next
+    beg_compile = time.perf_counter()
+    prob, (p_t, curt_t, real_p), cp_params = _make_forecast_ramps_problem(nb_h, total_gen, data["total_step"],
+                                                                          scale_for_loads, data["p_min"],
+                                                                          data["ramp_min"], data["ramp_max"])
+    compile_time = time.perf_counter() - beg_compile
+    solve_time = 0.
+    is_compiled = False
+    for t0 in t0s:
         # forecast are "consistent from a power system point of view" batch by batch
         # losses are not handled here !
-        loss_scale = res_gen_p_df.iloc[t0].sum() / load_p.iloc[t0].sum()
+        loss_scale = loss_scales[t0]
         indx_forecasts = np.arange(t0*nb_h, (t0+1)*nb_h)
         
-        prod_renew_for = res_gen_p_forecasted_df.iloc[indx_forecasts, env_for_loss.gen_renewable].sum(axis=1)
-        loss_for = (load_f.iloc[indx_forecasts] * loss_scale - prod_renew_for)
-        net_load = np.array(([res_gen_p_df.iloc[t0, env_for_loss.gen_redispatchable].sum()] +  # value in the env
-                             loss_for.tolist())
-                           )
+        prod_renew_for = res_gen_p_for_renew[indx_forecasts]
+        loss_for = (load_f_vals[indx_forecasts] * loss_scale - prod_renew_for)
+        net_load = np.concatenate(([res_gen_p_redisp[t0].sum()],  # value in the env
+                                   loss_for))
         # curtailment
-        curt_t = cp.Variable(shape=(total_step + nb_h, ), nonneg=True)
-        # curt_t = cp.multiply(curt_t_scaled, sum_pmax_renew)
-        renew = np.array(([res_gen_p_df.iloc[t0, env_for_loss.gen_renewable].sum()] +  # value in the env
-                          prod_renew_for.tolist())
-                        )
+        renew = np.concatenate(([res_gen_p_renew[t0]],  # value in the env
+                                prod_renew_for))
         scale_curt_factor = np.maximum(renew, 1.)
-        curt_t_scaled = cp.multiply(curt_t, 1. / scale_curt_factor)
         
         # generation
-        p_t = cp.Variable(shape=(total_step + nb_h, total_gen), pos=True)
-        real_p = cp.multiply(p_t, scale_for_loads)
-        target_vector = 1.0 * np.concatenate((res_gen_p_df.iloc[t0, env_for_loss.gen_redispatchable].values.reshape(1, total_gen),
-                                              res_gen_p_forecasted_df.iloc[indx_forecasts, env_for_loss.gen_redispatchable].values),
+        target_vector = 1.0 * np.concatenate((res_gen_p_redisp[t0].reshape(1, total_gen),
+                                              res_gen_p_for_redisp[indx_forecasts]),
                                               axis=0).reshape(1+nb_h, total_gen)
         
         p_max_here = 1.0 * p_max
-        if hydro_constraints is not None:
-            p_max_here[:, ids_hyrdo] = fix_nan_hydro_i_dont_know_why(hydro_constraints["p_max_pu"].values[indx_forecasts_for_hydro_only, :])
-            indx_forecasts_for_hydro_only += 1
-            indx_forecasts_for_hydro_only[indx_forecasts_for_hydro_only > (res_gen_p_df.shape[0] - 1)] = res_gen_p_df.shape[0] - 1
+        if hydro_p_max_pu is not None:
+            indx_forecasts_for_hydro_only = np.minimum(np.arange(t0, t0 + nb_h + 1), data["nb_t"] - 1)
+            p_max_here[:, ids_hyrdo] = fix_nan_hydro_i_dont_know_why(hydro_p_max_pu[indx_forecasts_for_hydro_only, :])
         
         turned_off_orig = 1.0 * (target_vector == 0.)
         target_vector /= scale_for_loads
-        constraints = [real_p[0,:] == res_gen_p_df.iloc[t0, env_for_loss.gen_redispatchable].values,
-                       p_t >= p_min,
-                       p_t <= p_max_here,
-                       p_t[1:,:] - p_t[:-1,:] >= ramp_min,
-                       p_t[1:,:] - p_t[:-1,:] <= ramp_max,
-                       cp.sum(real_p, axis=1) >= (net_load.reshape(-1) + curt_t),
-                       cp.sum(real_p, axis=1) <= 1.01 * (net_load.reshape(-1) + curt_t),
-                       curt_t <= renew,
-                       curt_t >= 0.,
-                       curt_t[0] == 0.
-                       ]
         
-        cost = cp.sum_squares(p_t - target_vector) + cp.norm1(cp.multiply(p_t, turned_off_orig)) + 10. * cp.sum_squares(curt_t_scaled)  # TODO normalize last stuff
-        prob = cp.Problem(cp.Minimize(cost), constraints)
+        if not (np.all(np.isfinite(target_vector)) and np.all(np.isfinite(p_max_here)) and
+                np.all(np.isfinite(net_load)) and np.all(np.isfinite(renew))):
+            t0_errors.append(t0)
+            errors.append(RuntimeError(f"cvxpy failed to find a solution for t0 {t0}, some input data are not finite"))
+            has_error[indx_forecasts] = True
+            continue
+        
+        cp_params["target_vector"].value = target_vector
+        cp_params["turned_off_orig"].value = turned_off_orig
+        cp_params["p_max"].value = p_max_here
+        cp_params["init_setpoint"].value = res_gen_p_redisp[t0]
+        cp_params["net_load"].value = net_load
+        cp_params["renew"].value = renew
+        cp_params["inv_scale_curt"].value = 1. / scale_curt_factor
+        beg_solve = time.perf_counter()
         try:
-            res_opt = prob.solve()
+            res_opt = prob.solve(warm_start=data["warm_start"])
         except cp.error.SolverError as exc_:
             t0_errors.append(t0)
             errors.append(RuntimeError(f"cvxpy failed to find a solution for t0 {t0}, error {exc_}"))
             has_error[indx_forecasts] = True
             continue
+        finally:
+            this_solve_time = time.perf_counter() - beg_solve
+            if not is_compiled:
+                # first call: cvxpy compiles the problem
+                solver_time = prob.solver_stats.solve_time if prob.solver_stats is not None else None
+                solver_time = float(solver_time) if solver_time is not None else 0.
+                compile_time += this_solve_time - solver_time
+                solve_time += solver_time
+                is_compiled = True
+            else:
+                solve_time += this_solve_time
         
         if not np.isfinite(res_opt):
             t0_errors.append(t0)
@@ -168,6 +211,118 @@ def fix_forecast_ramps(nb_h,
             res_gen_p[indx_forecasts] = 1.0 * gen_p_after_optim[1:,:]
             amount_curtailed_for[indx_forecasts] = curt_t.value[1:]
             
+    timers = {"compile_time": compile_time, "solve_time": solve_time}
+    return res_gen_p, amount_curtailed_for, has_error, t0_errors, errors, timers
+
+
+def fix_forecast_ramps(nb_h,
+                       load_p,
+                       load_p_forecasted,
+                       res_gen_p_df,
+                       res_gen_p_forecasted_df,
+                       env_for_loss,
+                       hydro_constraints,
+                       params):
+    
+    #### cvxpy
+    total_step = 1 # for now
+    total_gen = np.sum(env_for_loss.gen_redispatchable)
+    load_f = load_p_forecasted.sum(axis=1)
+    scaling_factor = env_for_loss.gen_pmax[env_for_loss.gen_redispatchable]
+    scale_for_loads =  np.repeat(scaling_factor.reshape(1,-1), total_step, axis=0)
+    ids_hyrdo = get_gen_ids_hydro(env_for_loss)
+    
+    p_min = np.repeat(env_for_loss.gen_pmin[env_for_loss.gen_redispatchable].reshape(1,-1)  / scaling_factor,
+                      total_step + nb_h,
+                      axis=0)
+    p_max = np.repeat(env_for_loss.gen_pmax[env_for_loss.gen_redispatchable].reshape(1,-1) * params["PmaxErrorCorrRatio"] / scaling_factor,
+                      total_step + nb_h,
+                      axis=0)
+    
+    ramp_min = np.repeat(-env_for_loss.gen_max_ramp_down[env_for_loss.gen_redispatchable].reshape(1,-1) * params["RampErrorCorrRatio"] / scaling_factor,
+                         total_step + (nb_h-1),
+                         axis=0)
+    ramp_max = np.repeat(env_for_loss.gen_max_ramp_up[env_for_loss.gen_redispatchable].reshape(1,-1) * params["RampErrorCorrRatio"] / scaling_factor,
+                         total_step + (nb_h-1),
+                         axis=0)
+    
+    if "hydro_ramp_reduction_factor" in params:
+        ramp_max[:, ids_hyrdo] /= float(params["hydro_ramp_reduction_factor"])
+        ramp_min[:, ids_hyrdo] /= float(params["hydro_ramp_reduction_factor"])
+    
+    if "forecast_ramps_warm_start" in params:
+        warm_start = bool(params["forecast_ramps_warm_start"])
+    else:
+        warm_start = True
+    
+    if "forecast_ramps_batch_size" in params:
+        batch_size = int(params["forecast_ramps_batch_size"])
+        assert batch_size > 0, f"forecast_ramps_batch_size should be > 0 and is currently {batch_size}"
+    else:
+        batch_size = None  # everything in one batch
+    
+    if "forecast_ramps_nb_process" in params:
+        nb_process = int(params["forecast_ramps_nb_process"])
+    else:
+        nb_process = 1
+    
+    # data that does not depend on t0 (numpy only, so that it can be sent to other processes)
+    data = {"nb_h": nb_h,
+            "total_gen": total_gen,
+            "total_step": total_step,
+            "nb_t": res_gen_p_df.shape[0],
+            "nb_for": res_gen_p_forecasted_df.shape[0],
+            "scale_for_loads": scale_for_loads,
+            "p_min": p_min,
+            "p_max": p_max,
+            "ramp_min": ramp_min,
+            "ramp_max": ramp_max,
+            "warm_start": warm_start,
+            "ids_hyrdo": ids_hyrdo,
+            "hydro_p_max_pu": hydro_constraints["p_max_pu"].values if hydro_constraints is not None else None,
+            "res_gen_p_redisp": res_gen_p_df.iloc[:, env_for_loss.gen_redispatchable].values,
+            "res_gen_p_renew": res_gen_p_df.iloc[:, env_for_loss.gen_renewable].values.sum(axis=1),
+            "res_gen_p_for_redisp": res_gen_p_forecasted_df.iloc[:, env_for_loss.gen_redispatchable].values,
+            "res_gen_p_for_renew": res_gen_p_forecasted_df.iloc[:, env_for_loss.gen_renewable].values.sum(axis=1),
+            "loss_scales": res_gen_p_df.values.sum(axis=1) / load_p.values.sum(axis=1),
+            "load_f": load_f.values,
+            }
+    
+    # the steps are independant from one another: they can be solved by batch
+    # (and possibly in parallel)
+    nb_t0 = res_gen_p_df.shape[0] - 1
+    if batch_size is None:
+        batch_size = max(nb_t0, 1)
+    batches = [np.arange(beg_, min(beg_ + batch_size, nb_t0)) for beg_ in range(0, nb_t0, batch_size)]
+    if nb_process > 1 and len(batches) > 1 and multiprocessing.current_process().daemon:
+        # already in a worker (eg with add_data), cannot start new processes
+        warnings.warn("fix_forecast_ramps: impossible to use multiple processes from a daemonic process. "
+                      "Batches are solved sequentially.")
+        nb_process = 1
+    if nb_process > 1 and len(batches) > 1:
+        with multiprocessing.Pool(min(nb_process, len(batches))) as pool_:
+            results = pool_.starmap(_fix_forecast_ramps_batch, [(t0s, data) for t0s in batches])
+    else:
+        results = [_fix_forecast_ramps_batch(t0s, data) for t0s in batches]
+    
+    # merge the results of all the batches
+    res_gen_p = np.zeros((res_gen_p_forecasted_df.shape[0], total_gen))
+    amount_curtailed_for = np.zeros((res_gen_p_forecasted_df.shape[0], ))
+    has_error = np.zeros(res_gen_p_forecasted_df.shape[0], dtype=bool)
+    t0_errors = []
+    errors = []
+    compile_time = 0.
+    solve_time = 0.
+    for (batch_res_gen_p, batch_curtailed, batch_has_error,
+         batch_t0_errors, batch_errors, batch_timers) in results:
+        res_gen_p += batch_res_gen_p
+        amount_curtailed_for += batch_curtailed
+        has_error |= batch_has_error
+        t0_errors += batch_t0_errors
+        errors += batch_errors
+        compile_time += batch_timers["compile_time"]
+        solve_time += batch_timers["solve_time"]
+        
     # last value is not used anyway
     # res_gen_p[-1, :] = 1.0 * gen_p_after_optim[1,:]
     has_error[-nb_h:] = True
@@ -189,7 +344,8 @@ def fix_forecast_ramps(nb_h,
     res_gen_p_forecasted_df_res[res_gen_p_forecasted_df_res < 0.] = 0.
     
     # make sure the forecasts are always above the demands, even the the opf failed
-    return res_gen_p_forecasted_df_res, t0_errors, errors, amount_curtailed_for
+    timers = {"compile_time": compile_time, "solve_time": solve_time}
+    return res_gen_p_forecasted_df_res, t0_errors, errors, amount_curtailed_for, timers
 
 
 def fix_negative(forecast):
@@ -245,7 +401,9 @@ def generate_new_gen_forecasts(prng,
                                loads_charac,
                                gens_charac,
                                path_env,
-                               res_gen_p_df):
+                               res_gen_p_df,
+                               dtype=np.float64,
+                               env_context=None):
     
     # read the parameters from the inputs
     nb_gen = len(gens_charac['name'])
@@ -256,8 +414,9 @@ def generate_new_gen_forecasts(prng,
     nb_t = datetime_index.shape[0]    
     
     # load the parameters controling the RES
-    with open(os.path.join(path_env, "params_res.json"), "r") as f:
-        res_params = json.load(f)
+    if env_context is None:
+        env_context = get_env_context(path_env)
+    res_params = env_context.read_json("params_res.json")
     
     res_gen_p_forecasted = None
     
@@ -286,7 +445,8 @@ def generate_new_gen_forecasts(prng,
                                                 gen_carac_this_type,
                                                 nb_gen_this_type,
                                                 add_h0=False,
-                                                prng_noise=prng)
+                                                prng_noise=prng,
+                                                dtype=dtype)
         # shape: (nb_elem, nb_t, nb_h)
         
         # generate all the forecasts
@@ -326,7 +486,9 @@ def generate_forecasts_gen(new_forecasts,
                            loads_charac,
                            gens_charac,
                            path_env,
-                           opf_params):
+                           opf_params,
+                           dtype=np.float64,
+                           env_context=None):
     if new_forecasts:
         res_gen_p_forecasted_df, nb_h = generate_new_gen_forecasts(prng,
                                                                    forecasts_params,
@@ -334,7 +496,9 @@ def generate_forecasts_gen(new_forecasts,
                                                                    loads_charac,
                                                                    gens_charac,
                                                                    path_env,
-                                                                   res_gen_p_df)
+                                                                   res_gen_p_df,
+                                                                   dtype=dtype,
+                                                                   env_context=env_context)
     else:
         res_gen_p_forecasted_df = res_gen_p_df * prng.lognormal(mean=0.0,
                                                                 sigma=sigma,
@@ -342,6 +506,8 @@ def generate_forecasts_gen(new_forecasts,
         res_gen_p_forecasted_df = res_gen_p_forecasted_df.shift(-1)
         res_gen_p_forecasted_df.iloc[-1] = 1.0 * res_gen_p_forecasted_df.iloc[-2]
         nb_h = 1
+    # the forecasts are fixed (below, then by an optimizer) in float64
+    res_gen_p_forecasted_df = res_gen_p_forecasted_df.astype(np.float64, copy=False)
     
     # "fix" cases where forecasts are bellow the loads => in that case scale the
     # controlable generation to be at least 1% above total demand
@@ -356,15 +522,16 @@ def generate_forecasts_gen(new_forecasts,
     
     # and fix the ramps (an optimizer, step by step)
     tmp_ = fix_forecast_ramps(nb_h,
-                              load_p,
-                              load_p_forecasted,
-                              res_gen_p_df,
+                              load_p.astype(np.float64, copy=False),
+                              load_p_forecasted.astype(np.float64, copy=False),
+                              res_gen_p_df.astype(np.float64, copy=False),
                               res_gen_p_forecasted_df,
                               env_for_loss,
                               hydro_constraints,
                               opf_params)
-    res_gen_p_forecasted_df_res, t0_errors, errors, amount_curtailed_for = tmp_
-    return res_gen_p_forecasted_df_res, amount_curtailed_for, t0_errors, errors
+    res_gen_p_forecasted_df_res, t0_errors, errors, amount_curtailed_for, timers = tmp_
+    res_gen_p_forecasted_df_res = res_gen_p_forecasted_df_res.astype(dtype, copy=False)
+    return res_gen_p_forecasted_df_res, amount_curtailed_for, t0_errors, errors, timers
 
 
 def apply_maintenance_wind_farm(extra_winds_params, prod_wind_init,
@@ -10,6 +10,7 @@ import numpy as np
 import json
 
 import grid2op
+from chronix2grid.grid2op_utils.retry import RetryPolicy, run_with_retry
 from chronix2grid.grid2op_utils.utils import generate_a_scenario
 from numpy.random import default_rng
 
@@ -21,7 +22,11 @@ def generate_one_episode(env: grid2op.Environment.Environment,
                          nb_steps=None,
                          seed=None,
                          with_loss=True,
-                         files_to_copy=("maintenance_meta.json", "params_load.json", "params_forecasts.json")):
+                         files_to_copy=("maintenance_meta.json", "params_load.json", "params_forecasts.json"),
+                         dtype="float64",
+                         max_attempts=5,
+                         retry_backoff=0.,
+                         return_metadata=False):
     """This function adds some data to already existing scenarios.
     
     .. warning::
@@ -41,6 +46,23 @@ def generate_one_episode(env: grid2op.Environment.Environment,
     with_loss: ``bool``
         Do you make sure that the generated data will not be modified too much when running with grid2op (default = True).
         Setting it to False will speed up (by quite a lot) the generation process, but will degrade the data quality.
+    dtype: ``str``
+        Type of the generated time series, "float64" (default) or "float32" (see
+        :func:`chronix2grid.grid2op_utils.utils.generate_a_scenario`)
+    max_attempts: ``int``
+        Maximum number of attempts to generate the episode (default 5). Each new attempt uses new seeds, derived
+        from the ones of the first attempt (see :mod:`chronix2grid.grid2op_utils.retry`), so the episode stays
+        reproducible. A RuntimeError is raised if all the attempts failed.
+    retry_backoff: ``float``
+        Time to wait (in s) before the second attempt, doubled after each attempt (default 0.)
+    return_metadata: ``bool``
+        Whether to also return the metadata of the generation (default False): a ``dict`` with the attempts
+        ("attempts", with the seeds and the error of each of them) and the quality of the losses ("quality")
+
+    Returns
+    -------
+    load_p, load_p_forecasted, load_q, load_q_forecasted, prod_p, prod_p_forecasted: :class:`pandas.DataFrame`
+        and the metadata if `return_metadata` is True
         
     """
     # generate the seeds
@@ -54,11 +76,20 @@ def generate_one_episode(env: grid2op.Environment.Environment,
     name_gen = env.name_gen
     gen_type = env.gen_type
     scen_id = "0"
-    error_ = "first"
     output_dir = None
-    while error_ is not None:
-        res_gen = generate_a_scenario(path_env, name_gen, gen_type, output_dir, start_date, dt, scen_id, load_seed, renew_seed, 
-                                      gen_p_forecast_seed, with_loss, nb_steps=nb_steps,
-                                      files_to_copy=files_to_copy)
-        error_, quality_, load_p, load_p_forecasted, load_q, load_q_forecasted, res_gen_p_df, res_gen_p_forecasted_df = res_gen
+
+    def _generate(load_seed, renew_seed, gen_p_forecast_seed):
+        return generate_a_scenario(path_env, name_gen, gen_type, output_dir, start_date, dt, scen_id, load_seed, renew_seed, 
+                                   gen_p_forecast_seed, with_loss, nb_steps=nb_steps,
+                                   files_to_copy=files_to_copy, dtype=dtype)
+    res_gen, attempts = run_with_retry(_generate,
+                                       (load_seed, renew_seed, gen_p_forecast_seed),
+                                       RetryPolicy(max_attempts=max_attempts, backoff=retry_backoff))
+    error_, quality_, load_p, load_p_forecasted, load_q, load_q_forecasted, res_gen_p_df, res_gen_p_forecasted_df = res_gen
+    if error_ is not None:
+        raise RuntimeError(f"Impossible to generate the episode starting at {start_date} in {len(attempts)} attempts: "
+                           f"{[el['error'] for el in attempts]}")
+    if return_metadata:
+        return (load_p, load_p_forecasted, load_q, load_q_forecasted, res_gen_p_df, res_gen_p_forecasted_df,
+                {"attempts": attempts, "quality": quality_})
     return load_p, load_p_forecasted, load_q, load_q_forecasted, res_gen_p_df, res_gen_p_forecasted_df
@@ -6,15 +6,13 @@
 # SPDX-License-Identifier: MPL-2.0
 # This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
 
-import os
-import json
 import pandas as pd
 import numpy as np
 
-from chronix2grid.getting_started.example.input.generation.patterns import ref_pattern_path
+from chronix2grid.grid2op_utils.env_context import get_env_context
 from chronix2grid.generation.consumption import ConsumptionGeneratorBackend
 from chronix2grid.generation.consumption.consumption_utils import (get_seasonal_pattern,
-                                                                    compute_load_pattern)
+                                                                    compute_load_patterns)
 
 from chronix2grid.generation.consumption.generate_load import get_add_dim as get_add_dim_load
 
@@ -40,15 +38,10 @@ def get_data_frames(load_p, load_p_for, loads_charac, datetime_index, nb_h):
     
 def get_load_ref(loads_charac, load_params, load_weekly_pattern, isoweekday_lwp=None, hour_minutes_lwp=None):
     weekly_pattern = load_weekly_pattern['test'].values
-    pmax_weekly_pattern = []
-    for index, name in enumerate(loads_charac['name']):
-        mask = (loads_charac['name'] == name)
-        Pmax = loads_charac[mask]['Pmax'].values[0]
-        tmp_ = Pmax * compute_load_pattern(load_params, weekly_pattern, index,
-                                           isoweekday_lwp=isoweekday_lwp,
-                                           hour_minutes_lwp=hour_minutes_lwp)
-        pmax_weekly_pattern.append(tmp_.reshape(1, -1))
-    load_ref = np.concatenate(pmax_weekly_pattern)
+    Pmax = loads_charac['Pmax'].values.reshape(-1, 1)
+    load_ref = Pmax * compute_load_patterns(load_params, weekly_pattern, np.arange(loads_charac.shape[0]),
+                                            isoweekday_lwp=isoweekday_lwp,
+                                            hour_minutes_lwp=hour_minutes_lwp)
     return load_ref
 
 
@@ -60,7 +53,8 @@ def generate_new_loads(load_seed,
                        load_weekly_pattern,
                        data_type='temperature',
                        day_lag=6,
-                       return_ref_curve=True):    
+                       return_ref_curve=True,
+                       dtype=np.float64):    
     # read the parameters from the inputs
     nb_load = len(loads_charac['name'])
     nb_h = len(forecasts_params["h"])
@@ -75,12 +69,12 @@ def generate_new_loads(load_seed,
     isoweekday = np.array([el.isoweekday() for el in datetime_lwp])
     hour_minutes = np.array([el.hour * 60 + el.minute for el in datetime_lwp])
     load_ref = get_load_ref(loads_charac, load_params, load_weekly_pattern,
-                            isoweekday_lwp=isoweekday, hour_minutes_lwp=hour_minutes)
+                            isoweekday_lwp=isoweekday, hour_minutes_lwp=hour_minutes).astype(dtype, copy=False)
     # (nb_load, nb_t)
     
     # Compute seasonal pattern
     seasonal_pattern_unit = get_seasonal_pattern(load_params)
-    seasonal_pattern_load = np.tile(seasonal_pattern_unit, (nb_load, 1))
+    seasonal_pattern_load = np.tile(seasonal_pattern_unit, (nb_load, 1)).astype(dtype, copy=False)
     # (nb_load, nb_t)
     if return_ref_curve:
         load_hat = load_ref * seasonal_pattern_load
@@ -98,7 +92,8 @@ def generate_new_loads(load_seed,
                                              load_params,
                                              loads_charac,
                                              nb_load,
-                                             add_h0=True)
+                                             add_h0=True,
+                                             dtype=dtype)
         
     # generate the "real" loads
     load_p = load_ref * (std_temperature_noise * loads_noise[:,:,0] + seasonal_pattern_load)
@@ -128,7 +123,9 @@ def generate_loads(path_env,
                    number_of_minutes,
                    generic_params,
                    load_q_from_p_coeff_default=0.7,
-                   day_lag=6):
+                   day_lag=6,
+                   dtype=np.float64,
+                   env_context=None):
     """
     This function generates the load for each consumption on a grid
 
@@ -148,14 +145,19 @@ def generate_loads(path_env,
         _description_
     generic_params : _type_
         _description_
+    dtype : numpy dtype
+        Type of the noise and of the generated loads (np.float32 halves the memory), by default np.float64
+    env_context : :class:`chronix2grid.grid2op_utils.env_context.EnvContext`
+        The input files of the environment, read once per process (the one of `path_env` by default)
 
     Returns
     -------
     _type_
         _description_
     """
-    with open(os.path.join(path_env, "params_load.json"), "r") as f:
-        load_params = json.load(f)
+    if env_context is None:
+        env_context = get_env_context(path_env)
+    load_params = env_context.read_json("params_load.json")
     load_params["start_date"] = start_date_dt
     load_params["end_date"] = end_date_dt
     load_params["dt"] = int(dt)
@@ -167,17 +169,14 @@ def generate_loads(path_env,
     else:
         load_q_from_p_coeff = load_q_from_p_coeff_default
         
-    forecasts_params = {}
-    new_forecasts = False
-    path_for_ = os.path.join(path_env, "params_forecasts.json")
-    if os.path.exists(path_for_):
-        with open(path_for_, "r") as f:
-            forecasts_params = json.load(f)
-        new_forecasts = True
+    forecasts_params = env_context.read_json("params_forecasts.json", optional=True)
+    new_forecasts = forecasts_params is not None
+    if not new_forecasts:
+        forecasts_params = {}
     
-    loads_charac = pd.read_csv(os.path.join(path_env, "loads_charac.csv"), sep=",")
-    gen_charac = pd.read_csv(os.path.join(path_env, "prods_charac.csv"), sep=",")
-    load_weekly_pattern = pd.read_csv(os.path.join(ref_pattern_path, "load_weekly_pattern.csv"), sep=",")
+    loads_charac = env_context.read_csv("loads_charac.csv")
+    gen_charac = env_context.read_csv("prods_charac.csv")
+    load_weekly_pattern = env_context.load_weekly_pattern()
     
     if new_forecasts:
         load_p, load_p_forecasted, load_ref_curve = generate_new_loads(load_seed,
@@ -187,7 +186,8 @@ def generate_loads(path_env,
                                                                        gen_charac,
                                                                        load_weekly_pattern,
                                                                        day_lag=day_lag,
-                                                                       return_ref_curve=True)
+                                                                       return_ref_curve=True,
+                                                                       dtype=dtype)
     else:
         load_generator = ConsumptionGeneratorBackend(out_path=None,
                                                      seed=load_seed, 
@@ -200,6 +200,8 @@ def generate_loads(path_env,
         load_p, load_p_forecasted, load_ref_curve = load_generator.run(load_weekly_pattern=load_weekly_pattern,
                                                                        return_ref_curve=True,
                                                                        use_legacy=False)
+        load_p = load_p.astype(dtype, copy=False)
+        load_p_forecasted = load_p_forecasted.astype(dtype, copy=False)
     
     load_q = load_p * load_q_from_p_coeff
     load_q_forecasted = load_p_forecasted * load_q_from_p_coeff
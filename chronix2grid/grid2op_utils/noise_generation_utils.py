@@ -57,9 +57,10 @@ def compute_noise(load_mesh_tmp,
                   range_x, range_y,
                   delta_x, delta_y,
                   rho_mesh_x, rho_mesh_y,
-                  nb_t, nb_h, nb_load):
+                  nb_t, nb_h, nb_load,
+                  dtype=np.float64):
     
-    loads_noise = np.zeros((nb_load, nb_t, nb_h))
+    loads_noise = np.zeros((nb_load, nb_t, nb_h), dtype=dtype)
     for row_id, (load_id, (load_x, load_y)) in enumerate(loads_charac[["x", 'y']].iterrows()):
         # compute where the "point" is on the mesh
         load_mesh = 1.0 * load_mesh_tmp
@@ -105,6 +106,57 @@ def get_knn_fitted(forecasts_params, coords_mesh, noise_mesh):
     return model
 
 
+class GridNoiseInterpolator:
+    """Interpolates the noise directly on the regular (x, y, t, h) mesh.
+
+    It exposes the same `predict` method as the kNN model so that it can be used
+    as a drop-in replacement in :func:`compute_noise`.
+    """
+    def __init__(self, axes, noise_mesh, method="linear"):
+        from scipy.interpolate import RegularGridInterpolator
+        self.interpolator = RegularGridInterpolator(axes,
+                                                    noise_mesh,
+                                                    method=method,
+                                                    bounds_error=False,
+                                                    fill_value=None)
+        
+    def predict(self, coords):
+        return self.interpolator(coords)
+
+
+def get_grid_fitted(forecasts_params, noise_mesh,
+                    rho_mesh_x, rho_mesh_y, rho_mesh_t, rho_mesh_h):
+    if "grid_interpolation_method" in forecasts_params:
+        method = str(forecasts_params["grid_interpolation_method"])
+    else:
+        method = "linear"
+    
+    # same coordinates as the one computed in `generate_coords_mesh`
+    axes = [np.arange(nb_) / ((nb_ - 1) * rho_)
+            for nb_, rho_ in zip(noise_mesh.shape,
+                                 (rho_mesh_x, rho_mesh_y, rho_mesh_t, rho_mesh_h))]
+    model = GridNoiseInterpolator(axes, noise_mesh, method=method)
+    return model
+
+
+def get_noise_model(forecasts_params, coords_mesh, noise_mesh,
+                    rho_mesh_x, rho_mesh_y, rho_mesh_t, rho_mesh_h):
+    if "noise_interpolator" in forecasts_params:
+        noise_interpolator = str(forecasts_params["noise_interpolator"])
+    else:
+        noise_interpolator = "knn"  # default, for reproducibility
+    
+    if noise_interpolator == "knn":
+        model = get_knn_fitted(forecasts_params, coords_mesh, noise_mesh)
+    elif noise_interpolator == "grid":
+        model = get_grid_fitted(forecasts_params, noise_mesh,
+                                rho_mesh_x, rho_mesh_y, rho_mesh_t, rho_mesh_h)
+    else:
+        raise RuntimeError(f"Unknown \"noise_interpolator\" {noise_interpolator}, "
+                           "it should be one of \"knn\" or \"grid\"")
+    return model
+
+
 def get_forecast_parameters(forecasts_params, load_params, data_type="load"):    
     hs_mins = [int(el) for el in forecasts_params["h"]]
     # convert the h in "number of steps" (and not in minutes)
@@ -188,7 +240,8 @@ def generate_noise(loads_charac,
                    elem_charac,
                    nb_elem,
                    add_h0=True,
-                   prng_noise=None):
+                   prng_noise=None,
+                   dtype=np.float64):
     # compute the "real" size of the mesh 
     delta_x, delta_y, range_x, range_y = resize_mesh_factor(loads_charac, gen_charac)
     
@@ -212,8 +265,9 @@ def generate_noise(loads_charac,
                                     noise_mesh.size) 
     coords_mesh, rho_mesh_x, rho_mesh_y, rho_mesh_t, rho_mesh_h = res_mesh
     
-    # "fit" the kNN    
-    model = get_knn_fitted(forecasts_params, coords_mesh, noise_mesh)
+    # "fit" the kNN (or the interpolator on the regular mesh)
+    model = get_noise_model(forecasts_params, coords_mesh, noise_mesh,
+                            rho_mesh_x, rho_mesh_y, rho_mesh_t, rho_mesh_h)
     
     # get the "temporary" for the load coordinates (whether or not to generate the
     # also the "env" value with this function)
@@ -233,6 +287,7 @@ def generate_noise(loads_charac,
                                range_x, range_y,
                                delta_x, delta_y,
                                rho_mesh_x, rho_mesh_y,
-                               nb_t, len(hs_), nb_elem)
+                               nb_t, len(hs_), nb_elem,
+                               dtype=dtype)
     
     return this_noise, hs, std_hs
\ No newline at end of file
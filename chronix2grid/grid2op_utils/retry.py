@@ -0,0 +1,104 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Bounded retry of the generation of a scenario.
+
+The first attempt uses the seeds of the scenario. As a failure (for example an infeasible dispatch) is most of the
+time deterministic, each new attempt uses new seeds, derived from the ones of the scenario with a
+:class:`numpy.random.SeedSequence` (the same seeds always give the same seeds for the same attempt, so the
+scenarios stay reproducible).
+"""
+
+import time
+
+import numpy as np
+
+
+class RetryPolicy:
+    """
+    How many times the generation of a scenario is attempted and how long to wait between the attempts
+
+    Attributes
+    ----------
+    max_attempts: ``int``
+        maximum number of attempts (1 for no retry)
+    backoff: ``float``
+        time to wait (in s) before the second attempt
+    backoff_factor: ``float``
+        the time to wait is multiplied by this factor after each attempt
+    """
+    def __init__(self, max_attempts=5, backoff=0., backoff_factor=2.):
+        if int(max_attempts) < 1:
+            raise RuntimeError(f"There should be at least one attempt (max_attempts={max_attempts})")
+        self.max_attempts = int(max_attempts)
+        self.backoff = float(backoff)
+        self.backoff_factor = float(backoff_factor)
+
+    def delay(self, attempt):
+        """time to wait (in s) before the attempt `attempt` (0 for the first one)"""
+        if attempt == 0:
+            return 0.
+        return self.backoff * self.backoff_factor ** (attempt - 1)
+
+
+def retry_seeds(seeds, attempt):
+    """
+    Seeds used for the attempt `attempt` (0 for the first one, that uses `seeds` as they are)
+
+    Parameters
+    ----------
+    seeds: ``tuple``
+        the seeds of the scenario (for example the seeds of the loads, of the renewables and of the forecasts)
+    attempt: ``int``
+
+    Returns
+    -------
+    ``tuple``
+        as many seeds as in `seeds`
+    """
+    if attempt == 0:
+        return tuple(int(el) for el in seeds)
+    seed_seq = np.random.SeedSequence([int(el) for el in seeds], spawn_key=(int(attempt),))
+    return tuple(int(el) for el in seed_seq.generate_state(len(seeds), dtype=np.uint32))
+
+
+def run_with_retry(generate, seeds, policy=None):
+    """
+    Calls ``generate(*seeds)`` until it succeeds (the first element of what it returns, the error, is None) or
+    until `policy.max_attempts` attempts failed
+
+    Parameters
+    ----------
+    generate:
+        function generating the scenario, for example calling
+        :func:`chronix2grid.grid2op_utils.utils.generate_a_scenario`
+    seeds: ``tuple``
+        the seeds of the scenario
+    policy: :class:`RetryPolicy`
+        a single attempt if None
+
+    Returns
+    -------
+    res:
+        what the last call to `generate` returned
+    attempts: ``list``
+        one ``dict`` per attempt, with the seeds ("seeds") and the error ("error", None if it succeeded)
+    """
+    if policy is None:
+        policy = RetryPolicy(max_attempts=1)
+    attempts = []
+    for attempt in range(policy.max_attempts):
+        time.sleep(policy.delay(attempt))
+        this_seeds = retry_seeds(seeds, attempt)
+        res = generate(*this_seeds)
+        error_ = res[0]
+        attempts.append({"seeds": list(this_seeds), "error": f"{error_}" if error_ is not None else None})
+        if error_ is None:
+            break
+    return res, attempts
@@ -0,0 +1,252 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Process pool used by :func:`chronix2grid.grid2op_utils.add_data` to run its tasks in parallel.
+
+Compared to :class:`multiprocessing.Pool`:
+
+* each worker is given a new task as soon as it is free (no chunking), the tasks expected to be the longest
+  being given first (see :class:`TaskDurations`)
+* a task that runs for more than `timeout` seconds (for example a solver that hangs) is stopped: its worker
+  is killed and replaced, and the task is reported as failed
+* a worker that dies (for example a crash of a solver) is replaced, its task is reported as failed (a worker that
+  dies while it is idle is replaced too, and no task is lost)
+* a worker is replaced after `max_tasks_per_child` tasks (the memory it might have leaked is given back)
+* the progress (and an estimation of the remaining time) is printed after each task
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+
+class TaskTimeoutError(RuntimeError):
+    pass
+
+
+class WorkerDiedError(RuntimeError):
+    pass
+
+
+def _worker_loop(func, conn):
+    """runs the tasks received on `conn` until it receives None"""
+    while True:
+        try:
+            item = conn.recv()
+        except EOFError:
+            break
+        if item is None:
+            break
+        task_id, args = item
+        try:
+            res = (True, func(args))
+        except Exception as exc_:
+            res = (False, f"{type(exc_).__name__}: {exc_}")
+        conn.send((task_id, res))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, func, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_loop, args=(func, child_conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.nb_tasks = 0
+        self.task_id = None
+        self.start = None
+
+    def submit(self, task_id, args):
+        self.conn.send((task_id, args))
+        self.task_id = task_id
+        self.start = time.perf_counter()
+        self.nb_tasks += 1
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5.)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class TaskDurations:
+    """
+    Durations of the tasks of the previous runs (per key, for example the start date of the scenario), stored in
+    a json file, used to give the longest tasks first
+
+    Attributes
+    ----------
+    path: ``str``
+        path of the json file (None to keep the durations in memory only)
+    durations: ``dict``
+        for each key, the mean duration (in s) and the number of tasks it is computed from
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.durations = {}
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.durations = json.load(f)
+            except ValueError:
+                self.durations = {}
+
+    def expected(self, key):
+        """expected duration of a task (None if there was no task with this key)"""
+        if key not in self.durations:
+            return None
+        return self.durations[key][0]
+
+    def add(self, key, duration):
+        mean_, nb_ = self.durations.get(key, (0., 0))
+        self.durations[key] = [(mean_ * nb_ + float(duration)) / (nb_ + 1), nb_ + 1]
+        if self.path is not None:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.durations, fp=f, indent=4, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def longest_first(self, keys):
+        """
+        Positions of `keys` sorted from the longest expected task to the shortest one (the ones that were never
+        run being considered the longest, in their original order)
+        """
+        expected = [self.expected(key) for key in keys]
+        return sorted(range(len(keys)), key=lambda i: (expected[i] is not None, -(expected[i] or 0.)))
+
+
+def _format_time(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def run_tasks(func, argss, callback, nb_core, timeout=None, max_tasks_per_child=None, order=None,
+              task_names=None, verbose=True):
+    """
+    Runs `func` on each element of `argss` in `nb_core` processes (see :mod:`chronix2grid.grid2op_utils.scheduler`)
+
+    Parameters
+    ----------
+    func:
+        function run by the workers (it should be picklable, ie defined at the top level of a module)
+    argss: ``list``
+        arguments of the tasks, `func` is called with each of them
+    callback:
+        called (in the main process) as soon as a task is finished, with ``callback(i, ok, res, duration)``:
+        the position of the task in `argss`, whether it succeeded, what `func` returned (or, if the task
+        failed, the error message) and its duration (in s)
+    nb_core: ``int``
+        number of workers
+    timeout: ``float``
+        maximum duration of a task (in s), None (default) for no limit
+    max_tasks_per_child: ``int``
+        number of tasks after which a worker is replaced, None (default) for no limit
+    order: ``list``
+        order in which the tasks are given to the workers (positions in `argss`), in the order of `argss` by default
+    task_names: ``list``
+        names of the tasks, for the progress
+    verbose: ``bool``
+        whether the progress is printed
+    """
+    if order is None:
+        order = list(range(len(argss)))
+    if task_names is None:
+        task_names = [f"{i}" for i in range(len(argss))]
+    ctx = multiprocessing.get_context()
+    queue = list(reversed(order))
+    nb_tasks = len(queue)
+    # (None for a worker that was stopped and that is started again only if there are tasks left)
+    workers = [None for _ in range(min(nb_core, nb_tasks))]
+    beg_ = time.perf_counter()
+    nb_done = 0
+
+    def _finish(worker, ok, res):
+        nonlocal nb_done
+        duration = time.perf_counter() - worker.start
+        task_id = worker.task_id
+        worker.task_id = None
+        nb_done += 1
+        callback(task_id, ok, res, duration)
+        if verbose:
+            elapsed = time.perf_counter() - beg_
+            eta = elapsed / nb_done * (nb_tasks - nb_done)
+            print(f"[{nb_done}/{nb_tasks}] {task_names[task_id]} {'done' if ok else 'failed'} in "
+                  f"{duration:.1f}s - elapsed {_format_time(elapsed)} - remaining (estimated) {_format_time(eta)}")
+
+    try:
+        while True:
+            # give a task to the idle workers (and replace the ones that did enough tasks)
+            for i, worker in enumerate(workers):
+                if not queue:
+                    break
+                if worker is not None and worker.task_id is not None:
+                    continue
+                if worker is not None and not worker.process.is_alive():
+                    # (died while it was idle, for example killed because of the memory)
+                    worker.kill()
+                    worker = workers[i] = None
+                if worker is not None and max_tasks_per_child is not None and worker.nb_tasks >= max_tasks_per_child:
+                    worker.stop()
+                    worker = None
+                if worker is None:
+                    worker = workers[i] = _Worker(func, ctx)
+                task_id = queue.pop()
+                try:
+                    worker.submit(task_id, argss[task_id])
+                except (OSError, ValueError):
+                    # the worker died since it was checked: it is replaced and the task given again
+                    worker.kill()
+                    workers[i] = None
+                    queue.append(task_id)
+            busy = [worker for worker in workers if worker is not None and worker.task_id is not None]
+            if not busy:
+                if queue:
+                    continue
+                break
+
+            wait_for = None
+            if timeout is not None:
+                now_ = time.perf_counter()
+                wait_for = max(min(worker.start + timeout - now_ for worker in busy), 0.)
+            ready = wait([worker.conn for worker in busy], timeout=wait_for)
+            for i, worker in enumerate(workers):
+                if worker is None or worker.task_id is None:
+                    continue
+                if worker.conn in ready:
+                    try:
+                        _, (ok, res) = worker.conn.recv()
+                    except (EOFError, OSError):
+                        worker.kill()
+                        workers[i] = None
+                        _finish(worker, False, f"{WorkerDiedError.__name__}: the worker running the task died "
+                                               f"(exit code {worker.process.exitcode})")
+                        continue
+                    _finish(worker, ok, res)
+                elif timeout is not None and time.perf_counter() - worker.start >= timeout:
+                    worker.kill()
+                    workers[i] = None
+                    _finish(worker, False, f"{TaskTimeoutError.__name__}: the task took more than {timeout}s")
+    finally:
+        for worker in workers:
+            if worker is None:
+                continue
+            if worker.task_id is None:
+                worker.stop()
+            else:
+                worker.kill()
@@ -0,0 +1,139 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Manifest of the tasks (one per scenario and month) of a run of :func:`chronix2grid.grid2op_utils.add_data`,
+so that a run that was interrupted can be resumed.
+
+The manifest is a JSON-lines file (:data:`MANIFEST_FILE_NAME`), only appended to:
+
+* one line ``{"event": "task", ...}`` per task, with its scenario id, start date and seeds, written before
+  the generation starts
+* one line ``{"event": "status", ...}`` each time a task finishes, with its status ("done" or "failed"),
+  its duration (in s), its error (if any) and, if it was attempted more than once, its attempts (see
+  :mod:`chronix2grid.grid2op_utils.retry`)
+
+The status of a task is the one of its last line (a task without any is "pending"). A line that was being
+written when the run was interrupted is ignored.
+"""
+
+import json
+import os
+import time
+
+MANIFEST_FILE_NAME = "add_data_manifest.jsonl"
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+class TaskManifest:
+    """
+    Tasks of a run of :func:`chronix2grid.grid2op_utils.add_data` and their status
+    (see :mod:`chronix2grid.grid2op_utils.task_manifest`)
+
+    Attributes
+    ----------
+    path: ``str``
+        path of the manifest file
+    tasks: ``dict``
+        keys are the scenario ids (for example "2050-01-03_0"), values are the tasks: start date ("start_date"),
+        scenario number ("scen_id"), seeds ("load_seed", "renew_seed", "gen_p_forecast_seed"), "status",
+        number of runs ("attempts"), last "duration", last "error" and attempts of the last run with new seeds
+        ("retries")
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.tasks = {}
+        if os.path.exists(self.path):
+            self._read()
+
+    def _read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # last line of a run that was interrupted
+                    continue
+                self._apply(entry)
+
+    def _apply(self, entry):
+        event = entry.pop("event")
+        if event == "task":
+            entry.update({"status": PENDING, "attempts": 0, "duration": None, "error": None, "retries": None})
+            self.tasks[entry["scenario_id"]] = entry
+        elif event == "status" and entry["scenario_id"] in self.tasks:
+            task = self.tasks[entry["scenario_id"]]
+            task["status"] = entry["status"]
+            task["duration"] = entry.get("duration")
+            task["error"] = entry.get("error")
+            task["retries"] = entry.get("retries")
+            task["attempts"] += 1
+
+    def _append(self, entries):
+        with open(self.path, "ab") as f:
+            if f.tell() > 0:
+                with open(self.path, "rb") as f_read:
+                    f_read.seek(-1, os.SEEK_END)
+                    if f_read.read(1) != b"\n":
+                        # (line of a run that was interrupted)
+                        f.write(b"\n")
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8"))
+        for entry in entries:
+            self._apply(dict(entry))
+
+    @classmethod
+    def create(cls, path, tasks):
+        """
+        Starts a new manifest (an existing one is overwritten)
+
+        Parameters
+        ----------
+        path: ``str``
+        tasks: ``list``
+            ``dict`` with the keys "start_date", "scen_id", "load_seed", "renew_seed" and "gen_p_forecast_seed"
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        res = cls(path)
+        res._append([{"event": "task",
+                      "scenario_id": f"{task['start_date']}_{task['scen_id']}",
+                      "start_date": task["start_date"],
+                      "scen_id": f"{task['scen_id']}",
+                      "load_seed": int(task["load_seed"]),
+                      "renew_seed": int(task["renew_seed"]),
+                      "gen_p_forecast_seed": int(task["gen_p_forecast_seed"]),
+                      "created": time.time()}
+                     for task in tasks])
+        return res
+
+    def set_status(self, scenario_id, status, duration=None, error=None, retries=None):
+        """records that the task `scenario_id` finished with the status `status` ("done" or "failed"), see
+        :func:`chronix2grid.grid2op_utils.retry.run_with_retry` for `retries`"""
+        if scenario_id not in self.tasks:
+            raise RuntimeError(f"The task \"{scenario_id}\" is not in the manifest \"{self.path}\"")
+        self._append([{"event": "status",
+                       "scenario_id": scenario_id,
+                       "status": status,
+                       "duration": float(duration) if duration is not None else None,
+                       "error": f"{error}" if error is not None else None,
+                       "retries": retries,
+                       "time": time.time()}])
+
+    def ids(self, status=None):
+        """ids of the tasks (with the status `status`, if not None), in the order they were created"""
+        return [scenario_id for scenario_id, task in self.tasks.items()
+                if status is None or task["status"] == status]
+
+    def summary(self):
+        """number of tasks per status (``dict``)"""
+        res = {}
+        for task in self.tasks.values():
+            res[task["status"]] = res.get(task["status"], 0) + 1
+        return res
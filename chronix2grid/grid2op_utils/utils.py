@@ -27,9 +27,13 @@ from lightsim2grid import LightSimBackend
 
 
 from chronix2grid.generation.renewable import RenewableBackend
-from chronix2grid.generation.dispatch.PypsaDispatchBackend import PypsaDispatcher
-from chronix2grid.getting_started.example.input.generation.patterns import ref_pattern_path
 from chronix2grid.generation.dispatch.EconomicDispatch import ChroniXScenario
+from chronix2grid.generation.dispatch.dispatch_loss_utils import BatchLossEvaluator, estimate_losses_dc
+from chronix2grid.output_format import write_data, DEFAULT_OUTPUT_FORMAT
+from chronix2grid.async_writer import get_async_writer
+from chronix2grid.telemetry import (Telemetry, opf_solver_stats, timed_stage, failed_telemetry_file_name,
+                                    TELEMETRY_FILE_NAME)
+from chronix2grid.grid2op_utils.env_context import get_env_context
 from chronix2grid.grid2op_utils.loads_utils import generate_loads
 from chronix2grid.grid2op_utils.gen_utils import (generate_forecasts_gen,
                                                   fix_nan_hydro_i_dont_know_why,
@@ -39,12 +43,22 @@ from chronix2grid.grid2op_utils.gen_utils import (generate_forecasts_gen,
 import warnings
 
 FLOATING_POINT_PRECISION_FORMAT = '%.1f'
+# types in which the time series can be generated (see generate_a_scenario)
+DTYPES = ("float32", "float64")
 
 # TODO allow for a "debug" mode where we can save the values for the prices, the renewables generated, the renewables after dispatch 
 # and the renewables after the losses
 # TODO add a parameter to generate data more correlated for data in the same area but less correlated within different area.
 
 
+def check_dtype(dtype):
+    """checks that the time series can be generated in `dtype` (one of :data:`DTYPES`) and returns it as a numpy dtype"""
+    dtype = np.dtype(dtype)
+    if dtype.name not in DTYPES:
+        raise RuntimeError(f"Unknown dtype \"{dtype.name}\", it should be one of {list(DTYPES)}")
+    return dtype
+
+
 def get_last_scenario_id(env_chronics_dir):
     """This function return the last scenario id identified.
     
@@ -58,12 +72,16 @@ def get_last_scenario_id(env_chronics_dir):
     env_chronics_dir : _type_
         _description_
     """
-    max_ = None
     list_files = os.listdir(env_chronics_dir)
-    for el in list_files:
-        this_file_path = os.path.join(env_chronics_dir, el)
-        if not os.path.isdir(this_file_path):
-            continue
+    return get_last_scenario_id_from_names([el for el in list_files
+                                            if os.path.isdir(os.path.join(env_chronics_dir, el))])
+
+
+def get_last_scenario_id_from_names(scenario_names):
+    """Same as :func:`get_last_scenario_id` for the scenarios named `scenario_names` (for example the
+    scenarios of a :class:`chronix2grid.scenario_store.ScenarioStore`)"""
+    max_ = None
+    for el in scenario_names:
         try:
             *date_, scen_id = el.split("_")
         except ValueError:
@@ -85,7 +103,7 @@ def get_last_scenario_id(env_chronics_dir):
 
 def generate_renewable_energy_sources(path_env, renew_seed, start_date_dt, end_date_dt,
                                       dt, number_of_minutes, generic_params, gens_charac,
-                                      tol_zero=1e-3):
+                                      tol_zero=1e-3, env_context=None):
     """This function generates the amount of power produced by renewable energy sources (res). 
     
     It serves as a maximum value for the economic dispatch. 
@@ -108,20 +126,23 @@ def generate_renewable_energy_sources(path_env, renew_seed, start_date_dt, end_d
         _description_
     gens_charac : _type_
         _description_
+    env_context : :class:`chronix2grid.grid2op_utils.env_context.EnvContext`
+        The input files of the environment, read once per process (the one of `path_env` by default)
 
     Returns
     -------
     _type_
         _description_
     """
-    with open(os.path.join(path_env, "params_res.json"), "r") as f:
-        renew_params = json.load(f)
+    if env_context is None:
+        env_context = get_env_context(path_env)
+    renew_params = env_context.read_json("params_res.json")
     renew_params["start_date"] = start_date_dt
     renew_params["end_date"] = end_date_dt
     renew_params["dt"] = int(dt)
     renew_params["T"] = number_of_minutes
     renew_params["planned_std"] = float(generic_params["planned_std"])
-    solar_pattern = np.load(os.path.join(ref_pattern_path, "solar_pattern.npy"))
+    solar_pattern = env_context.solar_pattern()
     renew_backend = RenewableBackend(out_path=None,
                                      seed=renew_seed,
                                      params=renew_params,
@@ -139,7 +160,9 @@ def generate_renewable_energy_sources(path_env, renew_seed, start_date_dt, end_d
 def generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_of_minutes, generic_params, 
                                load_p, prod_solar, prod_wind, name_gen, gen_type, scenario_id, final_gen_p,
                                gens_charac,
-                               opf_params):
+                               opf_params,
+                               telemetry=None,
+                               env_context=None):
     """This function emulates a perfect market where all productions need to meet the demand at the minimal cost.
     
     It does not consider limit on powerline, nor contigencies etc. The power network does not exist here. Only the ramps and
@@ -173,6 +196,10 @@ def generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_
         _description_
     gens_charac : _type_
         _description_
+    telemetry : :class:`chronix2grid.telemetry.Telemetry`
+        If not None, the statistics of the solver are added to its current stage
+    env_context : :class:`chronix2grid.grid2op_utils.env_context.EnvContext`
+        The input files of the environment, read once per process (the one of `path_env` by default)
 
     Returns
     -------
@@ -180,28 +207,38 @@ def generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_
         _description_
     """
     
-    load = pd.DataFrame(load_p.sum(axis=1))
-    total_solar = prod_solar.sum(axis=1)
-    total_wind = prod_wind.sum(axis=1)
+    # the optimizer works in float64, whatever the dtype of the generated time series
+    load = pd.DataFrame(load_p.astype(np.float64, copy=False).sum(axis=1))
+    total_solar = prod_solar.astype(np.float64, copy=False).sum(axis=1)
+    total_wind = prod_wind.astype(np.float64, copy=False).sum(axis=1)
     
     # init the dispatcher
     gens_charac_this = copy.deepcopy(gens_charac)
     gens_charac_this["pmax"] = gens_charac_this["Pmax"]
     gens_charac_this["pmin"] = gens_charac_this["Pmin"]
     gens_charac_this["cost_per_mw"] = gens_charac_this["marginal_cost"]
-    economic_dispatch = PypsaDispatcher.from_dataframe(gens_charac_this)
+    # lazy import: pypsa is imported only if the pypsa dispatcher is used
+    from chronix2grid import default_backend
+    if "dispatcher" in opf_params:
+        dispatcher_class = default_backend.DISPATCHERS[opf_params["dispatcher"]]
+    else:
+        dispatcher_class = default_backend.DISPATCHER
+    economic_dispatch = dispatcher_class.from_dataframe(gens_charac_this)
     
     # need to hack it to work...
     n_gen = len(name_gen)
     gen_p_orig = np.zeros((prod_solar.shape[0], n_gen))
-    economic_dispatch._chronix_scenario = ChroniXScenario(loads=1.0 * load_p,
+    economic_dispatch._chronix_scenario = ChroniXScenario(loads=load_p.astype(np.float64),
                                                           prods=pd.DataFrame(1.0 * gen_p_orig, columns=name_gen),
                                                           scenario_name=scenario_id,
                                                           res_names={"wind": name_gen[gen_type == "wind"],
                                                                      "solar": name_gen[gen_type == "solar"]
                                                                     }
                                                          )
-    economic_dispatch.read_hydro_guide_curves(os.path.join(ref_pattern_path, 'hydro_french.csv'))
+    if env_context is None:
+        env_context = get_env_context(path_env)
+    economic_dispatch.read_hydro_guide_curves(env_context.hydro_guide_curves_path(),
+                                              hydro_pattern=env_context.hydro_guide_curves())
     hydro_constraints = economic_dispatch.make_hydro_constraints_from_res_load_scenario()
     res_dispatch = economic_dispatch.run(load * (1.0 + 0.01 * float(opf_params["losses_pct"])),
                                          total_solar,
@@ -210,13 +247,16 @@ def generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_
                                          gen_constraints=hydro_constraints,
                                          pyomo=False,
                                          solver_name="cbc")
+    if telemetry is not None:
+        telemetry.add_solver_stats(**opf_solver_stats(getattr(economic_dispatch, "opf_timings", None),
+                                                      res_dispatch.terminal_conditions if res_dispatch is not None else None))
     
     if res_dispatch is None:     
         error_ = RuntimeError("Pypsa failed to find a solution")
         return None, None, None, error_
     
     # now assign the results
-    final_gen_p = 1.0 * final_gen_p  # copy the data frame to avoid modify the original one
+    final_gen_p = final_gen_p.astype(np.float64)  # copy the data frame to avoid modify the original one
     for gen_id, gen_nm in enumerate(name_gen):
         if gen_nm in res_dispatch.chronix.prods_dispatch:
             final_gen_p.iloc[:, gen_id] = 1.0 * res_dispatch.chronix.prods_dispatch[gen_nm].values
@@ -234,7 +274,57 @@ def generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_
     total_solar_curt = total_solar.values[mask_solar].sum() - res_dispatch.chronix.prods_dispatch['agg_solar'].values[mask_solar].sum()
     return final_gen_p, total_wind_curt, total_solar_curt, hydro_constraints, None
     
-    
+
+def _accelerate_losses(losses_in, losses_out, method, depth=3):
+    """Compute the loss vector for the next iteration of the fixed point `loss = G(loss)`
+    solved by `_adjust_gens` (G being: dispatch with these losses, then compute the AC losses).
+
+    Without acceleration the next iterate is simply `G(loss)`.
+
+    Parameters
+    ----------
+    losses_in : list
+        The losses used for the dispatch at the previous iterations (last one is the most recent)
+    losses_out : list
+        The losses computed by the powerflows at the previous iterations (same order as `losses_in`)
+    method : str
+        "anderson" for anderson acceleration (of depth `depth`) or "secant" for a secant
+        update made independently for each step.
+    depth : int, optional
+        Number of past iterations used by the anderson acceleration, by default 3
+
+    Returns
+    -------
+    np.ndarray
+        The losses to use for the next dispatch
+    """
+    g_k = 1.0 * losses_out[-1]
+    if len(losses_in) < 2:
+        return g_k
+    residuals = [out_ - in_ for in_, out_ in zip(losses_in, losses_out)]
+    if method == "secant":
+        delta_x = losses_in[-1] - losses_in[-2]
+        delta_f = residuals[-1] - residuals[-2]
+        # G(loss) is (plain iteration) loss + 1. * residual, the secant changes this "1."
+        # it is bounded to avoid too large steps when the secant is badly estimated
+        ok_ = np.abs(delta_f) > 1e-6
+        factor = np.ones(g_k.shape[0])
+        factor[ok_] = np.clip(-delta_x[ok_] / delta_f[ok_], 0.5, 5.)
+        res = losses_in[-1] + factor * residuals[-1]
+    elif method == "anderson":
+        depth = min(depth, len(residuals) - 1)
+        delta_f = np.stack([residuals[-i] - residuals[-i-1] for i in range(1, depth + 1)], axis=1)
+        delta_g = np.stack([losses_out[-i] - losses_out[-i-1] for i in range(1, depth + 1)], axis=1)
+        gamma, *_ = np.linalg.lstsq(delta_f, residuals[-1], rcond=None)
+        res = g_k - delta_g @ gamma
+    else:
+        raise RuntimeError(f"Unknown acceleration method \"{method}\"")
+    if np.any(~np.isfinite(res)):
+        # fall back to the plain iteration
+        return g_k
+    return res
+
+
 def _adjust_gens(all_loss_orig,
                  env_for_loss,
                  datetimes,
@@ -255,6 +345,9 @@ def _adjust_gens(all_loss_orig,
                  iter_quality_decrease=50,  # acept a reduction of the quality after this number of iteration
                  percentile_quality_decrease=99,
                  hydro_constraints=None,
+                 loss_engine="step",
+                 loss_acceleration=None,
+                 loss_anderson_depth=3,
                  ):
     """This function is an auxilliary function.
     
@@ -296,6 +389,15 @@ def _adjust_gens(all_loss_orig,
         _description_
     threshold_stop : float, optional
         _description_, by default 0.1
+    loss_engine : str, optional
+        How the losses are evaluated at each iteration: "step" runs a grid2op environment
+        (one `env.step` per time step), "batch" computes all the powerflows in one call
+        to lightsim2grid (see BatchLossEvaluator), by default "step"
+    loss_acceleration : str, optional
+        None for the plain fixed point iteration, "anderson" or "secant" to accelerate it 
+        (see _accelerate_losses), by default None
+    loss_anderson_depth : int, optional
+        Number of past iterations used by the anderson acceleration, by default 3
 
     Returns
     -------
@@ -349,8 +451,23 @@ def _adjust_gens(all_loss_orig,
             error_ = RuntimeError(f"{el_nm} contains non finite values")
             return None, error_, None
     
+    if loss_engine not in ("step", "batch"):
+        error_ = RuntimeError(f"Unknown loss_engine \"{loss_engine}\", it should be \"step\" or \"batch\"")
+        return None, error_, None
+    if loss_acceleration not in (None, "anderson", "secant"):
+        error_ = RuntimeError(f"Unknown loss_acceleration \"{loss_acceleration}\", it should be None, \"anderson\" or \"secant\"")
+        return None, error_, None
+    
+    losses_in = []
+    losses_out = []
+    max_diff_per_iter = []
+    env_fixed = None
+    loss_evaluator = None
+    env_setup_time = 0.
+    powerflow_time = 0.
     while True:
         iter_num += 1
+        loss_in = 1.0 * all_loss
         load = load_without_loss + all_loss - np.sum(res_gen_p[:,~env_for_loss.gen_redispatchable], axis=1)
         scale_for_loads =  np.repeat(scaling_factor.reshape(1,-1), total_step, axis=0)
         target_vector = res_gen_p[:,env_for_loss.gen_redispatchable] / scaling_factor         
@@ -402,44 +519,65 @@ def _adjust_gens(all_loss_orig,
                 id_redisp += 1
         
         # re evaluate the losses
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore")
-            env_fixed = grid2op.make(
-                env_path,
-                test=True,
-                # grid_path=grid_path, # assign it the 118 grid
-                param=env_param,
-                backend=LightSimBackend(),
-                chronics_class=FromNPY,
-                # chronics_path=path_chronix2grid,
-                data_feeding_kwargs={"load_p": load_p,
-                                     "load_q": load_q,
-                                     "prod_p": 1.0 * res_gen_p,
-                                     "prod_v": gen_v},
-                opponent_budget_per_ts=0.,
-                opponent_init_budget=0.,
-                opponent_class=BaseOpponent,
-                opponent_budget_class=NeverAttackBudget,
-                opponent_action_class=DontAct,
-                )
-        diff_ = np.full((env_fixed.max_episode_duration(), env_fixed.n_gen), fill_value=np.NaN)
-        all_loss[:] = np.NaN
+        beg_setup = time.perf_counter()
+        if env_fixed is None:
+            # the environment is created only once...
+            with warnings.catch_warnings():
+                warnings.filterwarnings("ignore")
+                env_fixed = grid2op.make(
+                    env_path,
+                    test=True,
+                    # grid_path=grid_path, # assign it the 118 grid
+                    param=env_param,
+                    backend=LightSimBackend(),
+                    chronics_class=FromNPY,
+                    # chronics_path=path_chronix2grid,
+                    data_feeding_kwargs={"load_p": load_p,
+                                         "load_q": load_q,
+                                         "prod_p": 1.0 * res_gen_p,
+                                         "prod_v": gen_v},
+                    opponent_budget_per_ts=0.,
+                    opponent_init_budget=0.,
+                    opponent_class=BaseOpponent,
+                    opponent_budget_class=NeverAttackBudget,
+                    opponent_action_class=DontAct,
+                    )
+            if loss_engine == "batch":
+                env_fixed.reset()
+                loss_evaluator = BatchLossEvaluator(env_fixed)
+        elif loss_engine == "step":
+            # ... then only the generators setpoint are changed (taken into account at the next reset)
+            env_fixed.chronics_handler.real_data.change_chronics(new_prod_p=1.0 * res_gen_p)
         
-        i = 0
-        obs = env_fixed.reset()
-        all_loss[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
-        diff_[i] = obs.gen_p - res_gen_p[i]
-
-        done = False
-        while not done:
-            obs, reward, done, info = env_fixed.step(env_fixed.action_space())
-            i += 1
-            if done:
-                break
+        if loss_engine == "batch":
+            env_setup_time += time.perf_counter() - beg_setup
+            beg_pf = time.perf_counter()
+            all_loss[:], diff_ = loss_evaluator.compute(res_gen_p, load_p, load_q)
+            powerflow_time += time.perf_counter() - beg_pf
+        else:
+            diff_ = np.full((env_fixed.max_episode_duration(), env_fixed.n_gen), fill_value=np.NaN)
+            all_loss[:] = np.NaN
+            
+            i = 0
+            obs = env_fixed.reset()
+            env_setup_time += time.perf_counter() - beg_setup
+            
+            beg_pf = time.perf_counter()
             all_loss[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
             diff_[i] = obs.gen_p - res_gen_p[i]
+
+            done = False
+            while not done:
+                obs, reward, done, info = env_fixed.step(env_fixed.action_space())
+                i += 1
+                if done:
+                    break
+                all_loss[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
+                diff_[i] = obs.gen_p - res_gen_p[i]
+            powerflow_time += time.perf_counter() - beg_pf
         
         max_diff_ = np.abs(diff_).max()
+        max_diff_per_iter.append(float(max_diff_))
         print(f"{iter_num = } : {max_diff_ = :.2f}")
         if not np.isfinite(max_diff_):
             error_ = RuntimeError(f"Some nans were found in the generated data at iteration {iter_num}")
@@ -452,7 +590,11 @@ def _adjust_gens(all_loss_orig,
                         float(np.mean(np.abs(diff_))),
                         float(np.percentile(np.abs(diff_), 95)),
                         float(np.percentile(np.abs(diff_), 99)),
-                        float(max_diff_)
+                        float(max_diff_),
+                        env_setup_time,
+                        powerflow_time,
+                        {"loss_acceleration": loss_acceleration,
+                         "max_diff_per_iter": max_diff_per_iter},
             )
             break
         
@@ -463,7 +605,11 @@ def _adjust_gens(all_loss_orig,
                             float(np.mean(np.abs(diff_))),
                             float(np.percentile(np.abs(diff_), 95)),
                             float(np.percentile(np.abs(diff_), 99)),
-                            float(np.max(np.abs(diff_)))
+                            float(np.max(np.abs(diff_))),
+                            env_setup_time,
+                            powerflow_time,
+                            {"loss_acceleration": loss_acceleration,
+                             "max_diff_per_iter": max_diff_per_iter},
                 )
                 break
                     
@@ -473,6 +619,16 @@ def _adjust_gens(all_loss_orig,
             quality_ = None
             break
         
+        if loss_acceleration is not None:
+            # the losses for the next iteration are not only the last computed ones
+            losses_in = losses_in[-loss_anderson_depth:] + [loss_in]
+            losses_out = losses_out[-loss_anderson_depth:] + [1.0 * all_loss]
+            all_loss[:] = _accelerate_losses(losses_in, losses_out, loss_acceleration, depth=loss_anderson_depth)
+    
+    if loss_evaluator is not None:
+        loss_evaluator.close()
+    if env_fixed is not None:
+        env_fixed.close()
     return res_gen_p, error_, quality_
 
 
@@ -487,6 +643,11 @@ def _fix_losses_one_scenario(env_for_loss,
                             iter_quality_decrease=20,  # after 20 iteration accept a degradation in the quality
                             percentile_quality_decrease=99,  # replace the "at maximum" by "percentile 99%"
                             hydro_constraints=None,
+                            loss_engine="step",
+                            loss_warm_start="ac",
+                            loss_acceleration=None,
+                            loss_anderson_depth=3,
+                            env_context=None,
                             ):
     """This function is an auxilliary function.
     
@@ -512,12 +673,20 @@ def _fix_losses_one_scenario(env_for_loss,
         _description_, by default 0.5
     max_iter : int, optional
         _description_, by default 100
+    loss_warm_start : str, optional
+        How the losses of the first iterate are computed: "ac" with a grid2op environment (exact losses
+        of the original dispatch) or "dc" with a quadratic approximation based on DC powerflows 
+        (see estimate_losses_dc), by default "ac"
 
     Returns
     -------
     _type_
         _description_
     """
+    if loss_warm_start not in ("ac", "dc"):
+        error_ = RuntimeError(f"Unknown loss_warm_start \"{loss_warm_start}\", it should be \"ac\" or \"dc\"")
+        return None, error_, None
+    
     gen_p_orig = np.full((env_for_loss.max_episode_duration(), env_for_loss.n_gen), fill_value=np.NaN, dtype=np.float32)
     final_gen_v = np.full((env_for_loss.max_episode_duration(), env_for_loss.n_gen), fill_value=np.NaN, dtype=np.float32)
     final_load_p = np.full((env_for_loss.max_episode_duration(), env_for_loss.n_load), fill_value=np.NaN, dtype=np.float32)
@@ -526,42 +695,60 @@ def _fix_losses_one_scenario(env_for_loss,
     max_diff_orig = np.zeros(env_for_loss.max_episode_duration())
     datetimes = np.zeros(env_for_loss.max_episode_duration(), dtype=datetime)
     
-    # env_for_loss.set_id(scenario_id)  # env_for_loss has only 1 set of time series anyways !
-    obs = env_for_loss.reset()
-    
-    i = 0
-    all_loss_orig[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
-    final_gen_v[i] = obs.gen_v
-    final_load_p[i] = obs.load_p
-    final_load_q[i] = obs.load_q
-    gen_p_orig[i] = 1.0 * obs.gen_p
-    datetimes[i] = obs.get_time_stamp()
-    max_diff_orig[i] = np.max(np.abs(obs.gen_p -  env_for_loss.chronics_handler.real_data._prod_p[i]))
+    if loss_warm_start == "dc":
+        # data are read from the chronics and the losses are only estimated, no AC powerflow is run
+        real_data = env_for_loss.chronics_handler.real_data
+        nb_step = env_for_loss.max_episode_duration()
+        gen_p_orig[:] = real_data._prod_p[:nb_step]
+        final_gen_v[:] = real_data._prod_v[:nb_step]
+        final_load_p[:] = real_data._load_p[:nb_step]
+        final_load_q[:] = real_data._load_q[:nb_step]
+        datetimes[:] = [real_data.start_datetime + i * real_data.time_interval for i in range(nb_step)]
+        try:
+            all_loss_orig[:] = estimate_losses_dc(env_for_loss, gen_p_orig, final_load_p, final_load_q)
+        except RuntimeError as exc_:
+            return None, exc_, None
+    else:
+        # env_for_loss.set_id(scenario_id)  # env_for_loss has only 1 set of time series anyways !
+        obs = env_for_loss.reset()
     
-    done = False
-    while not done:
-        obs, reward, done, info = env_for_loss.step(env_for_loss.action_space())
-        if done:
-            break
-        i += 1
+        i = 0
         all_loss_orig[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
-        final_load_p[i] = 1.0 * obs.load_p
-        final_load_q[i] = 1.0 * obs.load_p
-        gen_p_orig[i] = env_for_loss.chronics_handler.real_data._prod_p[i]  # 1.0 * obs.gen_p
+        final_gen_v[i] = obs.gen_v
+        final_load_p[i] = obs.load_p
+        final_load_q[i] = obs.load_q
+        gen_p_orig[i] = 1.0 * obs.gen_p
         datetimes[i] = obs.get_time_stamp()
         max_diff_orig[i] = np.max(np.abs(obs.gen_p -  env_for_loss.chronics_handler.real_data._prod_p[i]))
+    
+        done = False
+        while not done:
+            obs, reward, done, info = env_for_loss.step(env_for_loss.action_space())
+            if done:
+                break
+            i += 1
+            all_loss_orig[i] = np.sum(obs.gen_p) - np.sum(obs.load_p)
+            final_gen_v[i] = 1.0 * obs.gen_v
+            final_load_p[i] = 1.0 * obs.load_p
+            final_load_q[i] = 1.0 * obs.load_q
+            gen_p_orig[i] = env_for_loss.chronics_handler.real_data._prod_p[i]  # 1.0 * obs.gen_p
+            datetimes[i] = obs.get_time_stamp()
+            max_diff_orig[i] = np.max(np.abs(obs.gen_p -  env_for_loss.chronics_handler.real_data._prod_p[i]))
         
     total_solar = np.sum(gen_p_orig[:, env_for_loss.gen_type == "solar"], axis=1)
     total_wind = np.sum(gen_p_orig[:, env_for_loss.gen_type == "wind"], axis=1)
     load_without_loss = np.sum(final_load_p, axis=1) #  - total_solar - total_wind
     
     # load the right data
-    df = pd.read_csv(os.path.join(env_path, "prods_charac.csv"), sep=",")
+    if env_context is None:
+        env_context = get_env_context(env_path)
+    df = env_context.read_csv("prods_charac.csv")
     df["pmax"] = df["Pmax"]
     df["pmin"] = df["Pmin"]
     df["cost_per_mw"] = df["marginal_cost"]
     economic_dispatch = PypsaDispatcher.from_dataframe(df)
-    economic_dispatch.read_hydro_guide_curves(os.path.join(ref_pattern_path, 'hydro_french.csv'))
+    economic_dispatch.read_hydro_guide_curves(env_context.hydro_guide_curves_path(),
+                                              hydro_pattern=env_context.hydro_guide_curves())
     economic_dispatch._chronix_scenario = ChroniXScenario(loads=1.0 * load_df,
                                                           prods=pd.DataFrame(1.0 * gen_p_orig, columns=env_for_loss.name_gen),
                                                           scenario_name=scenario_id,
@@ -598,11 +785,15 @@ def _fix_losses_one_scenario(env_for_loss,
                                                max_iter=max_iter,
                                                iter_quality_decrease=iter_quality_decrease,
                                                percentile_quality_decrease=percentile_quality_decrease,
-                                               hydro_constraints=hydro_constraints)
+                                               hydro_constraints=hydro_constraints,
+                                               loss_engine=loss_engine,
+                                               loss_acceleration=loss_acceleration,
+                                               loss_anderson_depth=loss_anderson_depth)
     
     if error_ is not None:
         # the procedure failed
         return None, error_, None
+    quality_[7]["loss_warm_start"] = loss_warm_start
     
     return res_gen_p, error_, quality_
 
@@ -650,6 +841,11 @@ def handle_losses(path_env,
                   iter_quality_decrease=20,  # after 20 iteration accept a degradation in the quality
                   percentile_quality_decrease=99,  # replace the "at maximum" by "percentile 99%"
                   hydro_constraints=None,
+                  loss_engine="step",
+                  loss_warm_start="ac",
+                  loss_acceleration=None,
+                  loss_anderson_depth=3,
+                  env_context=None,
                   ):
     """This function is here to make sure that if you run an AC model with the data generated, then the generator setpoints will not change too much 
     (less than `threshold_stop` MW)
@@ -682,6 +878,16 @@ def handle_losses(path_env,
         _description_, by default 0.5
     max_iter : int, optional
         _description_, by default 100
+    loss_engine : str, optional
+        "step" to evaluate the losses with a grid2op environment, "batch" to compute 
+        all the powerflows of the scenario at once with lightsim2grid, by default "step"
+    loss_warm_start : str, optional
+        "ac" to start from the exact losses of the original dispatch, "dc" to start from
+        a (cheaper) estimation based on DC powerflows, by default "ac"
+    loss_acceleration : str, optional
+        None for the plain iterations, "anderson" or "secant" to accelerate them, by default None
+    loss_anderson_depth : int, optional
+        Number of past iterations used by the anderson acceleration, by default 3
 
     Returns
     -------
@@ -689,8 +895,9 @@ def handle_losses(path_env,
         _description_
     """
     
-    with open(os.path.join(path_env, "params_opf.json"), "r") as f:
-        loss_param = json.load(f)
+    if env_context is None:
+        env_context = get_env_context(path_env)
+    loss_param = env_context.read_json("params_opf.json")
     loss_param["loss_pct"] = 0.  # losses are handled better in this function
     loss_param["PmaxErrorCorrRatio"] = PmaxErrorCorrRatio
     loss_param["RampErrorCorrRatio"] = RampErrorCorrRatio
@@ -722,6 +929,11 @@ def handle_losses(path_env,
                                                            # replace the "at maximum" by "percentile 99%"
                                                            percentile_quality_decrease=percentile_quality_decrease,
                                                            hydro_constraints=hydro_constraints,  
+                                                           loss_engine=loss_engine,
+                                                           loss_warm_start=loss_warm_start,
+                                                           loss_acceleration=loss_acceleration,
+                                                           loss_anderson_depth=loss_anderson_depth,
+                                                           env_context=env_context,
                                                            )
     if error_ is not None:
         return None, error_, None, env_for_loss
@@ -743,9 +955,13 @@ def save_generated_data(this_scen_path,
                         debug,
                         save_load_q=True,
                         sep=';',
-                        float_prec=FLOATING_POINT_PRECISION_FORMAT):
+                        float_prec=FLOATING_POINT_PRECISION_FORMAT,
+                        output_format=DEFAULT_OUTPUT_FORMAT,
+                        writer=None):
     """This function saves the data that have been generated by this script.
 
+    The data frames that are ``None`` are not saved (for example because they have already been).
+
     Parameters
     ----------
     this_scen_path : _type_
@@ -768,6 +984,11 @@ def save_generated_data(this_scen_path,
         _description_, by default ';'
     float_prec : _type_, optional
         _description_, by default FLOATING_POINT_PRECISION_FORMAT
+    output_format : str, optional
+        Format of the files (see :mod:`chronix2grid.output_format`), by default "csv"
+    writer : :class:`chronix2grid.async_writer.AsyncWriter`, optional
+        If provided, the files are written in the background by this writer (call its `flush` method
+        to wait for them), by default None
     """
     li_dfs = [load_p, load_p_forecasted, prod_p, prod_p_forecasted]
     li_nms = ["load_p", "load_p_forecasted", "prod_p", "prod_p_forecasted"]
@@ -784,12 +1005,32 @@ def save_generated_data(this_scen_path,
         li_dfs.append(prod_p_after_dispatch)
         li_nms.append("prod_p_after_dispatch")
         
+    write = write_data if writer is None else writer.write
     for df, nm in zip(li_dfs, li_nms):
-        df.to_csv(os.path.join(this_scen_path, f'{nm}.csv.bz2'),
-                  sep=sep,
-                  float_format=float_prec,
-                  header=True,
-                  index=False)       
+        if df is None:
+            continue
+        write(df, os.path.join(this_scen_path, f'{nm}.csv.bz2'),
+              output_format=output_format,
+              sep=sep,
+              float_format=float_prec,
+              index=False)
+
+
+def _discard_scenario(writer, this_scen_path, created):
+    """removes the data of a scenario that failed (they were written in the background by `writer`)"""
+    writer.discard()
+    if created:
+        shutil.rmtree(this_scen_path, ignore_errors=True)
+
+
+def _write_telemetry(telemetry, output_dir, scenario_id, failed):
+    """writes the telemetry of the scenario `scenario_id` in its folder or, if it `failed` (its folder is removed),
+    next to it"""
+    if failed:
+        path = os.path.join(output_dir, failed_telemetry_file_name(scenario_id))
+    else:
+        path = os.path.join(output_dir, scenario_id, TELEMETRY_FILE_NAME)
+    telemetry.write(path)
 
 
 def save_meta_data(this_scen_path,
@@ -813,6 +1054,7 @@ def save_meta_data(this_scen_path,
                    forca_t0_errors,
                    forca_errors,
                    amount_curtailed_for,
+                   forca_timers=None,
                    files_to_copy=("maintenance_meta.json",),
                    load_ref=None,
                    solar_ref=None,
@@ -836,6 +1078,9 @@ def save_meta_data(this_scen_path,
     gen_p_forecast_seed : _type_
         _description_
     quality: tuple
+        (iter_num, avg, percent_95, percent_99, max, loss_env_setup_time, loss_powerflow_time, loss_iter_info)
+        the last three elements are optional. loss_iter_info is a dictionnary with the keys 
+        "loss_acceleration", "loss_warm_start" and "max_diff_per_iter".
 
     """
     with open(os.path.join(this_scen_path, "time_interval.info"), "w", encoding="utf-8") as f:
@@ -851,7 +1096,15 @@ def save_meta_data(this_scen_path,
         json.dump(obj={"load_seed": int(load_seed), "renew_seed": int(renew_seed), "gen_p_forecast_seed": int(gen_p_forecast_seed)},
                   fp=f)
     with open(os.path.join(this_scen_path, "generation_quality.json"), "w", encoding="utf-8") as f:
-        iter_num, mean_, percent_95, percent_99, max_ = quality
+        iter_num, mean_, percent_95, percent_99, max_ = quality[:5]
+        if len(quality) >= 7:
+            loss_env_setup_time, loss_powerflow_time = quality[5:7]
+        else:
+            loss_env_setup_time, loss_powerflow_time = float("Nan"), float("Nan")
+        if len(quality) >= 8:
+            loss_iter_info = quality[7]
+        else:
+            loss_iter_info = {}
         json.dump(obj={"iter_num": int(iter_num),
                        "avg": float(mean_),
                        "percent_95": float(percent_95),
@@ -867,8 +1120,12 @@ def save_meta_data(this_scen_path,
                                 "solar_curtailed_opf: total (in energy) solar power curtailed by the OPF",
                                 "iter_num: number of iteration of the loss algorithm",
                                 "generation_time: total time spent to generate these data (in seconds)",
-                                "saving_time: total time spent to save the generated data (in seconds), this excludes the metadata saving time",
-                                "amount_curtailed_for: sum of all the power that has been curtailed for the forecasts"
+                                "saving_time: total time spent to save the generated data (in seconds), this excludes the metadata saving time (with async_write, this is the time spent waiting for the writes done in the background)",
+                                "amount_curtailed_for: sum of all the power that has been curtailed for the forecasts",
+                                "forecast_compile_time, forecast_solve_time: time spent to build / compile (resp. solve) the optimization problem used to fix the forecasts ramps (in seconds)",
+                                "loss_env_setup_time, loss_powerflow_time: time spent to setup the grid2op environment (resp. to compute the powerflows) when adjusting for the losses (in seconds)",
+                                "loss_acceleration, loss_warm_start: acceleration of the loss iterations and how the losses were initialized",
+                                "loss_max_diff_per_iter: maximum difference between the AC solver and the generated data at each iteration of the loss algorithm"
                                 ),
                        "total_load": float(total_load),
                        "total_gen": float(total_gen),
@@ -882,7 +1139,14 @@ def save_meta_data(this_scen_path,
                        "forecast_generation_time": float(forecast_generation_time),
                        "forecasts_t0_errors": {f"{t0}": f"{error_msg}" for t0, error_msg in zip(forca_t0_errors, forca_errors)},
                        "forecasts_nb_fail": len(forca_t0_errors),
-                       "amount_curtailed_for": float(np.sum(amount_curtailed_for))
+                       "amount_curtailed_for": float(np.sum(amount_curtailed_for)),
+                       "forecast_compile_time": float(forca_timers["compile_time"]) if forca_timers is not None else None,
+                       "forecast_solve_time": float(forca_timers["solve_time"]) if forca_timers is not None else None,
+                       "loss_env_setup_time": float(loss_env_setup_time),
+                       "loss_powerflow_time": float(loss_powerflow_time),
+                       "loss_acceleration": loss_iter_info.get("loss_acceleration"),
+                       "loss_warm_start": loss_iter_info.get("loss_warm_start"),
+                       "loss_max_diff_per_iter": [float(el) for el in loss_iter_info.get("max_diff_per_iter", [])],
                        },
                   fp=f,
                   sort_keys=True,
@@ -922,7 +1186,15 @@ def generate_a_scenario(path_env,
                         save_ref_curve=False,
                         day_lag=6, # TODO 6 because it's 2050
                         tol_zero=1e-3,
-                        debug=True  # TODO more feature !
+                        debug=True,  # TODO more feature !
+                        loss_engine="step",
+                        loss_warm_start="ac",
+                        loss_acceleration=None,
+                        output_format=DEFAULT_OUTPUT_FORMAT,
+                        async_write=False,
+                        dtype="float64",
+                        telemetry=False,
+                        env_context=None,
                         ):
     """This function generates and save the data for a scenario.
     
@@ -957,6 +1229,31 @@ def generate_a_scenario(path_env,
         _description_
     gen_p_forecast_seed : _type_
         _description_
+    loss_engine : str
+        How the losses are evaluated (see handle_losses), "step" or "batch"
+    loss_warm_start : str
+        How the losses are initialized (see handle_losses), "ac" or "dc"
+    loss_acceleration : str
+        How the loss iterations are accelerated (see handle_losses), None, "anderson" or "secant"
+    output_format : str
+        Format of the generated time series (see :mod:`chronix2grid.output_format`), "csv" by default
+    async_write : bool
+        Whether the time series are written in the background (see :mod:`chronix2grid.async_writer`): the
+        loads are written while the rest of the scenario is generated. All the files are written before
+        the metadata of the scenario (and removed if the generation fails). False by default
+    dtype : str
+        Type of the generated time series, "float64" (default) or "float32". With "float32", the noise, the
+        time series and the intermediate data frames take half the memory. Only the inputs of the optimizers
+        (economic dispatch, ramps of the forecasts) are converted to float64. The results are close to the
+        ones generated in float64 (with the same seeds), but not identical.
+    telemetry : bool
+        Whether the duration, the peak memory and the solver statistics of each stage (loads, renewables, dispatch,
+        losses, forecasts and save) are written in the file "telemetry.jsonl" of the scenario (next to the folder of
+        the scenario if it fails, see :mod:`chronix2grid.telemetry`). False by default
+    env_context : :class:`chronix2grid.grid2op_utils.env_context.EnvContext`
+        The input files of the environment (parameters, characteristics of the loads and generators, reference
+        patterns), read once per process. By default the one of `path_env` for the current process (see
+        :func:`chronix2grid.grid2op_utils.env_context.get_env_context`)
 
     Returns
     -------
@@ -964,7 +1261,9 @@ def generate_a_scenario(path_env,
         _description_
     """
     beg_ = time.perf_counter()
+    dtype = check_dtype(dtype)
     scenario_id = f"{start_date}_{scen_id}"
+    telemetry_ = Telemetry(scenario_id) if telemetry else None
     dt_dt = timedelta(minutes=int(dt))
     start_date_dt = datetime.strptime(start_date, "%Y-%m-%d") - dt_dt
     if nb_steps is None:
@@ -972,184 +1271,264 @@ def generate_a_scenario(path_env,
     else:
         end_date_dt = start_date_dt + (int(nb_steps) + 2) * dt_dt
     end_date = datetime.strftime(end_date_dt,  "%Y-%m-%d %H:%M:%S")
-    with open(os.path.join(path_env, "params.json"), "r") as f:
-        generic_params = json.load(f)
+    if env_context is None:
+        env_context = get_env_context(path_env)
+    generic_params = env_context.read_json("params.json")
     number_of_minutes = int((end_date_dt - start_date_dt).total_seconds() // 60)
-    gens_charac = pd.read_csv(os.path.join(path_env, "prods_charac.csv"), sep=",")
+    gens_charac = env_context.read_csv("prods_charac.csv")
     
-    forecast_prng = default_rng(gen_p_forecast_seed)
-    # conso generation
-    tmp_ = generate_loads(path_env,
-                          load_seed,
-                          forecast_prng,
-                          start_date_dt,
-                          end_date_dt,
-                          dt,
-                          number_of_minutes,
-                          generic_params,
-                          day_lag=day_lag 
-                          )
-    (new_forecasts, forecasts_params, load_params, loads_charac,
-     load_p, load_q, load_p_forecasted, load_q_forecasted, load_ref) = tmp_
+    failed = True
+    writer = None
+    try:
+        forecast_prng = default_rng(gen_p_forecast_seed)
+        with timed_stage(telemetry_, "loads"):
+            # conso generation
+            tmp_ = generate_loads(path_env,
+                                  load_seed,
+                                  forecast_prng,
+                                  start_date_dt,
+                                  end_date_dt,
+                                  dt,
+                                  number_of_minutes,
+                                  generic_params,
+                                  day_lag=day_lag,
+                                  dtype=dtype,
+                                  env_context=env_context
+                                  )
+            (new_forecasts, forecasts_params, load_params, loads_charac,
+             load_p, load_q, load_p_forecasted, load_q_forecasted, load_ref) = tmp_
     
-    # renewable energy sources generation
-    res_renew = generate_renewable_energy_sources(path_env,
-                                                  renew_seed,
-                                                  start_date_dt,
-                                                  end_date_dt,
-                                                  dt,
-                                                  number_of_minutes,
-                                                  generic_params,
-                                                  gens_charac,
-                                                  tol_zero=tol_zero)
-    prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted, solar_ref, wind_ref, renew_prng = res_renew
-
-    path_extra_wind = os.path.join(path_env, "wind_extra_params.json")
-    if os.path.exists(path_extra_wind) and os.path.isfile(path_extra_wind):
-        with open(path_extra_wind, "r", encoding="utf-8") as f:
-            extra_winds_params = json.load(f)
-        prod_wind_init = prod_wind
-        prod_wind = apply_maintenance_wind_farm(extra_winds_params, prod_wind_init,
-                                                start_date_dt, end_date_dt, dt,
-                                                renew_prng)
+        if output_dir is not None and async_write:
+            writer = get_async_writer()
+            this_scen_path = os.path.join(output_dir, scenario_id)
+            scen_path_created = not os.path.exists(this_scen_path)
+            if scen_path_created:
+                os.mkdir(this_scen_path)
+            save_generated_data(this_scen_path,
+                                load_p,
+                                load_p_forecasted,
+                                load_q,
+                                load_q_forecasted,
+                                None, None, None, None,
+                                debug=False,
+                                output_format=output_format,
+                                writer=writer)
         
-    if prod_solar.isna().any().any():
-        error_ = RuntimeError("Nan generated in solar data")
-        return error_, None, None, None, None, None, None, None
-    if prod_wind.isna().any().any():
-        error_ = RuntimeError("Nan generated in wind data")
-        return error_, None, None, None, None, None, None, None
-    
-    # create the result data frame for the generators
-    final_gen_p = pd.merge(prod_solar, prod_wind, left_index=True, right_index=True)
-    
-    for el in name_gen:
-        if el in final_gen_p:
-            continue
-        final_gen_p[str(el)] = np.NaN
-    final_gen_p = final_gen_p[name_gen]
-    
-    with open(os.path.join(path_env, "params_opf.json"), "r") as f:
-        opf_params = json.load(f)
-    opf_params["start_date"] = start_date_dt
-    opf_params["end_date"] = end_date_dt
-    opf_params["dt"] = int(dt)
-    opf_params["T"] = number_of_minutes
-    opf_params["planned_std"] = float(generic_params["planned_std"])
-    
-    # generate economic dispatch
-    res_disp = generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_of_minutes,
-                                          generic_params,
-                                          load_p, prod_solar, prod_wind, name_gen, gen_type, scenario_id,
-                                          final_gen_p, gens_charac, opf_params)
-    gen_p_after_dispatch, total_wind_curt_opf, total_solar_curt_opf, hydro_constraints, error_ = res_disp
+        with timed_stage(telemetry_, "renewables"):
+            # renewable energy sources generation
+            res_renew = generate_renewable_energy_sources(path_env,
+                                                          renew_seed,
+                                                          start_date_dt,
+                                                          end_date_dt,
+                                                          dt,
+                                                          number_of_minutes,
+                                                          generic_params,
+                                                          gens_charac,
+                                                          tol_zero=tol_zero,
+                                                          env_context=env_context)
+            prod_solar, prod_solar_forecasted, prod_wind, prod_wind_forecasted, solar_ref, wind_ref, renew_prng = res_renew
+
+            extra_winds_params = env_context.read_json("wind_extra_params.json", optional=True)
+            if extra_winds_params is not None:
+                prod_wind_init = prod_wind
+                prod_wind = apply_maintenance_wind_farm(extra_winds_params, prod_wind_init,
+                                                        start_date_dt, end_date_dt, dt,
+                                                        renew_prng)
+            prod_solar = prod_solar.astype(dtype, copy=False)
+            prod_solar_forecasted = prod_solar_forecasted.astype(dtype, copy=False)
+            prod_wind = prod_wind.astype(dtype, copy=False)
+            prod_wind_forecasted = prod_wind_forecasted.astype(dtype, copy=False)
+
+            if prod_solar.isna().any().any():
+                error_ = RuntimeError("Nan generated in solar data")
+                if telemetry_ is not None:
+                    telemetry_.fail(error_)
+                if writer is not None:
+                    _discard_scenario(writer, this_scen_path, scen_path_created)
+                return error_, None, None, None, None, None, None, None
+            if prod_wind.isna().any().any():
+                error_ = RuntimeError("Nan generated in wind data")
+                if telemetry_ is not None:
+                    telemetry_.fail(error_)
+                if writer is not None:
+                    _discard_scenario(writer, this_scen_path, scen_path_created)
+                return error_, None, None, None, None, None, None, None
     
-    if error_ is not None:
-        # TODO log that !
-        return error_, None, None, None, None, None, None, None
+        with timed_stage(telemetry_, "dispatch"):
+            # create the result data frame for the generators
+            final_gen_p = pd.merge(prod_solar, prod_wind, left_index=True, right_index=True)
+
+            for el in name_gen:
+                if el in final_gen_p:
+                    continue
+                final_gen_p[str(el)] = np.NaN
+            final_gen_p = final_gen_p[name_gen].astype(dtype, copy=False)
+
+            opf_params = env_context.read_json("params_opf.json")
+            opf_params["start_date"] = start_date_dt
+            opf_params["end_date"] = end_date_dt
+            opf_params["dt"] = int(dt)
+            opf_params["T"] = number_of_minutes
+            opf_params["planned_std"] = float(generic_params["planned_std"])
+
+            # generate economic dispatch
+            res_disp = generate_economic_dispatch(path_env, start_date_dt, end_date_dt, dt, number_of_minutes,
+                                                  generic_params,
+                                                  load_p, prod_solar, prod_wind, name_gen, gen_type, scenario_id,
+                                                  final_gen_p, gens_charac, opf_params,
+                                                  telemetry=telemetry_,
+                                                  env_context=env_context)
+            gen_p_after_dispatch, total_wind_curt_opf, total_solar_curt_opf, hydro_constraints, error_ = res_disp
+
+            if error_ is not None:
+                # TODO log that !
+                if telemetry_ is not None:
+                    telemetry_.fail(error_)
+                if writer is not None:
+                    _discard_scenario(writer, this_scen_path, scen_path_created)
+                return error_, None, None, None, None, None, None, None
+            gen_p_after_dispatch = gen_p_after_dispatch.astype(dtype, copy=False)
     
-    # now try to move the generators so that when I run an AC powerflow, the setpoint of generators does not change "too much"
-    n_gen = len(name_gen)
-    if handle_loss:
-        res_gen_p_df, error_, quality_, env_for_loss = handle_losses(path_env,
-                                                                     n_gen,
-                                                                     name_gen,
-                                                                     gens_charac,
-                                                                     load_p,
-                                                                     load_q,
-                                                                     gen_p_after_dispatch,
-                                                                     start_date_dt,
-                                                                     dt_dt,
-                                                                     scenario_id, 
-                                                                     PmaxErrorCorrRatio=PmaxErrorCorrRatio,
-                                                                     RampErrorCorrRatio=RampErrorCorrRatio,
-                                                                     threshold_stop=threshold_stop,
-                                                                     max_iter=max_iter,
-                                                                     hydro_constraints=hydro_constraints)
-        if error_ is not None:
-            # TODO log that !
-            return error_, None, None, None, None, None, None, None
-    else:
-        res_gen_p_df = 1.0 * gen_p_after_dispatch
-        quality_ = (-1, float("Nan"), float("Nan"), float("Nan"), float("Nan"))
-        
-        env_param = Parameters()
-        env_param.NO_OVERFLOW_DISCONNECTION = True
-        gen_v = np.tile(np.array([float(gens_charac.loc[gens_charac["name"] == nm_gen].V) for nm_gen in name_gen ]),
-                        load_p.shape[0]).reshape(-1, n_gen)
-        env_for_loss = make_env_for_loss(path_env, env_param,
-                                         load_p, load_q,
-                                         final_gen_p, gen_v,
-                                         start_date_dt, dt_dt)
+        with timed_stage(telemetry_, "losses"):
+            # now try to move the generators so that when I run an AC powerflow, the setpoint of generators does not change "too much"
+            n_gen = len(name_gen)
+            if handle_loss:
+                res_gen_p_df, error_, quality_, env_for_loss = handle_losses(path_env,
+                                                                             n_gen,
+                                                                             name_gen,
+                                                                             gens_charac,
+                                                                             load_p,
+                                                                             load_q,
+                                                                             gen_p_after_dispatch,
+                                                                             start_date_dt,
+                                                                             dt_dt,
+                                                                             scenario_id, 
+                                                                             PmaxErrorCorrRatio=PmaxErrorCorrRatio,
+                                                                             RampErrorCorrRatio=RampErrorCorrRatio,
+                                                                             threshold_stop=threshold_stop,
+                                                                             max_iter=max_iter,
+                                                                             hydro_constraints=hydro_constraints,
+                                                                             loss_engine=loss_engine,
+                                                                             loss_warm_start=loss_warm_start,
+                                                                             loss_acceleration=loss_acceleration,
+                                                                             env_context=env_context)
+                if error_ is not None:
+                    # TODO log that !
+                    if telemetry_ is not None:
+                        telemetry_.fail(error_)
+                    if writer is not None:
+                        _discard_scenario(writer, this_scen_path, scen_path_created)
+                    return error_, None, None, None, None, None, None, None
+                res_gen_p_df = res_gen_p_df.astype(dtype, copy=False)
+                if telemetry_ is not None:
+                    telemetry_.add_solver_stats(iterations=int(quality_[0]),
+                                                env_setup_time=float(quality_[5]) if len(quality_) >= 7 else None,
+                                                powerflow_time=float(quality_[6]) if len(quality_) >= 7 else None)
+            else:
+                res_gen_p_df = 1.0 * gen_p_after_dispatch
+                quality_ = (-1, float("Nan"), float("Nan"), float("Nan"), float("Nan"), 0., 0., {})
+
+                env_param = Parameters()
+                env_param.NO_OVERFLOW_DISCONNECTION = True
+                gen_v = np.tile(np.array([float(gens_charac.loc[gens_charac["name"] == nm_gen].V) for nm_gen in name_gen ]),
+                                load_p.shape[0]).reshape(-1, n_gen)
+                env_for_loss = make_env_for_loss(path_env, env_param,
+                                                 load_p, load_q,
+                                                 final_gen_p, gen_v,
+                                                 start_date_dt, dt_dt)
     
-    prng = default_rng(gen_p_forecast_seed)
-    beg_forca = time.perf_counter()
-    tmp_ = generate_forecasts_gen(new_forecasts,
-                                  prng,
-                                  load_p,
-                                  load_p_forecasted,
-                                  res_gen_p_df,
-                                  float(generic_params["planned_std"]),
-                                  env_for_loss,
-                                  hydro_constraints,
-                                  forecasts_params,
-                                  load_params,
-                                  loads_charac,
-                                  gens_charac,
-                                  path_env,
-                                  opf_params,
-                                  )
-    res_gen_p_forecasted_df_res, amount_curtailed_for, t0_errors, errors = tmp_
-    end_forca = time.perf_counter()
-    end_ = time.perf_counter()
-    if output_dir is not None:
-        beg_save = time.perf_counter()
-        this_scen_path = os.path.join(output_dir, scenario_id)
-        if not os.path.exists(this_scen_path):
-            os.mkdir(this_scen_path)
-        save_generated_data(this_scen_path,
-                            load_p,
-                            load_p_forecasted,
-                            load_q,
-                            load_q_forecasted,
-                            final_gen_p,  # generated, before economic dispatch
-                            gen_p_after_dispatch,  # generated, after economic dispatch (and possibly curtailment)
-                            res_gen_p_df,
-                            res_gen_p_forecasted_df_res,
-                            debug=debug)
-        total_load = float(load_p.sum().sum())
-        total_gen = float(res_gen_p_df.sum().sum())
-        gen_p_per_step = res_gen_p_df.sum(axis=1)
-        proper_MWh_unit = float(dt_dt.total_seconds() / 3600.)
-        wind_curtailed_losses = (gen_p_after_dispatch.iloc[:, gen_type=="wind"].sum().sum() - res_gen_p_df.iloc[:, gen_type=="wind"].sum().sum())
-        end_save = time.perf_counter()
-        save_meta_data(this_scen_path,
-                       path_env,
-                       start_date_dt,
-                       dt_dt,
-                       load_seed,
-                       renew_seed,
-                       gen_p_forecast_seed,
-                       quality_,
-                       total_load=total_load * proper_MWh_unit,
-                       total_gen=total_gen * proper_MWh_unit,
-                       losses_mwh=(total_gen - total_load) * proper_MWh_unit,
-                       losses_avg=np.mean((gen_p_per_step - load_p.sum(axis=1)) / gen_p_per_step),
-                       wind_curtailed_opf=float(total_wind_curt_opf * proper_MWh_unit),
-                       wind_curtailed_losses=float(wind_curtailed_losses * proper_MWh_unit),
-                       solar_curtailed_opf=float(total_solar_curt_opf * proper_MWh_unit),
-                       generation_time=end_ - beg_,
-                       saving_time=end_save - beg_save,
-                       # forecasts information
-                       forecast_generation_time=end_forca - beg_forca,
-                       forca_t0_errors=t0_errors,
-                       forca_errors=errors,
-                       amount_curtailed_for=amount_curtailed_for,
-                       files_to_copy=files_to_copy,
-                       # ref curve
-                       load_ref=load_ref if save_ref_curve else None,
-                       solar_ref=solar_ref if save_ref_curve else None,
-                       wind_ref=wind_ref if save_ref_curve else None,
-                       )
-        
-    return error_, quality_, load_p, load_p_forecasted, load_q, load_q_forecasted, res_gen_p_df, res_gen_p_forecasted_df_res
+        with timed_stage(telemetry_, "forecasts"):
+            prng = default_rng(gen_p_forecast_seed)
+            beg_forca = time.perf_counter()
+            tmp_ = generate_forecasts_gen(new_forecasts,
+                                          prng,
+                                          load_p,
+                                          load_p_forecasted,
+                                          res_gen_p_df,
+                                          float(generic_params["planned_std"]),
+                                          env_for_loss,
+                                          hydro_constraints,
+                                          forecasts_params,
+                                          load_params,
+                                          loads_charac,
+                                          gens_charac,
+                                          path_env,
+                                          opf_params,
+                                          dtype=dtype,
+                                          env_context=env_context,
+                                          )
+            res_gen_p_forecasted_df_res, amount_curtailed_for, t0_errors, errors, forca_timers = tmp_
+            end_forca = time.perf_counter()
+            if telemetry_ is not None and forca_timers is not None:
+                telemetry_.add_solver_stats(build_time=float(forca_timers["compile_time"]),
+                                            solve_time=float(forca_timers["solve_time"]),
+                                            nb_errors=len(t0_errors))
+        end_ = time.perf_counter()
+        with timed_stage(telemetry_, "save"):
+            if output_dir is not None:
+                beg_save = time.perf_counter()
+                this_scen_path = os.path.join(output_dir, scenario_id)
+                if not os.path.exists(this_scen_path):
+                    os.mkdir(this_scen_path)
+                loads_saved = writer is not None  # loads already written in the background
+                save_generated_data(this_scen_path,
+                                    None if loads_saved else load_p,
+                                    None if loads_saved else load_p_forecasted,
+                                    None if loads_saved else load_q,
+                                    None if loads_saved else load_q_forecasted,
+                                    final_gen_p,  # generated, before economic dispatch
+                                    gen_p_after_dispatch,  # generated, after economic dispatch (and possibly curtailment)
+                                    res_gen_p_df,
+                                    res_gen_p_forecasted_df_res,
+                                    debug=debug,
+                                    output_format=output_format,
+                                    writer=writer)
+                total_load = float(load_p.sum().sum())
+                total_gen = float(res_gen_p_df.sum().sum())
+                gen_p_per_step = res_gen_p_df.sum(axis=1)
+                proper_MWh_unit = float(dt_dt.total_seconds() / 3600.)
+                wind_curtailed_losses = (gen_p_after_dispatch.iloc[:, gen_type=="wind"].sum().sum() - res_gen_p_df.iloc[:, gen_type=="wind"].sum().sum())
+                if writer is not None:
+                    # barrier: the metadata are saved once all the data are written
+                    writer.flush()
+                end_save = time.perf_counter()
+                save_meta_data(this_scen_path,
+                               path_env,
+                               start_date_dt,
+                               dt_dt,
+                               load_seed,
+                               renew_seed,
+                               gen_p_forecast_seed,
+                               quality_,
+                               total_load=total_load * proper_MWh_unit,
+                               total_gen=total_gen * proper_MWh_unit,
+                               losses_mwh=(total_gen - total_load) * proper_MWh_unit,
+                               losses_avg=np.mean((gen_p_per_step - load_p.sum(axis=1)) / gen_p_per_step),
+                               wind_curtailed_opf=float(total_wind_curt_opf * proper_MWh_unit),
+                               wind_curtailed_losses=float(wind_curtailed_losses * proper_MWh_unit),
+                               solar_curtailed_opf=float(total_solar_curt_opf * proper_MWh_unit),
+                               generation_time=end_ - beg_,
+                               saving_time=end_save - beg_save,
+                               # forecasts information
+                               forecast_generation_time=end_forca - beg_forca,
+                               forca_t0_errors=t0_errors,
+                               forca_errors=errors,
+                               amount_curtailed_for=amount_curtailed_for,
+                               forca_timers=forca_timers,
+                               files_to_copy=files_to_copy,
+                               # ref curve
+                               load_ref=load_ref if save_ref_curve else None,
+                               solar_ref=solar_ref if save_ref_curve else None,
+                               wind_ref=wind_ref if save_ref_curve else None,
+                               )
+        failed = False
+        return error_, quality_, load_p, load_p_forecasted, load_q, load_q_forecasted, res_gen_p_df, res_gen_p_forecasted_df_res
+    except BaseException:
+        if writer is not None:
+            # otherwise the next scenario generated by this process would wait for (and fail because of) the
+            # writes of this one
+            _discard_scenario(writer, this_scen_path, scen_path_created)
+        raise
+    finally:
+        if telemetry_ is not None and output_dir is not None:
+            _write_telemetry(telemetry_, output_dir, scenario_id, failed)
@@ -10,6 +10,8 @@ import pandas as pd
 import os
 import numpy as np
 
+from chronix2grid.output_format import read_data
+
 def EnergyMix_AprioriChecker(env118_withoutchron,Target_EM_percentage, PeakLoad, AverageLoad, CapacityFactor ):
     # # Check the Energy Mix apriori
 
@@ -146,8 +148,8 @@ def Ramps_Pmax_Pmin_APrioriCheckers(env118_withoutchron,Capacity, chronics_path_
         # Load consumption and prod
         if(os.path.isdir(os.path.join(chronics_path_gen,subpath))):
             this_path = os.path.join(chronics_path_gen, subpath)
-            load_p = pd.read_csv(os.path.join(this_path, 'load_p.csv.bz2'), sep = ';')
-            prod_p = pd.read_csv(os.path.join(this_path, 'prod_p.csv.bz2'), sep = ';')
+            load_p = read_data(os.path.join(this_path, 'load_p.csv.bz2'), sep = ';')
+            prod_p = read_data(os.path.join(this_path, 'prod_p.csv.bz2'), sep = ';')
 
            # Retrieve wind and solar from prod_p (Balthazar's generator)
             prod_p_wind = prod_p[[el for i, el in enumerate(env118_withoutchron.name_gen) if env118_withoutchron.gen_type[i] in ["wind"]]]
@@ -304,7 +306,7 @@ def Aposteriori_renewableCapacityFactor_Checkers(env118_withoutchron,Capacity, c
          if(os.path.isdir(os.path.join(chronics_path_gen,subpath))):
             # Load consumption and prod
             this_path = os.path.join(chronics_path_gen, subpath)
-            prod_p = pd.read_csv(os.path.join(this_path, 'prod_p.csv.bz2'), sep = ';')
+            prod_p = read_data(os.path.join(this_path, 'prod_p.csv.bz2'), sep = ';')
 
            # Retrieve wind and solar from prod_p (Balthazar's generator
             prod_p_wind = prod_p[[el for i, el in enumerate(env118_withoutchron.name_gen) if env118_withoutchron.gen_type[i] in ["wind"]]]
@@ -18,8 +18,8 @@ from .deterministic.kpis import EconomicDispatchValidator
 from ..generation import generation_utils as gu
 from .. import constants as cst
 from .. import utils as ut
+from ..output_format import read_columns
 from datetime import datetime, timedelta
-from grid2op.Chronics import GridStateFromFile
 
 
 
@@ -213,6 +213,7 @@ def list_dirs_with_chronics(generation_output_folder):
     return chronic_dirs
 
 def update_time_params_scenario(scenario_generation_output_folder,params):
+    from grid2op.Chronics import GridStateFromFile  # lazy import: grid2op is slow to import
     for_start_date = GridStateFromFile(scenario_generation_output_folder,start_datetime=params['start_date'],time_interval=timedelta(minutes=params['dt']))
     for_start_date._init_date_time()
     start_datetime, time_interval = for_start_date.start_datetime, for_start_date.time_interval
@@ -263,17 +264,14 @@ def check_solar_wind_prod_data(generation_output_folder,prods_charac):
     for root, dirs, filenames in os.walk(generation_output_folder):
         if 'prod' in str(filenames) and len(all_prod_names) == 0:
             if len(all_prod_names) == 0:
-                all_prod_names = pd.read_csv(os.path.join(root, 'prod_p.csv.bz2'),
-                                             sep=';', decimal='.', index_col=0, nrows=0).columns.tolist()
+                all_prod_names = read_columns(os.path.join(root, 'prod_p.csv.bz2'), sep=';', index_col=0)
         if 'solar_p' in str(filenames) and len(solar_names) == 0:
             if len(solar_names) == 0:
-                solar_names = pd.read_csv(os.path.join(root, 'solar_p.csv.bz2'),
-                                          sep=';', decimal='.', index_col=0, nrows=0).columns.tolist()
+                solar_names = read_columns(os.path.join(root, 'solar_p.csv.bz2'), sep=';', index_col=0)
                 has_solar = True
         if 'wind_p' in str(filenames) and len(wind_names) == 0:
             if len(wind_names) == 0:
-                wind_names = pd.read_csv(os.path.join(root, 'solar_p.csv.bz2'),
-                                         sep=';', decimal='.', index_col=0, nrows=0).columns.tolist()
+                wind_names = read_columns(os.path.join(root, 'solar_p.csv.bz2'), sep=';', index_col=0)
                 has_wind = True
         if 'load_p' in str(filenames):
             has_load = True
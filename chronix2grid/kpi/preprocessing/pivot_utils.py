@@ -13,6 +13,7 @@ import numpy as np
 import pandas as pd
 
 import chronix2grid.constants as cst
+from chronix2grid.output_format import read_data, data_file_exists
 import chronix2grid.default_backend as def_bk
 
 def usa_gan_trainingset_to_kpi(kpi_case_input_folder, timestep, prods_charac, loads_charac, params,year):
@@ -349,25 +350,26 @@ def chronics_to_kpi(chronics_repo, timestep, params, thermal = True):
 
     has_price=False
     price=None
-    load_p = pd.read_csv(os.path.join(chronics_repo, 'load_p.csv.bz2'),
-                         sep=';', decimal='.')
+    # the chronics can be in any of the formats of chronix2grid.output_format
+    load_p = read_data(os.path.join(chronics_repo, 'load_p.csv.bz2'),
+                       sep=';', decimal='.')
     if thermal:
         ## Format when all dispatch is generated
 
         # Read generated chronics after dispatch phase
-        prod_p = pd.read_csv(os.path.join(chronics_repo, 'prod_p.csv.bz2'),
-                             sep=';', decimal='.')
+        prod_p = read_data(os.path.join(chronics_repo, 'prod_p.csv.bz2'),
+                           sep=';', decimal='.')
 
         path_file_prices=os.path.join(chronics_repo, 'prices.csv.bz2')
-        if(os.path.exists(path_file_prices)):
-            price = pd.read_csv(path_file_prices,
-                                sep=';', decimal='.')
+        if(data_file_exists(path_file_prices)):
+            price = read_data(path_file_prices,
+                              sep=';', decimal='.')
             has_price=True
 
     else:
         ## Format synthetic chronics when no dispatch has been done
-        solar_p = pd.read_csv(os.path.join(chronics_repo, 'solar_p.csv.bz2'), sep=';', decimal='.')
-        wind_p = pd.read_csv(os.path.join(chronics_repo, 'wind_p.csv.bz2'), sep=';', decimal='.')
+        solar_p = read_data(os.path.join(chronics_repo, 'solar_p.csv.bz2'), sep=';', decimal='.')
+        wind_p = read_data(os.path.join(chronics_repo, 'wind_p.csv.bz2'), sep=';', decimal='.')
         prod_p = pd.concat([solar_p, wind_p], axis=1)
 
     # Rebuild timeline
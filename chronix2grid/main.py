@@ -20,9 +20,10 @@ from chronix2grid.GeneratorBackend import GeneratorBackend
 from chronix2grid import constants as cst
 from chronix2grid.generation import generate_chronics as gen
 from chronix2grid.generation import generation_utils as gu
-from chronix2grid.kpi import main as kpis
+from chronix2grid.generation.dispatch.dispatch_cache import DispatchCache
+from chronix2grid.output_format import OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT
 from chronix2grid.output_processor import (
-    output_processor_to_chunks, write_start_dates_for_chunks)
+    write_start_dates_for_chunks)
 from chronix2grid.seed_manager import (parse_seed_arg, generate_default_seed,
                                        dump_seeds)
 from chronix2grid import utils as ut
@@ -54,18 +55,36 @@ from chronix2grid import utils as ut
                    'in the chosen output directory.')
 @click.option('--scenario_name', default='', help='subname to add to the generated scenario output folder, as Scenario_subname_i')
 @click.option('--nb_core', default=1, help='number of cores to parallelize the number of scenarios')
+@click.option('--dispatch-cache', default=None,
+              help='Directory where the results of the dispatch are cached: a dispatch with exactly the same inputs '
+                   'is then read from this cache instead of being computed again')
+@click.option('--dispatch-cache-size', default=1024., help='Maximum size (in MB) of the dispatch cache')
+@click.option('--output-format', default=DEFAULT_OUTPUT_FORMAT, type=click.Choice(list(OUTPUT_FORMATS)),
+              help='Format of the generated time series: csv (bz2 compressed, the only one grid2op can read), '
+                   'parquet (zstd compressed, requires pyarrow), npz or npy (float32)')
+@click.option('--async-write', is_flag=True,
+              help='Write the generated time series in background threads, while the generation goes on')
+@click.option('--telemetry', is_flag=True,
+              help='Write the duration, the peak memory and the solver statistics of each step in the file '
+                   'telemetry.jsonl of each scenario (aggregate them with chronix2grid-telemetry)')
 def generate_mp(case, start_date, weeks, by_n_weeks, n_scenarios, mode,
              input_folder, output_folder, scenario_name,
-             seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings):
+             seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings,
+             dispatch_cache, dispatch_cache_size, output_format, async_write, telemetry):
     prng = default_rng()
+    if dispatch_cache is not None:
+        dispatch_cache = DispatchCache(dispatch_cache, max_size_mb=dispatch_cache_size)
     generate_mp_core(prng, case, start_date, weeks, by_n_weeks, n_scenarios, mode,
                      input_folder, output_folder, scenario_name,
-                     seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings)
+                     seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings,
+                     dispatch_cache=dispatch_cache, output_format=output_format, async_write=async_write,
+                     telemetry=telemetry)
 
 
 def generate_mp_core(prng, case, start_date, weeks, by_n_weeks, n_scenarios, mode,
              input_folder, output_folder, scenario_name,
-             seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings):
+             seed_for_loads, seed_for_res, seed_for_dispatch, nb_core, ignore_warnings,
+             dispatch_cache=None, output_format=DEFAULT_OUTPUT_FORMAT, async_write=False, telemetry=False):
 
     start_time = time.time()
     print(case)
@@ -128,7 +147,9 @@ def generate_mp_core(prng, case, start_date, weeks, by_n_weeks, n_scenarios, mod
         for i in range(n_scenarios):
             generate_per_scenario(case, start_date, weeks, by_n_weeks, mode, input_folder,
             kpi_output_folder, generation_output_folder, scen_names,
-            seeds_for_loads, seeds_for_res, seeds_for_disp, ignore_warnings,i)
+            seeds_for_loads, seeds_for_res, seeds_for_disp, ignore_warnings,i,
+            dispatch_cache=dispatch_cache, output_format=output_format, async_write=async_write,
+            telemetry=telemetry)
     else:
     # multi-processing
         with multiprocessing.Pool(nb_core) as pool:
@@ -137,7 +158,9 @@ def generate_mp_core(prng, case, start_date, weeks, by_n_weeks, n_scenarios, mod
                 generate_per_scenario,
                 case, start_date, weeks, by_n_weeks, mode, input_folder,
                 kpi_output_folder, generation_output_folder, scen_names,
-                seeds_for_loads, seeds_for_res, seeds_for_disp, ignore_warnings)
+                seeds_for_loads, seeds_for_res, seeds_for_disp, ignore_warnings,
+                dispatch_cache=dispatch_cache, output_format=output_format, async_write=async_write,
+                telemetry=telemetry)
 
             pool.map(multiprocessing_func, iterable)
         print('multiprocessing done')
@@ -153,7 +176,8 @@ def rm_temporary_folders(input_folder,output_folder, case):
 
 def generate_per_scenario(case, start_date, weeks, by_n_weeks, mode,
              input_folder, kpi_output_folder, generation_output_folder, scen_names,
-             seeds_for_loads, seeds_for_res, seeds_for_dispatch, ignore_warnings, scenario_id):
+             seeds_for_loads, seeds_for_res, seeds_for_dispatch, ignore_warnings, scenario_id,
+             dispatch_cache=None, output_format=DEFAULT_OUTPUT_FORMAT, async_write=False, telemetry=False):
     
     n_scenarios_sub_p = 1  # one scenario to compute per process``
     scenario_name = scen_names(scenario_id)
@@ -187,13 +211,16 @@ def generate_per_scenario(case, start_date, weeks, by_n_weeks, mode,
     generate_inner(
         case, start_date, weeks, by_n_weeks, n_scenarios_sub_p, mode,
         input_folder, kpi_output_folder, generation_output_folder,
-        scen_names, seed_for_loads, seed_for_res, seed_for_dispatch, scenario_id)
+        scen_names, seed_for_loads, seed_for_res, seed_for_dispatch, scenario_id,
+        dispatch_cache=dispatch_cache, output_format=output_format, async_write=async_write,
+        telemetry=telemetry)
     
 
 def generate_inner(case, start_date, weeks, by_n_weeks, n_scenarios, mode,
                    input_folder, kpi_output_folder, generation_output_folder,
                    scen_names, seed_for_loads, seed_for_res,
-                   seed_for_dispatch, scenario_id=None):
+                   seed_for_dispatch, scenario_id=None, dispatch_cache=None,
+                   output_format=DEFAULT_OUTPUT_FORMAT, async_write=False, telemetry=False):
 
     ut.check_scenario(n_scenarios, scenario_id)
     time_parameters = gu.time_parameters(weeks, start_date)
@@ -211,15 +238,19 @@ def generate_inner(case, start_date, weeks, by_n_weeks, n_scenarios, mode,
     # Chronic generation
     if 'L' in mode or 'R' in mode:
         generator = GeneratorBackend()
+        generator.dispatch_cache = dispatch_cache
+        generator.output_format = output_format
+        generator.async_write = async_write
+        generator.telemetry = telemetry
+        if by_n_weeks is not None and 'T' in mode and weeks > by_n_weeks:
+            # the chunks are written with the files
+            generator.by_n_weeks = by_n_weeks
         params, _, _ = gen.main(generator,case, n_scenarios, generation_input_folder,
                                  generation_output_folder, scen_names, time_parameters,
                                  mode, scenario_id, seed_for_loads, seed_for_res,
                                  seed_for_dispatch)
         scenario_name = scen_names(scenario_id)
         if by_n_weeks is not None and 'T' in mode:
-            output_processor_to_chunks(
-                generation_output_folder, scenario_name, by_n_weeks,
-                n_scenarios, weeks)
             write_start_dates_for_chunks(
                 generation_output_folder, scenario_name, weeks, by_n_weeks,
                 n_scenarios, start_date, int(params['dt']))
@@ -234,6 +265,7 @@ def generate_inner(case, start_date, weeks, by_n_weeks, n_scenarios, mode,
         print("WARNING: make sure that your generated data is in folder: "+generation_output_folder)
 
         #compute KPIs
+        from chronix2grid.kpi import main as kpis  # lazy import: the KPI stack (plotly, matplotlib...) is slow to import
         kpis.main(kpi_input_folder, generation_output_folder, scen_names,
                   kpi_output_folder, year, case, n_scenarios,
                   params_dict['G'], loads_charac, prods_charac, scenario_id)
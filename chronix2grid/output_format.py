@@ -0,0 +1,293 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Formats in which the generated time series can be written (and read back).
+
+* "csv" (default): bz2 compressed csv, separated by ";" and rounded with
+  :data:`chronix2grid.constants.FLOATING_POINT_PRECISION_FORMAT` (the format read by grid2op)
+* "parquet": parquet file compressed with zstd (requires pyarrow), values are not rounded
+* "npz": compressed numpy archive with the values (not rounded, in their own dtype), the names of the columns
+  and (optionally) the index
+* "npy": raw float32 numpy array, the names of the columns are stored next to it in a
+  ``.columns.json`` file (the index is never stored)
+
+When the outputs are cut into chunks of `by_n_weeks` weeks (see :func:`chunk_size_from_params`), the
+chunks are written by :func:`write_data` in the folders "chunk_0", "chunk_1"... next to the file, at
+the same time as the file itself.
+
+All the functions below take the path of the ".csv.bz2" file, that is used by the rest of the code,
+and change its extension according to the format.
+
+.. warning::
+    Only the "csv" format can be read by grid2op.
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid import constants as cst
+
+CSV_EXTENSION = ".csv.bz2"
+OUTPUT_FORMATS = {"csv": CSV_EXTENSION,
+                  "parquet": ".parquet",
+                  "npz": ".npz",
+                  "npy": ".npy"}
+DEFAULT_OUTPUT_FORMAT = "csv"
+NPY_COLUMNS_EXTENSION = ".columns.json"
+CHUNK_FOLDER_BASE_NAME = "chunk"
+MSG_PYARROW_DEPENDENCY = "Please install pyarrow (`pip install pyarrow`) to use the \"parquet\" output format"
+
+
+def check_output_format(output_format):
+    if output_format not in OUTPUT_FORMATS:
+        raise RuntimeError(f"Unknown output format \"{output_format}\", it should be one of "
+                           f"{sorted(OUTPUT_FORMATS)}")
+
+
+def _stem(path):
+    """path without the extension of any of the formats"""
+    for extension in OUTPUT_FORMATS.values():
+        if path.endswith(extension):
+            return path[:-len(extension)]
+    return path
+
+
+def data_name(path):
+    """name of the data stored in the file `path` (its name without the extension of the format)"""
+    return os.path.basename(_stem(path))
+
+
+def file_output_format(path):
+    """format of the file `path` according to its extension (None if it is not a data file)"""
+    for output_format, extension in OUTPUT_FORMATS.items():
+        if path.endswith(extension):
+            return output_format
+    return None
+
+
+def data_file_path(path, output_format=DEFAULT_OUTPUT_FORMAT):
+    """
+    Path of the file in which the data of `path` are stored in the format `output_format`
+
+    Parameters
+    ----------
+    path: ``str``
+        path of the file (with or without the ".csv.bz2" extension)
+    output_format: ``str``
+
+    Returns
+    -------
+    ``str``
+    """
+    check_output_format(output_format)
+    return _stem(path) + OUTPUT_FORMATS[output_format]
+
+
+def find_data_file(path):
+    """
+    Looks for the data of `path` in all the formats (csv first)
+
+    Returns
+    -------
+    path: ``str`` or ``None``
+        the path of the file found (None if there is none)
+    output_format: ``str`` or ``None``
+    """
+    for output_format in OUTPUT_FORMATS:
+        this_path = data_file_path(path, output_format)
+        if os.path.exists(this_path):
+            return this_path, output_format
+    return None, None
+
+
+def data_file_exists(path):
+    return find_data_file(path)[0] is not None
+
+
+def remove_data(path, n_rows=None, chunk_size=None):
+    """
+    removes the file `path` written by :func:`write_data` (and the names of the columns of a "npy" file) and,
+    if `chunk_size` is not None, its chunks (`n_rows` is the number of rows of the data), with their folders
+    if they are empty
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    if file_output_format(path) == "npy" and os.path.exists(_stem(path) + NPY_COLUMNS_EXTENSION):
+        os.remove(_stem(path) + NPY_COLUMNS_EXTENSION)
+    if chunk_size is None:
+        return
+    n_chunks = max(int(math.ceil(n_rows / chunk_size)), 1)
+    for chunk_id in range(n_chunks):
+        this_path = chunk_file_path(path, chunk_id, n_chunks)
+        remove_data(this_path)
+        if os.path.isdir(os.path.dirname(this_path)) and not os.listdir(os.path.dirname(this_path)):
+            os.rmdir(os.path.dirname(this_path))
+
+
+def chunk_size_from_params(params):
+    """
+    Number of rows of the chunks the outputs are cut into: `params["by_n_weeks"]` weeks with a time
+    step of `params["dt"]` minutes (None if `params["by_n_weeks"]` is None or missing, ie if the outputs
+    are not cut into chunks)
+    """
+    by_n_weeks = params.get("by_n_weeks")
+    if by_n_weeks is None:
+        return None
+    return int(by_n_weeks) * 7 * 24 * 60 // int(params.get("dt", 5))
+
+
+def chunk_file_path(path, chunk_id, n_chunks):
+    """path of the chunk `chunk_id` (out of `n_chunks`) of the file `path`"""
+    padding_size = len(str(int(n_chunks)))
+    parent_dir, file_nm = os.path.split(path)
+    return os.path.join(parent_dir, f"{CHUNK_FOLDER_BASE_NAME}_{chunk_id:0{padding_size}d}", file_nm)
+
+
+def write_data(df, path, output_format=DEFAULT_OUTPUT_FORMAT, sep=';',
+               float_format=cst.FLOATING_POINT_PRECISION_FORMAT, index=False, chunk_size=None):
+    """
+    Writes `df` in the format `output_format`
+
+    Parameters
+    ----------
+    df: :class:`pandas.DataFrame` or :class:`pandas.Series`
+    path: ``str``
+        path of the file, its extension is changed according to the format
+    output_format: ``str``
+        one of :data:`OUTPUT_FORMATS`
+    sep, float_format:
+        only used by the "csv" format
+    index: ``bool``
+        whether to write the index (not possible with the "npy" format)
+    chunk_size: ``int``
+        if not None, the data are also written by chunks of `chunk_size` rows, in the folders "chunk_0",
+        "chunk_1"... next to `path` (see :func:`chunk_size_from_params`)
+
+    Returns
+    -------
+    path: ``str``
+        the path of the file written
+    """
+    path = data_file_path(path, output_format)
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    if output_format == "csv":
+        df.to_csv(path, sep=sep, float_format=float_format, index=index)
+    elif output_format == "parquet":
+        try:
+            import pyarrow
+        except ImportError as exc_:
+            raise RuntimeError(MSG_PYARROW_DEPENDENCY) from exc_
+        df = df.copy(deep=False)
+        df.columns = [str(col) for col in df.columns]
+        df.to_parquet(path, engine="pyarrow", compression="zstd", index=index)
+    elif output_format == "npz":
+        arrays = {"values": df.values,
+                  "columns": np.array([str(col) for col in df.columns])}
+        if index:
+            arrays["index"] = df.index.values
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+    else:
+        np.save(path, df.values.astype(np.float32))
+        with open(_stem(path) + NPY_COLUMNS_EXTENSION, "w", encoding="utf-8") as f:
+            json.dump([str(col) for col in df.columns], f)
+    if chunk_size is not None:
+        n_chunks = max(int(math.ceil(df.shape[0] / chunk_size)), 1)
+        for chunk_id in range(n_chunks):
+            this_path = chunk_file_path(path, chunk_id, n_chunks)
+            os.makedirs(os.path.dirname(this_path), exist_ok=True)
+            write_data(df.iloc[chunk_id * chunk_size:(chunk_id + 1) * chunk_size], this_path,
+                       output_format=output_format, sep=sep, float_format=float_format, index=index)
+    return path
+
+
+def read_data(path, output_format=None, sep=';', **kwargs):
+    """
+    Reads data written by :func:`write_data`
+
+    Parameters
+    ----------
+    path: ``str``
+        path of the file, its extension is changed according to the format
+    output_format: ``str`` or ``None``
+        format of the file, if None all the formats are tried (csv first)
+    sep, kwargs:
+        passed to :func:`pandas.read_csv` for the "csv" format
+
+    Returns
+    -------
+    :class:`pandas.DataFrame`
+    """
+    if output_format is None:
+        this_path, output_format = find_data_file(path)
+        if this_path is None:
+            raise FileNotFoundError(f"No data found for \"{path}\" (with any of the extensions "
+                                    f"{list(OUTPUT_FORMATS.values())})")
+    path = data_file_path(path, output_format)
+    if output_format == "csv":
+        return pd.read_csv(path, sep=sep, **kwargs)
+    if output_format == "parquet":
+        try:
+            import pyarrow
+        except ImportError as exc_:
+            raise RuntimeError(MSG_PYARROW_DEPENDENCY) from exc_
+        return pd.read_parquet(path, engine="pyarrow")
+    if output_format == "npz":
+        with np.load(path, allow_pickle=False) as data:
+            index = data["index"] if "index" in data.files else None
+            return pd.DataFrame(data["values"], columns=data["columns"].tolist(), index=index)
+    with open(_stem(path) + NPY_COLUMNS_EXTENSION, "r", encoding="utf-8") as f:
+        columns = json.load(f)
+    return pd.DataFrame(np.load(path), columns=columns)
+
+
+def read_columns(path, output_format=None, sep=';', index_col=None):
+    """
+    Reads only the names of the columns of data written by :func:`write_data` (the values are not read)
+
+    Parameters
+    ----------
+    path: ``str``
+        path of the file, its extension is changed according to the format
+    output_format: ``str`` or ``None``
+        format of the file, if None all the formats are tried (csv first)
+    sep, index_col:
+        passed to :func:`pandas.read_csv` for the "csv" format
+
+    Returns
+    -------
+    ``list``
+    """
+    if output_format is None:
+        this_path, output_format = find_data_file(path)
+        if this_path is None:
+            raise FileNotFoundError(f"No data found for \"{path}\" (with any of the extensions "
+                                    f"{list(OUTPUT_FORMATS.values())})")
+    path = data_file_path(path, output_format)
+    if output_format == "csv":
+        return pd.read_csv(path, sep=sep, index_col=index_col, nrows=0).columns.tolist()
+    if output_format == "parquet":
+        try:
+            import pyarrow.parquet
+        except ImportError as exc_:
+            raise RuntimeError(MSG_PYARROW_DEPENDENCY) from exc_
+        schema = pyarrow.parquet.read_schema(path)
+        index_columns = (schema.pandas_metadata or {}).get("index_columns", [])
+        return [el for el in schema.names if el not in index_columns]
+    if output_format == "npz":
+        # the arrays of a npz archive are read only when they are accessed
+        with np.load(path, allow_pickle=False) as data:
+            return data["columns"].tolist()
+    with open(_stem(path) + NPY_COLUMNS_EXTENSION, "r", encoding="utf-8") as f:
+        return json.load(f)
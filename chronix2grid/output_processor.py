@@ -15,6 +15,7 @@ import pathlib
 
 from .generation import generation_utils as gu
 from chronix2grid import constants as cst
+from chronix2grid.output_format import file_output_format, read_data, write_data, NPY_COLUMNS_EXTENSION
 
 
 def write_start_dates_for_chunks(output_path, scenario_name, n_weeks, by_n_weeks,
@@ -85,8 +86,15 @@ def output_processor_to_chunks(output_path, scenario_name, by_n_weeks, n_scenari
 
 def generate_chunks(csv_files_to_process, chunk_size, sep=','):
     for csv_file in csv_files_to_process:
-        cut_df = cut_csv_file_into_chunks(csv_file, chunk_size, sep=sep)
-        save_chunks(cut_df, csv_file, index=False)
+        output_format = file_output_format(csv_file)
+        if output_format not in (None, "csv"):
+            # binary output formats (see chronix2grid.output_format)
+            cut_df = dataframe_cutter(read_data(csv_file, output_format=output_format), chunk_size)
+            save_chunks(cut_df, csv_file, output_format=output_format)
+        elif not csv_file.endswith(NPY_COLUMNS_EXTENSION):
+            # (names of the columns of a npy file, copied with it by write_data)
+            cut_df = cut_csv_file_into_chunks(csv_file, chunk_size, sep=sep)
+            save_chunks(cut_df, csv_file, index=False)
 
 
 def cut_csv_file_into_chunks(csv_file_path, chunk_size, **kwargs):
@@ -94,17 +102,21 @@ def cut_csv_file_into_chunks(csv_file_path, chunk_size, **kwargs):
     return dataframe_cutter(df, chunk_size)
 
 
-def save_chunks(chunks, original_file_path, **kwargs):
+def save_chunks(chunks, original_file_path, output_format=None, **kwargs):
     parent_dir = pathlib.Path(original_file_path).parent.absolute()
     original_file_name = pathlib.Path(original_file_path).name
     chunk_folder_name_generator = gu.folder_name_pattern('chunk', len(chunks))
     for i, chunk in enumerate(chunks):
         chunk_folder_name = chunk_folder_name_generator(i)
         os.makedirs(os.path.join(parent_dir, chunk_folder_name), exist_ok=True)
-        chunk.to_csv(
-            os.path.join(parent_dir, chunk_folder_name, original_file_name),
-            **kwargs
-        )
+        if output_format is None:
+            chunk.to_csv(
+                os.path.join(parent_dir, chunk_folder_name, original_file_name),
+                **kwargs
+            )
+        else:
+            write_data(chunk, os.path.join(parent_dir, chunk_folder_name, original_file_name),
+                       output_format=output_format)
 
 
 def dataframe_cutter(df, chunk_size):
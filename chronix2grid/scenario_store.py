@@ -0,0 +1,275 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Store holding all the scenarios of an environment in a handful of files, instead of one folder (with
+many small files) per scenario.
+
+Layout of the store (a folder):
+
+* ``<variable>.bin``: the rows of all the scenarios for this variable ("load_p", "prod_p",
+  "prod_p_forecasted"...), one after the other (raw array of `dtype`, `n_columns` values per row)
+* ``variables.json``: the dtype and, for each variable, the names of its columns
+* ``index.jsonl``: one line per scenario, with the position of its rows in each ``.bin`` file and its
+  metadata (the content of the other files of the scenario folder: "start_datetime.info",
+  "generation_quality.json"...)
+
+Scenarios can only be appended (the data are written before the line of the index, so an append that
+was interrupted is simply ignored). Any scenario can be read without reading the others
+(:func:`ScenarioStore.get`), and exported back to the grid2op layout (:func:`ScenarioStore.export`).
+"""
+
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid import constants as cst
+from chronix2grid.output_format import (data_name, file_output_format, read_data, write_data,
+                                        DEFAULT_OUTPUT_FORMAT, NPY_COLUMNS_EXTENSION)
+
+DATA_EXTENSION = ".bin"
+INDEX_FILE = "index.jsonl"
+VARIABLES_FILE = "variables.json"
+# files of a scenario folder stored (as text) in the metadata of the scenario
+METADATA_EXTENSIONS = (".info", ".json", ".jsonl")
+
+
+class ScenarioStore:
+    """
+    All the scenarios of an environment in one store (see :mod:`chronix2grid.scenario_store`),
+    each variable being seen as a (scenario x time x element) array.
+
+    Only one process should append to a store at a time.
+
+    Attributes
+    ----------
+    path: ``str``
+        Folder of the store
+    dtype: :class:`numpy.dtype`
+        Type of the values stored
+    """
+    def __init__(self, path, dtype="float64"):
+        self.path = os.path.abspath(path)
+        os.makedirs(self.path, exist_ok=True)
+        self._variables = {}
+        self._scenarios = {}
+        self._n_rows = {}
+        path_variables = os.path.join(self.path, VARIABLES_FILE)
+        if os.path.exists(path_variables):
+            with open(path_variables, "r", encoding="utf-8") as f:
+                tmp_ = json.load(f)
+            dtype = tmp_["dtype"]
+            self._variables = tmp_["variables"]
+        self.dtype = np.dtype(dtype)
+        self._read_index()
+
+    def _read_index(self):
+        path_index = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(path_index):
+            return
+        with open(path_index, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # last line of an append that was interrupted
+                    continue
+                self._add_entry(entry)
+
+    def _add_entry(self, entry):
+        self._scenarios[entry["name"]] = entry
+        for variable, (row_offset, n_rows) in entry["variables"].items():
+            self._n_rows[variable] = max(self._n_rows.get(variable, 0), row_offset + n_rows)
+
+    def _write_variables(self):
+        tmp_path = os.path.join(self.path, VARIABLES_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dtype": self.dtype.str, "variables": self._variables}, fp=f, indent=4)
+        os.replace(tmp_path, os.path.join(self.path, VARIABLES_FILE))
+
+    @property
+    def scenarios(self):
+        """names of the scenarios, in the order in which they were appended"""
+        return list(self._scenarios)
+
+    @property
+    def variables(self):
+        """names of the variables stored"""
+        return list(self._variables)
+
+    def __len__(self):
+        return len(self._scenarios)
+
+    def __contains__(self, scenario_name):
+        return scenario_name in self._scenarios
+
+    def columns(self, variable):
+        """names of the columns (elements) of `variable`"""
+        return list(self._variables[variable]["columns"])
+
+    def attrs(self, scenario_name):
+        """metadata of the scenario `scenario_name` (``dict``)"""
+        return self._scenarios[scenario_name]["attrs"]
+
+    def append(self, scenario_name, data, attrs=None):
+        """
+        Adds a scenario to the store
+
+        Parameters
+        ----------
+        scenario_name: ``str``
+            Name of the scenario, for example "2050-01-03_0" (it should not be in the store already)
+        data: ``dict``
+            The time series of the scenario: keys are the names of the variables ("load_p", "prod_p"...)
+            and values are :class:`pandas.DataFrame`, whose columns are the elements
+        attrs: ``dict``
+            Metadata of the scenario (should be json serializable)
+        """
+        if scenario_name in self._scenarios:
+            raise RuntimeError(f"The scenario \"{scenario_name}\" is already in the store \"{self.path}\"")
+        new_variables = False
+        for variable, df in data.items():
+            columns = [str(col) for col in df.columns]
+            if variable not in self._variables:
+                self._variables[variable] = {"columns": columns}
+                new_variables = True
+            elif columns != self._variables[variable]["columns"]:
+                raise RuntimeError(f"The columns of \"{variable}\" for the scenario \"{scenario_name}\" do not "
+                                   f"match the ones of the store \"{self.path}\"")
+        if new_variables:
+            self._write_variables()
+
+        entry = {"name": scenario_name, "variables": {}, "attrs": attrs if attrs is not None else {}}
+        for variable, df in data.items():
+            values = np.ascontiguousarray(df.values, dtype=self.dtype)
+            row_offset = self._n_rows.get(variable, 0)
+            path_data = os.path.join(self.path, variable + DATA_EXTENSION)
+            with open(path_data, "r+b" if os.path.exists(path_data) else "wb") as f:
+                # (the end of the file can contain the data of an append that was interrupted)
+                f.seek(row_offset * values.shape[1] * self.dtype.itemsize)
+                f.write(values.tobytes())
+                f.truncate()
+            entry["variables"][variable] = [row_offset, values.shape[0]]
+
+        # the scenario is in the store once its line is written
+        path_index = os.path.join(self.path, INDEX_FILE)
+        with open(path_index, "ab") as f:
+            if f.tell() > 0:
+                with open(path_index, "rb") as f_read:
+                    f_read.seek(-1, os.SEEK_END)
+                    if f_read.read(1) != b"\n":
+                        # (line of an append that was interrupted)
+                        f.write(b"\n")
+            f.write((json.dumps(entry) + "\n").encode("utf-8"))
+        self._add_entry(entry)
+
+    def get(self, scenario_name, variable):
+        """
+        Reads one variable of one scenario (without reading the other scenarios)
+
+        Returns
+        -------
+        :class:`pandas.DataFrame`
+        """
+        row_offset, n_rows = self._scenarios[scenario_name]["variables"][variable]
+        columns = self.columns(variable)
+        if n_rows == 0:
+            return pd.DataFrame(np.zeros((0, len(columns)), dtype=self.dtype), columns=columns)
+        values = np.memmap(os.path.join(self.path, variable + DATA_EXTENSION), dtype=self.dtype, mode="r",
+                           offset=row_offset * len(columns) * self.dtype.itemsize,
+                           shape=(n_rows, len(columns)))
+        return pd.DataFrame(np.array(values), columns=columns)
+
+    def read_scenario(self, scenario_name):
+        """all the variables of the scenario `scenario_name` (``dict``, see :func:`ScenarioStore.append`)"""
+        return {variable: self.get(scenario_name, variable)
+                for variable in self._scenarios[scenario_name]["variables"]}
+
+    def as_array(self, variable, scenarios=None):
+        """
+        `variable` for all the scenarios (or the scenarios in `scenarios`), as a (scenario x time x element)
+        array. All these scenarios should have the same number of steps.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+        """
+        if scenarios is None:
+            scenarios = [nm for nm in self._scenarios if variable in self._scenarios[nm]["variables"]]
+        n_steps = {self._scenarios[nm]["variables"][variable][1] for nm in scenarios}
+        if len(n_steps) > 1:
+            raise RuntimeError(f"The scenarios do not have the same number of steps for \"{variable}\": "
+                               f"{sorted(n_steps)}")
+        return np.stack([self.get(nm, variable).values for nm in scenarios])
+
+    def add_folder(self, scenario_path, scenario_name=None):
+        """
+        Adds a scenario generated in a folder (grid2op layout, any output format): its data files are
+        stored as variables and its ".info", ".json" and ".jsonl" (telemetry) files as metadata (key "files" of the attributes)
+
+        Parameters
+        ----------
+        scenario_path: ``str``
+            folder of the scenario
+        scenario_name: ``str``
+            name of the scenario in the store (the name of the folder by default)
+        """
+        if scenario_name is None:
+            scenario_name = os.path.basename(os.path.normpath(scenario_path))
+        data = {}
+        files = {}
+        ignored = []
+        for file_nm in sorted(os.listdir(scenario_path)):
+            this_path = os.path.join(scenario_path, file_nm)
+            if not os.path.isfile(this_path) or file_nm.endswith(NPY_COLUMNS_EXTENSION):
+                continue
+            output_format = file_output_format(file_nm)
+            if output_format == "npy" and \
+                    not os.path.exists(os.path.join(scenario_path, data_name(file_nm) + NPY_COLUMNS_EXTENSION)):
+                # not written by write_data (eg the reference curves)
+                output_format = None
+            if output_format is not None:
+                data[data_name(file_nm)] = read_data(this_path, output_format=output_format)
+            elif file_nm.endswith(METADATA_EXTENSIONS):
+                with open(this_path, "r", encoding="utf-8") as f:
+                    files[file_nm] = f.read()
+            else:
+                ignored.append(file_nm)
+        if ignored:
+            warnings.warn(f"The files {ignored} of \"{scenario_path}\" are not stored")
+        self.append(scenario_name, data, attrs={"files": files})
+
+    def export(self, output_dir, scenarios=None, output_format=DEFAULT_OUTPUT_FORMAT,
+               float_format=cst.FLOATING_POINT_PRECISION_FORMAT):
+        """
+        Writes scenarios of the store in the grid2op layout (one folder per scenario in `output_dir`)
+
+        Parameters
+        ----------
+        output_dir: ``str``
+        scenarios: ``list``
+            names of the scenarios to export (all by default)
+        output_format: ``str``
+            see :mod:`chronix2grid.output_format`, "csv" (the one read by grid2op) by default
+        float_format: ``str``
+            see :func:`chronix2grid.output_format.write_data`
+        """
+        if scenarios is None:
+            scenarios = self.scenarios
+        for scenario_name in scenarios:
+            scenario_path = os.path.join(output_dir, scenario_name)
+            os.makedirs(scenario_path, exist_ok=True)
+            for variable, df in self.read_scenario(scenario_name).items():
+                write_data(df, os.path.join(scenario_path, f"{variable}.csv.bz2"), output_format=output_format,
+                           float_format=float_format)
+            for file_nm, content in self.attrs(scenario_name).get("files", {}).items():
+                with open(os.path.join(scenario_path, file_nm), "w", encoding="utf-8") as f:
+                    f.write(content)
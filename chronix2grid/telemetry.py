@@ -0,0 +1,304 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+"""
+Per stage telemetry of the generation: nested timers, peak memory (RSS) and solver statistics.
+
+Each scenario writes its records in a JSON-lines file (:data:`TELEMETRY_FILE_NAME`, in the folder of the
+scenario, or next to it if the scenario failed, see :func:`failed_telemetry_file_name`), one line per stage,
+for example::
+
+    {"scenario": "Scenario_0", "stage": "scenario/T", "name": "T", "depth": 1, "start": 1690000000.0,
+     "duration": 12.3, "process_rss_peak_mb": 512.4, "rss_peak_increase_mb": 40.2, "status": "ok", "pid": 1234,
+     "solver": {"nb_periods": 4, "build_time": 1.2, "solve_time": 9.8, "status": {"optimal": 4}}}
+
+"process_rss_peak_mb" is the peak memory of the process since it started (at the end of the stage), so it
+includes the memory used by the stages and the scenarios generated before in the same process.
+"rss_peak_increase_mb" is how much the stage raised this peak: 0 if the stage used less memory than the peak
+already reached.
+
+The stages of a scenario are nested: "stage" is the path of the stage ("scenario/T" is the stage "T" of the
+stage "scenario"). The records of a batch of scenarios are aggregated by :func:`report` (also available as the
+command ``chronix2grid-telemetry``)::
+
+    chronix2grid-telemetry path/to/output_folder
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+import click
+import numpy as np
+import pandas as pd
+
+TELEMETRY_FILE_NAME = "telemetry.jsonl"
+
+
+def failed_telemetry_file_name(scenario):
+    """name of the telemetry file of the scenario `scenario` if it failed (its folder is removed, so the file is
+    written next to it)"""
+    return f"{scenario}_{TELEMETRY_FILE_NAME}"
+
+
+def peak_rss_mb():
+    """peak resident memory of the current process since it started (in MB, None if it is not available)"""
+    try:
+        import resource
+    except ImportError:
+        # not available on windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # in bytes on macos, in kB elsewhere
+        return peak / 1024. / 1024.
+    return peak / 1024.
+
+
+def opf_solver_stats(opf_timings, terminal_conditions=None):
+    """
+    Solver statistics of a dispatch
+
+    Parameters
+    ----------
+    opf_timings: :class:`pandas.DataFrame` or ``None``
+        the `opf_timings` of the dispatcher: one row per period and the time spent to set up ("setup"),
+        build ("build", HiGHS only), solve ("solve") and read ("extract") the optimization problem
+    terminal_conditions: ``list``
+        the terminal conditions (status) of the optimization of each period
+
+    Returns
+    -------
+    ``dict``
+    """
+    stats = {}
+    if opf_timings is not None and opf_timings.shape[0]:
+        stats["nb_periods"] = int(opf_timings.shape[0])
+        build_time = 0.
+        for col in ("setup", "build"):
+            if col in opf_timings:
+                build_time += float(opf_timings[col].sum())
+        stats["build_time"] = build_time
+        if "solve" in opf_timings:
+            stats["solve_time"] = float(opf_timings["solve"].sum())
+        if "extract" in opf_timings:
+            stats["extract_time"] = float(opf_timings["extract"].sum())
+    if terminal_conditions is not None:
+        status = {}
+        for el in terminal_conditions:
+            status[str(el)] = status.get(str(el), 0) + 1
+        stats["status"] = status
+    return stats
+
+
+class Telemetry:
+    """
+    Records the duration, the peak memory and (optionally) the solver statistics of the stages of the
+    generation of a scenario.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        telemetry = Telemetry("Scenario_0")
+        with telemetry.stage("scenario"):
+            with telemetry.stage("dispatch"):
+                ...
+                telemetry.add_solver_stats(solve_time=1.2, status={"optimal": 1})
+        telemetry.write(os.path.join(scenario_folder_path, TELEMETRY_FILE_NAME))
+
+    Attributes
+    ----------
+    scenario: ``str``
+        name of the scenario
+    records: ``list``
+        the records of the stages that are finished (the inner stages before the outer ones)
+    """
+    def __init__(self, scenario=None):
+        self.scenario = scenario
+        self.records = []
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the code in the ``with`` block, as the stage `name` (nested in the stage currently running, if any).
+        If an exception is raised (or if :func:`Telemetry.fail` is called), the stage is recorded with the status
+        "error" and the error ("error").
+        """
+        record = {"scenario": self.scenario,
+                  "stage": "/".join([el["name"] for el in self._stack] + [name]),
+                  "name": name,
+                  "depth": len(self._stack),
+                  "start": time.time(),
+                  "pid": os.getpid()}
+        self._stack.append(record)
+        beg_ = time.perf_counter()
+        rss_peak_beg = peak_rss_mb()
+        try:
+            yield record
+        except BaseException as exc:
+            record.setdefault("error", f"{exc}")
+            raise
+        finally:
+            record["duration"] = time.perf_counter() - beg_
+            record["process_rss_peak_mb"] = peak_rss_mb()
+            record["rss_peak_increase_mb"] = (record["process_rss_peak_mb"] - rss_peak_beg
+                                              if rss_peak_beg is not None else None)
+            record["status"] = "error" if "error" in record else "ok"
+            self._stack.pop()
+            self.records.append(record)
+
+    def fail(self, error):
+        """
+        Marks the stage currently running (and the stages it is nested in) as failed with `error`, for a
+        stage that stops without raising an exception (for example when the generation returns an error)
+        """
+        if not self._stack:
+            raise RuntimeError("fail should be called inside a stage")
+        for record in self._stack:
+            record.setdefault("error", f"{error}")
+
+    def add_solver_stats(self, **stats):
+        """adds solver statistics (iterations, status, build and solve time...) to the stage currently running"""
+        if not self._stack:
+            raise RuntimeError("add_solver_stats should be called inside a stage")
+        self._stack[-1].setdefault("solver", {}).update(stats)
+
+    def write(self, path):
+        """
+        Writes the records in the JSON-lines file `path` (it is overwritten)
+
+        Returns
+        -------
+        path: ``str``
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record, default=_to_json) + "\n")
+        return path
+
+
+def timed_stage(telemetry, name):
+    """:func:`Telemetry.stage` of `telemetry`, or a context that does nothing if `telemetry` is None"""
+    if telemetry is None:
+        return nullcontext()
+    return telemetry.stage(name)
+
+
+def _to_json(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def find_telemetry_files(paths):
+    """the telemetry files in `paths` (files, or folders that are searched recursively)"""
+    res = []
+    for path in paths:
+        if os.path.isfile(path):
+            res.append(path)
+            continue
+        for root, _, files in os.walk(path):
+            for file_name in files:
+                if file_name == TELEMETRY_FILE_NAME or file_name.endswith(f"_{TELEMETRY_FILE_NAME}"):
+                    res.append(os.path.join(root, file_name))
+    return sorted(res)
+
+
+def load_records(paths):
+    """
+    Reads the records of the telemetry files in `paths` (see :func:`find_telemetry_files`)
+
+    Returns
+    -------
+    :class:`pandas.DataFrame`
+        one row per record
+    """
+    records = []
+    for path in find_telemetry_files(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # file being written
+                    continue
+    return pd.DataFrame(records)
+
+
+def report(records):
+    """
+    Aggregates the records of many scenarios per stage
+
+    Parameters
+    ----------
+    records: :class:`pandas.DataFrame`
+        as returned by :func:`load_records`
+
+    Returns
+    -------
+    :class:`pandas.DataFrame`
+        one row per stage (sorted by total time): number of times it ran, number of errors, total, mean,
+        median, 95th percentile and maximum duration (in s), share of the total time of the outermost
+        stages (in %), maximum peak RSS of the process and maximum increase of this peak during the stage
+        (in MB) and, if any, total build and solve time of the solvers
+        and mean number of iterations
+    """
+    if records.shape[0] == 0:
+        return pd.DataFrame()
+    total_time = records.loc[records["depth"] == 0, "duration"].sum()
+    res = {}
+    for stage, df in records.groupby("stage", sort=False):
+        durations = df["duration"].values
+        row = {"count": durations.shape[0],
+               "errors": int((df["status"] != "ok").sum()),
+               "total_s": float(durations.sum()),
+               "mean_s": float(durations.mean()),
+               "p50_s": float(np.percentile(durations, 50)),
+               "p95_s": float(np.percentile(durations, 95)),
+               "max_s": float(durations.max()),
+               "share_pct": 100. * float(durations.sum()) / total_time if total_time > 0. else float("nan"),
+               "process_rss_peak_mb": float(pd.to_numeric(df["process_rss_peak_mb"]).max()),
+               "rss_peak_increase_mb": float(pd.to_numeric(df["rss_peak_increase_mb"]).max())}
+        if "solver" in df:
+            solver = [el for el in df["solver"].values if isinstance(el, dict)]
+            for key in ("build_time", "solve_time", "iterations"):
+                values = [el[key] for el in solver if el.get(key) is not None]
+                if values:
+                    if key == "iterations":
+                        row["mean_iterations"] = float(np.mean(values))
+                    else:
+                        row[f"solver_{key.replace('_time', '')}_s"] = float(np.sum(values))
+        res[stage] = row
+    res = pd.DataFrame.from_dict(res, orient="index")
+    res.index.name = "stage"
+    return res.sort_values("total_s", ascending=False)
+
+
+@click.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--csv", "csv_path", default=None, help="Also write the report in this csv file")
+def report_command(paths, csv_path):
+    """Aggregates the telemetry (telemetry.jsonl files) of the scenarios found in PATHS, per stage"""
+    records = load_records(paths)
+    if records.shape[0] == 0:
+        click.echo("No telemetry found")
+        return
+    res = report(records)
+    click.echo(f"{records['scenario'].nunique()} scenarios, {records.shape[0]} records")
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        click.echo(res.round(3).to_string())
+    if csv_path is not None:
+        res.to_csv(csv_path)
+
+
+if __name__ == "__main__":
+    report_command()
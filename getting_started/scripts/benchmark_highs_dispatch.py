@@ -0,0 +1,105 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+# compare the HighsDispatcher (sparse linear program solved by HiGHS) with the PypsaDispatcher
+# on a scenario already generated for the case118: objective value, marginal prices and
+# computation time.
+# The solver used by pypsa (`--solver_name`) must be installed.
+
+import os
+import time
+import json
+import argparse
+import pathlib
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.generation.dispatch.EconomicDispatch import ChroniXScenario
+from chronix2grid.generation.dispatch.PypsaDispatchBackend import PypsaDispatcher
+from chronix2grid.generation.dispatch.HighsDispatchBackend import HighsDispatcher
+
+DEFAULT_CASE = os.path.join(pathlib.Path(__file__).parent.parent.parent.absolute(),
+                            "tests", "data", "input", "generation", "case118_l2rpn_wcci_2022")
+DEFAULT_SCENARIO = "2050-03-14_0"
+
+
+def make_dispatcher(dispatcher_class, path_env, load_p, prod_p):
+    df = pd.read_csv(os.path.join(path_env, "prods_charac.csv"), sep=",")
+    df["pmax"] = df["Pmax"]
+    df["pmin"] = df["Pmin"]
+    df["cost_per_mw"] = df["marginal_cost"]
+    gen_type = df.set_index("name").loc[prod_p.columns, "type"].values
+    dispatcher = dispatcher_class.from_dataframe(df)
+    dispatcher._chronix_scenario = ChroniXScenario(loads=1.0 * load_p,
+                                                   prods=1.0 * prod_p,
+                                                   scenario_name="benchmark",
+                                                   res_names={"wind": prod_p.columns[gen_type == "wind"],
+                                                              "solar": prod_p.columns[gen_type == "solar"]})
+    return dispatcher
+
+
+def run_one(dispatcher_class, path_env, load_p, prod_p, opf_params, **kwargs):
+    dispatcher = make_dispatcher(dispatcher_class, path_env, load_p, prod_p)
+    load = pd.DataFrame(load_p.sum(axis=1))
+    beg_ = time.perf_counter()
+    res = dispatcher.run(load * (1.0 + 0.01 * float(opf_params["losses_pct"])),
+                         dispatcher.solar_p.sum(axis=1),
+                         dispatcher.wind_p.sum(axis=1),
+                         opf_params,
+                         **kwargs)
+    duration = time.perf_counter() - beg_
+    if res is None:
+        return None, None, None, duration
+    prods = res.chronix.prods_dispatch
+    marginal_cost = dispatcher.generators.loc[prods.columns, "marginal_cost"].values
+    objective = float(np.sum(prods.values * marginal_cost))
+    return objective, prods, res.chronix.marginal_prices, duration
+
+
+def main(path_env, scenario, nb_day, mode_opf, pyomo, solver_name):
+    chronics_path = os.path.join(path_env, "chronics", scenario)
+    nb_step = nb_day * 288
+    load_p = pd.read_csv(os.path.join(chronics_path, "load_p.csv.bz2"), sep=";").iloc[:nb_step]
+    prod_p = pd.read_csv(os.path.join(chronics_path, "prod_p.csv.bz2"), sep=";").iloc[:nb_step]
+    with open(os.path.join(path_env, "params_opf.json"), "r", encoding="utf-8") as f:
+        opf_params = json.load(f)
+    opf_params["mode_opf"] = mode_opf
+    with open(os.path.join(chronics_path, "start_datetime.info"), "r", encoding="utf-8") as f:
+        start_date = pd.Timestamp(f.read().strip())
+    load_p.index = pd.date_range(start=start_date, periods=load_p.shape[0], freq="5min")
+    prod_p.index = load_p.index
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore")
+        obj_highs, prods_highs, prices_highs, time_highs = run_one(HighsDispatcher, path_env, load_p, prod_p,
+                                                                   dict(opf_params))
+        obj_pypsa, prods_pypsa, prices_pypsa, time_pypsa = run_one(PypsaDispatcher, path_env, load_p, prod_p,
+                                                                   dict(opf_params),
+                                                                   pyomo=pyomo, solver_name=solver_name)
+    print(f"HighsDispatcher: objective {obj_highs:.2f} in {time_highs:.2f}s")
+    print(f"PypsaDispatcher: objective {obj_pypsa:.2f} in {time_pypsa:.2f}s")
+    if obj_highs is not None and obj_pypsa is not None:
+        print(f"relative objective difference: {abs(obj_highs - obj_pypsa) / abs(obj_pypsa):.2e}")
+        print(f"max difference of the marginal prices: {np.max(np.abs(prices_highs.values - prices_pypsa.values)):.2e}")
+        print(f"max difference of the productions: {np.max(np.abs(prods_highs.values - prods_pypsa[prods_highs.columns].values)):.2f}MW "
+              "(the dispatch is not necessarily unique)")
+    return obj_highs, obj_pypsa
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the HighsDispatcher against the PypsaDispatcher")
+    parser.add_argument("--path_env", default=DEFAULT_CASE, type=str)
+    parser.add_argument("--scenario", default=DEFAULT_SCENARIO, type=str)
+    parser.add_argument("--nb_day", default=7, type=int)
+    parser.add_argument("--mode_opf", default="day", type=str)
+    parser.add_argument("--pyomo", default=False, action="store_true")
+    parser.add_argument("--solver_name", default="cbc", type=str)
+    args = parser.parse_args()
+    main(args.path_env, args.scenario, args.nb_day, args.mode_opf, args.pyomo, args.solver_name)
@@ -0,0 +1,98 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+# compare the distribution of the number of iterations of the loss algorithm (see `handle_losses`)
+# with the different warm starts ("ac" / "dc") and accelerations (None / "anderson" / "secant")
+# on windows of a scenario already generated for the case118.
+
+import os
+import time
+import argparse
+import pathlib
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from grid2op.Parameters import Parameters
+
+from chronix2grid.grid2op_utils.utils import make_env_for_loss, _adjust_gens
+from chronix2grid.generation.dispatch.dispatch_loss_utils import BatchLossEvaluator, estimate_losses_dc
+
+DEFAULT_CASE = os.path.join(pathlib.Path(__file__).parent.parent.parent.absolute(),
+                            "tests", "data", "input", "generation", "case118_l2rpn_wcci_2022")
+DEFAULT_SCENARIO = "2050-03-14_0"
+
+
+def get_envs(path_env, scenario, nb_step, nb_window):
+    chronics_path = os.path.join(path_env, "chronics", scenario)
+    load_p = pd.read_csv(os.path.join(chronics_path, "load_p.csv.bz2"), sep=";")
+    load_q = pd.read_csv(os.path.join(chronics_path, "load_q.csv.bz2"), sep=";")
+    prod_p = pd.read_csv(os.path.join(chronics_path, "prod_p.csv.bz2"), sep=";")
+    gens_charac = pd.read_csv(os.path.join(path_env, "prods_charac.csv"), sep=",")
+    gen_v = gens_charac.set_index("name").loc[prod_p.columns, "V"].values
+    env_param = Parameters()
+    env_param.NO_OVERFLOW_DISCONNECTION = True
+    for window_id in range(nb_window):
+        beg_, end_ = window_id * nb_step, (window_id + 1) * nb_step
+        if end_ > prod_p.shape[0]:
+            break
+        gen_v_window = np.tile(gen_v, (nb_step, 1))
+        env = make_env_for_loss(path_env, env_param,
+                                load_p.iloc[beg_:end_], load_q.iloc[beg_:end_], prod_p.iloc[beg_:end_],
+                                gen_v_window, datetime(2050, 1, 1), timedelta(minutes=5))
+        yield env, env_param, prod_p.values[beg_:end_], gen_v_window, load_p.values[beg_:end_], load_q.values[beg_:end_]
+
+
+def run_one(env, env_param, path_env, gen_p, gen_v, load_p, load_q, warm_start, acceleration):
+    params = {"PmaxErrorCorrRatio": 0.9, "RampErrorCorrRatio": 0.95}
+    beg_ = time.perf_counter()
+    if warm_start == "dc":
+        all_loss = estimate_losses_dc(env, gen_p, load_p, load_q)
+    else:
+        evaluator = BatchLossEvaluator(env)
+        all_loss, _ = evaluator.compute(gen_p, load_p, load_q)
+        evaluator.close()
+    total = pd.Series(np.zeros(gen_p.shape[0]))
+    res_gen_p, error_, quality_ = _adjust_gens(all_loss, env, None, total, total, params, path_env, env_param,
+                                               np.sum(load_p, axis=1), load_p, load_q, gen_p,
+                                               gen_v, None, None,
+                                               threshold_stop=0.05, max_iter=100, iter_quality_decrease=20,
+                                               loss_engine="batch", loss_acceleration=acceleration)
+    if error_ is not None:
+        return float("nan"), float("nan"), time.perf_counter() - beg_
+    return quality_[0], quality_[4], time.perf_counter() - beg_
+
+
+def main(path_env, scenario, nb_step, nb_window):
+    res = []
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore")
+        for window_id, (env, env_param, gen_p, gen_v, load_p, load_q) in enumerate(get_envs(path_env, scenario, nb_step, nb_window)):
+            for warm_start in ["ac", "dc"]:
+                for acceleration in [None, "anderson", "secant"]:
+                    iter_num, max_diff, duration = run_one(env, env_param, path_env, gen_p, gen_v, load_p, load_q,
+                                                           warm_start, acceleration)
+                    res.append({"window": window_id, "warm_start": warm_start, "acceleration": str(acceleration),
+                                "iter_num": iter_num, "max_diff": max_diff, "time": duration})
+            env.close()
+    res = pd.DataFrame(res)
+    summary = res.groupby(["warm_start", "acceleration"])[["iter_num", "max_diff", "time"]].describe()
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(summary.loc[:, (slice(None), ["mean", "min", "50%", "max"])])
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the acceleration of the loss algorithm")
+    parser.add_argument("--path_env", default=DEFAULT_CASE, type=str)
+    parser.add_argument("--scenario", default=DEFAULT_SCENARIO, type=str)
+    parser.add_argument("--nb_step", default=288, type=int)
+    parser.add_argument("--nb_window", default=4, type=int)
+    args = parser.parse_args()
+    main(args.path_env, args.scenario, args.nb_step, args.nb_window)
@@ -0,0 +1,100 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+# compare the "knn" and "grid" noise interpolators (used for the forecasts) on the case118:
+# - in terms of computation time
+# - in terms of the statistics of the generated noise
+
+import os
+import time
+import json
+import argparse
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.grid2op_utils.noise_generation_utils import generate_noise
+from chronix2grid.generation.consumption.generate_load import get_add_dim
+
+DEFAULT_CASE = os.path.join(pathlib.Path(__file__).parent.parent.parent.absolute(),
+                            "tests", "data", "input", "generation", "case118_l2rpn_wcci_2022")
+
+
+def get_params(path_env, nb_days, dt):
+    with open(os.path.join(path_env, "params_load.json"), "r") as f:
+        load_params = json.load(f)
+    load_params["dt"] = dt
+    load_params["T"] = nb_days * 24 * 60
+    forecasts_params = {"h": [5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60],
+                        "nb_h_iid": 5,
+                        "h_std_load": [0.02 + 0.005 * i for i in range(12)]}
+    loads_charac = pd.read_csv(os.path.join(path_env, "loads_charac.csv"), sep=",")
+    gen_charac = pd.read_csv(os.path.join(path_env, "prods_charac.csv"), sep=",")
+    return load_params, forecasts_params, loads_charac, gen_charac
+
+
+def run_one(noise_interpolator, load_params, forecasts_params, loads_charac, gen_charac, seed):
+    this_params = dict(forecasts_params)
+    this_params["noise_interpolator"] = noise_interpolator
+    nb_t = load_params["T"] // load_params["dt"] + 1
+    beg_ = time.perf_counter()
+    noise, hs, std_hs = generate_noise(loads_charac,
+                                       gen_charac,
+                                       this_params,
+                                       load_params,
+                                       seed,
+                                       "temperature",
+                                       get_add_dim,
+                                       nb_t,
+                                       load_params,
+                                       loads_charac,
+                                       loads_charac.shape[0],
+                                       add_h0=True)
+    return noise, time.perf_counter() - beg_
+
+
+def summary(noise):
+    # lag-1 autocorrelation (in time) of the noise, averaged over the loads and horizons
+    centered = noise - noise.mean(axis=1, keepdims=True)
+    autocorr = (centered[:, 1:, :] * centered[:, :-1, :]).sum(axis=1) / (centered ** 2).sum(axis=1)
+    # correlation between the noise of the different loads
+    corr_loads = np.corrcoef(noise[:, :, 0])[np.triu_indices(noise.shape[0], k=1)]
+    return {"std": float(noise.std()),
+            "p01": float(np.percentile(noise, 1)),
+            "p99": float(np.percentile(noise, 99)),
+            "autocorr_t": float(np.mean(autocorr)),
+            "corr_loads": float(np.mean(corr_loads))}
+
+
+def main(path_env, nb_days, dt, nb_seeds):
+    load_params, forecasts_params, loads_charac, gen_charac = get_params(path_env, nb_days, dt)
+    res = {}
+    for noise_interpolator in ["knn", "grid"]:
+        times = []
+        stats = []
+        for seed in range(nb_seeds):
+            noise, duration = run_one(noise_interpolator, load_params, forecasts_params,
+                                      loads_charac, gen_charac, seed)
+            times.append(duration)
+            stats.append(summary(noise))
+        res[noise_interpolator] = {"time": np.mean(times), **pd.DataFrame(stats).mean().to_dict()}
+    res = pd.DataFrame(res)
+    print(res)
+    print(f"speed up: {res.loc['time', 'knn'] / res.loc['time', 'grid']:.1f}")
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the noise interpolators")
+    parser.add_argument("--path_env", default=DEFAULT_CASE, type=str)
+    parser.add_argument("--nb_days", default=7, type=int)
+    parser.add_argument("--dt", default=5, type=int)
+    parser.add_argument("--nb_seeds", default=3, type=int)
+    args = parser.parse_args()
+    main(args.path_env, args.nb_days, args.dt, args.nb_seeds)
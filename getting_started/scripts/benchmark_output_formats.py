@@ -0,0 +1,78 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+# compare the output formats of chronix2grid (see chronix2grid.output_format) on a scenario
+# already generated for the case118: time to write, time to read and size of the files.
+# The "parquet" format is only benchmarked if pyarrow is installed.
+
+import os
+import time
+import argparse
+import pathlib
+import tempfile
+
+import pandas as pd
+
+from chronix2grid.output_format import OUTPUT_FORMATS, read_data, write_data
+
+DEFAULT_CASE = os.path.join(pathlib.Path(__file__).parent.parent.parent.absolute(),
+                            "tests", "data", "input", "generation", "case118_l2rpn_wcci_2022")
+DEFAULT_SCENARIO = "2050-03-14_0"
+FILES = ["load_p", "prod_p"]
+
+
+def available_formats():
+    res = list(OUTPUT_FORMATS)
+    try:
+        import pyarrow
+    except ImportError:
+        res.remove("parquet")
+    return res
+
+
+def run_one(output_format, dfs, nb_repeat, tmp_dir):
+    time_write = 0.
+    time_read = 0.
+    size = 0
+    for _ in range(nb_repeat):
+        for name, df in dfs.items():
+            beg_ = time.perf_counter()
+            path = write_data(df, os.path.join(tmp_dir, f"{name}.csv.bz2"), output_format=output_format)
+            time_write += time.perf_counter() - beg_
+            beg_ = time.perf_counter()
+            read_data(path, output_format=output_format)
+            time_read += time.perf_counter() - beg_
+    for file_nm in os.listdir(tmp_dir):
+        size += os.path.getsize(os.path.join(tmp_dir, file_nm))
+        os.remove(os.path.join(tmp_dir, file_nm))
+    return time_write / nb_repeat, time_read / nb_repeat, size
+
+
+def main(path_env, scenario, nb_repeat):
+    chronics_path = os.path.join(path_env, "chronics", scenario)
+    dfs = {name: pd.read_csv(os.path.join(chronics_path, f"{name}.csv.bz2"), sep=";") for name in FILES}
+    print(f"{', '.join(FILES)}: {sum(df.shape[0] for df in dfs.values())} rows, "
+          f"{sum(df.shape[1] for df in dfs.values())} columns")
+    res = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for output_format in available_formats():
+            res[output_format] = run_one(output_format, dfs, nb_repeat, tmp_dir)
+    time_write_csv, time_read_csv, _ = res["csv"]
+    for output_format, (time_write, time_read, size) in res.items():
+        print(f"{output_format:>8}: write {time_write:.3f}s (x{time_write_csv / time_write:.1f}), "
+              f"read {time_read:.3f}s (x{time_read_csv / time_read:.1f}), size {size / 1024.:.0f}kB")
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the output formats against the bz2 csv")
+    parser.add_argument("--path_env", default=DEFAULT_CASE, type=str)
+    parser.add_argument("--scenario", default=DEFAULT_SCENARIO, type=str)
+    parser.add_argument("--nb_repeat", default=3, type=int)
+    args = parser.parse_args()
+    main(args.path_env, args.scenario, args.nb_repeat)
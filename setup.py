@@ -89,5 +89,6 @@ setup(name='Chronix2Grid',
                                     'getting_started/example/input/kpi/case118_l2rpn_neurips_1x/paramsKPI.json',
                                     'getting_started/example/input/kpi/case118_l2rpn_neurips_1x/France/eco2mix/*.csv',
                                     'getting_started/example/input/kpi/case118_l2rpn_neurips_1x/France/renewable_ninja/*.csv']},
-      entry_points={'console_scripts': ['chronix2grid=chronix2grid.main:generate_mp']}
+      entry_points={'console_scripts': ['chronix2grid=chronix2grid.main:generate_mp',
+                                          'chronix2grid-telemetry=chronix2grid.telemetry:report_command']}
 )
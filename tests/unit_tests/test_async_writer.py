@@ -0,0 +1,89 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.async_writer import AsyncWriter, get_async_writer
+from chronix2grid.output_format import read_data
+
+
+class TestAsyncWriter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame(np.random.default_rng(0).uniform(0., 100., size=(288, 5)),
+                               columns=[f"load_{i}" for i in range(5)])
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _path(self, nm):
+        return os.path.join(self.tmp_dir.name, f"{nm}.csv.bz2")
+
+    def test_write(self):
+        with AsyncWriter(max_workers=2) as writer:
+            df = self.df.copy()
+            writer.write(df, self._path("load_p"))
+            # the data are copied when submitted
+            df.iloc[:, :] = 0.
+            writer.write(self.df.values, self._path("load_q"), columns=list(self.df.columns),
+                         output_format="npz")
+            writer.flush()
+            assert np.allclose(read_data(self._path("load_p")).values, self.df.values, atol=0.05)
+            pd.testing.assert_frame_equal(read_data(self._path("load_q")), self.df)
+
+    def test_bounded(self):
+        writer = AsyncWriter(max_workers=1, max_pending=1)
+        event = threading.Event()
+        writer.submit(event.wait)
+        # the queue is full: a second job cannot be submitted until the first one is done
+        submitted = threading.Event()
+        thread = threading.Thread(target=lambda: (writer.submit(lambda: None), submitted.set()))
+        thread.start()
+        assert not submitted.wait(0.2)
+        event.set()
+        assert submitted.wait(5.)
+        thread.join()
+        writer.close()
+
+    def test_errors(self):
+        writer = AsyncWriter(max_workers=2)
+        writer.write(self.df, self._path("load_p"))
+        writer.write(self.df, os.path.join(self.tmp_dir.name, "does_not_exist", "load_q.csv.bz2"))
+        with self.assertRaises(OSError):
+            writer.flush()
+        # the error is raised only once
+        writer.flush()
+        writer.close()
+
+    def test_discard(self):
+        with AsyncWriter() as writer:
+            writer.write(self.df, self._path("load_p"))
+            writer.write(self.df, self._path("load_q"), output_format="npy")
+            writer.discard()
+        assert os.listdir(self.tmp_dir.name) == []
+
+    def test_discard_chunks_and_errors(self):
+        with AsyncWriter() as writer:
+            writer.write(self.df, self._path("load_p"), output_format="npz", chunk_size=100)
+            # fails after the file is created
+            writer.write(self.df, self._path("load_q"), float_format="%q")
+            writer.discard()
+        assert os.listdir(self.tmp_dir.name) == []
+
+    def test_get_async_writer(self):
+        assert get_async_writer() is get_async_writer()
+
+
+if __name__ == '__main__':
+    unittest.main()
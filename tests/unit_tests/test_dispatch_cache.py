@@ -0,0 +1,106 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import time
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.generation.dispatch.EconomicDispatch import ChroniXScenario
+from chronix2grid.generation.dispatch.HighsDispatchBackend import HighsDispatcher
+from chronix2grid.generation.dispatch.dispatch_cache import DispatchCache
+
+
+class TestDispatchCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.env_df = pd.DataFrame({"name": ["gen_0", "gen_1", "gen_2", "gen_3"],
+                                    "type": ["nuclear", "thermal", "solar", "wind"],
+                                    "pmax": [101., 101., 50., 50.],
+                                    "max_ramp_up": [5.1, 50., 0., 0.],
+                                    "max_ramp_down": [5.1, 50., 0., 0.],
+                                    "cost_per_mw": [10., 40., 0., 0.]})
+        nb_step = 288
+        index = pd.date_range(start="2050-01-01", periods=nb_step, freq="5min")
+        self.load = pd.DataFrame({"agg_load": 90. + 30. * np.sin(np.arange(nb_step) / 288. * 2. * np.pi)},
+                                 index=index)
+        self.prods = pd.DataFrame({"gen_2": np.zeros(nb_step), "gen_3": np.full(nb_step, 20.)}, index=index)
+        self.params = {"mode_opf": "day", "reactive_comp": 1.}
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _dispatcher(self, cache):
+        dispatcher = HighsDispatcher.from_dataframe(self.env_df)
+        dispatcher.chronix_scenario = ChroniXScenario(self.load, self.prods, {"wind": ["gen_3"], "solar": ["gen_2"]},
+                                                      "test")
+        dispatcher.cache = cache
+        return dispatcher
+
+    def _run(self, dispatcher, load=None, params=None):
+        return dispatcher.run_cached(self.load if load is None else load, None, dispatcher.wind_p.sum(axis=1),
+                                     self.params if params is None else params)
+
+    def test_make_key(self):
+        dispatcher = self._dispatcher(None)
+        wind = dispatcher.wind_p.sum(axis=1)
+        key = DispatchCache.make_key(dispatcher, self.load, None, wind, self.params)
+        assert key == DispatchCache.make_key(self._dispatcher(None), self.load.copy(), None, wind.copy(),
+                                             dict(self.params))
+        assert key != DispatchCache.make_key(dispatcher, self.load + 1e-3, None, wind, self.params)
+        assert key != DispatchCache.make_key(dispatcher, self.load, wind, wind, self.params)
+        assert key != DispatchCache.make_key(dispatcher, self.load, None, wind, dict(self.params, mode_opf="week"))
+        assert key != DispatchCache.make_key(dispatcher, self.load, None, wind, self.params, by_carrier=True)
+        dispatcher.generators.loc["gen_0", "marginal_cost"] = 11.
+        assert key != DispatchCache.make_key(dispatcher, self.load, None, wind, self.params)
+
+    def test_run_cached(self):
+        cache = DispatchCache(self.tmp_dir.name)
+        res = self._run(self._dispatcher(cache))
+        assert len(cache.entries()) == 1
+
+        # the same dispatch is not computed again
+        dispatcher = self._dispatcher(cache)
+        def fail(*args, **kwargs):
+            raise AssertionError("the dispatch should be read from the cache")
+        dispatcher.run = fail
+        res_cache = self._run(dispatcher)
+        assert dispatcher._has_results
+        pd.testing.assert_frame_equal(res_cache.chronix.prods_dispatch, res.chronix.prods_dispatch,
+                                      check_freq=False)
+        pd.testing.assert_series_equal(res_cache.chronix.marginal_prices, res.chronix.marginal_prices,
+                                       check_freq=False)
+        assert res_cache.terminal_conditions == [str(el) for el in res.terminal_conditions]
+        assert dispatcher.chronix_scenario.prods_dispatch is res_cache.chronix.prods_dispatch
+
+        # other inputs: it is computed
+        self._run(self._dispatcher(cache), load=self.load * 1.01)
+        assert len(cache.entries()) == 2
+
+    def test_lru(self):
+        cache = DispatchCache(self.tmp_dir.name)
+        prods = pd.DataFrame(np.random.default_rng(0).uniform(size=(288, 10)),
+                             index=pd.date_range(start="2050-01-01", periods=288, freq="5min"))
+        prices = prods.iloc[:, 0]
+        for key in ["a", "b", "c"]:
+            cache.put(key, prods, prices, ["optimal"])
+            time.sleep(0.01)
+        size = cache.entries()[0][1]
+        # "a" is used, so "b" is the least recently used
+        assert cache.get("a") is not None
+        cache.max_size_mb = 2.5 * size / 1024. / 1024.
+        cache.evict()
+        assert [os.path.basename(path) for path, _, _ in cache.entries()] == ["c.npz", "a.npz"]
+        assert cache.get("b") is None
+
+
+if __name__ == '__main__':
+    unittest.main()
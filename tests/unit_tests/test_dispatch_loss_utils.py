@@ -0,0 +1,186 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import pathlib
+import tempfile
+import unittest
+import warnings
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from grid2op.Backend import PandaPowerBackend
+from grid2op.Parameters import Parameters
+
+import chronix2grid.constants as cst
+from chronix2grid.generation.dispatch.dispatch_loss_utils import BatchLossEvaluator, estimate_losses_dc, \
+    run_grid2op_simulation_in_memory, correct_loss
+from chronix2grid.grid2op_utils.utils import make_env_for_loss, _accelerate_losses
+
+
+class TestBatchLossEvaluator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.env_path = os.path.join(pathlib.Path(__file__).parent.parent.absolute(),
+                                     'data', 'input', cst.GENERATION_FOLDER_NAME,
+                                     'case118_l2rpn_wcci_2022')
+        chronics_path = os.path.join(self.env_path, 'chronics', '2050-03-14_0')
+        nb_step = 24
+        self.load_p = pd.read_csv(os.path.join(chronics_path, 'load_p.csv.bz2'), sep=';').iloc[:nb_step]
+        self.load_q = pd.read_csv(os.path.join(chronics_path, 'load_q.csv.bz2'), sep=';').iloc[:nb_step]
+        self.prod_p = pd.read_csv(os.path.join(chronics_path, 'prod_p.csv.bz2'), sep=';').iloc[:nb_step]
+        gens_charac = pd.read_csv(os.path.join(self.env_path, 'prods_charac.csv'), sep=',')
+        gen_v = gens_charac.set_index("name").loc[self.prod_p.columns, "V"].values
+        env_param = Parameters()
+        env_param.NO_OVERFLOW_DISCONNECTION = True
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore")
+            self.env = make_env_for_loss(self.env_path, env_param, self.load_p, self.load_q, self.prod_p,
+                                         np.tile(gen_v, (nb_step, 1)),
+                                         datetime(2050, 3, 14), timedelta(minutes=5))
+
+    def tearDown(self) -> None:
+        self.env.close()
+
+    def test_same_as_step(self):
+        all_loss_step = []
+        diff_step = []
+        obs = self.env.reset()
+        done = False
+        while not done:
+            all_loss_step.append(np.sum(obs.gen_p) - np.sum(obs.load_p))
+            diff_step.append(obs.gen_p - self.prod_p.values[len(diff_step)])
+            obs, reward, done, info = self.env.step(self.env.action_space())
+
+        self.env.reset()
+        evaluator = BatchLossEvaluator(self.env)
+        all_loss, diff_ = evaluator.compute(self.prod_p.values, self.load_p.values, self.load_q.values)
+        # second call reuses the base case
+        all_loss2, diff2_ = evaluator.compute(self.prod_p.values, self.load_p.values, self.load_q.values)
+        evaluator.close()
+
+        nb_step = len(all_loss_step)
+        assert all_loss.shape == (self.prod_p.shape[0],)
+        assert diff_.shape == self.prod_p.shape
+        # observations are in float32
+        assert np.allclose(all_loss[:nb_step], all_loss_step, atol=1e-2)
+        assert np.allclose(diff_[:nb_step], np.array(diff_step), atol=1e-2)
+        assert np.allclose(all_loss, all_loss2)
+        assert np.allclose(diff_, diff2_)
+        assert np.all(all_loss > 0.)
+
+    def test_estimate_losses_dc(self):
+        self.env.reset()
+        evaluator = BatchLossEvaluator(self.env)
+        all_loss, _ = evaluator.compute(self.prod_p.values, self.load_p.values, self.load_q.values)
+        evaluator.close()
+        dc_loss = estimate_losses_dc(self.env, self.prod_p.values, self.load_p.values, self.load_q.values)
+        assert dc_loss.shape == all_loss.shape
+        assert np.all(dc_loss > 0.)
+        # reactive flows are neglected
+        assert np.all(dc_loss < all_loss)
+        assert np.all(dc_loss > 0.7 * all_loss)
+
+
+class TestInMemoryLossSimulation(unittest.TestCase):
+    def setUp(self) -> None:
+        self.env_path = os.path.join(pathlib.Path(__file__).parent.parent.absolute(),
+                                     'data', 'input', cst.GENERATION_FOLDER_NAME,
+                                     'case118_l2rpn_wcci_2022')
+        chronics_path = os.path.join(self.env_path, 'chronics', '2050-03-14_0')
+        nb_step = 24
+        self.load_p = pd.read_csv(os.path.join(chronics_path, 'load_p.csv.bz2'), sep=';').iloc[:nb_step]
+        self.load_q = pd.read_csv(os.path.join(chronics_path, 'load_q.csv.bz2'), sep=';').iloc[:nb_step]
+        self.prod_p = pd.read_csv(os.path.join(chronics_path, 'prod_p.csv.bz2'), sep=';').iloc[:nb_step]
+        self.params_opf = {"nameSlack": "gen_68_37", "idxSlack": 37, "early_stopping_mode": False}
+
+    def test_estimate_losses_dc_other_backend(self):
+        env = SimpleNamespace(backend=PandaPowerBackend())
+        with self.assertRaises(RuntimeError):
+            estimate_losses_dc(env, self.prod_p.values, self.load_p.values, self.load_q.values)
+
+    def test_step_and_batch(self):
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore")
+            res_batch = run_grid2op_simulation_in_memory(self.env_path, self.prod_p, self.load_p, self.load_q,
+                                                         loss_engine="batch")
+            # the columns are put in the order of the grid
+            res_step = run_grid2op_simulation_in_memory(self.env_path,
+                                                        self.prod_p[self.prod_p.columns[::-1]],
+                                                        self.load_p[self.load_p.columns[::-1]],
+                                                        self.load_q,
+                                                        loss_engine="step")
+        assert res_batch.prods_p.shape == self.prod_p.shape
+        # observations are in float32
+        assert np.allclose(res_batch.prods_p, res_step.prods_p, atol=1e-2)
+        # only the slack compensates the losses
+        diff_ = res_batch.prods_p - self.prod_p.values
+        assert np.max(np.abs(diff_[:, self.params_opf["idxSlack"]])) > 0.1
+        assert np.allclose(np.delete(diff_, self.params_opf["idxSlack"], axis=1), 0., atol=1e-3)
+
+    def test_correct_loss(self):
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore")
+            res_batch = run_grid2op_simulation_in_memory(self.env_path, self.prod_p, self.load_p, self.load_q,
+                                                         loss_engine="batch")
+        prod_p = self.prod_p.copy()
+        prod_p.index = pd.date_range(start="2050-03-14", periods=prod_p.shape[0], freq="5min")
+        prod_p_forecasted = prod_p + 1.
+        slack_name = self.params_opf["nameSlack"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with warnings.catch_warnings():
+                warnings.filterwarnings("ignore")
+                new_prod_p, new_prod_p_forecasted = correct_loss(prod_p.copy(), prod_p_forecasted.copy(), tmp_dir,
+                                                                 self.params_opf, res_batch)
+            adjusted_loss = pd.read_csv(os.path.join(tmp_dir, "adjusted_loss.csv.bz2"), sep=";")
+        correction = res_batch.prods_p[:, self.params_opf["idxSlack"]] - prod_p[slack_name].values
+        assert np.allclose(new_prod_p[slack_name].values, res_batch.prods_p[:, self.params_opf["idxSlack"]])
+        assert np.allclose(new_prod_p_forecasted[slack_name].values, prod_p_forecasted[slack_name].values + correction)
+        assert np.allclose(adjusted_loss["adjusted_loss_p"].values, correction)
+        pd.testing.assert_frame_equal(new_prod_p.drop(columns=slack_name), prod_p.drop(columns=slack_name))
+
+
+class TestAccelerateLosses(unittest.TestCase):
+    def setUp(self) -> None:
+        prng = np.random.default_rng(0)
+        # a (slowly converging) linear fixed point loss = a * loss + b
+        self.a = prng.uniform(0.5, 0.9, 10)
+        self.b = prng.uniform(50., 100., 10)
+        self.solution = self.b / (1. - self.a)
+
+    def _nb_iter(self, method, depth=3, tol=1e-3, max_iter=200):
+        losses_in = []
+        losses_out = []
+        loss = 1.0 * self.b
+        for iter_num in range(1, max_iter + 1):
+            new_loss = self.a * loss + self.b
+            if np.max(np.abs(new_loss - loss)) <= tol:
+                break
+            if method is None:
+                loss = new_loss
+            else:
+                losses_in = losses_in[-depth:] + [loss]
+                losses_out = losses_out[-depth:] + [new_loss]
+                loss = _accelerate_losses(losses_in, losses_out, method, depth=depth)
+        assert np.allclose(loss, self.solution, atol=1e-2)
+        return iter_num
+
+    def test_fewer_iterations(self):
+        nb_iter_plain = self._nb_iter(None)
+        assert self._nb_iter("secant") < nb_iter_plain
+        assert self._nb_iter("anderson") < nb_iter_plain
+
+    def test_first_iteration_is_plain(self):
+        loss_out = self.a * self.b + self.b
+        assert np.array_equal(_accelerate_losses([self.b], [loss_out], "anderson"), loss_out)
+        assert np.array_equal(_accelerate_losses([self.b], [loss_out], "secant"), loss_out)
+
+
+if __name__ == '__main__':
+    unittest.main()
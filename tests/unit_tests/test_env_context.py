@@ -0,0 +1,81 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from chronix2grid.grid2op_utils.env_context import EnvContext, get_env_context
+
+
+class TestEnvContext(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path_env = self.tmp_dir.name
+        for file_name in ["params.json", "params_load.json", "params_res.json", "params_opf.json"]:
+            self._write_json(file_name, {"planned_std": 0.01})
+        pd.DataFrame({"name": ["load_0"], "Pmax": [10.]}).to_csv(os.path.join(self.path_env, "loads_charac.csv"),
+                                                                  index=False)
+        pd.DataFrame({"name": ["gen_0"], "type": ["hydro"], "Pmax": [10.], "Pmin": [0.]}).to_csv(
+            os.path.join(self.path_env, "prods_charac.csv"), index=False)
+        pd.DataFrame({"datetime": ["2012-01-01 00:00", "2012-01-01 01:00"], "other": [0., 0.],
+                      "p_min_u": [0.1, 0.2], "p_max_u": [0.8, 0.9]}).to_csv(
+            os.path.join(self.path_env, "hydro_french.csv"), index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write_json(self, file_name, content):
+        with open(os.path.join(self.path_env, file_name), "w", encoding="utf-8") as f:
+            json.dump(content, f)
+
+    def test_cache(self):
+        context = EnvContext(self.path_env, ref_pattern_path=self.path_env)
+        params = context.read_json("params.json")
+        assert params == {"planned_std": 0.01}
+        # a copy is returned
+        params["planned_std"] = 1.
+        assert context.read_json("params.json") == {"planned_std": 0.01}
+        gens_charac = context.read_csv("prods_charac.csv")
+        gens_charac["Pmax"] = 0.
+        assert context.read_csv("prods_charac.csv")["Pmax"].tolist() == [10.]
+        assert context.read_json("params_forecasts.json", optional=True) is None
+
+    def test_invalidated(self):
+        context = EnvContext(self.path_env, ref_pattern_path=self.path_env)
+        assert context.read_json("params_opf.json") == {"planned_std": 0.01}
+        path = os.path.join(self.path_env, "params_opf.json")
+        mtime_ns = os.stat(path).st_mtime_ns
+        self._write_json("params_opf.json", {"planned_std": 0.02, "losses_pct": 1.})
+        os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+        assert context.read_json("params_opf.json") == {"planned_std": 0.02, "losses_pct": 1.}
+
+    def test_validate(self):
+        os.remove(os.path.join(self.path_env, "params_res.json"))
+        with self.assertRaises(RuntimeError):
+            EnvContext(self.path_env)
+        self._write_json("params_res.json", {})
+        pd.DataFrame({"name": ["gen_0"]}).to_csv(os.path.join(self.path_env, "prods_charac.csv"), index=False)
+        with self.assertRaises(RuntimeError):
+            EnvContext(self.path_env)
+
+    def test_hydro_guide_curves(self):
+        context = EnvContext(self.path_env, ref_pattern_path=self.path_env).preload()
+        hydro_pattern = context.hydro_guide_curves()
+        assert hydro_pattern.index.tolist() == [(1, 1, 0, 0, 0), (1, 1, 1, 0, 0)]
+        assert hydro_pattern["p_max_u"].tolist() == [0.8, 0.9]
+
+    def test_per_process(self):
+        assert get_env_context(self.path_env) is get_env_context(os.path.join(self.path_env, "."))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import types
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.grid2op_utils.gen_utils import fix_forecast_ramps
+
+
+class TestFixForecastRamps(unittest.TestCase):
+    def setUp(self) -> None:
+        prng = np.random.default_rng(0)
+        n_redisp, n_renew, n_load = 6, 4, 5
+        self.nb_h = 6
+        self.nb_t = 30
+        n_gen = n_redisp + n_renew
+        # only the attributes used by `fix_forecast_ramps`
+        self.env = types.SimpleNamespace(n_gen=n_gen,
+                                         gen_redispatchable=np.array([True] * n_redisp + [False] * n_renew),
+                                         gen_renewable=np.array([False] * n_redisp + [True] * n_renew),
+                                         gen_type=np.array(["hydro"] * 2 + ["thermal"] * (n_redisp - 2) + ["wind"] * n_renew),
+                                         gen_pmax=np.full(n_gen, 200.),
+                                         gen_pmin=np.zeros(n_gen),
+                                         gen_max_ramp_up=np.full(n_gen, 10.),
+                                         gen_max_ramp_down=np.full(n_gen, 10.))
+        t = np.arange(self.nb_t).reshape(-1, 1)
+        redisp = 100. + 20. * np.sin(t / 10.) + prng.uniform(-2., 2., (self.nb_t, n_redisp))
+        renew = 50. + 10. * np.cos(t / 10.) + prng.uniform(-2., 2., (self.nb_t, n_renew))
+        self.res_gen_p_df = pd.DataFrame(np.concatenate((redisp, renew), axis=1))
+        self.load_p = pd.DataFrame(self.res_gen_p_df.values.sum(axis=1, keepdims=True) / 1.02 * np.ones((1, n_load)) / n_load)
+        idx = np.repeat(np.arange(self.nb_t), self.nb_h)
+        self.res_gen_p_for_df = pd.DataFrame(self.res_gen_p_df.values[idx] * prng.lognormal(0., 0.05, (idx.shape[0], n_gen)))
+        self.load_p_for = pd.DataFrame(self.load_p.values[idx] * prng.lognormal(0., 0.02, (idx.shape[0], n_load)))
+        self.params = {"PmaxErrorCorrRatio": 0.9, "RampErrorCorrRatio": 0.95}
+
+    def _fix(self, **kwargs):
+        params = dict(self.params)
+        params.update(kwargs)
+        return fix_forecast_ramps(self.nb_h, self.load_p, self.load_p_for,
+                                  self.res_gen_p_df, self.res_gen_p_for_df,
+                                  self.env, None, params)
+
+    def test_ramps_fixed(self):
+        res, t0_errors, errors, amount_curtailed_for, timers = self._fix()
+        assert len(t0_errors) == 0
+        assert len(errors) == 0
+        assert timers["compile_time"] > 0.
+        assert timers["solve_time"] > 0.
+        assert res.shape == self.res_gen_p_for_df.shape
+        # check the ramps of each forecast horizon (for the steps that are optimized)
+        max_ramp = self.env.gen_max_ramp_up[self.env.gen_redispatchable] * self.params["RampErrorCorrRatio"]
+        gen_p_for = res.iloc[:, self.env.gen_redispatchable].values
+        for t0 in range(self.nb_t - 2):
+            this_for = gen_p_for[t0 * self.nb_h:(t0 + 1) * self.nb_h]
+            assert np.all(np.abs(np.diff(this_for, axis=0)) <= max_ramp + 1e-2)
+
+    def test_warm_start(self):
+        res_warm = self._fix()[0]
+        res_cold = self._fix(forecast_ramps_warm_start=False)[0]
+        assert np.allclose(res_warm.values, res_cold.values, atol=0.5)
+
+    def test_batches(self):
+        res_ref = self._fix(forecast_ramps_warm_start=False)
+        for nb_process in [1, 2]:
+            res = self._fix(forecast_ramps_warm_start=False,
+                            forecast_ramps_batch_size=7,
+                            forecast_ramps_nb_process=nb_process)
+            assert np.allclose(res[0].values, res_ref[0].values, atol=1e-3)
+            assert np.allclose(res[3], res_ref[3], atol=1e-3)
+            assert res[1] == res_ref[1]
+
+
+if __name__ == '__main__':
+    unittest.main()
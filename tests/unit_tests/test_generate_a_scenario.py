@@ -0,0 +1,63 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.async_writer import get_async_writer
+from chronix2grid.grid2op_utils import utils
+from chronix2grid.grid2op_utils.env_context import EnvContext
+
+
+class TestGenerateAScenario(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path_env = os.path.join(self.tmp_dir.name, "env")
+        self.output_dir = os.path.join(self.tmp_dir.name, "chronics")
+        os.mkdir(self.path_env)
+        os.mkdir(self.output_dir)
+        for file_name in ["params.json", "params_load.json", "params_res.json", "params_opf.json"]:
+            with open(os.path.join(self.path_env, file_name), "w", encoding="utf-8") as f:
+                json.dump({"planned_std": 0.01}, f)
+        pd.DataFrame({"name": ["load_0"]}).to_csv(os.path.join(self.path_env, "loads_charac.csv"), index=False)
+        pd.DataFrame({"name": ["gen_0"], "type": ["solar"], "Pmax": [10.], "Pmin": [0.]}).to_csv(
+            os.path.join(self.path_env, "prods_charac.csv"), index=False)
+        self.env_context = EnvContext(self.path_env, ref_pattern_path=self.path_env)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _generate_loads(self, *args, **kwargs):
+        load_p = pd.DataFrame(np.ones((2016, 1)), columns=["load_0"])
+        return None, None, None, None, load_p, 0.7 * load_p, load_p, 0.7 * load_p, None
+
+    def test_async_write_discarded_on_exception(self):
+        with mock.patch.object(utils, "generate_loads", self._generate_loads), \
+                mock.patch.object(utils, "generate_renewable_energy_sources",
+                                  side_effect=KeyError("gen_0")):
+            with self.assertRaises(KeyError):
+                utils.generate_a_scenario(self.path_env, ["gen_0"], np.array(["solar"]), self.output_dir,
+                                          "2050-01-03", 5, 0, 1, 2, 3,
+                                          async_write=True,
+                                          env_context=self.env_context)
+        assert os.listdir(self.output_dir) == []
+        # the writes of the scenario that failed do not affect the next one
+        writer = get_async_writer()
+        writer.write(pd.DataFrame({"a": [1.]}), os.path.join(self.output_dir, "load_p.csv.bz2"))
+        writer.flush()
+        assert os.listdir(self.output_dir) == ["load_p.csv.bz2"]
+
+
+if __name__ == '__main__':
+    unittest.main()
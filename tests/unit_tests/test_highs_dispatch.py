@@ -0,0 +1,205 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.generation.dispatch.EconomicDispatch import ChroniXScenario
+from chronix2grid.generation.dispatch.HighsDispatchBackend import HighsDispatcher, run_opf_highs
+from chronix2grid.generation.dispatch.PypsaDispatchBackend import PypsaDispatcher
+from chronix2grid.generation._dispatch._PypsaDispatchBackend._EDispatch_L2RPN2020.utils import compute_marginal_prices, prepare_net
+
+
+class TestHighsDispatcher(unittest.TestCase):
+    def setUp(self) -> None:
+        self.index = pd.date_range(start="2050-01-01", periods=4, freq="5min")
+        self.demand = pd.DataFrame({"agg_load": [50., 80., 90., 60.]}, index=self.index)
+        self.params = {"mode_opf": None}
+
+    def test_run_opf_highs(self):
+        net = HighsDispatcher()
+        net.add_generator("cheap", p_nom=100., carrier="thermal", marginal_cost=10.,
+                          ramp_limit_up=0.1, ramp_limit_down=0.1)
+        net.add_generator("expensive", p_nom=100., carrier="thermal", marginal_cost=20.)
+        empty = pd.DataFrame(index=self.index)
+        dispatch, termination_condition = run_opf_highs(net, self.demand, empty, empty, self.params,
+                                                        pyomo=False, solver_name="cbc")
+        assert termination_condition == "optimal"
+        assert list(dispatch.columns) == ["cheap", "expensive"]
+        # the cheap generator is limited by its ramps (10MW per step) after the first step
+        assert np.allclose(dispatch["cheap"].values, [50., 60., 70., 60.])
+        assert np.allclose(dispatch["expensive"].values, [0., 20., 20., 0.])
+        objective = np.sum(dispatch.values * net.generators["marginal_cost"].values)
+        assert abs(objective - 3200.) <= 1e-6
+
+        # p_max_pu limits the production (and makes the problem infeasible if too low)
+        gen_max = pd.DataFrame({"expensive": [1., 1., 0.1, 1.]}, index=self.index)
+        dispatch, termination_condition = run_opf_highs(net, self.demand, gen_max, empty, self.params)
+        assert termination_condition == "infeasible"
+        assert dispatch is None
+
+    def test_duals(self):
+        net = HighsDispatcher()
+        net.add_generator("cheap", p_nom=100., carrier="thermal", marginal_cost=10.,
+                          ramp_limit_up=0.1, ramp_limit_down=0.1)
+        net.add_generator("expensive", p_nom=100., carrier="thermal", marginal_cost=20.)
+        empty = pd.DataFrame(index=self.index)
+        dispatch, _, prices = run_opf_highs(net, self.demand, empty, empty, self.params, return_duals=True)
+        costs = net.generators["marginal_cost"].values
+        objective = np.sum(dispatch.values * costs)
+        assert np.allclose(prices.values, [0., 20., 20., 0.])
+        # the dual is between the cost of one MW less and of one MW more of demand
+        for t in range(self.demand.shape[0]):
+            delta_cost = []
+            for delta in (-1., 1.):
+                demand = self.demand.copy()
+                demand.iloc[t, 0] += delta
+                dispatch_t, _ = run_opf_highs(net, demand, empty, empty, self.params)
+                delta_cost.append((np.sum(dispatch_t.values * costs) - objective) / delta)
+            assert delta_cost[0] - 1e-6 <= prices.iloc[t] <= delta_cost[1] + 1e-6
+
+    def test_compute_marginal_prices(self):
+        prng = np.random.default_rng(0)
+        prod_p = pd.DataFrame(prng.uniform(-1., 1., (50, 5)), columns=[f"gen_{i}" for i in range(5)])
+        prod_p.iloc[3] = 0.
+        marginal_costs = pd.Series(prng.uniform(0., 100., 5), index=prod_p.columns)
+        expected = prod_p.apply(lambda row: marginal_costs[row[row > 0].index].max(), axis=1)
+        res = compute_marginal_prices(prod_p, marginal_costs)
+        assert np.isnan(res.iloc[3])
+        assert np.allclose(res.values, expected.values, equal_nan=True)
+
+    def test_run(self):
+        env_df = pd.DataFrame({"name": ["gen_0", "gen_1", "gen_2", "gen_3"],
+                               "type": ["nuclear", "thermal", "solar", "wind"],
+                               "pmax": [101., 101., 50., 50.],
+                               "max_ramp_up": [5.1, 50., 0., 0.],
+                               "max_ramp_down": [5.1, 50., 0., 0.],
+                               "cost_per_mw": [10., 40., 0., 0.]})
+        dispatcher = HighsDispatcher.from_dataframe(env_df)
+        assert list(dispatcher.generators.index) == ["gen_0", "gen_1", "agg_solar", "agg_wind"]
+        assert np.allclose(dispatcher.generators["p_nom"].values, [100., 100., 50., 50.])
+
+        nb_step = 24
+        index = pd.date_range(start="2050-01-01", periods=nb_step, freq="5min")
+        load = pd.DataFrame({"load_0": np.linspace(60., 120., nb_step)}, index=index)
+        prods = pd.DataFrame({"gen_2": np.linspace(0., 30., nb_step),
+                              "gen_3": np.full(nb_step, 20.)}, index=index)
+        dispatcher.chronix_scenario = ChroniXScenario(load, prods, {"wind": ["gen_3"], "solar": ["gen_2"]},
+                                                      "test")
+        res = dispatcher.run(load, dispatcher.solar_p.sum(axis=1), dispatcher.wind_p.sum(axis=1),
+                             {"mode_opf": "day", "reactive_comp": 1.})
+        prod_p = res.chronix.prods_dispatch
+        assert res.terminal_conditions == ["optimal"]
+        assert np.allclose(prod_p.sum(axis=1).values, load["load_0"].values)
+        # renewables are not curtailed
+        assert np.allclose(prod_p["agg_solar"].values, prods["gen_2"].values)
+        assert np.allclose(prod_p["agg_wind"].values, prods["gen_3"].values)
+        assert np.all(np.abs(np.diff(prod_p["gen_0"].values)) <= 5. + 1e-6)
+        # marginal price is the one of the most expensive generator producing
+        expected_prices = np.where(prod_p["gen_1"].values > 0, 40., 10.)
+        assert np.allclose(res.chronix.marginal_prices.values, expected_prices)
+        assert res.chronix.marginal_prices.index.equals(prod_p.index)
+        res_max_cost = dispatcher.run(load, dispatcher.solar_p.sum(axis=1), dispatcher.wind_p.sum(axis=1),
+                                      {"mode_opf": "day", "reactive_comp": 1., "marginal_price": "max_cost"})
+        assert np.allclose(res_max_cost.chronix.marginal_prices.values, expected_prices)
+        # ramps are restored after the run
+        assert np.allclose(dispatcher.generators.loc["gen_0", "ramp_limit_up"], 5.1 / 101.)
+
+
+class TestPreparedNet(unittest.TestCase):
+    def setUp(self) -> None:
+        self.env_df = pd.DataFrame({"name": ["gen_0", "gen_1", "gen_2", "gen_3"],
+                                    "type": ["nuclear", "thermal", "solar", "wind"],
+                                    "pmax": [101., 101., 50., 50.],
+                                    "max_ramp_up": [5.1, 50., 0., 0.],
+                                    "max_ramp_down": [5.1, 50., 0., 0.],
+                                    "cost_per_mw": [10., 40., 0., 0.]})
+        self.params = {"PmaxErrorCorrRatio": 0.9, "RampErrorCorrRatio": 0.5, "slack_ramp_limit_ratio": 0.5}
+
+    def test_prepare_net(self):
+        net = PypsaDispatcher.from_dataframe(self.env_df)
+        net._chronix_scenario = ChroniXScenario(pd.DataFrame(), pd.DataFrame(), {"wind": [], "solar": []}, "test")
+        prepared = prepare_net(net, self.params, slack_name="gen_1")
+        assert prepared is not net
+        assert prepared._chronix_scenario is net._chronix_scenario
+        # the network given is not modified
+        assert np.allclose(net.generators.loc[["gen_0", "gen_1"], "p_nom"].values, [100., 100.])
+        assert np.allclose(prepared.generators.loc[["gen_0", "gen_1", "agg_solar"], "p_nom"].values, [90., 90., 50.])
+        assert np.allclose(prepared.generators.loc["gen_0", "ramp_limit_up"], 0.5 * 5. / 101.)
+        assert np.allclose(prepared.generators.loc["gen_1", "ramp_limit_up"], 0.25 * 49.9 / 101.)
+
+    def test_run(self):
+        nb_step = 3 * 288
+        index = pd.date_range(start="2050-01-01", periods=nb_step, freq="5min")
+        load = pd.DataFrame({"load_0": 90. + 30. * np.sin(np.arange(nb_step) / 288. * 2. * np.pi)}, index=index)
+        prods = pd.DataFrame({"gen_2": np.zeros(nb_step), "gen_3": np.full(nb_step, 20.)}, index=index)
+        res = {}
+        for prepare in (False, True):
+            dispatcher = HighsDispatcher.from_dataframe(self.env_df)
+            dispatcher.chronix_scenario = ChroniXScenario(load, prods, {"wind": ["gen_3"], "solar": ["gen_2"]},
+                                                          "test")
+            params = dict(self.params, mode_opf="day", reactive_comp=1., prepare_net=prepare)
+            res[prepare] = dispatcher.run(load, None, dispatcher.wind_p.sum(axis=1), params)
+            # one row per period
+            assert dispatcher.opf_timings.shape[0] == 3
+            assert np.all(dispatcher.opf_timings[["setup", "build", "solve", "extract"]].values >= 0.)
+            assert np.allclose(dispatcher.generators.loc[["gen_0", "gen_1"], "p_nom"].values, [100., 100.])
+        assert np.allclose(res[False].chronix.prods_dispatch.values, res[True].chronix.prods_dispatch.values)
+        assert np.allclose(res[False].chronix.marginal_prices.values, res[True].chronix.marginal_prices.values)
+
+
+class TestDispatchHorizon(unittest.TestCase):
+    def setUp(self) -> None:
+        self.env_df = pd.DataFrame({"name": ["gen_0", "gen_1", "gen_2", "gen_3"],
+                                    "type": ["nuclear", "thermal", "solar", "wind"],
+                                    "pmax": [101., 101., 50., 50.],
+                                    "max_ramp_up": [1.1, 101., 0., 0.],
+                                    "max_ramp_down": [1.1, 101., 0., 0.],
+                                    "cost_per_mw": [10., 40., 0., 0.]})
+        # low load at the end of the first day, high load at the beginning of the second one
+        nb_step = 288
+        index = pd.date_range(start="2050-01-01", periods=2 * nb_step, freq="5min")
+        self.load = pd.DataFrame({"load_0": np.concatenate((np.full(nb_step, 20.), np.full(nb_step, 100.)))},
+                                 index=index)
+        self.prods = pd.DataFrame({"gen_2": np.zeros(2 * nb_step), "gen_3": np.zeros(2 * nb_step)}, index=index)
+        # ramp of gen_0 (1MW per step)
+        self.max_ramp = 1. / 101. * 100.
+
+    def _run(self, **params):
+        params.update({"mode_opf": "day", "reactive_comp": 1.})
+        dispatcher = HighsDispatcher.from_dataframe(self.env_df)
+        dispatcher.chronix_scenario = ChroniXScenario(self.load, self.prods, {"wind": ["gen_3"], "solar": ["gen_2"]},
+                                                      "test")
+        res = dispatcher.run(self.load, None, None, params)
+        prod_p = res.chronix.prods_dispatch
+        assert len(res.terminal_conditions) == 2
+        assert np.allclose(prod_p.sum(axis=1).values, self.load["load_0"].values)
+        return np.max(np.abs(np.diff(prod_p["gen_0"].values)))
+
+    def test_independent(self):
+        assert self._run() > 10. * self.max_ramp
+        assert self._run(dispatch_horizon="independent") > 10. * self.max_ramp
+
+    def test_rolling(self):
+        assert self._run(dispatch_horizon="rolling") <= self.max_ramp + 1e-6
+        assert self._run(dispatch_horizon="rolling", rolling_overlap_min=60) <= self.max_ramp + 1e-6
+
+    def test_parallel(self):
+        assert self._run(dispatch_horizon="parallel") <= self.max_ramp + 1e-6
+        assert self._run(dispatch_horizon="parallel", reconciliation_min=5) <= self.max_ramp + 1e-6
+        assert self._run(dispatch_horizon="parallel", dispatch_nb_process=2) <= self.max_ramp + 1e-6
+
+    def test_wrong_horizon(self):
+        with self.assertRaises(RuntimeError):
+            self._run(dispatch_horizon="wrong")
+
+
+if __name__ == '__main__':
+    unittest.main()
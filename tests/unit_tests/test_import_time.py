@@ -0,0 +1,46 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import json
+import subprocess
+import sys
+import time
+import unittest
+
+# time (in s) allowed for "import chronix2grid.main" (about 1s is expected, 4 to 5s when everything is imported)
+IMPORT_TIME_BUDGET = 3.
+# dependencies that should only be imported by the step that needs them
+HEAVY_MODULES = ["grid2op", "lightsim2grid", "pypsa", "cvxpy", "plotly", "matplotlib", "seaborn"]
+
+
+def _import_in_subprocess(module_name):
+    code = f"import sys, json, {module_name}; print(json.dumps(sorted(sys.modules)))"
+    beg_ = time.perf_counter()
+    res = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return time.perf_counter() - beg_, json.loads(res.stdout.strip().splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+    def test_no_heavy_import(self):
+        _, modules = _import_in_subprocess("chronix2grid.main")
+        imported = [nm for nm in HEAVY_MODULES if nm in modules]
+        assert not imported, f"{imported} should not be imported by chronix2grid.main"
+
+    def test_highs_without_pypsa(self):
+        _, modules = _import_in_subprocess("chronix2grid.generation.dispatch.HighsDispatchBackend")
+        assert "pypsa" not in modules
+
+    def test_import_time(self):
+        # best of 3, to be less sensitive to the load of the machine
+        import_time = min(_import_in_subprocess("chronix2grid.main")[0] for _ in range(3))
+        assert import_time <= IMPORT_TIME_BUDGET, \
+            f"\"import chronix2grid.main\" took {import_time:.2f}s (budget: {IMPORT_TIME_BUDGET:.2f}s)"
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import unittest
+
+import numpy as np
+import pandas as pd
+from numpy.random import default_rng
+
+import chronix2grid.grid2op_utils.noise_generation_utils as ngu
+from chronix2grid.generation.consumption.generate_load import get_add_dim
+
+
+class TestNoiseInterpolator(unittest.TestCase):
+    def setUp(self) -> None:
+        prng = default_rng(0)
+        self.loads_charac = pd.DataFrame({"name": [f"load_{i}" for i in range(5)],
+                                          "x": prng.uniform(0., 1000., 5),
+                                          "y": prng.uniform(0., 1000., 5),
+                                          "Pmax": prng.uniform(10., 100., 5)})
+        self.load_params = {"Lx": 1000, "Ly": 1000, "dx_corr": 250, "dy_corr": 250,
+                            "temperature_corr": 400, "T": 6 * 60, "dt": 5}
+        self.forecasts_params = {"h": [5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60],
+                                 "nb_h_iid": 5,
+                                 "h_std_load": [0.02 + 0.005 * i for i in range(12)]}
+        self.nb_t = self.load_params["T"] // self.load_params["dt"] + 1
+
+    def _get_noise(self, dtype=np.float64, **kwargs):
+        forecasts_params = dict(self.forecasts_params)
+        forecasts_params.update(kwargs)
+        noise, hs, std_hs = ngu.generate_noise(self.loads_charac,
+                                               self.loads_charac,
+                                               forecasts_params,
+                                               self.load_params,
+                                               1,
+                                               "temperature",
+                                               get_add_dim,
+                                               self.nb_t,
+                                               self.load_params,
+                                               self.loads_charac,
+                                               self.loads_charac.shape[0],
+                                               dtype=dtype)
+        return noise
+
+    def test_grid_exact_on_mesh(self):
+        Nx, Ny, Nt, Nh = 4, 5, 6, 3
+        noise_mesh = default_rng(1).normal(0, 1, (Nx, Ny, Nt, Nh))
+        res = ngu.generate_coords_mesh(Nx, Ny, Nt, Nh, noise_mesh.size)
+        coords_mesh, rho_x, rho_y, rho_t, rho_h = res
+        model = ngu.get_grid_fitted({}, noise_mesh, rho_x, rho_y, rho_t, rho_h)
+        assert np.allclose(model.predict(coords_mesh), noise_mesh.reshape(-1))
+
+    def test_grid_noise(self):
+        noise = self._get_noise(noise_interpolator="grid")
+        assert noise.shape == (5, self.nb_t, 13)
+        assert abs(noise.mean()) <= 1e-7
+        assert abs(noise.std() - 1.) <= 1e-7
+        noise_cubic = self._get_noise(noise_interpolator="grid", grid_interpolation_method="cubic")
+        assert noise_cubic.shape == noise.shape
+        
+    def test_knn_is_default(self):
+        noise_default = self._get_noise()
+        noise_knn = self._get_noise(noise_interpolator="knn")
+        assert np.array_equal(noise_default, noise_knn)
+
+    def test_float32(self):
+        noise = self._get_noise()
+        noise_32 = self._get_noise(dtype=np.float32)
+        assert noise_32.dtype == np.float32
+        assert np.allclose(noise_32, noise, atol=1e-5)
+        
+        # the forecasts stay in float32
+        load_p = (self.loads_charac["Pmax"].values.reshape(-1, 1) * np.ones((1, self.nb_t))).astype(np.float32)
+        _, hs, std_hs = ngu.get_forecast_parameters(self.forecasts_params, self.load_params)
+        load_p_for = ngu.get_forecast(load_p, noise_32, hs, std_hs, self.loads_charac)
+        assert load_p_for.dtype == np.float32
+        assert np.allclose(load_p_for, ngu.get_forecast(load_p.astype(np.float64), noise, hs, std_hs, self.loads_charac),
+                           atol=1e-3)
+
+    def test_unknown_interpolator(self):
+        with self.assertRaises(RuntimeError):
+            self._get_noise(noise_interpolator="unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.output_format import (chunk_size_from_params, data_file_path, find_data_file, read_columns,
+                                        read_data, write_data, NPY_COLUMNS_EXTENSION)
+from chronix2grid.output_processor import generate_chunks
+
+try:
+    import pyarrow
+    PYARROW_INSTALLED = True
+except ImportError:
+    PYARROW_INSTALLED = False
+
+
+class TestOutputFormat(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "prod_p.csv.bz2")
+        self.df = pd.DataFrame(np.random.default_rng(0).uniform(0., 100., size=(24, 3)),
+                               columns=["gen_0", "gen_1", "gen_2"])
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_data_file_path(self):
+        assert data_file_path(self.path, "csv") == self.path
+        assert data_file_path(self.path, "npz") == os.path.join(self.tmp_dir.name, "prod_p.npz")
+        assert data_file_path(os.path.join(self.tmp_dir.name, "prod_p.npy"), "parquet") == \
+            os.path.join(self.tmp_dir.name, "prod_p.parquet")
+        with self.assertRaises(RuntimeError):
+            data_file_path(self.path, "xlsx")
+
+    def test_roundtrip(self):
+        for output_format, atol in [("csv", 0.05), ("npz", 0.), ("npy", 1e-4)]:
+            path = write_data(self.df, self.path, output_format=output_format)
+            assert path == data_file_path(self.path, output_format)
+            res = read_data(path, output_format=output_format)
+            assert list(res.columns) == list(self.df.columns)
+            assert np.allclose(res.values, self.df.values, atol=atol, rtol=0.)
+        assert os.path.exists(os.path.join(self.tmp_dir.name, "prod_p" + NPY_COLUMNS_EXTENSION))
+
+    def test_index(self):
+        df = self.df.copy()
+        df.index = pd.date_range(start="2050-01-01", periods=df.shape[0], freq="5min")
+        res = read_data(write_data(df, self.path, output_format="npz", index=True))
+        assert np.array_equal(res.index.values, df.index.values)
+
+    def test_find_data_file(self):
+        assert find_data_file(self.path) == (None, None)
+        with self.assertRaises(FileNotFoundError):
+            read_data(self.path)
+        path = write_data(self.df, self.path, output_format="npz")
+        assert find_data_file(self.path) == (path, "npz")
+        res = read_data(self.path)
+        pd.testing.assert_frame_equal(res, self.df)
+
+    def test_read_columns(self):
+        for output_format in ["npz", "npy"]:
+            write_data(self.df, self.path, output_format=output_format, index=True)
+            assert read_columns(self.path, output_format=output_format) == ["gen_0", "gen_1", "gen_2"]
+        # the first format found
+        assert read_columns(self.path) == ["gen_0", "gen_1", "gen_2"]
+        write_data(self.df, self.path, output_format="csv", index=True)
+        assert read_columns(self.path, output_format="csv", index_col=0) == ["gen_0", "gen_1", "gen_2"]
+
+    @unittest.skipIf(not PYARROW_INSTALLED, "pyarrow is not installed")
+    def test_read_columns_parquet(self):
+        write_data(self.df, self.path, output_format="parquet", index=True)
+        assert read_columns(self.path, output_format="parquet") == ["gen_0", "gen_1", "gen_2"]
+
+    @unittest.skipIf(PYARROW_INSTALLED, "pyarrow is installed")
+    def test_parquet_no_pyarrow(self):
+        with self.assertRaises(RuntimeError):
+            write_data(self.df, self.path, output_format="parquet")
+
+    @unittest.skipIf(not PYARROW_INSTALLED, "pyarrow is not installed")
+    def test_parquet(self):
+        res = read_data(write_data(self.df, self.path, output_format="parquet"))
+        pd.testing.assert_frame_equal(res, self.df)
+
+    def test_chunks(self):
+        path = write_data(self.df, self.path, output_format="npy")
+        generate_chunks([path, data_file_path(self.path, "csv").replace(".csv.bz2", NPY_COLUMNS_EXTENSION)],
+                        chunk_size=8)
+        for i in range(3):
+            res = read_data(os.path.join(self.tmp_dir.name, f"chunk_{i}", "prod_p.csv.bz2"))
+            assert np.allclose(res.values, self.df.values[8 * i:8 * (i + 1)], atol=1e-4)
+
+    def test_chunk_size_from_params(self):
+        assert chunk_size_from_params({"dt": 5}) is None
+        assert chunk_size_from_params({"dt": 5, "by_n_weeks": None}) is None
+        assert chunk_size_from_params({"dt": 5, "by_n_weeks": 4}) == 4 * 7 * 288
+        assert chunk_size_from_params({"dt": 60, "by_n_weeks": 1}) == 7 * 24
+
+    def test_write_chunks(self):
+        # the chunks are written with the file, they are the same as the ones cut afterwards
+        df = pd.concat([self.df] * 5, ignore_index=True)
+        write_data(df, self.path, chunk_size=16)
+        stream_dir = os.path.join(self.tmp_dir.name, "stream")
+        os.mkdir(stream_dir)
+        for nm in os.listdir(self.tmp_dir.name):
+            if nm.startswith("chunk_"):
+                os.rename(os.path.join(self.tmp_dir.name, nm), os.path.join(stream_dir, nm))
+        generate_chunks([self.path], chunk_size=16)
+        assert sorted(os.listdir(stream_dir)) == [f"chunk_{i}" for i in range(8)]
+        for i in range(8):
+            stream_chunk = pd.read_csv(os.path.join(stream_dir, f"chunk_{i}", "prod_p.csv.bz2"), sep=";")
+            chunk = pd.read_csv(os.path.join(self.tmp_dir.name, f"chunk_{i}", "prod_p.csv.bz2"), sep=";")
+            assert stream_chunk.shape[0] == (16 if i < 7 else 8)
+            pd.testing.assert_frame_equal(stream_chunk, chunk)
+        # binary format: the names of the columns are written with each chunk
+        write_data(df, self.path, output_format="npy", chunk_size=100)
+        res = read_data(os.path.join(self.tmp_dir.name, "chunk_1", "prod_p.csv.bz2"), output_format="npy")
+        assert np.allclose(res.values, df.values[100:], atol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import unittest
+
+import numpy as np
+
+from chronix2grid.grid2op_utils.retry import RetryPolicy, retry_seeds, run_with_retry
+
+
+class TestRetry(unittest.TestCase):
+    def test_retry_seeds(self):
+        seeds = (np.int64(1), 2, 3)
+        assert retry_seeds(seeds, 0) == (1, 2, 3)
+        first = retry_seeds(seeds, 1)
+        assert len(first) == 3
+        assert first == retry_seeds(seeds, 1)
+        assert first != retry_seeds(seeds, 2)
+        assert first != retry_seeds((1, 2, 4), 1)
+        assert all(0 <= el < 2**32 for el in first)
+
+    def test_run_with_retry(self):
+        calls = []
+
+        def _generate(*seeds):
+            calls.append(seeds)
+            return ("infeasible" if len(calls) < 3 else None, "data")
+        res, attempts = run_with_retry(_generate, (1, 2, 3), RetryPolicy(max_attempts=5))
+        assert res == (None, "data")
+        assert len(attempts) == 3
+        assert [el["error"] for el in attempts] == ["infeasible", "infeasible", None]
+        assert [tuple(el["seeds"]) for el in attempts] == calls
+        assert calls[0] == (1, 2, 3)
+
+    def test_bounded(self):
+        res, attempts = run_with_retry(lambda *seeds: (RuntimeError("infeasible"), None), (1, 2, 3),
+                                       RetryPolicy(max_attempts=2))
+        assert isinstance(res[0], RuntimeError)
+        assert len(attempts) == 2
+        # no retry by default
+        _, attempts = run_with_retry(lambda *seeds: ("infeasible", None), (1, 2, 3))
+        assert len(attempts) == 1
+        with self.assertRaises(RuntimeError):
+            RetryPolicy(max_attempts=0)
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff=1., backoff_factor=2.)
+        assert [policy.delay(el) for el in range(4)] == [0., 1., 2., 4.]
+
+
+if __name__ == '__main__':
+    unittest.main()
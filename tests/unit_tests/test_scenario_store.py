@@ -0,0 +1,107 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.grid2op_utils.utils import get_last_scenario_id_from_names
+from chronix2grid.output_format import read_data, write_data
+from chronix2grid.scenario_store import ScenarioStore, INDEX_FILE
+
+
+class TestScenarioStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "store")
+        self.prng = np.random.default_rng(0)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def _data(self, nb_step=24):
+        return {"load_p": pd.DataFrame(self.prng.uniform(size=(nb_step, 3)), columns=["load_0", "load_1", "load_2"]),
+                "prod_p": pd.DataFrame(self.prng.uniform(size=(nb_step, 2)), columns=["gen_0", "gen_1"])}
+
+    def test_append_get(self):
+        store = ScenarioStore(self.path)
+        all_data = {}
+        for scen_id in range(3):
+            name = f"2050-01-03_{scen_id}"
+            all_data[name] = self._data()
+            store.append(name, all_data[name], attrs={"seed": scen_id})
+        assert store.scenarios == list(all_data)
+        assert sorted(store.variables) == ["load_p", "prod_p"]
+
+        # random access, also after the store is opened again
+        for this_store in [store, ScenarioStore(self.path)]:
+            pd.testing.assert_frame_equal(this_store.get("2050-01-03_1", "prod_p"), all_data["2050-01-03_1"]["prod_p"])
+            assert this_store.attrs("2050-01-03_2") == {"seed": 2}
+            arr = this_store.as_array("load_p")
+            assert arr.shape == (3, 24, 3)
+            assert np.array_equal(arr[2], all_data["2050-01-03_2"]["load_p"].values)
+
+        with self.assertRaises(RuntimeError):
+            store.append("2050-01-03_0", self._data())
+        data = self._data()
+        data["prod_p"].columns = ["gen_1", "gen_0"]
+        with self.assertRaises(RuntimeError):
+            store.append("2050-01-03_3", data)
+        store.append("2050-01-03_4", self._data(nb_step=10))
+        with self.assertRaises(RuntimeError):
+            store.as_array("load_p")
+        assert get_last_scenario_id_from_names(store.scenarios) == 4
+
+    def test_interrupted_append(self):
+        store = ScenarioStore(self.path)
+        data_0 = self._data()
+        store.append("2050-01-03_0", data_0)
+        # data written but not the (whole) line of the index
+        with open(os.path.join(self.path, "load_p.bin"), "ab") as f:
+            f.write(b"\x00" * 100)
+        with open(os.path.join(self.path, INDEX_FILE), "a", encoding="utf-8") as f:
+            f.write('{"name": "2050-01-03_1", "vari')
+
+        store = ScenarioStore(self.path)
+        assert store.scenarios == ["2050-01-03_0"]
+        data_1 = self._data()
+        store.append("2050-01-03_1", data_1)
+        store = ScenarioStore(self.path)
+        assert store.scenarios == ["2050-01-03_0", "2050-01-03_1"]
+        pd.testing.assert_frame_equal(store.get("2050-01-03_0", "load_p"), data_0["load_p"])
+        pd.testing.assert_frame_equal(store.get("2050-01-03_1", "load_p"), data_1["load_p"])
+        assert os.path.getsize(os.path.join(self.path, "load_p.bin")) == 2 * 24 * 3 * 8
+
+    def test_add_folder_export(self):
+        scenario_path = os.path.join(self.tmp_dir.name, "2050-01-03_0")
+        os.mkdir(scenario_path)
+        data = self._data()
+        for variable, df in data.items():
+            write_data(df, os.path.join(scenario_path, f"{variable}.csv.bz2"), output_format="npz")
+        with open(os.path.join(scenario_path, "start_datetime.info"), "w", encoding="utf-8") as f:
+            f.write("2050-01-02 23:55")
+
+        store = ScenarioStore(self.path)
+        store.add_folder(scenario_path)
+        pd.testing.assert_frame_equal(store.get("2050-01-03_0", "load_p"), data["load_p"])
+
+        output_dir = os.path.join(self.tmp_dir.name, "chronics")
+        store.export(output_dir)
+        assert sorted(os.listdir(os.path.join(output_dir, "2050-01-03_0"))) == \
+            ["load_p.csv.bz2", "prod_p.csv.bz2", "start_datetime.info"]
+        res = read_data(os.path.join(output_dir, "2050-01-03_0", "prod_p.csv.bz2"))
+        assert np.allclose(res.values, data["prod_p"].values, atol=0.05)
+        with open(os.path.join(output_dir, "2050-01-03_0", "start_datetime.info"), "r", encoding="utf-8") as f:
+            assert f.read() == "2050-01-02 23:55"
+
+
+if __name__ == '__main__':
+    unittest.main()
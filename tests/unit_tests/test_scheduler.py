@@ -0,0 +1,109 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import signal
+import tempfile
+import time
+import unittest
+
+from chronix2grid.grid2op_utils.scheduler import run_tasks, TaskDurations
+
+
+def _task(args):
+    kind, value = args
+    if kind == "sleep":
+        time.sleep(value)
+    elif kind == "raise":
+        raise ValueError(value)
+    elif kind == "die":
+        os._exit(3)
+    return os.getpid()
+
+
+def _wait_dead(pid, timeout=5.):
+    """waits until the process `pid` is dead (a zombie, as it is not joined yet)"""
+    beg_ = time.perf_counter()
+    while time.perf_counter() - beg_ < timeout:
+        try:
+            with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+                if f.read().rsplit(")", 1)[1].split()[0] in ("Z", "X"):
+                    return
+        except OSError:
+            return
+        time.sleep(0.01)
+
+
+class TestScheduler(unittest.TestCase):
+    def _run(self, argss, **kwargs):
+        results = {}
+
+        def _callback(i, ok, res, duration):
+            results[i] = (ok, res, duration)
+        run_tasks(_task, argss, _callback, verbose=False, **kwargs)
+        return results
+
+    def test_errors_and_crashes(self):
+        results = self._run([("ok", None), ("raise", "diverged"), ("die", None), ("ok", None)], nb_core=2)
+        assert sorted(results) == [0, 1, 2, 3]
+        assert results[0][0] and results[3][0]
+        assert results[1] == (False, "ValueError: diverged", results[1][2])
+        assert not results[2][0]
+        assert "WorkerDiedError" in results[2][1]
+
+    def test_timeout(self):
+        beg_ = time.perf_counter()
+        results = self._run([("sleep", 60.), ("ok", None)], nb_core=1, timeout=1.)
+        assert time.perf_counter() - beg_ < 30.
+        assert not results[0][0]
+        assert "TaskTimeoutError" in results[0][1]
+        # the next task is run by a new worker
+        assert results[1][0]
+
+    def test_idle_worker_killed(self):
+        results = {}
+
+        def _callback(i, ok, res, duration):
+            results[i] = (ok, res, duration)
+            if i == 0:
+                # the worker dies between two tasks
+                os.kill(res, signal.SIGKILL)
+                _wait_dead(res)
+        run_tasks(_task, [("ok", None), ("ok", None)], _callback, nb_core=1, verbose=False)
+        assert results[0][0] and results[1][0]
+        assert results[1][1] != results[0][1]
+
+    def test_max_tasks_per_child(self):
+        results = self._run([("ok", None)] * 4, nb_core=1, max_tasks_per_child=2)
+        pids = [results[i][1] for i in range(4)]
+        assert pids[0] == pids[1]
+        assert pids[1] != pids[2]
+        assert pids[2] == pids[3]
+
+    def test_longest_first(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "durations.json")
+            durations = TaskDurations(path)
+            durations.add("2050-01-03", 10.)
+            durations.add("2050-01-03", 20.)
+            durations.add("2050-01-10", 30.)
+            durations = TaskDurations(path)
+            assert durations.expected("2050-01-03") == 15.
+            order = durations.longest_first(["2050-01-03", "2050-01-10", "2050-01-17"])
+            assert order == [2, 1, 0]
+
+        order_run = []
+
+        def _callback(i, ok, res, duration):
+            order_run.append(i)
+        run_tasks(_task, [("ok", None)] * 3, _callback, nb_core=1, order=[2, 0, 1], verbose=False)
+        assert order_run == [2, 0, 1]
+
+
+if __name__ == '__main__':
+    unittest.main()
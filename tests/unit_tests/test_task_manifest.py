@@ -0,0 +1,88 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from chronix2grid.grid2op_utils.add_data import _tasks_to_resume
+from chronix2grid.grid2op_utils.task_manifest import TaskManifest, MANIFEST_FILE_NAME, DONE, FAILED, PENDING
+from chronix2grid.output_format import write_data
+
+
+def _tasks(start_dates, scen_id="0"):
+    return [{"start_date": start_date, "scen_id": scen_id,
+             "load_seed": np.int64(1), "renew_seed": 2, "gen_p_forecast_seed": 3}
+            for start_date in start_dates]
+
+
+class TestTaskManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, MANIFEST_FILE_NAME)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_status(self):
+        manifest = TaskManifest.create(self.path, _tasks(["2050-01-03", "2050-01-10"]))
+        assert manifest.ids() == ["2050-01-03_0", "2050-01-10_0"]
+        assert manifest.summary() == {PENDING: 2}
+        manifest.set_status("2050-01-03_0", FAILED, duration=1., error=RuntimeError("diverged"))
+        manifest.set_status("2050-01-03_0", DONE, duration=2.)
+
+        # read back from the file
+        manifest = TaskManifest(self.path)
+        task = manifest.tasks["2050-01-03_0"]
+        assert task["status"] == DONE
+        assert task["attempts"] == 2
+        assert task["duration"] == 2.
+        assert task["error"] is None
+        assert task["load_seed"] == 1
+        assert manifest.ids(DONE) == ["2050-01-03_0"]
+        with self.assertRaises(RuntimeError):
+            manifest.set_status("2050-01-17_0", DONE)
+
+    def test_interrupted_line(self):
+        manifest = TaskManifest.create(self.path, _tasks(["2050-01-03", "2050-01-10"]))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"event": "status", "scenario_id": "2050-01-10_0", "sta')
+        manifest = TaskManifest(self.path)
+        assert manifest.summary() == {PENDING: 2}
+        manifest.set_status("2050-01-10_0", DONE)
+        assert TaskManifest(self.path).ids(DONE) == ["2050-01-10_0"]
+
+    def test_tasks_to_resume(self):
+        manifest = TaskManifest.create(self.path, _tasks(["2050-01-03", "2050-01-10", "2050-01-17", "2050-01-24"]))
+        df = pd.DataFrame(np.ones((2, 2)), columns=["a", "b"])
+        for scenario_id in ["2050-01-03_0", "2050-01-10_0", "2050-01-17_0"]:
+            scenario_path = os.path.join(self.tmp_dir.name, scenario_id)
+            os.mkdir(scenario_path)
+            for nm in ["load_p", "load_q", "prod_p", "prod_p_forecasted"]:
+                write_data(df, os.path.join(scenario_path, f"{nm}.csv.bz2"))
+        with open(os.path.join(self.tmp_dir.name, "2050-01-03_0", "generation_quality.json"), "w") as f:
+            json.dump({}, f)
+        manifest.set_status("2050-01-03_0", DONE)
+        # done but half-written
+        manifest.set_status("2050-01-10_0", DONE)
+        manifest.set_status("2050-01-24_0", FAILED, error="diverged")
+        # 2050-01-17_0: interrupted while it was written
+
+        to_run = _tasks_to_resume(manifest, self.tmp_dir.name, None)
+        assert to_run == ["2050-01-10_0", "2050-01-17_0", "2050-01-24_0"]
+        assert os.path.exists(os.path.join(self.tmp_dir.name, "2050-01-03_0"))
+        assert not os.path.exists(os.path.join(self.tmp_dir.name, "2050-01-10_0"))
+        assert not os.path.exists(os.path.join(self.tmp_dir.name, "2050-01-17_0"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# Copyright (c) 2019-2023, RTE (https://www.rte-france.com)
+# See AUTHORS.txt
+# This Source Code Form is subject to the terms of the Mozilla Public License, version 2.0.
+# If a copy of the Mozilla Public License, version 2.0 was not distributed with this file,
+# you can obtain one at http://mozilla.org/MPL/2.0/.
+# SPDX-License-Identifier: MPL-2.0
+# This file is part of Chronix2Grid, A python package to generate "en-masse" chronics for loads and productions (thermal, renewable)
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from chronix2grid.GeneratorBackend import GeneratorBackend
+from chronix2grid.telemetry import (Telemetry, failed_telemetry_file_name, load_records, opf_solver_stats, report,
+                                    timed_stage, TELEMETRY_FILE_NAME)
+
+
+class TestTelemetry(unittest.TestCase):
+    def test_nested_stages(self):
+        telemetry = Telemetry("Scenario_0")
+        with telemetry.stage("scenario"):
+            with telemetry.stage("L"):
+                pass
+            with telemetry.stage("T"):
+                telemetry.add_solver_stats(solve_time=1.5, status={"optimal": 2})
+        assert [el["stage"] for el in telemetry.records] == ["scenario/L", "scenario/T", "scenario"]
+        assert [el["depth"] for el in telemetry.records] == [1, 1, 0]
+        assert all(el["status"] == "ok" for el in telemetry.records)
+        assert all(el["duration"] >= 0. for el in telemetry.records)
+        assert all(el["rss_peak_increase_mb"] >= 0. for el in telemetry.records)
+        assert telemetry.records[1]["solver"] == {"solve_time": 1.5, "status": {"optimal": 2}}
+        assert "solver" not in telemetry.records[0]
+
+    def test_error_status(self):
+        telemetry = Telemetry()
+        with self.assertRaises(ValueError):
+            with telemetry.stage("scenario"):
+                raise ValueError("dispatch failed")
+        assert telemetry.records[0]["status"] == "error"
+        assert telemetry.records[0]["error"] == "dispatch failed"
+        with self.assertRaises(RuntimeError):
+            telemetry.add_solver_stats(iterations=3)
+
+    def test_fail(self):
+        telemetry = Telemetry()
+        with telemetry.stage("renewables"):
+            pass
+        with telemetry.stage("scenario"):
+            with telemetry.stage("dispatch"):
+                telemetry.fail(RuntimeError("infeasible"))
+        assert [el["status"] for el in telemetry.records] == ["ok", "error", "error"]
+        assert telemetry.records[1]["error"] == "infeasible"
+        assert "error" not in telemetry.records[0]
+        with self.assertRaises(RuntimeError):
+            telemetry.fail("infeasible")
+
+    def test_timed_stage_disabled(self):
+        with timed_stage(None, "scenario") as record:
+            assert record is None
+
+    def test_opf_solver_stats(self):
+        opf_timings = pd.DataFrame({"setup": [1., 2.], "build": [0.5, 0.5], "solve": [3., 4.], "extract": [.1, .1]})
+        stats = opf_solver_stats(opf_timings, ["optimal", "optimal", "infeasible"])
+        assert stats["nb_periods"] == 2
+        assert abs(stats["build_time"] - 4.) <= 1e-8
+        assert abs(stats["solve_time"] - 7.) <= 1e-8
+        assert stats["status"] == {"optimal": 2, "infeasible": 1}
+        assert opf_solver_stats(None) == {}
+
+    def test_write_and_report(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for scen_id, iterations in enumerate([2, 4]):
+                telemetry = Telemetry(f"Scenario_{scen_id}")
+                with telemetry.stage("scenario"):
+                    with telemetry.stage("losses"):
+                        telemetry.add_solver_stats(iterations=iterations)
+                scen_path = os.path.join(tmp_dir, f"Scenario_{scen_id}")
+                os.mkdir(scen_path)
+                telemetry.write(os.path.join(scen_path, TELEMETRY_FILE_NAME))
+            telemetry = Telemetry("Scenario_2")
+            with telemetry.stage("scenario"):
+                telemetry.fail("infeasible")
+            telemetry.write(os.path.join(tmp_dir, failed_telemetry_file_name("Scenario_2")))
+            records = load_records([tmp_dir])
+        assert records.shape[0] == 5
+        assert records["scenario"].nunique() == 3
+        res = report(records)
+        assert sorted(res.index) == ["scenario", "scenario/losses"]
+        assert res.loc["scenario", "count"] == 3
+        assert res.loc["scenario", "errors"] == 1
+        assert res.loc["scenario/losses", "errors"] == 0
+        assert abs(res.loc["scenario", "share_pct"] - 100.) <= 1e-8
+        assert res.loc["scenario/losses", "mean_iterations"] == 3.
+        assert res.loc["scenario", "process_rss_peak_mb"] > 0.
+        assert res.loc["scenario", "rss_peak_increase_mb"] >= 0.
+
+    def test_generator_backend_error(self):
+        generator = GeneratorBackend()
+        generator.telemetry = True
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            scen_path = os.path.join(tmp_dir, "Scenario_0")
+            with self.assertRaises(ValueError):
+                with generator._scenario_telemetry("Scenario_0", scen_path):
+                    with timed_stage(generator._telemetry, "L"):
+                        pass
+                    with timed_stage(generator._telemetry, "R"):
+                        raise ValueError("Nan generated in solar data")
+            assert generator._telemetry is None
+            records = load_records([tmp_dir])
+        assert records["stage"].tolist() == ["scenario/L", "scenario/R", "scenario"]
+        assert records["status"].tolist() == ["ok", "error", "error"]
+        assert records["error"].tolist()[1:] == ["Nan generated in solar data"] * 2
+
+
+if __name__ == '__main__':
+    unittest.main()
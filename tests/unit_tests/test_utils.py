@@ -9,6 +9,7 @@ import pathlib
 from chronix2grid.main import create_directory_tree
 import chronix2grid.constants as cst
 import chronix2grid.generation.generation_utils as gu
+import chronix2grid.generation.consumption.consumption_utils as conso
 
 
 class TestUtils(unittest.TestCase):
@@ -39,3 +40,58 @@ class TestUtils(unittest.TestCase):
                 'start_date2', scenario_name
             )
             self.assertTrue(os.path.isdir(path_to_check))
+
+    def test_interpolate_noise_many(self):
+        prng = np.random.default_rng(0)
+        params = {'Lx': 1000, 'Ly': 1000, 'T': 24 * 60, 'dt': 5,
+                  'dx_corr': 250, 'dy_corr': 250, 'temperature_corr': 400}
+        add_dim = 3
+        noise = gu.generate_coarse_noise(prng, params, 'temperature', add_dim)
+        locations = prng.uniform(0., 1000., (20, 2))
+        res = gu.interpolate_noise_many(noise, params, locations,
+                                        params['temperature_corr'], add_dim)
+        self.assertEqual(res.shape, (20, params['T'] // params['dt'] + 1))
+        for site_id, location in enumerate(locations):
+            res_site = gu.interpolate_noise(noise, params, location,
+                                            params['temperature_corr'], add_dim)
+            self.assertTrue(np.allclose(res[site_id], res_site))
+
+    def test_compute_loads_array(self):
+        prng = np.random.default_rng(0)
+        params = {'Lx': 1000, 'Ly': 1000, 'T': 24 * 60, 'dt': 5,
+                  'dx_corr': 250, 'dy_corr': 250, 'temperature_corr': 400,
+                  'std_temperature_noise': 0.06,
+                  'start_date': pd.Timestamp('2012-01-01'),
+                  'end_date': pd.Timestamp('2012-01-02')}
+        nb_load = 30
+        loads_charac = pd.DataFrame({'name': [f'load_{i}' for i in range(nb_load)],
+                                     'type': 'residential',
+                                     'x': prng.uniform(0., 1000., nb_load),
+                                     'y': prng.uniform(0., 1000., nb_load),
+                                     'Pmax': prng.uniform(10., 100., nb_load)})
+        datetime_lwp = pd.date_range('2018-01-01', periods=12 * 24 * 7 * 10, freq='5min')
+        load_weekly_pattern = pd.DataFrame({'datetime': datetime_lwp.strftime('%Y-%m-%d %H:%M:%S'),
+                                            'test': 1. + 0.1 * prng.uniform(size=datetime_lwp.shape[0])})
+        add_dim = 3
+        noise = gu.generate_coarse_noise(prng, params, 'temperature', add_dim)
+        names, loads_array, ref_curves = conso.compute_loads_array(loads_charac, noise, params,
+                                                                   load_weekly_pattern.copy(),
+                                                                   add_dim, return_ref_curve=True,
+                                                                   use_legacy=False)
+        self.assertEqual(loads_array.shape, (nb_load, params['T'] // params['dt'] + 1))
+        self.assertEqual(ref_curves.shape, (params['T'] // params['dt'] + 1, nb_load))
+        self.assertEqual(list(names), list(loads_charac['name']))
+        
+        datetime_lwp = pd.to_datetime(load_weekly_pattern["datetime"])
+        isoweekday = np.array([el.isoweekday() for el in datetime_lwp])
+        hour_minutes = np.array([el.hour * 60 + el.minute for el in datetime_lwp])
+        weekly_pattern = load_weekly_pattern['test'].values
+        for load_id, (x, y, Pmax) in enumerate(loads_charac[['x', 'y', 'Pmax']].values):
+            load_series, ref_curve = conso.compute_residential([x, y], Pmax, noise, params,
+                                                               weekly_pattern, index=load_id,
+                                                               add_dim=add_dim,
+                                                               return_ref_curve=True,
+                                                               isoweekday_lwp=isoweekday,
+                                                               hour_minutes_lwp=hour_minutes)
+            self.assertTrue(np.allclose(loads_array[load_id], load_series))
+            self.assertTrue(np.allclose(ref_curves[:, load_id], ref_curve))